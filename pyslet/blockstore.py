@@ -1,6 +1,8 @@
 #! /usr/bin/env python
 
 import binascii
+import collections
+import contextlib
 import hashlib
 import io
 import logging
@@ -16,9 +18,15 @@ from .odata2 import csdl as edm
 from .py2 import (
     byte,
     join_bytes,
+    py2,
     range3)
 from .vfs import OSFilePath as FilePath
 
+if py2:
+    import Queue as queue
+else:
+    import queue
+
 
 MAX_BLOCK_SIZE = 65536
 """The default maximum block size for block stores: 64K"""
@@ -110,6 +118,13 @@ class BlockStore(object):
             A hex string previously returned by :py:meth:`store`."""
         raise NotImplementedError
 
+    def iterkeys(self):
+        """Generates the keys of all the blocks in the store
+
+        Used when searching the store for orphaned data, the order of
+        the keys is undefined."""
+        raise NotImplementedError
+
 
 class FileBlockStore(BlockStore):
 
@@ -186,6 +201,19 @@ class FileBlockStore(BlockStore):
                 # catch race condition where path is gone already
                 pass
 
+    def iterkeys(self):
+        for d1 in self.dpath.listdir():
+            d1_path = self.dpath.join(d1)
+            # skips tmp, the key directories have two character names
+            if len(str(d1)) != 2 or not d1_path.isdir():
+                continue
+            for d2 in d1_path.listdir():
+                d2_path = d1_path.join(d2)
+                if not d2_path.isdir():
+                    continue
+                for name in d2_path.listdir():
+                    yield str(d1) + str(d2) + str(name)
+
 
 class EDMBlockStore(BlockStore):
 
@@ -238,6 +266,12 @@ class EDMBlockStore(BlockStore):
             except KeyError:
                 pass
 
+    def iterkeys(self):
+        with self.entity_set.open() as blocks:
+            blocks.select_keys()
+            for key in blocks.iterkeys():
+                yield key
+
 
 class LockStoreContext(object):
 
@@ -400,6 +434,61 @@ class LockStore(object):
                                 "on busy hash %s", hash_key)
 
 
+class _BlockTask(object):
+
+    # A unit of work executed by a _BlockWorkers thread
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception as err:
+            self.error = err
+        self.done.set()
+
+    def wait(self):
+        """Waits for the task and returns the result
+
+        If the task raised an exception it is re-raised."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _BlockWorkers(object):
+
+    # A simple pool of daemon threads that execute _BlockTasks, threads
+    # are started on demand up to a maximum of nthreads
+
+    def __init__(self, nthreads):
+        self.nthreads = nthreads
+        self.tasks = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        task = _BlockTask(func, args)
+        with self.lock:
+            if len(self.threads) < self.nthreads:
+                t = threading.Thread(target=self.run)
+                t.daemon = True
+                t.start()
+                self.threads.append(t)
+        self.tasks.put(task)
+        return task
+
+    def run(self):
+        while True:
+            self.tasks.get().run()
+
+
 class StreamStore(object):
 
     """Class for storing stream objects
@@ -469,13 +558,66 @@ class StreamStore(object):
             A block sequence integer
 
         hash
-            The hash key of the block in the block store"""
-
-    def __init__(self, bs, ls, entity_set):
+            The hash key of the block in the block store
+
+    read_ahead
+        The number of blocks to prefetch when streams opened for
+        reading only cross a block boundary.  Defaults to 0, no
+        read-ahead.
+
+    write_behind
+        The maximum number of blocks that are stored concurrently
+        while writing a stream.  Defaults to 0, blocks are stored
+        synchronously.
+
+    Read-ahead and write-behind use a shared pool of background
+    threads, the block store and lock store must therefore be usable
+    from multiple threads.  The larger of the two values determines
+    the number of threads in the pool.  Increasing these values allows
+    throughput to scale in cases where the latency of the block store
+    dominates.
+
+    deferred_gc
+        When blocks are deleted, or replaced with new data, the data in
+        the block store may no longer be referenced by any stream.  By
+        default, such orphaned data is removed immediately.  If
+        deferred_gc is True the hash keys are simply recorded and the
+        orphaned data is only removed when :py:meth:`sweep` is
+        called.
+
+        The recorded hash keys are only held in memory by this object,
+        they are lost if the process exits before :py:meth:`sweep` is
+        called and streams deleted through other StreamStore instances
+        (including those in other processes) are not recorded at all.
+        Orphaned data left behind in this way can be found and removed
+        with a full sweep, see :py:meth:`sweep` for details."""
+
+    #: the maximum number of hash keys checked in a single query
+    GC_BATCH_SIZE = 64
+
+    def __init__(self, bs, ls, entity_set, read_ahead=0, write_behind=0,
+                 deferred_gc=False):
         self.bs = bs
         self.ls = ls
         self.stream_set = entity_set
         self.block_set = entity_set.get_target('Blocks')
+        #: the number of blocks prefetched by read-only streams
+        self.read_ahead = read_ahead
+        #: the maximum number of blocks stored concurrently
+        self.write_behind = write_behind
+        #: True if orphaned data is only removed by :py:meth:`sweep`
+        self.deferred_gc = deferred_gc
+        self._workers = None
+        self._workers_lock = threading.Lock()
+        self._gc_hashes = set()
+        self._gc_lock = threading.Lock()
+
+    def _submit(self, func, *args):
+        with self._workers_lock:
+            if self._workers is None:
+                self._workers = _BlockWorkers(
+                    max(self.read_ahead, self.write_behind, 1))
+        return self._workers.submit(func, *args)
 
     def new_stream(self,
                    mimetype=params.MediaType('application', 'octet-stream'),
@@ -548,39 +690,55 @@ class StreamStore(object):
             stream.exists = False
 
     def store_block(self, stream, block_num, data):
+        block = self._insert_block(stream, block_num, data)
+        self._store_data(block['hash'].value, data)
+        return block
+
+    def begin_store_block(self, stream, block_num, data):
+        """Stores a block in the background
+
+        The block entity is created immediately but the data itself is
+        stored by a background thread.  Returns a tuple of the block
+        entity and a task object with a single method, wait, which
+        blocks until the data has been stored and re-raises any error
+        that occurred while storing it."""
+        block = self._insert_block(stream, block_num, data)
+        return block, self._submit(self._store_data, block['hash'].value,
+                                   data)
+
+    def _insert_block(self, stream, block_num, data):
+        # the block entity is always created before the data is stored
+        # to prevent it being deleted as an orphan by another thread
         hash_key = self.bs.key(data)
         with stream['Blocks'].open() as blocks:
             block = blocks.new_entity()
             block['num'].set_from_value(block_num)
             block['hash'].set_from_value(hash_key)
             blocks.insert_entity(block)
-            # now ensure that the data is stored
-            with self.ls.lock(hash_key):
-                self.bs.store(data)
-            return block
+        return block
+
+    def _store_data(self, hash_key, data):
+        with self.ls.lock(hash_key):
+            self.bs.store(data)
 
     def update_block(self, block, data):
         hash_key = block['hash'].value
         new_hash = self.bs.key(data)
         if new_hash == hash_key:
             return
-        filter = core.BinaryExpression(core.Operator.eq)
-        filter.add_operand(core.PropertyExpression('hash'))
-        hash_value = edm.EDMValue.from_type(edm.SimpleType.String)
-        filter.add_operand(core.LiteralExpression(hash_value))
-        # filter is: hash eq <hash_value>
         with self.block_set.open() as base_coll:
             with self.ls.lock(hash_key):
                 with self.ls.lock(new_hash):
                     self.bs.store(data)
                     block['hash'].set_from_value(new_hash)
                     base_coll.update_entity(block)
-                    # is the old hash key used anywhere?
-                    hash_value.set_from_value(hash_key)
-                    base_coll.set_filter(filter)
-                    if len(base_coll) == 0:
-                        # remove orphan block from block store
-                        self.bs.delete(hash_key)
+                    if not self.deferred_gc:
+                        # is the old hash key used anywhere?
+                        for orphan in self._unreferenced((hash_key, )):
+                            # remove orphan block from block store
+                            self.bs.delete(orphan)
+        if self.deferred_gc:
+            self._defer_gc((hash_key, ))
 
     def retrieve_blocklist(self, stream):
         with stream['Blocks'].open() as blocks:
@@ -592,26 +750,121 @@ class StreamStore(object):
     def retrieve_block(self, block):
         return self.bs.retrieve(block['hash'].value)
 
+    def begin_retrieve_block(self, block):
+        """Retrieves a block in the background
+
+        Returns a task object with a single method, wait, which blocks
+        until the data is available and returns it (or raises the error
+        that occurred while retrieving it)."""
+        return self._submit(self.bs.retrieve, block['hash'].value)
+
     def delete_blocks(self, stream, from_num=0):
-        blocks = list(self.retrieve_blocklist(stream))
-        filter = core.BinaryExpression(core.Operator.eq)
-        filter.add_operand(core.PropertyExpression('hash'))
-        hash_value = edm.EDMValue.from_type(edm.SimpleType.String)
-        filter.add_operand(core.LiteralExpression(hash_value))
-        # filter is: hash eq <hash_value>
+        # group the blocks to delete by hash key
+        hashes = {}
+        for block in self.retrieve_blocklist(stream):
+            if from_num and block['num'].value < from_num:
+                continue
+            hashes.setdefault(block['hash'].value, []).append(block.key())
+        hash_keys = sorted(hashes)
         with self.block_set.open() as base_coll:
-            for block in blocks:
-                if from_num and block['num'].value < from_num:
-                    continue
-                hash_key = block['hash'].value
-                with self.ls.lock(hash_key):
-                    del base_coll[block.key()]
-                    # is this hash key used anywhere?
-                    hash_value.set_from_value(hash_key)
-                    base_coll.set_filter(filter)
-                    if len(base_coll) == 0:
+            if self.deferred_gc:
+                base_coll.delete_entities(
+                    key for hash_key in hash_keys for key in hashes[hash_key])
+                self._defer_gc(hash_keys)
+                return
+            for i in range3(0, len(hash_keys), self.GC_BATCH_SIZE):
+                batch = hash_keys[i:i + self.GC_BATCH_SIZE]
+                with self._lock_all(batch):
+                    base_coll.delete_entities(
+                        [key for hash_key in batch
+                         for key in hashes[hash_key]])
+                    for orphan in self._unreferenced(batch):
                         # remove orphan block from block store
-                        self.bs.delete(hash_key)
+                        self.bs.delete(orphan)
+
+    def sweep(self, full=False):
+        """Removes orphaned data from the block store
+
+        Only required if the store was created with *deferred_gc* set
+        to True.  Checks the hash keys of all blocks deleted or
+        replaced since the last sweep and removes the data of any that
+        are no longer referenced by a stream.  It is safe to call this
+        method from a background thread.  Returns the number of
+        orphaned data blocks removed.
+
+        full
+            If True, the keys of all the data in the block store are
+            checked instead.  A full sweep removes orphaned data that
+            was not recorded by this object, for example, because the
+            process that deleted the stream exited before sweeping.  It
+            is much slower and the keys of the entire block store are
+            held in memory while it runs, use it for occasional
+            maintenance only."""
+        if full:
+            hash_keys = set(self.bs.iterkeys())
+        else:
+            hash_keys = set()
+        with self._gc_lock:
+            pending = self._gc_hashes
+            self._gc_hashes = set()
+        hash_keys = sorted(hash_keys.union(pending))
+        count = 0
+        try:
+            while hash_keys:
+                batch = hash_keys[:self.GC_BATCH_SIZE]
+                with self._lock_all(batch):
+                    for orphan in self._unreferenced(batch):
+                        self.bs.delete(orphan)
+                        count += 1
+                del hash_keys[:len(batch)]
+        finally:
+            if hash_keys:
+                # put back anything we didn't get to
+                self._defer_gc(pending.intersection(hash_keys) if full
+                               else hash_keys)
+        return count
+
+    def _defer_gc(self, hash_keys):
+        with self._gc_lock:
+            self._gc_hashes.update(hash_keys)
+
+    @contextlib.contextmanager
+    def _lock_all(self, hash_keys):
+        # locks all of hash_keys, they should be sorted to prevent
+        # deadlock with other threads doing the same
+        locked = []
+        try:
+            for hash_key in hash_keys:
+                self.ls.lock(hash_key)
+                locked.append(hash_key)
+            yield
+        finally:
+            for hash_key in reversed(locked):
+                self.ls.unlock(hash_key)
+
+    def _unreferenced(self, hash_keys):
+        # returns the list of hash keys in hash_keys that are not
+        # referenced by any block using a single query
+        def hash_filter(keys):
+            # builds a balanced expression: hash eq key1 or ...
+            if len(keys) > 1:
+                result = core.BinaryExpression(core.Operator.bool_or)
+                half = len(keys) // 2
+                result.add_operand(hash_filter(keys[:half]))
+                result.add_operand(hash_filter(keys[half:]))
+            else:
+                result = core.BinaryExpression(core.Operator.eq)
+                result.add_operand(core.PropertyExpression('hash'))
+                hash_value = edm.EDMValue.from_type(edm.SimpleType.String)
+                hash_value.set_from_value(keys[0])
+                result.add_operand(core.LiteralExpression(hash_value))
+            return result
+        if not hash_keys:
+            return []
+        with self.block_set.open() as blocks:
+            blocks.set_filter(hash_filter(list(hash_keys)))
+            used = set(blocks.distinct_values('hash'))
+        return [hash_key for hash_key in hash_keys if hash_key not in used]
 
 
 class BlockStream(io.RawIOBase):
@@ -622,7 +875,14 @@ class BlockStream(io.RawIOBase):
     binary mode.  They are seekable but lack efficiency if random access
     is used across block boundaries.  The main design criteria is to
     ensure that no more than one block is kept in memory at any one
-    time."""
+    time, in addition to any blocks being prefetched or stored in the
+    background as determined by the :py:attr:`StreamStore.read_ahead`
+    and :py:attr:`StreamStore.write_behind` settings.
+
+    When blocks are stored in the background the stream entity itself
+    is only updated when the stream is flushed or closed, after all
+    pending blocks have been stored.  Errors storing blocks are raised
+    at that point."""
 
     def __init__(self, ss, stream, mode="r"):
         self.ss = ss
@@ -631,6 +891,12 @@ class BlockStream(io.RawIOBase):
         self.w = "w" in mode or "+" in mode
         self.size = stream['size'].value
         self.block_size = self.ss.bs.max_block_size
+        # read-ahead is only used for read-only streams
+        self.read_ahead = 0 if self.w else self.ss.read_ahead
+        self.write_behind = self.ss.write_behind if self.w else 0
+        self._prefetch = {}
+        self._pending = collections.deque()
+        self._scommit = False
         self._bdata = None
         self._bnum = 0
         self._bpos = 0
@@ -653,6 +919,7 @@ class BlockStream(io.RawIOBase):
     def close(self):
         super(BlockStream, self).close()
         self.blocks = None
+        self._prefetch = {}
         self.r = self.w = False
 
     def readable(self):
@@ -675,7 +942,7 @@ class BlockStream(io.RawIOBase):
             raise IOError("bad value for whence in seek")
         new_bnum = self.pos // self.block_size
         if new_bnum != self._bnum:
-            self.flush()
+            self._flush_deferred()
             self._bdata = None
             self._bnum = new_bnum
         self._bpos = self.pos % self.block_size
@@ -689,13 +956,45 @@ class BlockStream(io.RawIOBase):
             self._btop = self.block_size
 
     def flush(self):
+        self._flush_block()
+        self._wait_pending()
+        if self._scommit:
+            if self.size != self.stream['size'].value:
+                self.stream['size'].set_from_value(self.size)
+            now = TimePoint.from_now_utc()
+            self.stream['modified'].set_from_value(now)
+            if self._md5 is not None:
+                self.stream['md5'].set_from_value(self._md5.digest())
+            else:
+                self.stream['md5'].set_null()
+            self.stream.commit()
+            self._scommit = False
+
+    def _flush_deferred(self):
+        # flushes the current block, the commit of the stream entity is
+        # deferred if blocks are being stored in the background
+        if self.write_behind:
+            self._flush_block()
+        else:
+            self.flush()
+
+    def _flush_block(self):
         if self._bdirty:
             # the current block is dirty, write it out
             data = self._bdata[:self._btop]
             if data:
                 block = self.blocks[self._bnum]
                 if block.exists:
+                    # the old data may still be queued for storage
+                    self._wait_pending()
                     self.ss.update_block(block, bytes(data))
+                elif self.write_behind:
+                    block, task = self.ss.begin_store_block(
+                        self.stream, self._bnum, data)
+                    self.blocks[self._bnum] = block
+                    self._pending.append(task)
+                    while len(self._pending) > self.write_behind:
+                        self._pending.popleft().wait()
                 else:
                     self.blocks[self._bnum] = self.ss.store_block(
                         self.stream, self._bnum, data)
@@ -704,16 +1003,13 @@ class BlockStream(io.RawIOBase):
                     self._md5num += 1
                 else:
                     self._md5 = None
-            if self.size != self.stream['size'].value:
-                self.stream['size'].set_from_value(self.size)
-            now = TimePoint.from_now_utc()
-            self.stream['modified'].set_from_value(now)
-            if self._md5 is not None:
-                self.stream['md5'].set_from_value(self._md5.digest())
-            else:
-                self.stream['md5'].set_null()
-            self.stream.commit()
             self._bdirty = False
+            self._scommit = True
+
+    def _wait_pending(self):
+        # waits for all blocks being stored in the background
+        while self._pending:
+            self._pending.popleft().wait()
 
     def tell(self):
         return self.pos
@@ -730,16 +1026,36 @@ class BlockStream(io.RawIOBase):
             if self.w:
                 # create a full size block in case we also write
                 self._bdata = bytearray(self.block_size)
+                self._wait_pending()
                 data = self.ss.retrieve_block(self.blocks[self._bnum])
                 self._bdata[:len(data)] = data
             else:
-                self._bdata = self.ss.retrieve_block(self.blocks[self._bnum])
+                self._bdata = self._retrieve_block()
         if nbytes > len(b):
             nbytes = len(b)
         b[:nbytes] = self._bdata[self._bpos:self._bpos + nbytes]
         self.seek(nbytes, io.SEEK_CUR)
         return nbytes
 
+    def _retrieve_block(self):
+        # retrieves the current block using the read-ahead cache
+        task = self._prefetch.pop(self._bnum, None)
+        if task is not None:
+            data = task.wait()
+        else:
+            data = self.ss.retrieve_block(self.blocks[self._bnum])
+        if self.read_ahead:
+            bmax = min(self._bnum + self.read_ahead, len(self.blocks) - 1)
+            for bnum in list(self._prefetch):
+                if bnum < self._bnum or bnum > bmax:
+                    # discard blocks outside the window after a seek
+                    del self._prefetch[bnum]
+            for bnum in range3(self._bnum + 1, bmax + 1):
+                if bnum not in self._prefetch:
+                    self._prefetch[bnum] = self.ss.begin_retrieve_block(
+                        self.blocks[bnum])
+        return data
+
     def write(self, b):
         if not self.w:
             raise IOError("stream not open for writing")
@@ -757,7 +1073,7 @@ class BlockStream(io.RawIOBase):
                 # force the new size to be written
                 self._bdata = bytearray(self.block_size)
                 self._bdirty = True
-                self.flush()
+                self._flush_deferred()
                 # finally add the last block, but don't store it yet
                 with self.stream['Blocks'].open() as blist:
                     new_block = blist.new_entity()
@@ -769,6 +1085,7 @@ class BlockStream(io.RawIOBase):
                     self._bdirty = True
             else:
                 self._bdata = bytearray(self.block_size)
+                self._wait_pending()
                 data = self.ss.retrieve_block(self.blocks[self._bnum])
                 self._bdata[:len(data)] = data
         if nbytes > len(b):
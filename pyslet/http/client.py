@@ -18,6 +18,11 @@ try:
 except ImportError:
     OpenSSL = None
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
 from .. import info
 from .. import rfc2396 as uri
 
@@ -195,6 +200,17 @@ class Connection(SortableMixin):
     def queue_request(self, request):
         self.request_queue.append(request)
 
+    def queue_length(self):
+        """Returns the number of requests queued or in progress
+
+        Used by the :py:class:`Client` to assign requests to the least
+        loaded connection when a thread has more than one connection
+        to the same target."""
+        result = len(self.request_queue) + len(self.response_queue)
+        if self.response is not None:
+            result += 1
+        return result
+
     def connection_task(self):
         """Processes the requests and responses for this connection.
 
@@ -849,7 +865,16 @@ class Connection(SortableMixin):
         elif recv_needs is None:
             # make it safe to call _recv_task in this mode
             return (True, False, False)
-        err = None
+        elif self.recv_buffer_size:
+            # data left over from the previous response, when
+            # pipelining the next response may already be waiting in
+            # our buffer so don't block on the socket until we've
+            # processed it
+            if self._recv_buffered(None):
+                return (True, False, False)
+            elif self.response.recv_mode() == 0:
+                return (False, False, False)
+        recv_err = None
         try:
             data = self.socket.recv(io.DEFAULT_BUFFER_SIZE)
             self.last_rw = time.time()
@@ -863,6 +888,7 @@ class Connection(SortableMixin):
             else:
                 # we're going to swallow this error, log it
                 logging.error("socket.recv raised %s", str(err))
+                recv_err = err
                 data = None
         except IOError as err:
             if io_blocked(err):
@@ -871,6 +897,7 @@ class Connection(SortableMixin):
             # We can't truly tell if the server hung-up except by
             # getting an error here so this error could be fairly benign.
             logging.warning("socket.recv raised %s", str(err))
+            recv_err = err
             data = None
         logging.debug("Reading from %s: \n%s", self.host, repr(data))
         if data:
@@ -893,33 +920,37 @@ class Connection(SortableMixin):
             if self.response.recv_mode() != 0:
                 self.close()
                 return (True, False, False)
-        # Now loop until we can't satisfy the response anymore (or the response
-        # is done)
+        if self._recv_buffered(recv_err):
+            return (True, False, False)
+        return (False, False, False)
+
+    def _recv_buffered(self, err):
+        # Now loop until we can't satisfy the response anymore (or the
+        # response is done), returns True if the response is done
         while self.response is not None:
             recv_needs = self.response.recv_mode()
             if recv_needs is None:
                 # We don't need any bytes at all, the response is done
-                return (True, False, False)
+                return True
             elif recv_needs == messages.Message.RECV_HEADERS:
                 # scan for CRLF, consolidate first
                 data = b''.join(self.recv_buffer)
                 pos = data.find(grammar.CRLF)
                 if pos == 0:
                     # just a blank line, no headers
-                    lines = [grammar.CRLF]
+                    header_block = grammar.CRLF
                     data = data[2:]
                 elif pos > 0:
                     # we need CRLFCRLF actually
                     pos = data.find(grammar.CRLF + grammar.CRLF)
                     # pos can't be 0 now...
                 if pos > 0:
-                    # split the data into lines
-                    lines = [l + grammar.CRLF for l in
-                             data[0:pos + 2].split(grammar.CRLF)]
+                    # pass the header block without splitting it
+                    header_block = data[0:pos + 4]
                     data = data[pos + 4:]
                 elif err:
                     self.close(err)
-                    return (True, False, False)
+                    return True
                 elif pos < 0:
                     # We didn't find the data we wanted this time
                     break
@@ -929,9 +960,10 @@ class Connection(SortableMixin):
                 else:
                     self.recv_buffer = []
                     self.recv_buffer_size = 0
-                if lines:
-                    # logging.debug("Response Headers: %s", repr(lines))
-                    self.response.recv(lines)
+                if header_block:
+                    # logging.debug("Response Headers: %s",
+                    #               repr(header_block))
+                    self.response.recv(header_block)
             elif recv_needs == messages.Message.RECV_LINE:
                 # scan for CRLF, consolidate first
                 data = b''.join(self.recv_buffer)
@@ -941,7 +973,7 @@ class Connection(SortableMixin):
                     data = data[pos + 2:]
                 elif err:
                     self.close(err)
-                    return (True, False, False)
+                    return True
                 else:
                     # We didn't find the data we wanted this time
                     break
@@ -994,7 +1026,7 @@ class Connection(SortableMixin):
             else:
                 raise RuntimeError("Unexpected recv mode: %s" %
                                    repr(recv_needs))
-        return (False, False, False)
+        return False
 
     def new_socket(self):
         with self.lock:
@@ -1098,6 +1130,10 @@ class Client(PEP8Compatibility, object):
         raise :py:class:`RequestManagerBusy`) if an attempt to queue a
         request would cause this limit to be exceeded.
 
+    max_thread_connections (1)
+        The maximum number of HTTP connections each thread may have open
+        to the same host+port at any one time.  See below for details.
+
     timeout
         The maximum wait time on the connection.  This is not the same
         as a limit on the total time to receive a request but a limit on
@@ -1157,19 +1193,36 @@ class Client(PEP8Compatibility, object):
     PUT request that overwrites it.
 
     In summary, to take advantage of multiple simultaneous connections
-    to the same host+port you must use multiple threads."""
+    to the same host+port you must use multiple threads or set
+    max_thread_connections.
+
+    If max_thread_connections is greater than 1 then requests queued by
+    the same thread for the same host+port are assigned to the least
+    loaded of the thread's connections (the one with the fewest
+    requests queued or in progress).  An additional connection is
+    opened, subject to the overall max_connections limit, whenever all
+    the thread's existing connections are busy.  Requests are then
+    spread across the connections so a slow response, or a POST, only
+    stalls the requests queued behind it on the same connection.  If
+    no additional connection can be opened the request is queued on
+    the least loaded existing connection rather than waiting.  The
+    connections are all serviced by :py:meth:`thread_task` in the
+    usual way so there is no need to create additional threads.  As
+    with pipelining, users should beware of non-idempotent sequences
+    as requests on different connections may be processed by the
+    server in any order."""
     ConnectionClass = Connection
     SecureConnectionClass = SecureConnection
 
     def __init__(self, max_connections=100, ca_certs=None, timeout=None,
-                 max_inactive=None):
+                 max_inactive=None, max_thread_connections=1):
         PEP8Compatibility.__init__(self)
         self.managerLock = threading.Condition()
         # the id of the next connection object we'll create
         self.nextId = 1
         self.cActiveThreadTargets = {}
-        # A dict of active connections keyed on thread and target (always
-        # unique)
+        # A dict of dicts of active connections keyed on thread and
+        # target then connection id
         self.cActiveThreads = {}
         # A dict of dicts of active connections keyed on thread id then
         # connection id
@@ -1181,6 +1234,8 @@ class Client(PEP8Compatibility, object):
         self.closing = threading.Event()    # set if we are closing
         # maximum number of connections to manage (set only on construction)
         self.max_connections = max_connections
+        # maximum number of connections per thread and target
+        self.max_thread_connections = max(1, max_thread_connections)
         # maximum wait time on connections
         self.timeout = timeout
         # cached results from socket.getaddrinfo keyed on (hostname,port)
@@ -1306,9 +1361,19 @@ class Client(PEP8Compatibility, object):
                 raise ConnectionClosed
             while True:
                 # Step 1: search for an active connection to the same
-                # target already bound to our thread
-                if thread_target in self.cActiveThreadTargets:
-                    connection = self.cActiveThreadTargets[thread_target]
+                # target already bound to our thread, choosing the least
+                # loaded one if we have more than one
+                active = self.cActiveThreadTargets.get(thread_target, None)
+                if active:
+                    cactive = list(dict_values(active))
+                    cactive.sort(key=lambda c: (c.queue_length(), c.id))
+                    least_loaded = cactive[0]
+                else:
+                    least_loaded = None
+                if least_loaded is not None and (
+                        not least_loaded.queue_length() or
+                        len(cactive) >= self.max_thread_connections):
+                    connection = least_loaded
                     break
                 # Step 2: search for an idle connection to the same
                 # target and bind it to our thread
@@ -1320,11 +1385,15 @@ class Client(PEP8Compatibility, object):
                     self._activate_connection(connection, thread_id)
                     break
                 # Step 3: create a new connection
-                elif (len(self.cActiveThreadTargets) + len(self.cIdleList) <
+                elif (self._active_total() + len(self.cIdleList) <
                       self.max_connections):
                     connection = self._new_connection(target)
                     self._activate_connection(connection, thread_id)
                     break
+                # Step 3a: no more connections, share an existing one
+                elif least_loaded is not None:
+                    connection = least_loaded
+                    break
                 # Step 4: delete the oldest idle connection and go round again
                 elif len(self.cIdleList):
                     cidle = list(dict_values(self.cIdleList))
@@ -1356,7 +1425,10 @@ class Client(PEP8Compatibility, object):
     def active_count(self):
         """Returns the total number of active connections."""
         with self.managerLock:
-            return len(self.cActiveThreadTargets)
+            return self._active_total()
+
+    def _active_total(self):
+        return sum(len(c) for c in dict_values(self.cActiveThreads))
 
     def thread_active_count(self):
         """Returns the total number of active connections associated
@@ -1371,7 +1443,12 @@ class Client(PEP8Compatibility, object):
         target = connection.target_key()
         thread_target = connection.thread_target_key()
         with self.managerLock:
-            self.cActiveThreadTargets[thread_target] = connection
+            if thread_target in self.cActiveThreadTargets:
+                self.cActiveThreadTargets[thread_target][
+                    connection.id] = connection
+            else:
+                self.cActiveThreadTargets[thread_target] = {
+                    connection.id: connection}
             if thread_id in self.cActiveThreads:
                 self.cActiveThreads[thread_id][connection.id] = connection
             else:
@@ -1390,8 +1467,7 @@ class Client(PEP8Compatibility, object):
         target = connection.target_key()
         thread_target = connection.thread_target_key()
         with self.managerLock:
-            if thread_target in self.cActiveThreadTargets:
-                del self.cActiveThreadTargets[thread_target]
+            if self._remove_active_target(connection, thread_target):
                 self.cIdleList[connection.id] = connection
                 if target in self.cIdleTargets:
                     self.cIdleTargets[target][connection.id] = connection
@@ -1415,8 +1491,7 @@ class Client(PEP8Compatibility, object):
         # implementation is similar to deactivation.
         thread_target = connection.thread_target_key()
         with self.managerLock:
-            if thread_target in self.cActiveThreadTargets:
-                del self.cActiveThreadTargets[thread_target]
+            self._remove_active_target(connection, thread_target)
             if connection.thread_id in self.cActiveThreads:
                 if connection.id in self.cActiveThreads[connection.thread_id]:
                     del self.cActiveThreads[
@@ -1425,6 +1500,17 @@ class Client(PEP8Compatibility, object):
                     del self.cActiveThreads[connection.thread_id]
             connection.thread_id = None
 
+    def _remove_active_target(self, connection, thread_target):
+        # removes connection from cActiveThreadTargets returning True
+        # if it was there
+        active = self.cActiveThreadTargets.get(thread_target, None)
+        if active is None or connection.id not in active:
+            return False
+        del active[connection.id]
+        if not active:
+            del self.cActiveThreadTargets[thread_target]
+        return True
+
     def _delete_idle_connection(self, connection):
         if connection.id in self.cIdleList:
             target = connection.target_key()
@@ -1434,6 +1520,10 @@ class Client(PEP8Compatibility, object):
                 del self.cIdleTargets[target]
             connection.close()
 
+    def _request_done(self, request):
+        # Called when a request is finished and has not been resent
+        pass
+
     def _nextid(self):
         #   Used internally to manage auto-incrementing connection ids
         with self.managerLock:
@@ -1574,8 +1664,8 @@ class Client(PEP8Compatibility, object):
                     if connection.last_active < now - max_inactive:
                         # remove this connection from the active lists
                         del self.cActiveThreads[thread_id][connection.id]
-                        del self.cActiveThreadTargets[
-                            connection.thread_target_key()]
+                        self._remove_active_target(
+                            connection, connection.thread_target_key())
                         clist.append(connection)
             if clist:
                 # if stuck threads were blocked waiting for a connection
@@ -1595,7 +1685,7 @@ class Client(PEP8Compatibility, object):
         while True:
             with self.managerLock:
                 self.closing.set()
-                if len(self.cActiveThreadTargets) + len(self.cIdleList) == 0:
+                if self._active_total() + len(self.cIdleList) == 0:
                     break
             self.active_cleanup(0)
             self.idle_cleanup(0)
@@ -1677,6 +1767,191 @@ class Client(PEP8Compatibility, object):
 HTTPRequestManager = Client
 
 
+class AsyncClient(Client):
+
+    """An HTTP client driven by an asyncio event loop
+
+    The constructor takes the same keyword arguments as
+    :py:class:`Client` with the addition of:
+
+    loop
+        The asyncio event loop to use, defaults to None in which case
+        the event loop current when the first request is made is used.
+
+    The default value of max_thread_connections is changed to None,
+    meaning that there is no limit on the number of connections to the
+    same host+port other than max_connections itself.
+
+    Instead of servicing connections from :py:meth:`Client.thread_task`
+    the client registers their sockets with the event loop and does
+    its processing in callbacks.  All requests must be made from the
+    thread running the event loop using :py:meth:`request`, which
+    returns a future, so a coroutine can simply write::
+
+        request = ClientRequest("http://www.example.com/")
+        await client.request(request)
+        if request.status == 200:
+            # do something with request.res_body
+
+    Any number of
+    requests can be outstanding at the same time, they share the
+    client's connection pool and credential and cookie handling works
+    exactly as it does for the threaded client.  Requests that can't
+    be assigned a connection because the pool is full wait (without
+    blocking the event loop) until a connection is released.
+
+    The connections themselves are unchanged so there are some
+    situations in which the event loop may still block.  For example,
+    DNS name resolution, connecting sockets and SSL handshaking.
+    Upgraded connections are not supported.
+
+    This class requires the asyncio module, it is not available in
+    Python 2."""
+
+    def __init__(self, loop=None, max_thread_connections=None, **kwargs):
+        if asyncio is None:
+            raise RuntimeError("AsyncClient requires asyncio")
+        if max_thread_connections is None:
+            max_thread_connections = kwargs.get('max_connections', 100)
+        super(AsyncClient, self).__init__(
+            max_thread_connections=max_thread_connections, **kwargs)
+        self.loop = loop
+        # the thread running the event loop
+        self.loop_thread = None
+        # requests waiting for a connection
+        self.waiting = []
+        # futures for outstanding requests keyed on request
+        self.futures = {}
+        # socket files we have registered with the loop
+        self.readers = set()
+        self.writers = set()
+        # the pending call to _process (if any)
+        self.process_handle = None
+        # the pending timer (if any)
+        self.timer_handle = None
+        # set when a connection is returned to the pool
+        self.released = False
+
+    def request(self, request):
+        """Starts processing an HTTP *request*
+
+        request
+            A :py:class:`ClientRequest` object.
+
+        Returns an asyncio future that is resolved (with *request*
+        itself as the result) when the request is finished. The status
+        and response can then be inspected as normal, like
+        :py:meth:`Client.process_request`, a failed request is not
+        treated as an exception."""
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        if self.loop_thread is None:
+            self.loop_thread = threading.current_thread().ident
+        elif self.loop_thread != threading.current_thread().ident:
+            raise RuntimeError("AsyncClient.request called from a "
+                               "thread other than the event loop's")
+        future = self.loop.create_future()
+        self.futures[request] = future
+        try:
+            self.queue_request(request)
+        except Exception:
+            del self.futures[request]
+            raise
+        return future
+
+    def queue_request(self, request, timeout=None):
+        """Queues a request without blocking
+
+        Overridden to ensure that we never block the event loop.  The
+        *timeout* is ignored, if no connection is available the request
+        is put on hold until a connection is released back to the
+        pool.  This method is also called to queue resends following
+        redirects and authentication challenges."""
+        if self.waiting:
+            # don't jump the queue
+            request.set_client(self)
+            self.waiting.append(request)
+        else:
+            try:
+                super(AsyncClient, self).queue_request(request, timeout=0)
+            except RequestManagerBusy:
+                request.set_client(self)
+                self.waiting.append(request)
+        self._wakeup()
+
+    def _deactivate_connection(self, connection):
+        super(AsyncClient, self)._deactivate_connection(connection)
+        self.released = True
+
+    def _request_done(self, request):
+        future = self.futures.pop(request, None)
+        if future is not None and not future.done():
+            future.set_result(request)
+
+    def _wakeup(self):
+        # schedules a call to _process if one isn't already scheduled
+        if self.process_handle is None and self.loop is not None:
+            self.process_handle = self.loop.call_soon(self._process)
+
+    def _process(self):
+        # the asyncio equivalent of thread_task
+        self.process_handle = None
+        if self.timer_handle is not None:
+            self.timer_handle.cancel()
+            self.timer_handle = None
+        if self.released:
+            self.released = False
+            # try and find connections for waiting requests
+            while self.waiting:
+                request = self.waiting[0]
+                try:
+                    super(AsyncClient, self).queue_request(
+                        request, timeout=0)
+                except RequestManagerBusy:
+                    break
+                except Exception as err:
+                    # the request can't be sent at all
+                    request.error = err
+                    self._request_done(request)
+                del self.waiting[0]
+        with self.managerLock:
+            connections = list(
+                dict_values(self.cActiveThreads.get(self.loop_thread, {})))
+        readers = set()
+        writers = set()
+        wait_time = None
+        for c in connections:
+            try:
+                r, w, tmax = c.connection_task()
+                if wait_time is None or (tmax is not None and
+                                         wait_time > tmax):
+                    wait_time = tmax
+                if r:
+                    readers.add(r)
+                if w:
+                    writers.add(w)
+            except Exception as err:
+                c.close(err)
+        if self.released and self.waiting:
+            # a connection was released during processing
+            self._wakeup()
+        # update the sockets registered with the loop, socket files
+        # may have been closed and reused since the last call so we
+        # always register them afresh
+        for r in self.readers:
+            self.loop.remove_reader(r)
+        for w in self.writers:
+            self.loop.remove_writer(w)
+        for r in readers:
+            self.loop.add_reader(r, self._wakeup)
+        for w in writers:
+            self.loop.add_writer(w, self._wakeup)
+        self.readers = readers
+        self.writers = writers
+        if wait_time is not None and connections:
+            self.timer_handle = self.loop.call_later(wait_time, self._wakeup)
+
+
 class ClientRequest(messages.Request):
 
     """Represents an HTTP request.
@@ -1781,6 +2056,8 @@ class ClientRequest(messages.Request):
         self.send_pipe = None
         #: the recv pipe to use on upgraded connections
         self.recv_pipe = None
+        # True if we've been queued since we last finished
+        self._queued = False
 
     def _init_retries(self):
         self.nretries = 0
@@ -1865,6 +2142,7 @@ class ClientRequest(messages.Request):
         client
             an :py:class:`Client` instance"""
         self.manager = client
+        self._queued = True
 
     def connect(self, connection, send_pos):
         """Called when we are assigned to an HTTPConnection"
@@ -1906,7 +2184,7 @@ class ClientRequest(messages.Request):
         self.connection = None
         if self.status > 0:
             # The response has finished
-            self.finished()
+            self._finished()
 
     def send_header(self):
         # Check authorization and add credentials if the manager has them
@@ -1932,7 +2210,7 @@ class ClientRequest(messages.Request):
         if self.status is None:
             logging.error("Error receiving response, %s", str(self.error))
             self.status = 0
-            self.finished()
+            self._finished()
         else:
             logging.info("Finished Response, status %i", self.status)
             # we grab the cookies early in the flow, they may help
@@ -2009,7 +2287,16 @@ class ClientRequest(messages.Request):
                     self.connection.request_disconnect()
             else:
                 # The request is already disconnected, we're done
-                self.finished()
+                self._finished()
+
+    def _finished(self):
+        # calls finished and then tells the manager if we're done, we
+        # are not done if finished queued the request again (e.g., to
+        # follow a redirect)
+        self._queued = False
+        self.finished()
+        if not self._queued and self.manager is not None:
+            self.manager._request_done(self)
 
     def finished(self):
         """Called when we have a final response *and* have disconnected
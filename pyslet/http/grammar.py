@@ -4,11 +4,12 @@ from ..py2 import (
     byte,
     byte_to_bstr,
     byte_value,
+    character,
     dict_keys,
     is_byte,
     is_unicode,
     join_bytes)
-from ..unicode5 import BasicParser, ParserMixin
+from ..unicode5 import BasicParser, CharClass, ParserMixin
 
 
 def is_octet(b):
@@ -122,6 +123,18 @@ def is_separator(b):
     return b in SEPARATORS
 
 
+# classes of octets used to parse runs of bytes in a single step, the
+# octets are represented by the characters with the same code points
+_text_class = CharClass((character(0x20), character(0x7E)),
+                        (character(0x80), character(0xFF)))
+_token_class = CharClass(_text_class)
+_token_class.subtract_class(CharClass('()<>@,;:\\"/[]?={} \t'))
+_ctext_class = CharClass(_text_class)
+_ctext_class.subtract_class(CharClass('()\\'))
+_qdtext_class = CharClass(_text_class)
+_qdtext_class.subtract_class(CharClass('"\\'))
+
+
 def check_token(t):
     """Raises ValueError if *t* is *not* a valid token
 
@@ -297,16 +310,18 @@ class OctetParser(BasicParser):
         any LWS) or None if no TEXT was found."""
         text = []
         while self.the_char is not None:
-            t = self.parse_onetext(unfold)
+            t = self.parse_span(_text_class)
+            if t is None:
+                t = self.parse_onetext(unfold)
             if t is not None:
                 if is_byte(t):
-                    text.append(t)
+                    text.append(byte_to_bstr(t))
                 else:
-                    text += list(t)
+                    text.append(bytes(t))
             else:
                 break
         if text:
-            return join_bytes(text)
+            return b''.join(text)
         else:
             return None
 
@@ -316,15 +331,9 @@ class OctetParser(BasicParser):
         Parses a single instance of the production token.  The return
         value is the matching token as a binary string or None if no
         token was found."""
-        token = []
-        while self.the_char is not None:
-            if is_ctl(self.the_char) or is_separator(self.the_char):
-                break
-            else:
-                token.append(self.the_char)
-                self.next_char()
-        if token:
-            return join_bytes(token)
+        token = self.parse_span(_token_class)
+        if token is not None:
+            return bytes(token)
         else:
             return None
 
@@ -391,16 +400,18 @@ class OctetParser(BasicParser):
             if self.match_one(b"()\\"):
                 break
             else:
-                t = self.parse_onetext(unfold)
+                t = self.parse_span(_ctext_class)
+                if t is None:
+                    t = self.parse_onetext(unfold)
                 if t is not None:
                     if is_byte(t):
-                        ctext.append(t)
+                        ctext.append(byte_to_bstr(t))
                     else:
-                        ctext += list(t)
+                        ctext.append(bytes(t))
                 else:
                     break
         if ctext:
-            return join_bytes(ctext)
+            return b''.join(ctext)
         else:
             return None
 
@@ -453,16 +464,18 @@ class OctetParser(BasicParser):
             if self.match_one(b'"\\'):
                 break
             else:
-                t = self.parse_onetext(unfold)
+                t = self.parse_span(_qdtext_class)
+                if t is None:
+                    t = self.parse_onetext(unfold)
                 if t is not None:
                     if is_byte(t):
-                        qdtext.append(t)
+                        qdtext.append(byte_to_bstr(t))
                     else:
-                        qdtext += list(t)
+                        qdtext.append(bytes(t))
                 else:
                     break
         if qdtext:
-            return join_bytes(qdtext)
+            return b''.join(qdtext)
         else:
             return None
 
@@ -450,6 +450,8 @@ class Message(PEP8Compatibility, object):
         self.lock = threading.RLock()
         self.protocol = protocol
         self.headers = {}
+        # cache of parsed header values
+        self._parsed = {}
         #: boolean indicating that all headers have been received
         self.got_headers = False
         if isinstance(entity_body, bytes):
@@ -746,6 +748,7 @@ class Message(PEP8Compatibility, object):
             self.transfermode = self.START_MODE
             self.protcolVersion = None
             self.headers = {}
+            self._parsed = {}
             self.got_headers = False
             self._curr_header = None
             if self.body_started:
@@ -789,7 +792,11 @@ class Message(PEP8Compatibility, object):
             this message is expecting a set of headers, terminated by a
             blank line.  The next call to recv must be with a list of
             binary CRLF terminated strings the last of which must the
-            string CRLF only.
+            string CRLF only.  Alternatively, the next call may pass
+            the entire header block as a single binary string (or
+            bytearray) including the terminating blank line.  This
+            form is more efficient as the block is scanned in place
+            rather than line by line.
 
         RECV_LINE
             this message is expecting a single terminated line.  The
@@ -833,7 +840,7 @@ class Message(PEP8Compatibility, object):
 
     def recv(self, data):
         logging.debug("Message in transfer mode %i", self.transfermode)
-        logging.debug("Message receiving: %s", repr(data))
+        logging.debug("Message receiving: %r", data)
         with self.lock:
             if self.transfermode == self.START_MODE:
                 if data == grammar.CRLF:
@@ -843,8 +850,11 @@ class Message(PEP8Compatibility, object):
                     self.recv_start(data)
                     self.transfermode = self.HEADER_MODE
             elif self.transfermode == self.HEADER_MODE:
-                for line in data:
-                    self._recv_header(line)
+                if isinstance(data, (bytes, bytearray)):
+                    self._recv_header_block(data)
+                else:
+                    for line in data:
+                        self._recv_header(line)
                 # we're done reading headers
                 self.recv_transferlength()
                 if self.transferchunked:
@@ -931,8 +941,11 @@ class Message(PEP8Compatibility, object):
                     raise ProtocolError("chunk-data termination error")
                 self.transfermode = self.CHUNK_HEAD_MODE
             elif self.transfermode == self.CHUNK_TRAILER_MODE:
-                for line in data:
-                    self._recv_header(line)
+                if isinstance(data, (bytes, bytearray)):
+                    self._recv_header_block(data)
+                else:
+                    for line in data:
+                        self._recv_header(line)
                 self._flush_buffered()
             else:
                 raise HTTPException(
@@ -960,7 +973,7 @@ class Message(PEP8Compatibility, object):
                 self._curr_header = None
             return False
         else:
-            fold = grammar.OctetParser(h).parse_lws()
+            fold = h[0:1] in (b' ', b'\t')
             if fold and self._curr_header:
                 # a continuation line
                 self._curr_header[1] = self._curr_header[1] + h
@@ -977,6 +990,48 @@ class Message(PEP8Compatibility, object):
                         "Badly formed header line: %s" % repr(h))
             return True
 
+    def _recv_header_block(self, block):
+        # parses a complete block of headers scanning for line ends in
+        # place, equivalent to calling set_header(name, value, True)
+        # for each header but without the per-line parsing overhead
+        if not isinstance(block, bytes):
+            block = bytes(block)
+        headers = self.headers
+        end = len(block)
+        pos = 0
+        name = None
+        vstart = vend = 0
+        while True:
+            eol = block.find(b"\r\n", pos) if pos < end else pos
+            if eol < 0:
+                raise ProtocolError(
+                    "Unterminated header line: %s" % repr(block[pos:]))
+            if name is not None:
+                if eol > pos and block[pos:pos + 1] in b" \t":
+                    # a continuation line
+                    vend = eol
+                    pos = eol + 2
+                    continue
+                value = block[vstart:vend].strip()
+                h = headers.get(name.lower(), None)
+                if h is None:
+                    headers[name.lower()] = [name, value]
+                else:
+                    h.append(value)
+                name = None
+            if eol == pos:
+                # blank line (or end of block), end of headers
+                break
+            colon = block.find(b":", pos, eol)
+            if colon < 0:
+                # badly formed header line
+                raise ProtocolError(
+                    "Badly formed header line: %s" % repr(block[pos:eol + 2]))
+            name = block[pos:colon]
+            vstart = colon + 1
+            vend = eol
+            pos = eol + 2
+
     def _recv_buffered(self):
         if self.recv_buffer:
             if isinstance(self.entity_body, io.IOBase):
@@ -1178,6 +1233,22 @@ class Message(PEP8Compatibility, object):
             else:
                 return b", ".join(h[1:])
 
+    def _get_parsed(self, field_name, from_str):
+        # returns the value of header field_name parsed with from_str
+        # or None if the header is not present.  The parsed value is
+        # cached until the header's value changes so from_str must
+        # return an immutable object.
+        with self.lock:
+            field_value = self.get_header(field_name)
+            if field_value is None:
+                return None
+            cached = self._parsed.get(field_name, None)
+            if cached is not None and cached[0] == field_value:
+                return cached[1]
+            result = from_str(field_value)
+            self._parsed[field_name] = (field_value, result)
+            return result
+
     def set_header(self, field_name, field_value, append_mode=False):
         """Sets the header with *field_name* to the string *field_value*.
 
@@ -1283,13 +1354,18 @@ class Message(PEP8Compatibility, object):
 
         If no Connection header was present an empty set is returned.
         All tokens are returned as lower case."""
-        field_value = self.get_header("Connection")
-        if field_value:
-            hp = HeaderParser(field_value)
-            return set(t.lower() for t in hp.parse_tokenlist())
+        tokens = self._get_parsed("Connection", self._connection_tokens)
+        if tokens:
+            # return a copy, the cached value is shared
+            return set(tokens)
         else:
             return set()
 
+    @staticmethod
+    def _connection_tokens(field_value):
+        hp = HeaderParser(field_value)
+        return frozenset(t.lower() for t in hp.parse_tokenlist())
+
     def set_connection(self, connection_tokens):
         """Set the Connection tokens from an iterable set of
         *connection_tokens*
@@ -1432,13 +1508,9 @@ class Message(PEP8Compatibility, object):
         """Returns a :py:class:`MediaType` instance parsed from the
         Content-Type header.
 
-        If no Content-Type header was present None is returned."""
-        field_value = self.get_header("Content-Type")
-        if field_value is not None:
-            mtype = params.MediaType.from_str(field_value)
-            return mtype
-        else:
-            return None
+        If no Content-Type header was present None is returned.  The
+        parsed value is cached until the header is changed."""
+        return self._get_parsed("Content-Type", params.MediaType.from_str)
 
     def set_content_type(self, mtype=None):
         """Sets the Content-Type header from mtype, a
@@ -1673,26 +1745,22 @@ class RecvWrapper(RecvWrapperBase):
             # we're done, pipe empty and message complete
             return True
         elif mode == Message.RECV_HEADERS:
-            pos = self.buffer.find(b"\r\n\r\n")
-            if pos < 0:
-                if self.buffer.startswith(b"\r\n"):
-                    # catch a degenerate case, no headers
-                    pos = 0
-            if pos < 0:
+            if self.buffer.startswith(b"\r\n"):
+                # catch a degenerate case, no headers
+                end = 2
+            else:
+                end = self.buffer.find(b"\r\n\r\n")
+                if end >= 0:
+                    end += 4
+            if end < 0:
                 # fill the buffer and loop
                 if not self.fill_buffer():
                     # blocked on our read
                     return None
             else:
-                headers = []
-                base = 0
-                while base <= pos:
-                    i = self.buffer.find(b"\r\n", base)
-                    headers.append(bytes(self.buffer[base:i + 2]))
-                    base = i + 2
-                headers.append(b"\r\n")
-                self.message.recv(headers)
-                self.buffer = self.buffer[pos + 4:]
+                # pass the whole header block in one go
+                self.message.recv(self.buffer[:end])
+                del self.buffer[:end]
         elif mode == Message.RECV_LINE:
             pos = self.buffer.find(b"\r\n")
             if pos < 0:
@@ -1993,12 +2061,10 @@ class Request(Message):
 
     def get_accept(self):
         """Returns an :py:class:`AcceptList` instance or None if no
-        "Accept" header is present."""
-        field_value = self.get_header("Accept")
-        if field_value is not None:
-            return AcceptList.from_str(field_value)
-        else:
-            return None
+        "Accept" header is present.
+
+        The parsed value is cached until the header is changed."""
+        return self._get_parsed("Accept", AcceptList.from_str)
 
     def set_accept(self, accept_value):
         """Sets the "Accept" header, replacing any existing value.
@@ -2014,12 +2080,10 @@ class Request(Message):
 
     def get_accept_charset(self):
         """Returns an :py:class:`AcceptCharsetList` instance or None if
-        no "Accept-Charset" header is present."""
-        field_value = self.get_header("Accept-Charset")
-        if field_value is not None:
-            return AcceptCharsetList.from_str(field_value)
-        else:
-            return None
+        no "Accept-Charset" header is present.
+
+        The parsed value is cached until the header is changed."""
+        return self._get_parsed("Accept-Charset", AcceptCharsetList.from_str)
 
     def set_accept_charset(self, accept_value):
         """Sets the "Accept-Charset" header, replacing any existing value.
@@ -2035,12 +2099,10 @@ class Request(Message):
 
     def get_accept_encoding(self):
         """Returns an :py:class:`AcceptEncodingList` instance or None if
-        no "Accept-Encoding" header is present."""
-        field_value = self.get_header("Accept-Encoding")
-        if field_value is not None:
-            return AcceptEncodingList.from_str(field_value)
-        else:
-            return None
+        no "Accept-Encoding" header is present.
+
+        The parsed value is cached until the header is changed."""
+        return self._get_parsed("Accept-Encoding", AcceptEncodingList.from_str)
 
     def set_accept_encoding(self, accept_value):
         """Sets the "Accept-Encoding" header, replacing any existing value.
@@ -3070,6 +3132,121 @@ class ContentRange(object):
                 (self.total_len is None or self.last_byte < self.total_len))
 
 
+class EntityTagList(params.Parameter):
+
+    """Represents the value of an If-Match or If-None-Match header
+
+    Instances are immutable, they are constructed from zero or more
+    :py:class:`pyslet.http.params.EntityTag` instances.  With no
+    arguments the instance represents the special value "*".
+
+    Instances behave like read-only lists implementing len, indexing and
+    iteration in the usual way."""
+
+    def __init__(self, *args):
+        self._tags = list(args)
+
+    @classmethod
+    def from_str(cls, source):
+        """Create an EntityTagList from a *source* string."""
+        p = HeaderParser(source)
+        p.parse_sp()
+        if p.the_word == b'*':
+            p.parse_word()
+            tags = []
+        else:
+            tags = [p.require_entity_tag()]
+            while p.parse_separator(COMMA):
+                tags.append(p.require_entity_tag())
+        p.parse_sp()
+        p.require_end("entity-tag list")
+        return cls(*tags)
+
+    def is_any(self):
+        """Returns True if this value is "*"."""
+        return not self._tags
+
+    def match(self, etags, weak=True):
+        """Returns True if this value matches one of *etags*
+
+        etags
+            An iterable of :py:class:`pyslet.http.params.EntityTag`
+            instances that identify the current representations of the
+            resource.
+
+        weak
+            If True (the default) the weak comparison function is used,
+            as required for If-None-Match, otherwise the strong
+            comparison function is used, as required for If-Match.
+
+        The value "*" matches any representation."""
+        if not self._tags:
+            return True
+        if weak:
+            tags = set(etag.tag for etag in etags)
+            for tag in self._tags:
+                if tag.tag in tags:
+                    return True
+        else:
+            tags = set(etag.tag for etag in etags if not etag.weak)
+            for tag in self._tags:
+                if not tag.weak and tag.tag in tags:
+                    return True
+        return False
+
+    def to_bytes(self):
+        if self._tags:
+            return b', '.join(tag.to_bytes() for tag in self._tags)
+        else:
+            return b'*'
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __getitem__(self, index):
+        return self._tags[index]
+
+    def __iter__(self):
+        return self._tags.__iter__()
+
+
+def not_modified(if_none_match, if_modified_since, etags=(), mtime=None):
+    """Evaluates the preconditions of a conditional GET
+
+    if_none_match
+        The value of the If-None-Match header as a string, or None if
+        the request has no If-None-Match header.
+
+    if_modified_since
+        The value of the If-Modified-Since header as a string, or None.
+
+    etags
+        An iterable of :py:class:`pyslet.http.params.EntityTag`
+        instances that identify the current representations of the
+        resource.
+
+    mtime
+        The time the resource was last modified as a unix time, or None
+        if it is not known.
+
+    Returns True if the response should be 304 Not Modified.  As per
+    RFC7232, If-Modified-Since is ignored if If-None-Match is present.
+    If-None-Match is evaluated with the weak comparison function and
+    headers that can't be parsed are ignored."""
+    if if_none_match is not None:
+        try:
+            return EntityTagList.from_str(if_none_match).match(etags)
+        except grammar.BadSyntax:
+            return False
+    if if_modified_since is not None and mtime is not None:
+        try:
+            since = params.FullDate.from_http_str(if_modified_since)
+            return mtime <= since.get_unixtime()
+        except grammar.BadSyntax:
+            pass
+    return False
+
+
 class HeaderParser(params.ParameterParser):
 
     """A special parser for parsing HTTP headers from TEXT
@@ -223,6 +223,9 @@ class MySQLEntityContainer(sqlds.SQLEntityContainer):
         clause = []
         if top:
             clause.append('LIMIT %i ' % top)
+        elif skip:
+            # MySQL requires a LIMIT clause before OFFSET
+            clause.append('LIMIT 18446744073709551615 ')
         if skip:
             clause.append('OFFSET %i ' % skip)
             skip = 0
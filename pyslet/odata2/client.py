@@ -3,7 +3,10 @@
 by Microsoft."""
 
 import io
+import json
 import logging
+import re
+import threading
 
 from . import core
 from . import csdl as edm
@@ -13,8 +16,9 @@ from .. import rfc2396 as uri
 from .. import rfc4287 as atom
 from .. import rfc5023 as app
 from ..http import client as http
-from ..http import params
 from ..http import messages
+from ..http import multipart
+from ..http import params
 from ..pep8 import old_method
 from ..py2 import (
     dict_items,
@@ -51,6 +55,9 @@ class DataFormatError(ClientException):
 
 class ClientCollection(core.EntityCollection):
 
+    #: the Accept header used when reading feeds
+    FEED_ACCEPT = "application/json, application/atom+xml;q=0.5"
+
     def __init__(self, client, base_uri=None, **kwargs):
         super(ClientCollection, self).__init__(**kwargs)
         if base_uri is None:
@@ -128,6 +135,15 @@ class ClientCollection(core.EntityCollection):
                 logging.debug(debug_msg)
         raise etype(error_msg)
 
+    def check_no_content(self, request):
+        """Checks the response to a request that returns no content
+
+        Used as the handler for requests passed to
+        :meth:`Client.submit_request` that expect a 204 response, if the
+        response has any other status :meth:`raise_error` is called."""
+        if request.status != 204:
+            self.raise_error(request)
+
     def insert_entity(self, entity):
         if entity.exists:
             raise edm.EntityExists(str(entity.get_location()))
@@ -148,18 +164,57 @@ class ClientCollection(core.EntityCollection):
                 str(self.base_uri), 'POST', entity_body=data)
             request.set_content_type(
                 params.MediaType.from_str(core.ODATA_RELATED_ENTRY_TYPE))
-            self.client.process_request(request)
-            if request.status == 201:
-                # success, read the entity back from the response
-                doc = core.Document()
-                doc.read(request.res_body)
-                entity.exists = True
-                doc.root.get_value(entity)
-                # so which bindings got handled?  Assume all of them
-                for k, dv in entity.navigation_items():
-                    dv.bindings = []
-            else:
-                self.raise_error(request)
+
+            def inserted(request):
+                if request.status == 201:
+                    # success, read the entity back from the response
+                    doc = core.Document()
+                    doc.read(request.res_body)
+                    entity.exists = True
+                    doc.root.get_value(entity)
+                    # so which bindings got handled?  Assume all of them
+                    for k, dv in entity.navigation_items():
+                        dv.bindings = []
+                else:
+                    self.raise_error(request)
+            self.client.submit_request(request, inserted)
+
+    def insert_entities(self, entities, batch_size=100):
+        """Inserts multiple entities using $batch requests
+
+        The entities are sent to the server in batches of up to
+        *batch_size* inserts, each batch being a single changeset.  See
+        :meth:`Client.batch` for details.  An entity that is bound to
+        another entity in the current batch starts a new batch as the
+        bound entity must be inserted first."""
+        entities = iter(entities)
+        held = None
+        while True:
+            with self.client.batch():
+                batch = set()
+                while len(batch) < batch_size:
+                    if held is not None:
+                        entity, held = held, None
+                    else:
+                        entity = next(entities, None)
+                        if entity is None:
+                            break
+                    if batch and self._binds_any(entity, batch):
+                        held = entity
+                        break
+                    self.insert_entity(entity)
+                    batch.add(id(entity))
+            if held is None and len(batch) < batch_size:
+                break
+
+    def _binds_any(self, entity, batch):
+        # returns True if entity is bound to an entity whose id is in
+        # batch
+        for k, dv in entity.navigation_items():
+            for binding in dv.bindings:
+                if isinstance(binding, edm.Entity) and id(binding) in batch:
+                    return True
+        return False
 
     def __len__(self):
         # use $count
@@ -205,32 +260,116 @@ class ClientCollection(core.EntityCollection):
                 str(feed_url) + "?" +
                 core.ODataURI.format_sys_query_options(sys_query_options))
         while True:
-            request = http.ClientRequest(str(feed_url))
-            request.set_header('Accept', 'application/atom+xml')
-            self.client.process_request(request)
-            if request.status != 200:
-                raise UnexpectedHTTPResponse(
-                    "%i %s" % (request.status, request.response.reason))
+            next_link = []
+            nentries = 0
+            for entity in self.read_feed(feed_url, next_link):
+                nentries += 1
+                yield entity
+            if not nentries or not next_link:
+                break
+            feed_url = next_link[0]
+
+    def read_feed(self, feed_url, next_link):
+        """Generates the entities in one page of a feed
+
+        feed_url
+            The URI of the page to read.
+
+        next_link
+            A list, when the page has been read the URI of the next page
+            (if any) is appended to it.
+
+        JSON is requested in preference to Atom.  JSON responses are
+        parsed incrementally, entities are yielded as soon as they have
+        been received and the page is not held in memory.  Atom
+        responses are read in full before they are parsed."""
+        stream = ResponseStream(self.client)
+        request = http.ClientRequest(str(feed_url), 'GET', res_body=stream)
+        request.set_header('Accept', self.FEED_ACCEPT)
+        stream.start_request(request)
+        if request.response.status != 200:
+            # the request has finished, request.status is set (to 0 if
+            # the connection failed)
+            raise UnexpectedHTTPResponse(
+                "%i %s" % (request.status, request.response.reason))
+        mtype = request.response.get_content_type()
+        if (mtype is not None and mtype.type.lower() == 'application' and
+                mtype.subtype.lower() == 'json'):
+            parser = JSONFeedParser()
+            for data in stream.data_gen():
+                try:
+                    entries = parser.feed(data)
+                except ValueError:
+                    raise core.InvalidFeedDocument(str(feed_url))
+                for obj in entries:
+                    yield self.entity_from_json(obj)
+            try:
+                feed = parser.close()['d']
+            except (ValueError, TypeError, KeyError):
+                raise core.InvalidFeedDocument(str(feed_url))
+            if isinstance(feed, dict):
+                href = feed.get('__next', None)
+                if isinstance(href, dict):
+                    href = href.get('uri', None)
+                if href:
+                    href = uri.URI.from_octets(href)
+                    if not href.is_absolute():
+                        href = href.resolve(str(feed_url))
+                    next_link.append(href)
+            elif not isinstance(feed, list):
+                raise core.InvalidFeedDocument(str(feed_url))
+        else:
             doc = core.Document(base_uri=feed_url)
-            doc.read(request.res_body)
-            if isinstance(doc.root, atom.Feed):
-                if len(doc.root.Entry):
-                    for e in doc.root.Entry:
-                        entity = core.Entity(self.entity_set)
-                        entity.exists = True
-                        e.get_value(entity)
-                        yield entity
-                else:
-                    break
-            else:
+            for e in doc.iter_entries(b''.join(stream.data_gen())):
+                entity = core.Entity(self.entity_set)
+                entity.exists = True
+                e.get_value(entity)
+                yield entity
+            if not isinstance(doc.root, atom.Feed):
                 raise core.InvalidFeedDocument(str(feed_url))
-            feed_url = None
             for link in doc.root.Link:
                 if link.rel == "next":
-                    feed_url = link.resolve_uri(link.href)
+                    next_link.append(link.resolve_uri(link.href))
                     break
-            if feed_url is None:
-                break
+
+    def entity_from_json(self, obj, entity_set=None, expand=None):
+        """Returns an entity read from a JSON entry
+
+        obj
+            A python dictionary parsed from a JSON representation of an
+            entity in *entity_set*, which defaults to the entity set of
+            this collection.
+
+        expand
+            The expand rules used to read expanded navigation
+            properties.  If *entity_set* is None the expand rules of
+            this collection are used instead."""
+        if entity_set is None:
+            entity_set = self.entity_set
+            expand = self.expand
+        entity = core.Entity(entity_set)
+        entity.exists = True
+        entity.set_from_json_object(obj)
+        selected = set(k for k in entity.data_keys() if k in obj)
+        if len(selected) < len(entity.type_def.Property):
+            entity.selected = selected
+        if expand:
+            for k, sub_expand in dict_items(expand):
+                links = obj.get(k, None)
+                if isinstance(links, dict):
+                    if '__deferred' in links:
+                        continue
+                    elif '__metadata' not in links and 'results' in links:
+                        links = links['results']
+                    else:
+                        links = [links]
+                elif links is None:
+                    links = []
+                target_set = entity_set.get_target(k)
+                entity[k].set_expansion_values(
+                    [self.entity_from_json(link, target_set, sub_expand)
+                     for link in links])
+        return entity
 
     def itervalues(self):
         return self.entity_generator()
@@ -269,41 +408,25 @@ class ClientCollection(core.EntityCollection):
             feed_url = uri.URI.from_octets(
                 str(feed_url) + "?" +
                 core.ODataURI.format_sys_query_options(sys_query_options))
-        request = http.ClientRequest(str(feed_url))
-        request.set_header('Accept', 'application/atom+xml')
-        self.client.process_request(request)
-        if request.status != 200:
-            raise UnexpectedHTTPResponse(
-                "%i %s" % (request.status, request.response.reason))
-        doc = core.Document(base_uri=feed_url)
-        doc.read(request.res_body)
-        if isinstance(doc.root, atom.Feed):
-            if len(doc.root.Entry):
-                for e in doc.root.Entry:
-                    entity = core.Entity(self.entity_set)
-                    entity.exists = True
-                    e.get_value(entity)
-                    yield entity
-            feed_url = self.nextSkiptoken = None
-            for link in doc.root.Link:
-                if link.rel == "next":
-                    feed_url = link.resolve_uri(link.href)
-                    break
-            if feed_url is not None:
-                # extract the skiptoken from this link
-                feed_url = core.ODataURI(feed_url, self.client.path_prefix)
-                self.nextSkiptoken = feed_url.sys_query_options.get(
-                    core.SystemQueryOption.skiptoken, None)
-            if set_next:
-                if self.nextSkiptoken is not None:
-                    self.skiptoken = self.nextSkiptoken
-                    self.skip = None
-                elif self.skip is not None:
-                    self.skip += len(doc.root.Entry)
-                else:
-                    self.skip = len(doc.root.Entry)
-        else:
-            raise core.InvalidFeedDocument(str(feed_url))
+        next_link = []
+        nentries = 0
+        for entity in self.read_feed(feed_url, next_link):
+            nentries += 1
+            yield entity
+        feed_url = self.nextSkiptoken = None
+        if next_link:
+            # extract the skiptoken from this link
+            feed_url = core.ODataURI(next_link[0], self.client.path_prefix)
+            self.nextSkiptoken = feed_url.sys_query_options.get(
+                core.SystemQueryOption.skiptoken, None)
+        if set_next:
+            if self.nextSkiptoken is not None:
+                self.skiptoken = self.nextSkiptoken
+                self.skip = None
+            elif self.skip is not None:
+                self.skip += nentries
+            else:
+                self.skip = nentries
 
     def __getitem__(self, key):
         sys_query_options = {}
@@ -464,42 +587,43 @@ class ClientCollection(core.EntityCollection):
         return swrapper.sinfo, swrapper.data_gen()
 
 
-class EntityStream(io.RawIOBase):
+class ResponseStream(io.RawIOBase):
 
-    def __init__(self, collection):
-        self.collection = collection
+    """Receives the body of a response as it arrives
+
+    client
+        The :py:class:`Client` used to process the request.
+
+    An instance is passed as the res_body of a request and
+    :py:meth:`start_request` is used in place of the client's
+    process_request method.  The data can then be read in chunks from
+    the generator returned by :py:meth:`data_gen` without the whole
+    response being spooled into memory first."""
+
+    def __init__(self, client):
+        self.client = client
         self.request = None
-        self.sinfo = None
         self.data = []
 
     def start_request(self, request):
+        """Starts processing *request*
+
+        Returns when the response status is known and the first chunk
+        of data has been received (or the request has finished)."""
         self.request = request
         # now loop until we get the first write or until there nothing
         # to do!
-        self.collection.client.queue_request(self.request)
-        while self.collection.client.thread_task():
+        self.client.queue_request(self.request)
+        while self.client.thread_task():
             if self.data:
                 if self.request.response.status == 200:
                     break
                 else:
                     # discard data received before the response status
-                    logging.debug("EntityStream discarding data... %i",
+                    logging.debug("%s discarding data... %i",
+                                  self.__class__.__name__,
                                   sum(len(x) for x in self.data))
                     self.data = []
-        if self.request.response.status == 200:
-            self.sinfo = core.StreamInfo()
-            self.sinfo.type = request.response.get_content_type()
-            self.sinfo.size = request.response.get_content_length()
-            self.sinfo.modified = request.response.get_last_modified()
-            self.sinfo.created = self.sinfo.modified
-            self.sinfo.md5 = request.response.get_content_md5()
-        elif self.request.status == 404:
-            # sort of success, we return an empty stream
-            self.sinfo = core.StreamInfo()
-            self.sinfo.size = 0
-        else:
-            # unexpected HTTP response
-            self.collection.raise_error(self.request)
 
     def data_gen(self):
         """Generates the data written to the stream.
@@ -509,15 +633,15 @@ class EntityStream(io.RawIOBase):
         calls to handle the request to enable us to yield data as soon
         as it is available without needing the full stream in memory."""
         yield_data = (self.request.response.status == 200)
-        while self.data or self.collection.client.thread_task():
-            for chunk in self.data:
+        while self.data or self.client.thread_task():
+            data = self.data
+            self.data = []
+            for chunk in data:
                 if chunk:
-                    logging.debug("EntityStream: writing %i bytes", len(chunk))
+                    logging.debug("%s: writing %i bytes",
+                                  self.__class__.__name__, len(chunk))
                     if yield_data:
                         yield chunk
-            self.data = []
-        # that's all the data consumed, request is finished
-        self.collection.close()
 
     def readable(self):
         return False
@@ -532,11 +656,151 @@ class EntityStream(io.RawIOBase):
         if not isinstance(b, bytes):
             raise TypeError("write requires bytes, not %s" % repr(type(b)))
         if b:
-            logging.debug("EntityStream: reading %i bytes", len(b))
+            logging.debug("%s: reading %i bytes", self.__class__.__name__,
+                          len(b))
             self.data.append(b)
         return len(b)
 
 
+class EntityStream(ResponseStream):
+
+    def __init__(self, collection):
+        super(EntityStream, self).__init__(collection.client)
+        self.collection = collection
+        self.sinfo = None
+
+    def start_request(self, request):
+        super(EntityStream, self).start_request(request)
+        if self.request.response.status == 200:
+            self.sinfo = core.StreamInfo()
+            self.sinfo.type = request.response.get_content_type()
+            self.sinfo.size = request.response.get_content_length()
+            self.sinfo.modified = request.response.get_last_modified()
+            self.sinfo.created = self.sinfo.modified
+            self.sinfo.md5 = request.response.get_content_md5()
+        elif self.request.status == 404:
+            # sort of success, we return an empty stream
+            self.sinfo = core.StreamInfo()
+            self.sinfo.size = 0
+        else:
+            # unexpected HTTP response
+            self.collection.raise_error(self.request)
+
+    def data_gen(self):
+        for chunk in super(EntityStream, self).data_gen():
+            yield chunk
+        # that's all the data consumed, request is finished
+        self.collection.close()
+
+
+class JSONFeedParser(object):
+
+    """An incremental parser for JSON formatted feeds
+
+    Data is passed to :py:meth:`feed` as it is received and the JSON
+    objects representing the entries in the feed are returned as soon
+    as they are complete so the feed itself is never held in memory.
+
+    Both the version 1 format, in which "d" is an array of entries, and
+    the version 2 format, in which the entries are in the "results"
+    array of "d", are supported.  The data outside the entries is
+    retained and parsed by :py:meth:`close`."""
+
+    _scan = re.compile(br'[{}\[\]",]')
+    _scan_string = re.compile(br'["\\]')
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # the depth of the array of entries, None if not yet found
+        self.array_depth = None
+        self.array_done = False
+        # the data of the current entry or None if between entries
+        self.entry = None
+        # the data outside the entries
+        self.skeleton = []
+
+    def feed(self, data):
+        """Parses the next chunk of *data*
+
+        data
+            A binary string containing the next part of the UTF-8
+            encoded feed.
+
+        Returns a (possibly empty) list of the entries completed by
+        *data* as dictionaries parsed from their JSON representation.
+        Raises ValueError if an entry can't be parsed."""
+        entries = []
+        pos = start = 0
+        while True:
+            if self.in_string:
+                if self.escape:
+                    # skip the escaped character
+                    if pos >= len(data):
+                        break
+                    self.escape = False
+                    pos += 1
+                match = self._scan_string.search(data, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if data[match.start():pos] == b'"':
+                    self.in_string = False
+                else:
+                    self.escape = True
+                continue
+            match = self._scan.search(data, pos)
+            if match is None:
+                break
+            c = data[match.start():match.end()]
+            pos = match.end()
+            if c == b'"':
+                self.in_string = True
+            elif c == b'{' or c == b'[':
+                if self.array_depth is None:
+                    if c == b'[' and self.depth in (1, 2):
+                        # the first array found at this depth
+                        self.array_depth = self.depth + 1
+                elif (self.entry is None and not self.array_done and
+                        self.depth == self.array_depth):
+                    self.skeleton.append(data[start:match.start()])
+                    start = match.start()
+                    self.entry = []
+                self.depth += 1
+            elif c == b'}' or c == b']':
+                self.depth -= 1
+                if self.entry is not None and self.depth == self.array_depth:
+                    self.entry.append(data[start:pos])
+                    start = pos
+                    entries.append(
+                        json.loads(b''.join(self.entry).decode('utf-8')))
+                    self.entry = None
+                elif (self.array_depth is not None and
+                        self.depth == self.array_depth - 1):
+                    self.array_done = True
+            elif (self.entry is None and self.depth == self.array_depth and
+                    not self.array_done):
+                # a comma separating entries, omitted from the skeleton
+                self.skeleton.append(data[start:match.start()])
+                start = pos
+        if self.entry is None:
+            self.skeleton.append(data[start:])
+        else:
+            self.entry.append(data[start:])
+        return entries
+
+    def close(self):
+        """Parses the data outside the entries
+
+        Returns the feed object with the array of entries empty, e.g.,
+        {"d": {"results": [], "__next": ...}}.  Raises ValueError if the
+        feed is incomplete or not valid JSON."""
+        if self.entry is not None or self.in_string or self.depth:
+            raise ValueError("incomplete JSON feed")
+        return json.loads(b''.join(self.skeleton).decode('utf-8'))
+
+
 class EntityCollection(ClientCollection, core.EntityCollection):
 
     """An entity collection that provides access to entities stored
@@ -556,34 +820,31 @@ class EntityCollection(ClientCollection, core.EntityCollection):
             entity_body=data)
         request.set_content_type(
             params.MediaType.from_str(core.ODATA_RELATED_ENTRY_TYPE))
-        self.client.process_request(request)
-        if request.status == 204:
-            # success, nothing to read back but we're not done
-            # we've only updated links to existing entities on properties with
-            # single cardinality
-            for k, dv in entity.navigation_items():
-                if not dv.bindings or dv.isCollection:
-                    continue
-                # we need to know the location of the target entity set
-                binding = dv.bindings[-1]
-                if isinstance(binding, edm.Entity) and binding.exists:
-                    dv.bindings = []
-            # now use the default method to finish the job
-            self.update_bindings(entity)
-            return
-        else:
-            self.raise_error(request)
+
+        def updated(request):
+            if request.status == 204:
+                # success, nothing to read back but we're not done
+                # we've only updated links to existing entities on
+                # properties with single cardinality
+                for k, dv in entity.navigation_items():
+                    if not dv.bindings or dv.isCollection:
+                        continue
+                    # we need to know the location of the target entity
+                    # set
+                    binding = dv.bindings[-1]
+                    if isinstance(binding, edm.Entity) and binding.exists:
+                        dv.bindings = []
+                # now use the default method to finish the job
+                self.update_bindings(entity)
+            else:
+                self.raise_error(request)
+        self.client.submit_request(request, updated)
 
     def __delitem__(self, key):
         entity = self.new_entity()
         entity.set_key(key)
         request = http.ClientRequest(str(entity.get_location()), 'DELETE')
-        self.client.process_request(request)
-        if request.status == 204:
-            # success, nothing to read back
-            return
-        else:
-            self.raise_error(request)
+        self.client.submit_request(request, self.check_no_content)
 
 
 class NavigationCollection(ClientCollection, core.NavigationCollection):
@@ -808,11 +1069,7 @@ class NavigationCollection(ClientCollection, core.NavigationCollection):
                 str(self.linksURI), 'PUT', entity_body=data)
             request.set_content_type(
                 params.MediaType.from_str('application/xml'))
-            self.client.process_request(request)
-            if request.status == 204:
-                return
-            else:
-                self.raise_error(request)
+            self.client.submit_request(request, self.check_no_content)
         else:
             doc = core.Document(root=core.URI)
             doc.root.set_value(str(entity.get_location()))
@@ -821,11 +1078,7 @@ class NavigationCollection(ClientCollection, core.NavigationCollection):
                 str(self.linksURI), 'POST', entity_body=data)
             request.set_content_type(
                 params.MediaType.from_str('application/xml'))
-            self.client.process_request(request)
-            if request.status == 204:
-                return
-            else:
-                self.raise_error(request)
+            self.client.submit_request(request, self.check_no_content)
 
     def replace(self, entity):
         if not entity.exists:
@@ -844,11 +1097,7 @@ class NavigationCollection(ClientCollection, core.NavigationCollection):
                 str(self.linksURI), 'PUT', entity_body=data)
             request.set_content_type(
                 params.MediaType.from_str('application/xml'))
-            self.client.process_request(request)
-            if request.status == 204:
-                return
-            else:
-                self.raise_error(request)
+            self.client.submit_request(request, self.check_no_content)
 
     def __delitem__(self, key):
         if self.isCollection:
@@ -860,12 +1109,7 @@ class NavigationCollection(ClientCollection, core.NavigationCollection):
         else:
             # danger, how do we know that key really is the right one?
             request = http.ClientRequest(str(self.linksURI), 'DELETE')
-        self.client.process_request(request)
-        if request.status == 204:
-            # success, nothing to read back
-            return
-        else:
-            self.raise_error(request)
+        self.client.submit_request(request, self.check_no_content)
 
 
 class Client(app.Client):
@@ -892,6 +1136,8 @@ class Client(app.Client):
         #: a :py:class:`metadata.Edmx` instance containing the model for
         #: the service
         self.model = None
+        # holds the active batch for each thread
+        self._batch = threading.local()
         if service_root is not None:
             self.LoadService(service_root)
 
@@ -1001,6 +1247,55 @@ class Client(app.Client):
         messages.AcceptItem(messages.MediaRange('application', 'atomcat+xml')),
         messages.AcceptItem(messages.MediaRange('application', 'xml')))
 
+    def batch(self):
+        """Returns a context manager that batches modifying requests
+
+        Within the with statement the operations that modify data in
+        the collections bound to this client (inserts, updates, deletes
+        and link changes) are not sent to the server immediately but are
+        added to a :class:`Batch` and sent in a single $batch request
+        when the with statement exits::
+
+            with client.batch():
+                with client.feeds['Products'].open() as products:
+                    for product in new_products:
+                        products.insert_entity(product)
+
+        Consecutive modifying operations form a single changeset which
+        the server executes atomically (if the underlying data store
+        supports it).  Only the calling thread's operations are batched.
+        Query operations are still executed immediately unless they are
+        added to the batch explicitly with :meth:`Batch.add`.
+
+        The results of the batched operations are not available until
+        the batch is sent, for example, entities inserted within a batch
+        do not exist until the with statement has exited.  If an
+        operation fails the corresponding exception is raised when the
+        batch exits.  If the with statement raises an exception the
+        batch is abandoned and nothing is sent.  Nested batches are
+        merged into the outermost batch."""
+        return Batch(self)
+
+    def submit_request(self, request, handler):
+        """Processes a modifying *request* and calls *handler*
+
+        request
+            A :class:`pyslet.http.client.ClientRequest` instance.
+
+        handler
+            A callable that takes the request as its only argument, it
+            is called once the response has been received.
+
+        If a batch is active in the calling thread the request is added
+        to it and the handler is called when the batch is sent.
+        Otherwise the request is processed immediately."""
+        batch = getattr(self._batch, 'active', None)
+        if batch is None:
+            self.process_request(request)
+            handler(request)
+        else:
+            batch.add(request, handler)
+
     def queue_request(self, request, timeout=60):
         if not request.has_header("Accept"):
             request.set_accept(self.ACCEPT_LIST)
@@ -1010,3 +1305,172 @@ class Client(app.Client):
             request.set_header(
                 'MaxDataServiceVersion', '2.0; pyslet %s' % info.version)
         super(Client, self).queue_request(request, timeout)
+
+
+class Batch(object):
+
+    """A batch of requests to be sent in a single $batch request
+
+    client
+        The :class:`Client` instance that will send the batch.
+
+    Instances are not normally created directly but are returned by
+    :meth:`Client.batch`.  The object is a context manager, the batch
+    is sent when the with statement exits and operations on the
+    client's collections are added to the batch in the meantime."""
+
+    def __init__(self, client):
+        #: the client that will send the batch
+        self.client = client
+        #: the list of operations, each item is either a (request,
+        #: handler) tuple or a list of such tuples for a changeset
+        self.operations = []
+        #: the batch that was already active when this one was entered
+        self.outer = None
+
+    def __enter__(self):
+        self.outer = getattr(self.client._batch, 'active', None)
+        if self.outer is None:
+            self.client._batch.active = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is None:
+            self.client._batch.active = None
+            if exc_type is None:
+                self.send()
+        return False
+
+    def add(self, request, handler=None):
+        """Adds a request to the batch
+
+        request
+            A :class:`pyslet.http.client.ClientRequest` instance.  GET
+            and HEAD requests are added as query operations, other
+            requests are added to a changeset with any immediately
+            preceding modifying requests.
+
+        handler
+            An optional callable that is called with the request as its
+            only argument once the batch has been sent.
+
+        If this batch was entered while another batch was active the
+        request is added to the outer batch instead."""
+        if self.outer is not None:
+            return self.outer.add(request, handler)
+        if request.method.upper() in ("GET", "HEAD"):
+            self.operations.append((request, handler))
+        else:
+            if not self.operations or \
+                    not isinstance(self.operations[-1], list):
+                self.operations.append([])
+            self.operations[-1].append((request, handler))
+
+    def send(self):
+        """Sends the batch
+
+        The batch is sent as a single request, the responses to the
+        individual operations are copied into their requests and the
+        handlers are then called in the order in which the requests
+        were added.  The operations are cleared so the batch can be
+        reused.
+
+        If the server does not accept the batch request then
+        :class:`UnexpectedHTTPResponse` is raised.  Handlers will
+        typically raise exceptions if their operations failed; in this
+        case the remaining handlers are not called."""
+        operations = self.operations
+        self.operations = []
+        if not operations:
+            return
+        parts = []
+        for op in operations:
+            if isinstance(op, list):
+                ctype = self.multipart_type(b"changeset_")
+                data = multipart.MultipartSendWrapper(
+                    ctype, [self.request_part(r) for r, h in op]).read()
+                part = multipart.MessagePart(entity_body=data)
+                part.set_content_type(ctype)
+                parts.append(part)
+            else:
+                parts.append(self.request_part(op[0]))
+        btype = self.multipart_type(b"batch_")
+        data = multipart.MultipartSendWrapper(btype, parts).read()
+        request = http.ClientRequest(
+            str(uri.URI.from_octets('$batch').resolve(
+                self.client.service_root)), 'POST', entity_body=data)
+        request.set_content_type(btype)
+        self.client.process_request(request)
+        if request.status != 202:
+            raise UnexpectedHTTPResponse(
+                "%i %s" % (request.status, request.response.reason))
+        try:
+            rtype = request.response.get_content_type()
+            input = multipart.MultipartRecvWrapper(
+                io.BytesIO(request.res_body), rtype)
+            for op, part in zip(operations, input.read_parts()):
+                ptype = part.message.get_content_type()
+                if isinstance(op, list):
+                    if ptype.type == "multipart":
+                        cinput = multipart.MultipartRecvWrapper(part, ptype)
+                        for (r, h), cpart in zip(op, cinput.read_parts()):
+                            self.set_response(r, *self.read_response(cpart))
+                    else:
+                        # the changeset failed, the single response
+                        # applies to all operations
+                        response, body = self.read_response(part)
+                        for r, h in op:
+                            self.set_response(r, response, body)
+                else:
+                    self.set_response(op[0], *self.read_response(part))
+        except (messages.ProtocolError, ValueError) as e:
+            raise DataFormatError("Bad batch response: %s" % str(e))
+        for op in operations:
+            if not isinstance(op, list):
+                op = [op]
+            for request, handler in op:
+                if handler is not None:
+                    handler(request)
+
+    def multipart_type(self, prefix):
+        return params.MediaType("multipart", "mixed", {
+            "boundary": (
+                "boundary", multipart.make_boundary_delimiter(prefix))})
+
+    def request_part(self, request):
+        """Returns a MessagePart containing a request"""
+        if not request.has_header("Accept"):
+            request.set_accept(self.client.ACCEPT_LIST)
+        if request.entity_body is None:
+            op = messages.Request()
+        else:
+            op = messages.Request(entity_body=request.entity_body.read())
+        op.method = request.method
+        op.request_uri = str(request.url)
+        for hname in request.get_headerlist():
+            if hname == b"content-length":
+                continue
+            op.set_header(hname, request.get_header(hname))
+        part = multipart.MessagePart(
+            entity_body=messages.SendWrapper(op).read())
+        part.set_content_type("application/http")
+        part.set_content_transfer_encoding("binary")
+        return part
+
+    def read_response(self, part):
+        """Reads a response from a part of the batch response
+
+        Returns a tuple of :class:`pyslet.http.messages.Response` and
+        the response body as a binary string."""
+        wrapper = messages.RecvWrapper(part, messages.Response)
+        response = wrapper.read_message_header()
+        return response, wrapper.read()
+
+    def set_response(self, request, response, body):
+        """Copies a response read from the batch into *request*"""
+        request.status = response.status
+        request.response.status = response.status
+        request.response.reason = response.reason
+        for hname in response.get_headerlist():
+            request.response.set_header(hname, response.get_header(hname))
+        request.res_body = body
@@ -6,6 +6,7 @@ import decimal
 import itertools
 import json
 import math
+import operator
 import uuid
 import warnings
 
@@ -216,6 +217,57 @@ def can_cast_method_argument(type_a, type_b):
         return False
 
 
+def _cast_raw(value, type_code):
+    # casts a raw (non-null) numeric value to the given type using the
+    # same rules as SimpleValue.cast
+    result = edm.EDMValue.from_type(type_code)
+    result.set_from_value(value)
+    return result.value
+
+
+class _CompiledValue(object):
+
+    # The result of compiling an expression.  func is a function that
+    # takes a context object (typically an entity) and returns a raw
+    # Python value, None representing null.  type_code is the
+    # SimpleType of the result, or None if the result is null
+    # (independent of the context).  For complex values type_code is
+    # the ComplexType definition instead.  safe is False if evaluation
+    # may raise an error.  Constant values also set value, in which
+    # case func simply returns it.
+
+    def __init__(self, func, type_code, safe=True, constant=False,
+                 value=None):
+        self.func = func
+        self.type_code = type_code
+        self.safe = safe
+        self.constant = constant
+        self.value = value
+
+    @classmethod
+    def from_constant(cls, value, type_code):
+        return cls(lambda e: value, type_code, constant=True, value=value)
+
+    def promote(self, type_code):
+        """Returns a compiled value cast to type_code"""
+        if self.type_code == type_code or self.type_code is None:
+            # null can be cast to anything and remains null
+            return self
+        elif self.constant:
+            return self.from_constant(
+                None if self.value is None else
+                _cast_raw(self.value, type_code), type_code)
+        else:
+            func = self.func
+
+            def cast(e):
+                value = func(e)
+                if value is None:
+                    return None
+                return _cast_raw(value, type_code)
+            return _CompiledValue(cast, type_code, self.safe)
+
+
 class OperatorCategory(xsi.Enumeration):
 
     """An enumeration used to represent operator categories (for precedence).
@@ -381,6 +433,7 @@ class CommonExpression(SortableMixin, UnicodeMixin, MigratedClass):
         self.parent = None
         self.operator = operator
         self.operands = []
+        self._compiled_filter = None
 
     @old_method('AddOperand')
     def add_operand(self, operand):
@@ -390,6 +443,58 @@ class CommonExpression(SortableMixin, UnicodeMixin, MigratedClass):
     def evaluate(self, context_entity):
         raise NotImplementedError
 
+    def compile_filter(self, entity_type):
+        """Compiles this expression into a filter function
+
+        entity_type
+            The :py:class:`pyslet.odata2.csdl.EntityType` of the
+            entities that will be filtered.
+
+        Returns a function that takes an entity and returns True, False
+        or None (for a null result) or None if the expression can't be
+        compiled, in which case the caller must fall back to
+        :py:meth:`evaluate`.
+
+        The compiled function works directly on the raw values of the
+        entity's properties.  Type promotion of literals is done once,
+        when the expression is compiled, and no intermediate
+        :py:class:`pyslet.odata2.csdl.SimpleValue` instances are created
+        for the common operators and string methods.  Expressions that
+        use other features (such as navigation properties, isof, cast or
+        round) are not compiled.  The result is cached so subsequent
+        calls with the same *entity_type* are cheap.
+
+        The compiled function gives the same result as :py:meth:`evaluate`
+        with one exception: relational operators on strings, dates and
+        guids always return False if either operand is null (they may
+        raise TypeError when evaluated)."""
+        cache = self._compiled_filter
+        if cache is not None and cache[0] is entity_type:
+            return cache[1]
+        try:
+            result = self.compile_value(entity_type)
+            if result.type_code == edm.SimpleType.Boolean:
+                func = result.func
+            else:
+                func = None
+        except EvaluationError:
+            func = None
+        self._compiled_filter = (entity_type, func)
+        return func
+
+    def compile_value(self, context_type):
+        """Compiles this expression
+
+        context_type
+            The type definition of the objects that will be passed to
+            the compiled function, an
+            :py:class:`pyslet.odata2.csdl.EntityType` or
+            :py:class:`pyslet.odata2.csdl.ComplexType`.
+
+        Used in the implementation of :py:meth:`compile_filter`, raises
+        EvaluationError if the expression can't be compiled."""
+        raise EvaluationError("Can't compile %s" % repr(self))
+
     def sortkey(self):
         """We implement comparisons based on operator precedence."""
         if self.operator is None:
@@ -433,6 +538,11 @@ class UnaryExpression(CommonExpression):
     """A mapping from unary operator constants to unbound methods that
     evaluate the operator."""
 
+    CompileMethod = {
+    }
+    """A mapping from unary operator constants to unbound methods that
+    compile the operator."""
+
     def __init__(self, operator):
         super(UnaryExpression, self).__init__(operator)
 
@@ -489,11 +599,56 @@ class UnaryExpression(CommonExpression):
         else:
             raise EvaluationError("Illegal operand for not")
 
+    def compile_value(self, context_type):
+        method = self.CompileMethod.get(self.operator, None)
+        if method is None:
+            return super(UnaryExpression, self).compile_value(context_type)
+        return method(self, self.operands[0].compile_value(context_type))
+
+    def compile_negate(self, rvalue):
+        type_code = rvalue.type_code
+        if type_code in (edm.SimpleType.Byte, edm.SimpleType.Int16):
+            type_code = edm.SimpleType.Int32
+        elif type_code == edm.SimpleType.Single:
+            type_code = edm.SimpleType.Double
+        elif type_code is None:
+            return _CompiledValue.from_constant(None, edm.SimpleType.Int32)
+        elif type_code not in (
+                edm.SimpleType.Int32, edm.SimpleType.Int64,
+                edm.SimpleType.Double, edm.SimpleType.Decimal):
+            raise EvaluationError("Illegal operand for negate")
+        func = rvalue.promote(type_code).func
+
+        def negate(e):
+            value = func(e)
+            if value is None:
+                return None
+            return _cast_raw(0 - value, type_code)
+        return _CompiledValue(negate, type_code, False)
+
+    def compile_not(self, rvalue):
+        if rvalue.type_code is None:
+            return _CompiledValue.from_constant(None, edm.SimpleType.Boolean)
+        elif rvalue.type_code != edm.SimpleType.Boolean:
+            raise EvaluationError("Illegal operand for not")
+        func = rvalue.func
+
+        def bool_not(e):
+            value = func(e)
+            if value is None:
+                return None
+            return not value
+        return _CompiledValue(bool_not, edm.SimpleType.Boolean, rvalue.safe)
+
 
 UnaryExpression.EvalMethod = {
     Operator.negate: UnaryExpression.evaluate_negate,
     Operator.boolNot: UnaryExpression.evaluate_not}
 
+UnaryExpression.CompileMethod = {
+    Operator.negate: UnaryExpression.compile_negate,
+    Operator.boolNot: UnaryExpression.compile_not}
+
 
 class BinaryExpression(CommonExpression):
 
@@ -502,6 +657,11 @@ class BinaryExpression(CommonExpression):
     """A mapping from binary operators to unbound methods that evaluate
     the operator."""
 
+    CompileMethod = {
+    }
+    """A mapping from binary operators to unbound methods that compile
+    the operator."""
+
     def __init__(self, operator):
         super(BinaryExpression, self).__init__(operator)
 
@@ -876,6 +1036,226 @@ class BinaryExpression(CommonExpression):
         else:
             raise EvaluationError("Illegal operands for boolean and")
 
+    def compile_value(self, context_type):
+        if self.operator == Operator.member:
+            return self.compile_member(context_type)
+        method = self.CompileMethod.get(self.operator, None)
+        if method is None:
+            return super(BinaryExpression, self).compile_value(context_type)
+        return method(self, self.operands[0].compile_value(context_type),
+                      self.operands[1].compile_value(context_type))
+
+    def compile_member(self, context_type):
+        # only members of complex values are compiled, navigation
+        # properties are not
+        lvalue = self.operands[0].compile_value(context_type)
+        if not isinstance(lvalue.type_code, edm.ComplexType):
+            raise EvaluationError("Can't compile member of %s" %
+                                  to_text(self.operands[0]))
+        rvalue = self.operands[1].compile_value(lvalue.type_code)
+        lfunc = lvalue.func
+        rfunc = rvalue.func
+        return _CompiledValue(lambda e: rfunc(lfunc(e)), rvalue.type_code)
+
+    def compile_operands(self, lvalue, rvalue):
+        # returns the promoted type code and the pair of promoted values
+        if isinstance(lvalue.type_code, edm.ComplexType) or isinstance(
+                rvalue.type_code, edm.ComplexType):
+            raise EvaluationError(
+                "Expected primitive value for %s" %
+                Operator.to_str(self.operator))
+        type_code = promote_types(lvalue.type_code, rvalue.type_code)
+        if type_code is None:
+            return None, lvalue, rvalue
+        return type_code, lvalue.promote(type_code), rvalue.promote(type_code)
+
+    def compile_arithmetic(self, lvalue, rvalue, op):
+        type_code, lvalue, rvalue = self.compile_operands(lvalue, rvalue)
+        if type_code is None:
+            # null op null
+            return _CompiledValue.from_constant(None, edm.SimpleType.Int32)
+        elif type_code not in (
+                edm.SimpleType.Int32, edm.SimpleType.Int64,
+                edm.SimpleType.Single, edm.SimpleType.Double,
+                edm.SimpleType.Decimal):
+            raise EvaluationError(
+                "Illegal operands for %s" % Operator.to_str(self.operator))
+        lfunc = lvalue.func
+        rfunc = rvalue.func
+
+        def arithmetic(e):
+            lv = lfunc(e)
+            rv = rfunc(e)
+            if lv is None or rv is None:
+                return None
+            return _cast_raw(op(lv, rv, type_code), type_code)
+        return _CompiledValue(arithmetic, type_code, False)
+
+    def compile_mul(self, lvalue, rvalue):
+        return self.compile_arithmetic(
+            lvalue, rvalue, lambda x, y, t: x * y)
+
+    def compile_add(self, lvalue, rvalue):
+        return self.compile_arithmetic(
+            lvalue, rvalue, lambda x, y, t: x + y)
+
+    def compile_sub(self, lvalue, rvalue):
+        return self.compile_arithmetic(
+            lvalue, rvalue, lambda x, y, t: x - y)
+
+    def compile_div(self, lvalue, rvalue):
+        def div(x, y, type_code):
+            try:
+                if type_code in (edm.SimpleType.Int32, edm.SimpleType.Int64):
+                    # see evaluate_div
+                    return int(float(x) / float(y))
+                else:
+                    return x / y
+            except ZeroDivisionError as e:
+                raise EvaluationError(str(e))
+        return self.compile_arithmetic(lvalue, rvalue, div)
+
+    def compile_mod(self, lvalue, rvalue):
+        def mod(x, y, type_code):
+            try:
+                if type_code in (edm.SimpleType.Int32, edm.SimpleType.Int64):
+                    # see evaluate_mod
+                    return int(math.fmod(float(x), float(y)))
+                else:
+                    return math.fmod(x, y)
+            except (ZeroDivisionError, ValueError) as e:
+                raise EvaluationError(str(e))
+        return self.compile_arithmetic(lvalue, rvalue, mod)
+
+    def compile_relation(self, lvalue, rvalue, relation):
+        type_code, lvalue, rvalue = self.compile_operands(lvalue, rvalue)
+        if type_code is None:
+            # e.g., null lt null
+            return _CompiledValue.from_constant(False, edm.SimpleType.Boolean)
+        elif type_code not in NUMERIC_TYPES and type_code not in (
+                edm.SimpleType.String, edm.SimpleType.DateTime,
+                edm.SimpleType.DateTimeOffset, edm.SimpleType.Guid):
+            raise EvaluationError(
+                "Illegal operands for %s" % Operator.to_str(self.operator))
+        elif type_code in (edm.SimpleType.Byte, edm.SimpleType.Int16):
+            # evaluate_relation does not cover these types
+            raise EvaluationError(
+                "Illegal operands for %s" % Operator.to_str(self.operator))
+        lfunc = lvalue.func
+        safe = lvalue.safe and rvalue.safe
+        if rvalue.constant:
+            rv = rvalue.value
+            if rv is None:
+                return _CompiledValue.from_constant(
+                    False, edm.SimpleType.Boolean)
+
+            def relation_constant(e):
+                lv = lfunc(e)
+                if lv is None:
+                    return False
+                return relation(lv, rv)
+            return _CompiledValue(relation_constant, edm.SimpleType.Boolean,
+                                  safe)
+        rfunc = rvalue.func
+
+        def relation_values(e):
+            lv = lfunc(e)
+            rv = rfunc(e)
+            if lv is None or rv is None:
+                return False
+            return relation(lv, rv)
+        return _CompiledValue(relation_values, edm.SimpleType.Boolean, safe)
+
+    def compile_lt(self, lvalue, rvalue):
+        return self.compile_relation(lvalue, rvalue, operator.lt)
+
+    def compile_gt(self, lvalue, rvalue):
+        return self.compile_relation(lvalue, rvalue, operator.gt)
+
+    def compile_le(self, lvalue, rvalue):
+        return self.compile_relation(lvalue, rvalue, operator.le)
+
+    def compile_ge(self, lvalue, rvalue):
+        return self.compile_relation(lvalue, rvalue, operator.ge)
+
+    def compile_eq(self, lvalue, rvalue, negate=False):
+        type_code, lvalue, rvalue = self.compile_operands(lvalue, rvalue)
+        if type_code is not None and type_code not in NUMERIC_TYPES and \
+                type_code not in (
+                    edm.SimpleType.String, edm.SimpleType.DateTime,
+                    edm.SimpleType.DateTimeOffset, edm.SimpleType.Guid,
+                    edm.SimpleType.Binary):
+            raise EvaluationError(
+                "Illegal operands for %s" % Operator.to_str(self.operator))
+        elif type_code in (edm.SimpleType.Byte, edm.SimpleType.Int16):
+            # evaluate_eq does not cover these types
+            raise EvaluationError(
+                "Illegal operands for %s" % Operator.to_str(self.operator))
+        lfunc = lvalue.func
+        safe = lvalue.safe and rvalue.safe
+        if rvalue.constant:
+            rv = rvalue.value
+            if negate:
+                func = lambda e: lfunc(e) != rv    # noqa
+            else:
+                func = lambda e: lfunc(e) == rv    # noqa
+        else:
+            rfunc = rvalue.func
+            if negate:
+                func = lambda e: lfunc(e) != rfunc(e)  # noqa
+            else:
+                func = lambda e: lfunc(e) == rfunc(e)  # noqa
+        return _CompiledValue(func, edm.SimpleType.Boolean, safe)
+
+    def compile_ne(self, lvalue, rvalue):
+        return self.compile_eq(lvalue, rvalue, negate=True)
+
+    def compile_boolean(self, lvalue, rvalue):
+        type_code = promote_types(lvalue.type_code, rvalue.type_code)
+        if type_code is None:
+            # null and/or null
+            return None, None
+        elif type_code != edm.SimpleType.Boolean:
+            raise EvaluationError(
+                "Illegal operands for boolean %s" %
+                Operator.to_str(self.operator))
+        return lvalue.func, rvalue.func
+
+    def compile_and(self, lvalue, rvalue):
+        lfunc, rfunc = self.compile_boolean(lvalue, rvalue)
+        if lfunc is None:
+            return _CompiledValue.from_constant(False, edm.SimpleType.Boolean)
+        if rvalue.safe:
+            # null is treated as False by the and operator
+            func = lambda e: lfunc(e) is True and rfunc(e) is True  # noqa
+        else:
+            # evaluate both sides in case the right side raises an error
+            def func(e):
+                lv = lfunc(e)
+                rv = rfunc(e)
+                return lv is True and rv is True
+        return _CompiledValue(func, edm.SimpleType.Boolean,
+                              lvalue.safe and rvalue.safe)
+
+    def compile_or(self, lvalue, rvalue):
+        lfunc, rfunc = self.compile_boolean(lvalue, rvalue)
+        if lfunc is None:
+            return _CompiledValue.from_constant(False, edm.SimpleType.Boolean)
+        safe = rvalue.safe
+
+        def func(e):
+            lv = lfunc(e)
+            if lv is None and safe:
+                return False
+            rv = rfunc(e)
+            if lv is None or rv is None:
+                # null or anything is False
+                return False
+            return lv or rv
+        return _CompiledValue(func, edm.SimpleType.Boolean,
+                              lvalue.safe and rvalue.safe)
+
+
 BinaryExpression.EvalMethod = {
     Operator.cast: BinaryExpression.evaluate_cast,
     Operator.mul: BinaryExpression.evaluate_mul,
@@ -893,15 +1273,32 @@ BinaryExpression.EvalMethod = {
     Operator.boolAnd: BinaryExpression.evaluate_and,
     Operator.boolOr: BinaryExpression.evaluate_or}
 
+BinaryExpression.CompileMethod = {
+    Operator.mul: BinaryExpression.compile_mul,
+    Operator.div: BinaryExpression.compile_div,
+    Operator.mod: BinaryExpression.compile_mod,
+    Operator.add: BinaryExpression.compile_add,
+    Operator.sub: BinaryExpression.compile_sub,
+    Operator.lt: BinaryExpression.compile_lt,
+    Operator.gt: BinaryExpression.compile_gt,
+    Operator.le: BinaryExpression.compile_le,
+    Operator.ge: BinaryExpression.compile_ge,
+    Operator.eq: BinaryExpression.compile_eq,
+    Operator.ne: BinaryExpression.compile_ne,
+    Operator.boolAnd: BinaryExpression.compile_and,
+    Operator.boolOr: BinaryExpression.compile_or}
+
 
 class LiteralExpression(CommonExpression):
 
     """When converted to str return for example, '42L' or 'Paddy O''brian'
     - note that %-encoding is not applied"""
 
-    def __init__(self, value):
+    def __init__(self, value, parameter=False):
         super(LiteralExpression, self).__init__()
         self.value = value
+        #: True if value is a parameter that may change after parsing
+        self.parameter = parameter
 
     def __unicode__(self):
         if not self.value:
@@ -935,6 +1332,13 @@ class LiteralExpression(CommonExpression):
         """A literal evaluates to itself."""
         return self.value
 
+    def compile_value(self, context_type):
+        value = self.value
+        if self.parameter:
+            # the value is only known when the expression is evaluated
+            return _CompiledValue(lambda e: value.value, value.type_code)
+        return _CompiledValue.from_constant(value.value, value.type_code)
+
 
 class PropertyExpression(CommonExpression):
 
@@ -970,6 +1374,28 @@ class PropertyExpression(CommonExpression):
             raise EvaluationError(
                 "Evaluation of %s member: no entity in context" % self.name)
 
+    def compile_value(self, context_type):
+        if context_type is None:
+            raise EvaluationError(
+                "Compilation of %s member: no type in context" % self.name)
+        elif self.name not in context_type:
+            raise EvaluationError("Undefined property: %s" % self.name)
+        p = context_type[self.name]
+        if not isinstance(p, edm.Property):
+            # navigation properties are not compiled
+            return super(PropertyExpression, self).compile_value(
+                context_type)
+        name = self.name
+        # entities and complex values store their properties in a data
+        # dictionary, we use it directly for speed
+        if p.complexType is not None:
+            return _CompiledValue(lambda e: e.data[name], p.complexType)
+        elif p.simpleTypeCode is not None:
+            return _CompiledValue(lambda e: e.data[name].value,
+                                  p.simpleTypeCode)
+        else:
+            raise EvaluationError("Undefined property type: %s" % self.name)
+
 
 class CallExpression(CommonExpression):
 
@@ -978,6 +1404,11 @@ class CallExpression(CommonExpression):
     """A mapping from method calls to unbound methods that evaluate
     the method."""
 
+    CompileMethod = {
+    }
+    """A mapping from method calls to unbound methods that compile
+    the method."""
+
     def __init__(self, method_call):
         super(CallExpression, self).__init__(Operator.method_call)
         self.method = method_call
@@ -1291,6 +1722,150 @@ class CallExpression(CommonExpression):
             raise EvaluationError(
                 "ceiling() takes 1 argument, %i given" % len(args))
 
+    def compile_value(self, context_type):
+        method = self.CompileMethod.get(self.method, None)
+        if method is None:
+            return super(CallExpression, self).compile_value(context_type)
+        return method(self, list(x.compile_value(context_type)
+                                 for x in self.operands))
+
+    def compile_param(self, arg, type_code):
+        # the compiled equivalent of promote_param
+        if not isinstance(arg.type_code, edm.ComplexType) and \
+                can_cast_method_argument(arg.type_code, type_code):
+            return arg.promote(type_code)
+        raise EvaluationError(
+            "Expected %s value in %s()" %
+            (edm.SimpleType.to_str(type_code), Method.to_str(self.method)))
+
+    def compile_strict_param(self, arg, type_code):
+        # the compiled equivalent of check_strict_param
+        if arg.type_code == type_code:
+            return arg
+        raise EvaluationError(
+            "Expected %s value in %s()" %
+            (edm.SimpleType.to_str(type_code), Method.to_str(self.method)))
+
+    def compile_method(self, args, nargs, type_code, method, strict=None):
+        # compiles a method call that takes nargs, all of type
+        # *strict* (strict param check) or String (promoted), and
+        # returns a value of type_code.  method is called with the
+        # non-null raw values of the arguments, if any argument is null
+        # the result is null.
+        if len(args) != nargs:
+            raise EvaluationError(
+                "%s() takes %i argument(s), %i given" %
+                (Method.to_str(self.method), nargs, len(args)))
+        if strict is None:
+            args = [self.compile_param(arg, edm.SimpleType.String)
+                    for arg in args]
+        else:
+            args = [self.compile_strict_param(arg, strict) for arg in args]
+        safe = all(arg.safe for arg in args)
+        if nargs == 1:
+            func = args[0].func
+
+            def call1(e):
+                value = func(e)
+                if value is None:
+                    return None
+                return method(value)
+            return _CompiledValue(call1, type_code, safe)
+        elif nargs == 2:
+            lfunc = args[0].func
+            rfunc = args[1].func
+
+            def call2(e):
+                lv = lfunc(e)
+                rv = rfunc(e)
+                if lv is None or rv is None:
+                    return None
+                return method(lv, rv)
+            return _CompiledValue(call2, type_code, safe)
+        else:
+            funcs = [arg.func for arg in args]
+
+            def calln(e):
+                values = [func(e) for func in funcs]
+                if None in values:
+                    return None
+                return method(*values)
+            return _CompiledValue(calln, type_code, safe)
+
+    def compile_endswith(self, args):
+        return self.compile_method(args, 2, edm.SimpleType.Boolean,
+                                   lambda x, y: x.endswith(y))
+
+    def compile_indexof(self, args):
+        return self.compile_method(args, 2, edm.SimpleType.Int32,
+                                   lambda x, y: x.find(y))
+
+    def compile_replace(self, args):
+        return self.compile_method(args, 3, edm.SimpleType.String,
+                                   lambda x, y, z: x.replace(y, z))
+
+    def compile_startswith(self, args):
+        return self.compile_method(args, 2, edm.SimpleType.Boolean,
+                                   lambda x, y: x.startswith(y))
+
+    def compile_tolower(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.String,
+                                   lambda x: x.lower())
+
+    def compile_toupper(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.String,
+                                   lambda x: x.upper())
+
+    def compile_trim(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.String,
+                                   lambda x: x.strip())
+
+    def compile_substringof(self, args):
+        return self.compile_method(args, 2, edm.SimpleType.Boolean,
+                                   lambda x, y: y.find(x) >= 0)
+
+    def compile_concat(self, args):
+        return self.compile_method(args, 2, edm.SimpleType.String,
+                                   lambda x, y: x + y,
+                                   strict=edm.SimpleType.String)
+
+    def compile_length(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: len(x),
+                                   strict=edm.SimpleType.String)
+
+    def compile_year(self, args):
+        return self.compile_method(
+            args, 1, edm.SimpleType.Int32,
+            lambda x: x.date.century * 100 + x.date.year,
+            strict=edm.SimpleType.DateTime)
+
+    def compile_month(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: x.date.month,
+                                   strict=edm.SimpleType.DateTime)
+
+    def compile_day(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: x.date.day,
+                                   strict=edm.SimpleType.DateTime)
+
+    def compile_hour(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: x.time.hour,
+                                   strict=edm.SimpleType.DateTime)
+
+    def compile_minute(self, args):
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: x.time.minute,
+                                   strict=edm.SimpleType.DateTime)
+
+    def compile_second(self, args):
+        # set_from_value truncates a fractional second
+        return self.compile_method(args, 1, edm.SimpleType.Int32,
+                                   lambda x: int(x.time.second),
+                                   strict=edm.SimpleType.DateTime)
+
 
 CallExpression.EvalMethod = {
     Method.endswith: CallExpression.evaluate_endswith,
@@ -1315,6 +1890,25 @@ CallExpression.EvalMethod = {
     Method.ceiling: CallExpression.evaluate_ceiling
 }
 
+CallExpression.CompileMethod = {
+    Method.endswith: CallExpression.compile_endswith,
+    Method.indexof: CallExpression.compile_indexof,
+    Method.replace: CallExpression.compile_replace,
+    Method.startswith: CallExpression.compile_startswith,
+    Method.tolower: CallExpression.compile_tolower,
+    Method.toupper: CallExpression.compile_toupper,
+    Method.trim: CallExpression.compile_trim,
+    Method.substringof: CallExpression.compile_substringof,
+    Method.concat: CallExpression.compile_concat,
+    Method.length: CallExpression.compile_length,
+    Method.year: CallExpression.compile_year,
+    Method.month: CallExpression.compile_month,
+    Method.day: CallExpression.compile_day,
+    Method.hour: CallExpression.compile_hour,
+    Method.minute: CallExpression.compile_minute,
+    Method.second: CallExpression.compile_second
+}
+
 
 class Parser(edm.Parser):
 
@@ -1337,16 +1931,18 @@ class Parser(edm.Parser):
         op_stack = []
         while True:
             self.parse_wsp()
+            parameter = False
             if params is not None and self.parse(':'):
                 pname = self.parse_simple_identifier()
                 if pname in params:
                     value = params[pname]
+                    parameter = True
                 else:
                     raise ValueError("Expected parameter name after ':'")
             else:
                 value = self.parse_uri_literal()
             if value is not None:
-                right_op = LiteralExpression(value)
+                right_op = LiteralExpression(value, parameter)
             else:
                 name = self.parse_simple_identifier()
                 if name == "not":
@@ -1646,7 +2242,7 @@ class Parser(edm.Parser):
         if self.SimpleIdentifierStartClass is None:
             load_class = CharClass(CharClass.ucd_category("L"))
             load_class.add_class(CharClass.ucd_category("Nl"))
-            self.__class__.SimpleIdentifierStartClass = load_class
+            self.__class__.SimpleIdentifierStartClass = load_class.freeze()
         if self.SimpleIdentifierClass is None:
             load_class = CharClass(self.SimpleIdentifierStartClass)
             for c in ['Nd', 'Mn', 'Mc', 'Pc', 'Cf']:
@@ -1662,10 +2258,9 @@ class Parser(edm.Parser):
                 return None
             result.append(self.the_char)
             self.next_char()
-            while self.the_char is not None and \
-                    self.SimpleIdentifierClass.test(self.the_char):
-                result.append(self.the_char)
-                self.next_char()
+            segment = self.parse_span(self.SimpleIdentifierClass)
+            if segment:
+                result.append(segment)
             if not self.parse('.'):
                 break
             result.append('.')
@@ -2834,26 +3429,20 @@ def parse_asp_dot_net_date(src):
     if not (src.startswith("/Date(") and src.endswith(")/")):
         raise ValueError
     ticks = src[6:-2]
-    if '+' in ticks:
-        # split by +
-        ticks = ticks.split('+')
-        zdir = 1
-    elif '-' in ticks:
-        # split by -
-        ticks = ticks.split('-')
-        zdir = -1
+    # a leading sign belongs to the ticks, not the offset
+    i = max(ticks.find('+', 1), ticks.find('-', 1))
+    if i > 0:
+        zdir = 1 if ticks[i] == '+' else -1
+        zoffset = int(ticks[i + 1:])
+        ticks = ticks[:i]
     else:
         zdir = 0
-    if zdir:
-        if len(ticks) != 2:
-            raise ValueError
-        zoffset = int(ticks[1])
-    else:
         zoffset = 0
-    t, overflow = iso.Time().offset(
-        seconds=int(ticks[0]) / 1000.0)
-    t = t.with_zone(zdir, zoffset // 60, zoffset % 60)
-    d = iso.Date(absolute_day=BASE_DAY + overflow)
+    days, ms = divmod(int(ticks), TICKS_PER_DAY)
+    t = iso.Time(hour=ms // 3600000, minute=(ms // 60000) % 60,
+                 second=(ms % 60000) / 1000.0, zdirection=zdir,
+                 zhour=zoffset // 60, zminute=zoffset % 60)
+    d = iso.Date(absolute_day=BASE_DAY + days)
     return iso.TimePoint(date=d, time=t)
 
 
@@ -3036,6 +3625,9 @@ class EntityCollection(edm.EntityCollection):
         *boolExpression* is a :py:class:`CommonExpression`.  """
         if self.filter is None:
             return True
+        func = self.filter.compile_filter(self.entity_set.entityType)
+        if func is not None:
+            return func(entity) is True
         else:
             result = self.filter.evaluate(entity)
             if isinstance(result, edm.BooleanValue):
@@ -3514,6 +4106,9 @@ class Link(atom.Link):
                         entity.exists = exists
                         entry.get_value(entity)
                         entries.append(entity)
+                else:
+                    # an empty inline element, no entity is linked
+                    entries = []
                 deferred.set_expansion(
                     ExpandedEntityCollection(
                         from_entity=deferred.from_entity,
@@ -4063,4 +4658,28 @@ class Document(app.Document):
                 result = app.Document.get_element_class(name)
         return result
 
+    def iter_entries(self, src=None):
+        """Reads this document, yielding the entries of a feed
+
+        src (defaults to None)
+            The source to read from, as for
+            :meth:`pyslet.xml.structures.Document.read`.
+
+        This method is a generator that yields each :class:`Entry` in
+        the root feed as soon as it has been parsed.  The entry is
+        removed from the feed when the next entry is requested, so only
+        one entry is held in memory at any one time even when reading
+        very large feeds.
+
+        When the generator is exhausted the remainder of the feed, e.g.,
+        the count and any next link, is available from :attr:`root` in
+        the usual way.  Entries in nested (inline) feeds remain part of
+        their parent entry.  If the document is not a feed then nothing
+        is yielded."""
+        for event, entry in self.iterparse(src, element_class=Entry):
+            feed = entry.parent
+            if feed is self.root and isinstance(feed, atom.Feed):
+                yield entry
+                feed.remove_child(entry)
+
 xmlns.map_class_elements(Document.classMap, globals())
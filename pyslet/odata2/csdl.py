@@ -9,6 +9,7 @@ import copy
 import datetime
 import decimal
 import hashlib
+import heapq
 import io
 import itertools
 import logging
@@ -2825,6 +2826,37 @@ class Entity(SortableMixin, TypeInstance):
         return False
 
 
+def _null_key(value):
+    # a sort key that places None before all other values
+    return (value is not None, value)
+
+
+class _OrderKey(object):
+
+    # A composite sort key.  values is a list of values to compare in
+    # turn, dirs a parallel list of 1 (ascending) or -1 (descending).
+    # None compares less than any other value.
+
+    __slots__ = ('values', 'dirs')
+
+    def __init__(self, values, dirs):
+        self.values = values
+        self.dirs = dirs
+
+    def __lt__(self, other):
+        for a, b, d in zip(self.values, other.values, self.dirs):
+            if a == b:
+                continue
+            if a is None:
+                result = True
+            elif b is None:
+                result = False
+            else:
+                result = a < b
+            return result if d > 0 else not result
+        return False
+
+
 class EntityCollection(DictionaryLike, PEP8Compatibility):
 
     """Represents a collection of entities from an :py:class:`EntitySet`.
@@ -3104,27 +3136,57 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
         returns a generator function that returns the same entities in
         sorted order (according to the :py:attr:`orderby` object).
 
-        This implementation simply creates a list and then sorts it
-        based on the output of :py:meth:`calculate_order_key` so is not
-        suitable for use with long lists of entities.  However, if no
-        ordering is required then no list is created."""
-        elist = None
-        if self.paging:
+        The sort keys are calculated with :py:meth:`calculate_order_key`.
+        When paging, the entity key is used as the final sort criterion
+        so that pages are predictable, otherwise the sort is stable.
+        Null values sort before all other values.
+
+        When called during :py:meth:`iterpage` the results are limited
+        to those required to complete the page, these are selected
+        using a bounded heap (with a single composite key for each
+        entity) so the entity set as a whole is never held in memory.
+        Otherwise, this implementation creates a list and sorts it once
+        for each rule so is not suitable for use with long lists of
+        entities.  If no ordering is required then no list is
+        created."""
+        rules = list(self.orderby) if self.orderby else []
+        paging = self.paging
+        if not rules and not paging:
+            for e in entity_iterable:
+                yield e
+            return
+        limit = None
+        if paging:
+            emin, emax, next_skiptoken = self._page_range()
+            if emax is not None:
+                # iterpage reads one extra entity to detect the page end
+                limit = emax + 1
+        if limit is None:
             elist = list(entity_iterable)
-            elist.sort(key=lambda x: x.key())
-        if self.orderby:
-            if elist is None:
-                elist = list(entity_iterable)
-            # we avoid Py3 warnings by doing multiple sorts with a key function
-            for rule, ruleDir in reversed(self.orderby):
-                elist.sort(key=lambda x: self.calculate_order_key(
-                    x, rule), reverse=True if ruleDir < 0 else False)
-        if elist:
+            if paging:
+                elist.sort(key=lambda x: x.key())
+            # multiple stable sorts with simple keys avoid comparing
+            # entities in Python code
+            for rule, rule_dir in reversed(rules):
+                elist.sort(key=lambda x: _null_key(
+                    self.calculate_order_key(x, rule)),
+                    reverse=True if rule_dir < 0 else False)
             for e in elist:
                 yield e
-        else:
-            for e in entity_iterable:
-                yield e
+            return
+        dirs = [rule_dir for rule, rule_dir in rules]
+        dirs.append(1)
+        dirs.append(1)
+
+        def order_key(item):
+            i, e = item
+            values = [self.calculate_order_key(e, rule) for rule, d in rules]
+            values.append(e.key())
+            values.append(i)
+            return _OrderKey(values, dirs)
+        for i, e in heapq.nsmallest(limit, enumerate(entity_iterable),
+                                    key=order_key):
+            yield e
 
     @old_method('SetInlineCount')
     def set_inlinecount(self, inlinecount):
@@ -3194,6 +3256,27 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
         create two entities with duplicate keys)."""
         raise NotImplementedError
 
+    def insert_entities(self, entities, batch_size=100):
+        """Inserts multiple entities into this entity set.
+
+        entities
+            An iterable of :py:class:`Entity` instances to insert.
+
+        batch_size
+            A hint to the data provider indicating how many entities it
+            may group together when inserting them.
+
+        The effect is the same as calling :py:meth:`insert_entity` for
+        each entity in turn but data providers may override this method
+        to provide a more efficient implementation for bulk loading.
+        If the call is unsuccessful then all entities in *entities*
+        should be discarded.
+
+        The default implementation simply calls
+        :py:meth:`insert_entity`."""
+        for entity in entities:
+            self.insert_entity(entity)
+
     def update_entity(self, entity, merge=True):
         """Updates *entity* which must already be in the entity set.
 
@@ -3234,6 +3317,20 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
                 return e
         raise KeyError(to_text(key))
 
+    def read_concurrency_tokens(self, key):
+        """Returns the entity with *key* for concurrency checks
+
+        The result is an :py:class:`Entity` instance in which the key
+        and concurrency tokens are selected, the values of other
+        properties are undefined.  It is intended for checking an
+        entity's ETag without the expense of loading the whole entity.
+        If there is no entity with *key* then KeyError is raised.
+
+        The default implementation simply returns self[key], data
+        providers should override it if they can read the concurrency
+        tokens more efficiently."""
+        return self[key]
+
     def __setitem__(self, key, value):
         if not isinstance(value, Entity) or \
                 value.entity_set is not self.entity_set:
@@ -3246,6 +3343,48 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
     def __delitem__(self, key):
         raise NotImplementedError
 
+    def delete_entities(self, keys, batch_size=100):
+        """Deletes multiple entities from this entity set.
+
+        keys
+            An iterable of entity keys.
+
+        batch_size
+            A hint to the data provider indicating how many entities it
+            may delete with a single operation.
+
+        The effect is the same as deleting each entity in turn with the
+        del operator but data providers may override this method to
+        provide a more efficient implementation.  If there is no entity
+        with one of the keys then KeyError is raised.
+
+        The default implementation simply deletes the entities one at a
+        time."""
+        for key in keys:
+            del self[key]
+
+    def distinct_values(self, name):
+        """Generates the distinct values of a property
+
+        name
+            The name of a simple (non-complex) data property.
+
+        Generates the values of property *name* in the entities in this
+        collection, taking account of any filter, without repeating
+        any value.  The values are generated as python values, not as
+        :py:class:`SimpleValue` instances, and nulls are omitted.
+
+        The default implementation reads all the entities in the
+        collection, data providers should override it if they can
+        retrieve each value just once."""
+        seen = set()
+        for entity in self.itervalues():
+            value = entity[name].value
+            if value is None or value in seen:
+                continue
+            seen.add(value)
+            yield value
+
     def set_page(self, top, skip=0, skiptoken=None):
         """Sets the page parameters that determine the next page
         returned by :py:meth:`iterpage`.
@@ -3297,30 +3436,7 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
             # end of paging
             return
         i = 0
-        self.nextSkiptoken = None
-        try:
-            emin = int(self.skiptoken, 16)
-        except (TypeError, ValueError):
-            # not a skip token we recognise, do nothing
-            emin = None
-        if emin is None:
-            emin = 0
-        if self.skip is not None:
-            emin = self.skip + emin
-        if self.topmax:
-            if self.top is None or self.top > self.topmax:
-                # may be truncated
-                emax = emin + self.topmax
-                self.nextSkiptoken = "%X" % (emin + self.topmax)
-            else:
-                # top not None and <= topmax
-                emax = emin + self.top
-        else:
-            # no forced paging
-            if self.top is None:
-                emax = None
-            else:
-                emax = emin + self.top
+        emin, emax, self.nextSkiptoken = self._page_range()
         try:
             self.paging = True
             if emax is None:
@@ -3355,6 +3471,38 @@ class EntityCollection(DictionaryLike, PEP8Compatibility):
             self.top = self.skip = 0
             self.skiptoken = None
 
+    def _page_range(self):
+        # returns a triple of (emin, emax, next_skiptoken) where emin is
+        # the index of the first entity in the page and emax the index
+        # of the entity after the last one (or None for no limit).
+        # next_skiptoken is the skiptoken of the next page if the page
+        # was truncated by topmax, otherwise None.
+        next_skiptoken = None
+        try:
+            emin = int(self.skiptoken, 16)
+        except (TypeError, ValueError):
+            # not a skip token we recognise, do nothing
+            emin = None
+        if emin is None:
+            emin = 0
+        if self.skip is not None:
+            emin = self.skip + emin
+        if self.topmax:
+            if self.top is None or self.top > self.topmax:
+                # may be truncated
+                emax = emin + self.topmax
+                next_skiptoken = "%X" % (emin + self.topmax)
+            else:
+                # top not None and <= topmax
+                emax = emin + self.top
+        else:
+            # no forced paging
+            if self.top is None:
+                emax = None
+            else:
+                emax = emin + self.top
+        return emin, emax, next_skiptoken
+
     def next_skiptoken(self):
         """Following a complete iteration of the generator returned by
         :py:meth:`iterpage`, this method returns the skiptoken which
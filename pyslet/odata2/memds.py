@@ -1,6 +1,7 @@
 #! /usr/bin/env python
 """A simple Entity store using a python dictionary"""
 
+import bisect
 import hashlib
 import threading
 import logging
@@ -47,6 +48,9 @@ class InMemoryEntityStore(object):
         # a mapping of association set names to
         # :py:class:`InMemoryAssociation` index instances *to* this
         # entity set
+        #: a mapping of property names to
+        #: :py:class:`InMemoryPropertyIndex` instances
+        self.indexes = {}
         self._deleting = set()
         if entity_set is not None:
             self.bind_to_entity_set(entity_set)
@@ -68,6 +72,32 @@ class InMemoryEntityStore(object):
         else:
             self.associations[aindex.name] = aindex
 
+    def add_index(self, property_name, ordered=False):
+        """Adds a secondary index on a simple property
+
+        property_name
+            The name of a simple (non-key) property of this entity
+            set's entity type.
+
+        ordered
+            If True, the index also maintains a sorted list of values
+            enabling range and startswith() filters and $orderby on
+            this property to be resolved from the index.  By default
+            only equality filters use the index.
+
+        Indexes that already exist are not duplicated, an existing
+        unordered index is upgraded if *ordered* is True.  Existing
+        entities are added to the new index.  Returns the
+        :py:class:`InMemoryPropertyIndex` instance."""
+        with self.container.lock:
+            index = self.indexes.get(property_name, None)
+            if index is None or (ordered and not index.ordered):
+                index = InMemoryPropertyIndex(self, property_name, ordered)
+                for key, value in dict_items(self.data):
+                    index.add(key, value[index.pos])
+                self.indexes[property_name] = index
+            return index
+
     def add_entity(self, e):
         key = e.key()
         value = []
@@ -92,7 +122,10 @@ class InMemoryEntityStore(object):
         with self.container.lock:
             if key in self.data:
                 raise edm.ConstraintError("Duplicate key: %s", str(key))
-            self.data[key] = tuple(value)
+            value = tuple(value)
+            self.data[key] = value
+            for index in dict_values(self.indexes):
+                index.add(key, value[index.pos])
             # At this point the entity exists
             e.exists = True
 
@@ -100,16 +133,21 @@ class InMemoryEntityStore(object):
         with self.container.lock:
             return len(self.data)
 
-    def generate_entities(self, select=None):
+    def generate_entities(self, select=None, keys=None):
         """A generator function that returns the entities in the entity set
 
         The implementation is a compromise, we don't lock the container
         for the duration of the iteration, instead we work on a copy of
         the list of keys.  This creates the slight paradox that an entity
         deleted during the iteration *may* not be yielded but an entity
-        inserted during the iteration will never be yielded."""
-        with self.container.lock:
-            keys = dict_keys(self.data)
+        inserted during the iteration will never be yielded.
+
+        If *keys* is not None it is an iterable of keys to generate
+        instead of the entire entity set, the entities are yielded in
+        the order of *keys*.  Keys that do not exist are ignored."""
+        if keys is None:
+            with self.container.lock:
+                keys = dict_keys(self.data)
         for k in keys:
             e = self.read_entity(k, select)
             if e is not None:
@@ -188,7 +226,11 @@ class InMemoryEntityStore(object):
                         v.set_default_value()
                         value[i] = v.value
                 i = i + 1
-            self.data[key] = tuple(value)
+            value = tuple(value)
+            old_value = self.data[key]
+            self.data[key] = value
+            for index in dict_values(self.indexes):
+                index.update(key, old_value[index.pos], value[index.pos])
 
     def update_entity_stream(self, key, stream, sinfo):
         with self.container.lock:
@@ -252,7 +294,9 @@ class InMemoryEntityStore(object):
                 aindex.delete_hook(key)
             for aindex in dict_values(self.reverseAssociations):
                 aindex.rdelete_hook(key)
-            del self.data[key]
+            value = self.data.pop(key)
+            for index in dict_values(self.indexes):
+                index.remove(key, value[index.pos])
             if key in self.streams:
                 del self.streams[key]
 
@@ -264,6 +308,202 @@ class InMemoryEntityStore(object):
         return key in self.data
 
 
+class InMemoryPropertyIndex(object):
+
+    """A secondary index on a simple property of an entity store
+
+    store
+        The :py:class:`InMemoryEntityStore` being indexed.
+
+    property_name
+        The name of the property to index
+
+    ordered
+        Maintain a sorted list of values as well as a hash
+
+    Only properties with primitive types that have a natural ordering
+    in Python can be indexed, ValueError is raised for other types,
+    navigation properties and complex values.  The index is maintained
+    by the store itself, all methods must be called with the
+    container's lock acquired.
+
+    An index is only ever used to narrow down the set of entities that
+    must be tested against a filter, it never replaces the evaluation
+    of the filter itself."""
+
+    #: the property types that can be indexed
+    IndexTypes = frozenset((
+        edm.SimpleType.Binary, edm.SimpleType.Boolean,
+        edm.SimpleType.Byte, edm.SimpleType.Decimal,
+        edm.SimpleType.Double, edm.SimpleType.Guid,
+        edm.SimpleType.Int16, edm.SimpleType.Int32,
+        edm.SimpleType.Int64, edm.SimpleType.SByte,
+        edm.SimpleType.Single, edm.SimpleType.String))
+
+    #: types that are compared as integers
+    IntegerTypes = frozenset((
+        edm.SimpleType.Byte, edm.SimpleType.Int16,
+        edm.SimpleType.Int32, edm.SimpleType.Int64,
+        edm.SimpleType.SByte))
+
+    def __init__(self, store, property_name, ordered=False):
+        self.store = store
+        #: the name of the indexed property
+        self.name = property_name
+        e = Entity(store.entity_set, store)
+        names = list(e.data_keys())
+        if property_name not in names:
+            raise ValueError("%s is not a data property of %s" %
+                             (property_name, store.entity_set.name))
+        if property_name in store.entity_set.keys:
+            raise ValueError("%s is a key property" % property_name)
+        p = e[property_name]
+        if (not isinstance(p, edm.SimpleValue) or
+                p.type_code not in self.IndexTypes):
+            raise ValueError("Can't index property %s" % property_name)
+        #: the position of the property's value in the stored tuples
+        self.pos = names.index(property_name)
+        #: the type of the indexed property
+        self.type_code = p.type_code
+        #: True if this index maintains a sorted list of values
+        self.ordered = ordered
+        #: a dictionary mapping non-null values on to sets of keys
+        self.index = {}
+        #: the set of keys with a null value for the property
+        self.nulls = set()
+        #: a sorted list of the distinct non-null values (if ordered)
+        self.values = []
+
+    def add(self, key, value):
+        """Adds *key* with property *value* to the index"""
+        if value is None:
+            self.nulls.add(key)
+            return
+        keys = self.index.get(value, None)
+        if keys is None:
+            self.index[value] = set((key, ))
+            if self.ordered:
+                bisect.insort(self.values, value)
+        else:
+            keys.add(key)
+
+    def remove(self, key, value):
+        """Removes *key* with property *value* from the index"""
+        if value is None:
+            self.nulls.discard(key)
+            return
+        keys = self.index.get(value, None)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self.index[value]
+            if self.ordered:
+                i = bisect.bisect_left(self.values, value)
+                if i < len(self.values) and self.values[i] == value:
+                    del self.values[i]
+
+    def update(self, key, old_value, new_value):
+        """Moves *key* from *old_value* to *new_value*"""
+        if old_value != new_value:
+            self.remove(key, old_value)
+            self.add(key, new_value)
+
+    def compatible(self, literal):
+        """Returns True if literal can be compared using the index
+
+        *literal* is a :py:class:`pyslet.odata2.csdl.SimpleValue`
+        instance, null values are never compatible."""
+        if not isinstance(literal, edm.SimpleValue) or not literal:
+            return False
+        return (literal.type_code == self.type_code or
+                (literal.type_code in self.IntegerTypes and
+                 self.type_code in self.IntegerTypes))
+
+    def eq_keys(self, value):
+        """Returns the set of keys with property equal to *value*"""
+        return set(self.index.get(value, ()))
+
+    def range_keys(self, lower=None, lower_inclusive=True, upper=None,
+                   upper_inclusive=True):
+        """Returns the set of keys with property values in range
+
+        A bound of None means the range is unbounded at that end, null
+        values are never included.  Requires an ordered index."""
+        if lower is None:
+            i = 0
+        elif lower_inclusive:
+            i = bisect.bisect_left(self.values, lower)
+        else:
+            i = bisect.bisect_right(self.values, lower)
+        if upper is None:
+            j = len(self.values)
+        elif upper_inclusive:
+            j = bisect.bisect_right(self.values, upper)
+        else:
+            j = bisect.bisect_left(self.values, upper)
+        result = set()
+        for value in self.values[i:j]:
+            result.update(self.index[value])
+        return result
+
+    def prefix_keys(self, prefix):
+        """Returns the set of keys with string values starting *prefix*
+
+        Requires an ordered index."""
+        result = set()
+        i = bisect.bisect_left(self.values, prefix)
+        while i < len(self.values):
+            value = self.values[i]
+            if not value.startswith(prefix):
+                break
+            result.update(self.index[value])
+            i += 1
+        return result
+
+    def ordered_keys(self, keys=None, reverse=False):
+        """Returns a list of keys sorted by property value
+
+        keys
+            An optional set of keys to sort, by default all keys in the
+            index are returned.
+
+        reverse
+            Sort in descending order of value
+
+        Ties are always sorted in ascending key order.  Null values sort
+        before all other values.  Requires an ordered index."""
+        if keys is not None and len(keys) < len(self.values):
+            # quicker to sort the keys directly
+            data = self.store.data
+            pos = self.pos
+            nulls = sorted(k for k in keys if data[k][pos] is None)
+            result = sorted((k for k in keys if data[k][pos] is not None),
+                            key=lambda k: (data[k][pos], k))
+            if reverse:
+                # reverse the values but not the ties
+                result = sorted(result, key=lambda k: data[k][pos],
+                                reverse=True)
+                result += nulls
+            else:
+                result = nulls + result
+            return result
+        if keys is None:
+            nulls = sorted(self.nulls)
+        else:
+            nulls = sorted(self.nulls.intersection(keys))
+        result = [] if reverse else nulls
+        values = reversed(self.values) if reverse else self.values
+        for value in values:
+            if keys is None:
+                result += sorted(self.index[value])
+            else:
+                result += sorted(self.index[value].intersection(keys))
+        if reverse:
+            result += nulls
+        return result
+
+
 class InMemoryAssociationIndex(object):
 
     """An in memory index that implements the association between two
@@ -427,43 +667,180 @@ class EntityCollection(odata.EntityCollection):
         with self.entity_store.container.lock:
             # This is a bit clumsy, but we lock the whole container while we
             # check all constraints and perform any nested deletes
-            try:
-                key = entity.key()
-            except KeyError:
-                # if the entity doesn't have a key, autogenerate one
-                # until we have one that is good
-                for i in range3(100):
-                    entity.auto_key()
-                    key = entity.key()
-                    if not self.entity_store.test_key(key):
-                        break
-                    else:
-                        key = None
-            if key is None:
-                logging.error("Failed to find an unused key in %s "
-                              "after 100 attempts", entity.entity_set.name)
-                raise edm.EDMError("Auto-key failure" %
-                                   odata.ODataURI.format_entity_key(entity))
-            # Check constraints
-            entity.check_navigation_constraints(from_end)
-            self.entity_store.add_entity(entity)
+            self._add_entity(entity, from_end)
             self.update_bindings(entity)
 
+    def insert_entities(self, entities, batch_size=100):
+        """Inserts multiple entities
+
+        The container is locked once for each batch of entities.  The
+        entities in a batch are added first and their bindings are then
+        updated in a second pass."""
+        entities = iter(entities)
+        batch = True
+        while batch:
+            batch = []
+            with self.entity_store.container.lock:
+                for entity in entities:
+                    self._add_entity(entity)
+                    batch.append(entity)
+                    if len(batch) >= batch_size:
+                        break
+                for entity in batch:
+                    self.update_bindings(entity)
+
+    def _add_entity(self, entity, from_end=None):
+        # adds entity to the store, called with the container locked
+        try:
+            key = entity.key()
+        except KeyError:
+            # if the entity doesn't have a key, autogenerate one
+            # until we have one that is good
+            for i in range3(100):
+                entity.auto_key()
+                key = entity.key()
+                if not self.entity_store.test_key(key):
+                    break
+                else:
+                    key = None
+        if key is None:
+            logging.error("Failed to find an unused key in %s "
+                          "after 100 attempts", entity.entity_set.name)
+            raise edm.EDMError("Auto-key failure" %
+                               odata.ODataURI.format_entity_key(entity))
+        # Check constraints
+        entity.check_navigation_constraints(from_end)
+        self.entity_store.add_entity(entity)
+
     def __len__(self):
         if self.filter is None:
             return self.entity_store.count_entities()
         else:
             result = 0
             for e in self.filter_entities(
-                    self.entity_store.generate_entities()):
+                    self.entity_store.generate_entities(
+                        keys=self._filter_keys())):
                 result += 1
             return result
 
     def itervalues(self):
+        keys = self._filter_keys()
+        ordered_keys = self._order_keys(keys)
+        if ordered_keys is not None:
+            return self.expand_entities(
+                self.filter_entities(
+                    self.entity_store.generate_entities(self.select,
+                                                        ordered_keys)))
         return self.order_entities(
             self.expand_entities(
                 self.filter_entities(
-                    self.entity_store.generate_entities(self.select))))
+                    self.entity_store.generate_entities(self.select, keys))))
+
+    def _filter_keys(self):
+        # returns a superset of the keys that match the filter using
+        # the entity store's indexes or None if the filter can't be
+        # resolved using an index
+        if self.filter is None or not self.entity_store.indexes:
+            return None
+        with self.entity_store.container.lock:
+            keys = self._index_keys(self.filter)
+            if keys is not None:
+                # sorting makes the order of results predictable
+                keys = sorted(keys)
+            return keys
+
+    def _index_keys(self, expression):
+        # called with the container locked
+        if isinstance(expression, odata.CallExpression):
+            if (expression.method == odata.Method.startswith and
+                    len(expression.operands) == 2):
+                index, literal, flip = self._index_operands(
+                    expression.operands)
+                if (index is not None and not flip and index.ordered and
+                        index.type_code == edm.SimpleType.String):
+                    return index.prefix_keys(literal.value)
+            return None
+        elif not isinstance(expression, odata.BinaryExpression):
+            return None
+        op = expression.operator
+        if op == odata.Operator.bool_and:
+            lkeys = self._index_keys(expression.operands[0])
+            rkeys = self._index_keys(expression.operands[1])
+            if lkeys is None:
+                return rkeys
+            elif rkeys is None:
+                return lkeys
+            else:
+                return lkeys.intersection(rkeys)
+        elif op == odata.Operator.bool_or:
+            lkeys = self._index_keys(expression.operands[0])
+            if lkeys is None:
+                return None
+            rkeys = self._index_keys(expression.operands[1])
+            if rkeys is None:
+                return None
+            return lkeys.union(rkeys)
+        elif op not in (odata.Operator.eq, odata.Operator.lt,
+                        odata.Operator.le, odata.Operator.gt,
+                        odata.Operator.ge):
+            return None
+        index, literal, flip = self._index_operands(expression.operands)
+        if index is None:
+            return None
+        value = literal.value
+        if op == odata.Operator.eq:
+            return index.eq_keys(value)
+        elif not index.ordered:
+            return None
+        if flip:
+            # literal op property: reverse the sense of the relation
+            op = {odata.Operator.lt: odata.Operator.gt,
+                  odata.Operator.le: odata.Operator.ge,
+                  odata.Operator.gt: odata.Operator.lt,
+                  odata.Operator.ge: odata.Operator.le}[op]
+        if op == odata.Operator.lt:
+            return index.range_keys(upper=value, upper_inclusive=False)
+        elif op == odata.Operator.le:
+            return index.range_keys(upper=value)
+        elif op == odata.Operator.gt:
+            return index.range_keys(lower=value, lower_inclusive=False)
+        else:
+            return index.range_keys(lower=value)
+
+    def _index_operands(self, operands):
+        # Returns a triple of (index, literal value, flip) if operands
+        # is a property/literal pair that can be resolved by an index.
+        # flip is True if the literal comes first.
+        index = literal = None
+        flip = False
+        lop, rop = operands
+        if isinstance(rop, odata.PropertyExpression):
+            lop, rop = rop, lop
+            flip = True
+        if (isinstance(lop, odata.PropertyExpression) and
+                isinstance(rop, odata.LiteralExpression)):
+            index = self.entity_store.indexes.get(lop.name, None)
+            literal = rop.value
+            if index is not None and not index.compatible(literal):
+                index = None
+        return index, literal, flip
+
+    def _order_keys(self, keys):
+        # returns a list of keys sorted according to the orderby rule
+        # using the entity store's indexes or None if the ordering
+        # can't be determined from an index
+        if not self.orderby or len(self.orderby) != 1:
+            return None
+        rule, rule_dir = self.orderby[0]
+        if not isinstance(rule, odata.PropertyExpression):
+            return None
+        index = self.entity_store.indexes.get(rule.name, None)
+        if index is None or not index.ordered:
+            return None
+        with self.entity_store.container.lock:
+            if keys is not None:
+                keys = set(k for k in keys if self.entity_store.test_key(k))
+            return index.ordered_keys(keys, reverse=rule_dir < 0)
 
     def __getitem__(self, key):
         e = self.entity_store.read_entity(key, self.select)
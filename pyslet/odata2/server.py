@@ -3,10 +3,15 @@
 
 import base64
 import codecs
+import contextlib
+import hashlib
+import io
+import itertools
 import json
 import logging
 import sys
 import traceback
+import zlib
 
 from . import metadata as edmx
 from . import core as core
@@ -18,16 +23,58 @@ from .. import rfc4287 as atom
 from .. import rfc5023 as app
 from ..http import grammar
 from ..http import messages
+from ..http import multipart
 from ..http import params
 from ..pep8 import old_method
 from ..py2 import (
     byte_value,
+    dict_items,
     force_ascii,
     to_text)
 from ..unicode5 import detect_encoding
 from ..xml import structures as xml
 
 
+class ChangesetFailed(Exception):
+
+    """Raised to abandon a changeset in a batch request
+
+    The exception carries the response of the failed operation, it is
+    raised inside :meth:`Server.changeset` to force any changes made so
+    far to be rolled back."""
+
+    def __init__(self, response):
+        Exception.__init__(self, response[0])
+        #: a (status, headers, data, content_id) tuple
+        self.response = response
+
+
+class CachedResponse(object):
+
+    """A response body that is encoded once and served many times
+
+    data
+        The binary string containing the response body.
+
+    On construction a gzip compressed copy of the data is made and a
+    strong entity tag is calculated from a hash of *data*.  The
+    compressed variant is given its own entity tag (the same tag with
+    "-gzip" appended) as the two representations are not byte-for-byte
+    identical."""
+
+    def __init__(self, data):
+        #: the uncompressed data
+        self.data = data
+        zobj = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        #: the gzip compressed data
+        self.gzip_data = zobj.compress(data) + zobj.flush()
+        tag = hashlib.sha256(data).hexdigest()[:32]
+        #: the entity tag of :attr:`data`
+        self.etag = params.EntityTag(tag, weak=False)
+        #: the entity tag of :attr:`gzip_data`
+        self.gzip_etag = params.EntityTag(tag + "-gzip", weak=False)
+
+
 class WSGIWrapper(object):
 
     def __init__(self, environ, start_response, response_headers):
@@ -147,7 +194,8 @@ class Server(app.Server):
         params.MediaType.from_str('octet/stream')]
     # we allow the last one in case someone read the spec literally!
 
-    def __init__(self, service_root="http://localhost", **kws):
+    def __init__(self, service_root="http://localhost", streaming=False,
+                 **kws):
         service_root = kws.get('serviceRoot', service_root)
         if service_root[-1] != '/':
             service_root = service_root + '/'
@@ -170,6 +218,18 @@ class Server(app.Server):
         self.model = None
         #: the maximum number of entities to return per request
         self.topmax = 100
+        #: True if entity collections are streamed to the client, see
+        #: :meth:`return_entity_collection` for details.
+        self.streaming = streaming
+        #: the approximate size, in characters, of each streamed chunk
+        self.stream_chunk = 16384
+        #: a :class:`CachedResponse` of the metadata document
+        self.metadata_cache = None
+        #: a :class:`CachedResponse` of the XML service document
+        self.service_cache = None
+        #: a :class:`CachedResponse` of the JSON service root
+        self.json_root_cache = None
+        self.cache_documents()
 
     @old_method('SetModel')
     def set_model(self, model):
@@ -207,6 +267,28 @@ class Server(app.Server):
                     # update the locations following SetBase above
                     es.set_location()
         self.model = model
+        self.cache_documents()
+
+    def cache_documents(self):
+        """Pre-encodes the metadata and service documents
+
+        Called automatically on construction and by :meth:`set_model`,
+        the documents are serialised once, in each format we support,
+        and then served from the resulting :class:`CachedResponse`
+        objects.  If you modify the model or the service document
+        directly you must call this method again to update the cached
+        copies."""
+        if self.model is None:
+            self.metadata_cache = None
+        else:
+            self.metadata_cache = CachedResponse(
+                str(self.model.get_document()).encode('utf-8'))
+        self.service_cache = CachedResponse(
+            to_text(self.serviceDoc).encode('utf-8'))
+        self.json_root_cache = CachedResponse(
+            str('{"d":%s}' % json.dumps(
+                {'EntitySets': [x.href for x in self.ws.Collection]})
+                ).encode('utf-8'))
 
     @classmethod
     def encode_pathinfo(cls, pathinfo):
@@ -539,6 +621,93 @@ class Server(app.Server):
             etag = entity.format_etag(etag, entity.etag_is_strong())
             response_headers.append(("ETag", etag))
 
+    def last_modified(self, entity):
+        """Returns the last modified time of *entity*
+
+        If the entity has a single concurrency token of type DateTime or
+        DateTimeOffset its value is returned as an integer unix time,
+        DateTime values being treated as UTC.  Otherwise None is
+        returned."""
+        tokens = entity.etag_values()
+        if len(tokens) != 1 or not tokens[0] or not isinstance(
+                tokens[0], (edm.DateTimeValue, edm.DateTimeOffsetValue)):
+            return None
+        t = tokens[0].value
+        if t.get_zone()[0] is None:
+            t = t.with_zone(zdirection=0)
+        return int(t.get_unixtime())
+
+    def set_last_modified(self, entity, response_headers):
+        mtime = self.last_modified(entity)
+        if mtime is not None:
+            response_headers.append(
+                ("Last-Modified", str(params.FullDate.from_unix_time(mtime))))
+
+    def entity_not_modified(self, entity, environ):
+        """Returns True if a conditional GET matches *entity*
+
+        If-None-Match is compared with the entity's ETag, if there is
+        no If-None-Match header then If-Modified-Since is compared with
+        :meth:`last_modified`."""
+        etag = entity.etag()
+        if etag is None:
+            etags = []
+        else:
+            etags = [params.EntityTag.from_str(
+                entity.format_etag(etag, entity.etag_is_strong()))]
+        return messages.not_modified(
+            environ.get('HTTP_IF_NONE_MATCH', None),
+            environ.get('HTTP_IF_MODIFIED_SINCE', None),
+            etags, self.last_modified(entity))
+
+    def check_not_modified(self, request, environ, start_response,
+                           response_headers):
+        """Short-circuits conditional requests for a single entity
+
+        Applies to GET and HEAD requests for an entity identified by an
+        entity set and key with no path or $expand options.  The
+        entity's concurrency tokens are read using
+        :meth:`pyslet.odata2.csdl.EntityCollection.read_concurrency_tokens`
+        and, if :meth:`entity_not_modified` returns True, a 304 response
+        is returned without loading or serialising the entity.
+
+        In all other cases None is returned and the request should be
+        handled as normal."""
+        if (self.model is None or
+                environ["REQUEST_METHOD"].upper() not in ("GET", "HEAD") or
+                ('HTTP_IF_NONE_MATCH' not in environ and
+                 'HTTP_IF_MODIFIED_SINCE' not in environ) or
+                request.path_option is not None or
+                len(request.nav_path) != 1 or
+                core.SystemQueryOption.expand in request.sys_query_options):
+            return None
+        name, key_predicate = request.nav_path[0]
+        if not key_predicate:
+            return None
+        try:
+            entity_set = self.model.DataServices.search_containers(name)
+        except KeyError:
+            return None
+        if not isinstance(entity_set, edm.EntitySet):
+            return None
+        for p_def in entity_set.entityType.Property:
+            if p_def.concurrencyMode == edm.ConcurrencyMode.Fixed:
+                break
+        else:
+            return None
+        try:
+            with entity_set.open() as collection:
+                entity = collection.read_concurrency_tokens(
+                    entity_set.get_key(key_predicate))
+        except KeyError:
+            return None
+        if not self.entity_not_modified(entity, environ):
+            return None
+        self.set_etag(entity, response_headers)
+        self.set_last_modified(entity, response_headers)
+        start_response("%i %s" % (304, "Not Modified"), response_headers)
+        return []
+
     @old_method('HandleRequest')
     def handle_request(self, request, environ, start_response,
                        response_headers):
@@ -549,14 +718,17 @@ class Server(app.Server):
             resource_path."""
         method = environ["REQUEST_METHOD"].upper()
         try:
+            result = self.check_not_modified(
+                request, environ, start_response, response_headers)
+            if result is not None:
+                return result
             resource, parent_entity = self.get_resource(request)
             if request.path_option == core.PathOption.metadata:
                 return self.return_metadata(
                     request, environ, start_response, response_headers)
             elif request.path_option == core.PathOption.batch:
-                return self.odata_error(
-                    request, environ, start_response, "Bad Request",
-                    "Batch requests not supported", 404)
+                return self.handle_batch(
+                    request, environ, start_response, response_headers)
             elif request.path_option == core.PathOption.count:
                 if isinstance(resource, edm.Entity):
                     return self.return_count(
@@ -866,12 +1038,9 @@ class Server(app.Server):
                 else:
                     # override the default handling of service root to improve
                     # content negotiation
-                    data = to_text(self.serviceDoc).encode('utf-8')
-                    response_headers.append(
-                        ("Content-Type", str(response_type)))
-                    response_headers.append(("Content-Length", str(len(data))))
-                    start_response("200 Ok", response_headers)
-                    return [data]
+                    return self.return_cached(
+                        self.service_cache, response_type, environ,
+                        start_response, response_headers)
         except core.MissingURISegment as e:
             return self.odata_error(
                 request, environ, start_response, "Resource not found",
@@ -893,6 +1062,253 @@ class Server(app.Server):
                 request, environ, start_response, "NotImplementedError",
                 str(e), 405)
 
+    def handle_batch(self, request, environ, start_response,
+                     response_headers):
+        """Handles a $batch request
+
+        The request body must be a multipart/mixed entity in which each
+        part is either a single operation (an application/http part
+        containing a complete HTTP request) or a changeset (a nested
+        multipart/mixed entity containing one or more operations).
+
+        Each operation is executed by calling this server as a WSGI
+        application with an environment derived from *environ* and the
+        request in the part.  The operations in a changeset are executed
+        inside :meth:`changeset` and a changeset operation may use
+        $<Content-ID> at the start of its URI to refer to the resource
+        created by an earlier operation in the same changeset.  If any
+        operation in a changeset fails the changeset is rolled back and
+        the response to the failed operation replaces the responses to
+        the whole changeset.
+
+        The response is a 202 multipart/mixed entity with one part per
+        operation or changeset in the request."""
+        method = environ["REQUEST_METHOD"].upper()
+        if method != "POST":
+            raise core.InvalidMethod("$batch requires POST")
+        try:
+            mtype = params.MediaType.from_str(environ.get("CONTENT_TYPE", ""))
+        except grammar.BadSyntax:
+            mtype = None
+        if (mtype is None or mtype.type != "multipart" or
+                "boundary" not in mtype):
+            return self.odata_error(
+                request, environ, start_response, "Bad Request",
+                "$batch requires a multipart/mixed request", 400)
+        parts = []
+        try:
+            input = multipart.MultipartRecvWrapper(
+                messages.WSGIInputWrapper(environ), mtype)
+            for part in input.read_parts():
+                ptype = part.message.get_content_type()
+                if ptype.type == "multipart" and "boundary" in ptype:
+                    parts.append(self.run_changeset(part, ptype, environ))
+                else:
+                    parts.append(self.batch_part(
+                        *self.run_batch_operation(part, environ)))
+        except (messages.ProtocolError, ValueError) as e:
+            return self.odata_error(
+                request, environ, start_response, "Bad Request",
+                "Malformed batch request: %s" % to_text(e), 400)
+        rtype = params.MediaType("multipart", "mixed", {
+            "boundary": (
+                "boundary",
+                multipart.make_boundary_delimiter(b"batchresponse_"))})
+        data = multipart.MultipartSendWrapper(rtype, parts).read()
+        response_headers.append(("Content-Type", str(rtype)))
+        response_headers.append(("Content-Length", str(len(data))))
+        start_response("%i %s" % (202, "Accepted"), response_headers)
+        return [data]
+
+    def run_changeset(self, part, mtype, environ):
+        """Executes a changeset from a batch request
+
+        part
+            A stream from which the changeset can be read.
+
+        mtype
+            The multipart media type of the changeset.
+
+        environ
+            The environment of the batch request.
+
+        Returns a :class:`pyslet.http.multipart.MessagePart` containing
+        the responses to the changeset."""
+        responses = []
+        content_ids = {}
+        try:
+            with self.changeset():
+                input = multipart.MultipartRecvWrapper(part, mtype)
+                for operation in input.read_parts():
+                    response = self.run_batch_operation(
+                        operation, environ, content_ids)
+                    if int(response[0].split()[0]) >= 400:
+                        raise ChangesetFailed(response)
+                    responses.append(response)
+        except ChangesetFailed as e:
+            return self.batch_part(*e.response)
+        except (messages.ProtocolError, ValueError):
+            # a malformed changeset is a malformed batch
+            raise
+        except Exception as e:
+            logging.error(
+                "Error in OData changeset: %s",
+                "".join(traceback.format_exception(*sys.exc_info())))
+            msg = "Changeset failed: %s" % to_text(e)
+            return self.batch_part(*self._capture_response(
+                lambda sr: self.odata_error(
+                    core.ODataURI('error'), environ, sr, "UnexpectedError",
+                    msg, 500)))
+        ctype = params.MediaType("multipart", "mixed", {
+            "boundary": (
+                "boundary",
+                multipart.make_boundary_delimiter(b"changesetresponse_"))})
+        data = multipart.MultipartSendWrapper(
+            ctype, [self.batch_part(*r) for r in responses]).read()
+        result = multipart.MessagePart(entity_body=data)
+        result.set_content_type(ctype)
+        return result
+
+    def run_batch_operation(self, part, environ, content_ids=None):
+        """Executes a single operation from a batch request
+
+        part
+            A stream from which the part containing the operation can be
+            read.
+
+        environ
+            The environment of the batch request.
+
+        content_ids
+            A dictionary mapping Content-IDs onto the locations of
+            resources created by previous operations in the same
+            changeset, or None if this operation is not in a changeset.
+            Updated if the operation has a Content-ID.
+
+        Returns a tuple of (status, headers, data, content_id) where
+        content_id is the raw value of any Content-ID header or None."""
+        wrapper = messages.RecvWrapper(part, messages.Request)
+        request = wrapper.read_message_header()
+        body = wrapper.read()
+        content_id = part.message.get_header("Content-ID")
+        if content_id is None:
+            content_id = request.get_header("Content-ID")
+        target = request.request_uri
+        if content_ids and target.startswith("$"):
+            ref = target[1:].split("/", 1)[0]
+            if ref in content_ids:
+                target = content_ids[ref] + target[len(ref) + 1:]
+        url = uri.URI.from_octets(target).resolve(self.service_root)
+        try:
+            path_info = uri.unescape_data(url.abs_path).decode('utf-8')
+        except UnicodeDecodeError:
+            path_info = uri.unescape_data(url.abs_path).decode('iso-8859-1')
+        script_name = environ.get('SCRIPT_NAME', "")
+        if path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        # copy the batch environment but not the request headers
+        op_environ = {}
+        for k, v in dict_items(environ):
+            if not k.startswith('HTTP_') and not k.startswith('CONTENT_'):
+                op_environ[k] = v
+        op_environ['REQUEST_METHOD'] = request.method
+        op_environ['PATH_INFO'] = path_info
+        op_environ['QUERY_STRING'] = url.query if url.query else ""
+        for hname in request.get_headerlist():
+            if hname == b"transfer-encoding":
+                # the body has already been decoded
+                continue
+            hvalue = request.get_header(hname).decode('iso-8859-1')
+            hname = hname.replace(b"-", b"_").decode('iso-8859-1').upper()
+            if hname not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                hname = 'HTTP_' + hname
+            op_environ[hname] = hvalue
+        op_environ['CONTENT_LENGTH'] = str(len(body))
+        op_environ['wsgi.input'] = io.BytesIO(body)
+        status, headers, data = self._capture_response(
+            lambda sr: self(op_environ, sr))
+        if content_id is not None and content_ids is not None:
+            for hname, hvalue in headers:
+                if hname.lower() == "location":
+                    content_ids[
+                        content_id.decode('ascii').strip().strip('<>')] = \
+                        hvalue
+        return status, headers, data, content_id
+
+    def _capture_response(self, app):
+        # calls app with a start_response function and returns a tuple
+        # of status, headers and data
+        response = []
+
+        def start_response(status, response_headers, exc_info=None):
+            response[:] = [status, response_headers]
+        result = app(start_response)
+        try:
+            data = b"".join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response[0], response[1], data
+
+    def batch_part(self, status, headers, data, content_id=None):
+        """Returns a MessagePart containing a batch operation response
+
+        status, headers, data
+            The status line, response headers and data as passed to the
+            WSGI start_response and returned by the application.
+
+        content_id
+            The optional Content-ID of the operation's part, as a binary
+            string, which is copied to the response part."""
+        response = [("HTTP/1.1 %s\r\n" % status).encode('iso-8859-1')]
+        for hname, hvalue in headers:
+            response.append(
+                ("%s: %s\r\n" % (hname, hvalue)).encode('iso-8859-1'))
+        response.append(b"\r\n")
+        response.append(data)
+        part = multipart.MessagePart(entity_body=b"".join(response))
+        part.set_content_type("application/http")
+        part.set_content_transfer_encoding("binary")
+        if content_id is not None:
+            part.set_header("Content-ID", content_id)
+        return part
+
+    @contextlib.contextmanager
+    def changeset(self):
+        """Context manager used to execute a changeset
+
+        The operations in a changeset must be executed atomically.  The
+        data containers bound to the model's entity sets are searched
+        for objects with a transaction method (such as
+        :meth:`pyslet.odata2.sqlds.SQLEntityContainer.transaction`) and
+        the changeset is executed inside each of these transactions.  If
+        the block raises an exception the transactions are rolled back.
+
+        Containers without transaction support, such as the in-memory
+        implementation in :mod:`pyslet.odata2.memds`, have no way to
+        roll back changes so changesets are not atomic in those
+        cases."""
+        containers = []
+        if self.model is not None:
+            for s in self.model.DataServices.Schema:
+                for container in s.EntityContainer:
+                    for es in container.EntitySet:
+                        for kw in es.binding[1].values():
+                            if (callable(getattr(kw, 'transaction', None)) and
+                                    kw not in containers):
+                                containers.append(kw)
+        with self._nested_transactions(containers):
+            yield
+
+    @contextlib.contextmanager
+    def _nested_transactions(self, containers):
+        if containers:
+            with containers[0].transaction():
+                with self._nested_transactions(containers[1:]):
+                    yield
+        else:
+            yield
+
     def expand_resource(self, resource, sys_query_options):
         try:
             expand = sys_query_options.get(core.SystemQueryOption.expand, None)
@@ -912,29 +1328,68 @@ class Server(app.Server):
 
     def return_json_root(self, request, environ, start_response,
                          response_headers):
-        data = str('{"d":%s}' % json.dumps(
-            {'EntitySets': [x.href for x in self.ws.Collection]}))
-        data = data.encode('utf-8')
-        response_headers.append(("Content-Type", "application/json"))
-        response_headers.append(("Content-Length", str(len(data))))
-        start_response("%i %s" % (200, "Success"), response_headers)
-        return [data]
+        return self.return_cached(
+            self.json_root_cache, "application/json", environ,
+            start_response, response_headers)
 
     def return_metadata(self, request, environ, start_response,
                         response_headers):
-        doc = self.model.get_document()
         response_type = self.content_negotiation(
             request, environ, self.MetadataTypes)
         if response_type is None:
             return self.odata_error(
                 request, environ, start_response, "Not Acceptable",
                 'xml or plain text formats supported', 406)
-        data = str(doc).encode('utf-8')
+        return self.return_cached(
+            self.metadata_cache, response_type, environ, start_response,
+            response_headers)
+
+    def return_cached(self, cached, response_type, environ, start_response,
+                      response_headers):
+        """Returns a :class:`CachedResponse`
+
+        The gzip variant is returned if the Accept-Encoding header
+        prefers it.  GET and HEAD requests with an If-None-Match header
+        that matches the entity tag are answered with 304."""
+        encoding = None
+        if "HTTP_ACCEPT_ENCODING" in environ:
+            try:
+                alist = messages.AcceptEncodingList.from_str(
+                    environ["HTTP_ACCEPT_ENCODING"])
+                encoding = alist.select_token(["gzip", "identity"])
+            except grammar.BadSyntax:
+                pass
+        if encoding == "gzip":
+            data = cached.gzip_data
+            etag = cached.gzip_etag
+            response_headers.append(("Content-Encoding", "gzip"))
+        else:
+            data = cached.data
+            etag = cached.etag
+        response_headers.append(("Vary", "Accept, Accept-Encoding"))
+        response_headers.append(("ETag", str(etag)))
+        if (environ["REQUEST_METHOD"].upper() in ("GET", "HEAD") and
+                self.etag_matches(environ, (cached.etag, cached.gzip_etag))):
+            start_response("%i %s" % (304, "Not Modified"), response_headers)
+            return []
         response_headers.append(("Content-Type", str(response_type)))
         response_headers.append(("Content-Length", str(len(data))))
         start_response("%i %s" % (200, "Success"), response_headers)
         return [data]
 
+    def etag_matches(self, environ, etags):
+        """Returns True if If-None-Match matches an entity tag
+
+        etags
+            A list of :class:`pyslet.http.params.EntityTag` instances
+            that identify the current representations of the resource.
+
+        The weak comparison function is used.  If there is no
+        If-None-Match header, or it can't be parsed, False is
+        returned."""
+        return messages.not_modified(
+            environ.get('HTTP_IF_NONE_MATCH', None), None, etags)
+
     def return_links(self, entities, request, environ, start_response,
                      response_headers):
         response_type = self.content_negotiation(
@@ -1001,7 +1456,12 @@ class Server(app.Server):
 
     def return_entity_collection(self, entities, request, environ,
                                  start_response, response_headers):
-        """Returns an iterable of Entities."""
+        """Returns an iterable of Entities.
+
+        If :attr:`streaming` is True the response is generated as the
+        entities are serialised (see :meth:`stream_response`) otherwise
+        the whole response is serialised before it is returned with an
+        appropriate Content-Length."""
         response_type = self.content_negotiation(
             request, environ, self.FeedTypes)
         if response_type is None:
@@ -1010,15 +1470,26 @@ class Server(app.Server):
                 'xml, json or plain text formats supported', 406)
         entities.set_topmax(self.topmax)
         if response_type == "application/json":
+            if self.streaming:
+                data = itertools.chain(
+                    ('{"d":', ),
+                    entities.generate_entity_set_in_json(request.version),
+                    ('}', ))
+                response_headers.append(("Content-Type", str(response_type)))
+                return self.stream_response(
+                    data, entities, start_response, response_headers)
             data = str('{"d":%s}' % ''.join(
                 entities.generate_entity_set_in_json(request.version)))
         else:
-            # Here's a challenge, we want to pull data through the feed
-            # by yielding strings just load in to memory at the moment
             f = core.Feed(None, entities)
             doc = core.Document(root=f)
             f.collection = entities
             f.set_base(str(self.service_root))
+            if self.streaming:
+                response_headers.append(("Content-Type", str(response_type)))
+                return self.stream_response(
+                    doc.generate_xml(), entities, start_response,
+                    response_headers)
             data = str(doc)
         data = data.encode('utf-8')
         response_headers.append(("Content-Type", str(response_type)))
@@ -1026,6 +1497,75 @@ class Server(app.Server):
         start_response("%i %s" % (200, "Success"), response_headers)
         return [data]
 
+    def stream_response(self, data, collection, start_response,
+                        response_headers, status=200, status_msg="Success"):
+        """Returns a streamed response
+
+        data
+            An iterable of character strings that make up the response
+            body.  The strings are gathered into chunks of approximately
+            :attr:`stream_chunk` characters and yielded UTF-8 encoded.
+
+        collection
+            The collection being serialised (or None).  The collection
+            is closed when the response has been sent.
+
+        No Content-Length header is added to the response, leaving the
+        WSGI server to choose between chunked encoding and closing the
+        connection.
+
+        The first chunk is generated *before* start_response is called
+        so that errors that occur early in the query (typically when
+        the filter is first evaluated) can still be reported to the
+        client in the usual way.  Errors that occur after the first
+        chunk has been generated are logged and result in a truncated
+        response."""
+        chunks = self.generate_chunks(data, collection)
+        try:
+            first_chunk = next(chunks)
+        except StopIteration:
+            first_chunk = b''
+        start_response("%i %s" % (status, status_msg), response_headers)
+        return self._stream_chunks(first_chunk, chunks)
+
+    def generate_chunks(self, data, collection=None):
+        """Generates UTF-8 encoded chunks from *data*
+
+        data
+            An iterable of character strings
+
+        collection
+            An optional collection to close when *data* is exhausted (or
+            the generator is closed)."""
+        try:
+            buff = []
+            blen = 0
+            for s in data:
+                buff.append(s)
+                blen += len(s)
+                if blen >= self.stream_chunk:
+                    yield ''.join(buff).encode('utf-8')
+                    buff = []
+                    blen = 0
+            if buff:
+                yield ''.join(buff).encode('utf-8')
+        finally:
+            if collection is not None:
+                collection.close()
+
+    def _stream_chunks(self, first_chunk, chunks):
+        try:
+            yield first_chunk
+            for chunk in chunks:
+                yield chunk
+        except Exception:
+            logging.error(
+                "Error streaming OData response: %s",
+                "".join(traceback.format_exception(*sys.exc_info())))
+            raise
+        finally:
+            chunks.close()
+
     def read_xml_or_json(self, environ):
         """Reads either an XML document or a JSON object from environ."""
         atom_flag = None
@@ -1123,6 +1663,7 @@ class Server(app.Server):
         response_headers.append(("Content-Type", str(response_type)))
         response_headers.append(("Content-Length", str(len(data))))
         self.set_etag(entity, response_headers)
+        self.set_last_modified(entity, response_headers)
         start_response("%i %s" % (status, status_msg), response_headers)
         return [data]
 
@@ -1415,9 +1956,12 @@ class ReadOnlyServer(Server):
             resource_path.
 
         If the method is anything other than GET or HEAD a 403 response
-        is returned"""
+        is returned.  Batch requests are POSTed as normal but any
+        operations in the batch that would modify the data are refused
+        in the same way."""
         method = environ["REQUEST_METHOD"].upper()
-        if method in ("GET", "HEAD"):
+        if (method in ("GET", "HEAD") or
+                request.path_option == core.PathOption.batch):
             return super(ReadOnlyServer, self).handle_request(
                 request, environ, start_response, response_headers)
         else:
@@ -3,10 +3,12 @@
 
 
 import binascii
+import bisect
+import collections
+import contextlib
 import decimal
 import hashlib
 import io
-import itertools
 import logging
 import math
 import os.path
@@ -40,6 +42,11 @@ logging = logging.getLogger('pyslet.odata2.sqlds')
 # : the standard timeout while waiting for a database connection, in seconds
 SQL_TIMEOUT = 90
 
+#: the upper limits (in seconds) of the buckets used to record the time
+#: spent waiting for a database connection, see
+#: :meth:`SQLEntityContainer.pool_stats`
+POOL_WAIT_LIMITS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
 
 class SQLError(Exception):
 
@@ -216,11 +223,130 @@ class PyFormatParams(SQLParams):
         return literal.replace("%", "%%")
 
 
+class PlanParams(SQLParams):
+
+    """A class used when compiling query plans.
+
+    Wraps an existing :py:class:`SQLParams` instance, counting the
+    parameters that are added to it so that the compiled query can be
+    checked for compatibility with the plan cache."""
+
+    def __init__(self, wrapped):
+        super(PlanParams, self).__init__()
+        self.wrapped = wrapped
+        self.params = wrapped.params
+        #: the number of parameters added
+        self.count = 0
+
+    def add_param(self, value):
+        self.count += 1
+        result = self.wrapped.add_param(value)
+        self.params = self.wrapped.params
+        return result
+
+
+def expression_shape(expression, values=None):
+    """Returns a hashable key describing the shape of an expression
+
+    expression
+        A :py:class:`pyslet.odata2.core.CommonExpression` instance.
+
+    values (optional)
+        A list to which the value of each (parameterized) literal in
+        the expression is appended, in a consistent order.
+
+    Two expressions have the same shape if they differ only in the
+    values of their literals.  The types of the literals, and whether
+    or not they are null, are considered part of the shape."""
+    if isinstance(expression, UnparameterizedLiteral):
+        return (UnparameterizedLiteral, to_text(expression.value))
+    elif isinstance(expression, core.LiteralExpression):
+        if values is not None:
+            values.append(expression.value)
+        return (core.LiteralExpression, expression.value.type_code,
+                not expression.value)
+    elif isinstance(expression, core.PropertyExpression):
+        return (core.PropertyExpression, expression.name)
+    else:
+        return (expression.__class__, expression.operator,
+                getattr(expression, 'method', None),
+                tuple(expression_shape(op, values)
+                      for op in expression.operands))
+
+
+def _select_shape(select):
+    if select is None:
+        return None
+    return tuple(sorted((k, _select_shape(v)) for k, v in dict_items(select)))
+
+
+class QueryPlanCache(object):
+
+    """A thread-safe, size-limited cache of compiled query plans
+
+    max_size
+        The maximum number of plans to hold in the cache.  When the
+        cache is full the least recently used plan is discarded.  A
+        value of 0 disables the cache.
+
+    The cache is keyed on tuples that describe the shape of the query,
+    see :meth:`SQLCollectionBase.query_plan_key` for details."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.lock = threading.RLock()
+        self.plans = {}
+        self.use_count = 0
+        #: the number of successful lookups
+        self.hits = 0
+        #: the number of failed lookups
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the plan for *key* or None if there is no plan"""
+        with self.lock:
+            entry = self.plans.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.use_count += 1
+            entry[1] = self.use_count
+            return entry[0]
+
+    def set(self, key, plan):
+        """Adds a *plan* to the cache with *key*"""
+        if not self.max_size:
+            return
+        with self.lock:
+            while key not in self.plans and len(self.plans) >= self.max_size:
+                # discard the least recently used plan
+                lru_key = None
+                lru_count = None
+                for k, entry in dict_items(self.plans):
+                    if lru_count is None or entry[1] < lru_count:
+                        lru_key = k
+                        lru_count = entry[1]
+                del self.plans[lru_key]
+            self.use_count += 1
+            self.plans[key] = [plan, self.use_count]
+
+    def clear(self):
+        """Removes all plans from the cache, the counters are not reset"""
+        with self.lock:
+            self.plans = {}
+
+    def __len__(self):
+        return len(self.plans)
+
+
 def retry_decorator(tmethod):
     """Decorates a transaction method with retry handling"""
 
     def retry(self, *args, **kwargs):
-        if self.query_count:
+        if self.query_count or self.connection.transaction_level:
+            # don't reconnect part way through an outer transaction
+            # either, the work done so far would be silently lost
             return tmethod(self, *args, **kwargs)
         else:
             strike = 0
@@ -313,12 +439,35 @@ class SQLTransaction(object):
         self.cursor.execute(sqlcmd,
                             params.params if params is not None else None)
         self.query_count += 1
+        self.connection.query_count += 1
+        if self.container.metrics_callback is not None:
+            self.container.metrics_callback('query', self.connection, sqlcmd)
+
+    @retry_decorator
+    def executemany(self, sqlcmd, param_list):
+        """Executes *sqlcmd* multiple times as part of this transaction.
+
+        sqlcmd
+                A string containing the query
+
+        param_list
+                A list of :py:class:`SQLParams` objects, one for each
+                execution of *sqlcmd*.  Each object must have been
+                constructed by adding the same sequence of parameters so
+                that they all match *sqlcmd*."""
+        self.cursor.executemany(sqlcmd, [p.params for p in param_list])
+        self.query_count += 1
+        self.connection.query_count += 1
+        if self.container.metrics_callback is not None:
+            self.container.metrics_callback('query', self.connection, sqlcmd)
 
     def commit(self):
         """Ends this transaction with a commit
 
-        Nested transactions do nothing."""
-        if self.no_commit:
+        Nested transactions do nothing, neither do transactions that
+        are running inside :meth:`SQLEntityContainer.transaction`, the
+        commit is deferred until the outer transaction completes."""
+        if self.no_commit or self.connection.transaction_level:
             return
         self.connection.dbc.commit()
 
@@ -326,7 +475,9 @@ class SQLTransaction(object):
         """Calls the underlying database connection rollback method.
 
         Nested transactions do not rollback the connection, they do
-        nothing except re-raise *err* (if required).
+        nothing except re-raise *err* (if required).  The same applies
+        to transactions running inside
+        :meth:`SQLEntityContainer.transaction`.
 
         If rollback is not supported the resulting error is absorbed.
 
@@ -342,7 +493,7 @@ class SQLTransaction(object):
         swallow
             A flag (defaults to False) indicating that *err* should be
             swallowed, rather than re-raised."""
-        if not self.no_commit:
+        if not self.no_commit and not self.connection.transaction_level:
             try:
                 self.connection.dbc.rollback()
                 if err is not None:
@@ -409,6 +560,15 @@ class SQLCollectionBase(core.EntityCollection):
     values defined in the metadata model are ignored by the
     collection object."""
 
+    ROW_VALUES = False
+    """A boolean indicating whether or not the collection supports row
+    value comparisons such as::
+
+        ("LastName", "FirstName") > (?, ?)
+
+    If True, row value comparisons are used to constrain queries that
+    use a skiptoken."""
+
     def __init__(self, container, **kwargs):
         super(SQLCollectionBase, self).__init__(**kwargs)
         #: the parent container (database) for this collection
@@ -426,8 +586,8 @@ class SQLCollectionBase(core.EntityCollection):
         #: a connection to the database acquired with
         #: :meth:`SQLEntityContainer.acquire_connection`
         self.connection = None
-        self._sqlLen = None
-        self._sqlGen = None
+        # source values recorded while compiling a query plan
+        self._plan_sources = None
         try:
             self.connection = self.container.acquire_connection(SQL_TIMEOUT)
             if self.connection is None:
@@ -444,16 +604,7 @@ class SQLCollectionBase(core.EntityCollection):
             self.connection = None
 
     def __len__(self):
-        if self._sqlLen is None:
-            query = ["SELECT COUNT(*) FROM %s" % self.table_name]
-            params = self.container.ParamsClass()
-            where = self.where_clause(None, params)
-            query.append(self.join_clause())
-            query.append(where)
-            query = ''.join(query)
-            self._sqlLen = (query, params)
-        else:
-            query, params = self._sqlLen
+        query, params, extra = self.query_plan(('len', ), self._len_query)
         transaction = SQLTransaction(self.container, self.connection)
         try:
             transaction.begin()
@@ -471,50 +622,288 @@ class SQLCollectionBase(core.EntityCollection):
         finally:
             transaction.close()
 
-    def entity_generator(self):
-        entity, values = None, None
-        if self._sqlGen is None:
-            entity = self.new_entity()
-            query = ["SELECT "]
-            params = self.container.ParamsClass()
-            column_names, values = zip(*list(self.select_fields(entity)))
-            # values is used later for the first result
-            column_names = list(column_names)
-            self.orderby_cols(column_names, params)
-            query.append(", ".join(column_names))
-            query.append(' FROM ')
-            query.append(self.table_name)
-            # we force where and orderby to be calculated before the
-            # join clause is added as they may add to the joins
-            where = self.where_clause(
-                None, params, use_filter=True, use_skip=False)
-            orderby = self.orderby_clause()
+    def _len_query(self, params):
+        query = ["SELECT COUNT(*) FROM %s" % self.table_name]
+        where = self.where_clause(None, params)
+        query.append(self.join_clause())
+        query.append(where)
+        return ''.join(query), None
+
+    def distinct_values(self, name):
+        """Generates the distinct values of a property
+
+        Overridden to use a single SELECT DISTINCT query so that each
+        value is only read from the database once."""
+        def distinct_query(params):
+            query = ["SELECT DISTINCT ",
+                     self._mangle_name((self.entity_set.name, name)),
+                     " FROM ", self.table_name]
+            where = self.where_clause(None, params)
             query.append(self.join_clause())
             query.append(where)
-            query.append(orderby)
-            query = ''.join(query)
-            self._sqlGen = query, params
-        else:
-            query, params = self._sqlGen
+            return ''.join(query), None
+        value = self.new_entity()[name]
+        if not isinstance(value, edm.SimpleValue):
+            raise ValueError("distinct_values: %s is not a simple property"
+                             % name)
+        query, params, extra = self.query_plan(('distinct', name),
+                                               distinct_query)
         transaction = SQLTransaction(self.container, self.connection)
         try:
             transaction.begin()
             logging.info("%s; %s", query, to_text(params.params))
             transaction.execute(query, params)
-            while True:
-                row = transaction.cursor.fetchone()
-                if row is None:
+            for row in self.fetch_rows(transaction.cursor):
+                self.container.read_sql_value(value, row[0])
+                if value:
+                    yield value.value
+            transaction.commit()
+        except Exception as e:
+            transaction.rollback(e)
+        finally:
+            transaction.close()
+
+    def query_plan_key(self):
+        """Returns a tuple that describes the shape of this collection
+
+        The result is used as the basis of the key for caching compiled
+        queries in the container's :py:class:`QueryPlanCache`.  The key
+        includes the shape of the filter and orderby expressions (see
+        :func:`expression_shape`), the select rules and the form of the
+        skiptoken.  Derived classes that generate different SQL for
+        the same entity set must extend the result."""
+        if self.filter is None:
+            filter_shape = None
+        else:
+            filter_shape = expression_shape(self.filter)
+        if self.orderby is None:
+            orderby_shape = None
+        else:
+            orderby_shape = tuple((expression_shape(e), d) for e, d in
+                                  self.orderby)
+        if self.skiptoken is None:
+            skiptoken_shape = None
+        else:
+            skiptoken_shape = len(self.skiptoken)
+        return (self.__class__, self.entity_set.name, filter_shape,
+                orderby_shape, _select_shape(self.select), skiptoken_shape)
+
+    def query_plan_arguments(self):
+        """Returns a list of additional values used in this collection's
+        queries
+
+        The default implementation returns an empty list, derived
+        classes that add parameters to their queries other than those
+        obtained from filter and orderby literals or the skiptoken must
+        return the :py:class:`~pyslet.odata2.csdl.SimpleValue`
+        instances used here."""
+        return []
+
+    def query_plan_values(self):
+        """Returns the list of values that parameterize this collection
+
+        The values are all :py:class:`~pyslet.odata2.csdl.SimpleValue`
+        instances: the results of :meth:`query_plan_arguments` followed
+        by the literals in the filter and orderby expressions and
+        finally the values in the skiptoken, if there is one.  The order
+        (and length) of the list is fixed for collections that have the
+        same :meth:`query_plan_key`."""
+        values = self.query_plan_arguments()
+        if self.filter is not None:
+            expression_shape(self.filter, values)
+        if self.orderby is not None:
+            for expression, direction in self.orderby:
+                expression_shape(expression, values)
+        if self.skiptoken is not None:
+            values.extend(self.skiptoken)
+        return values
+
+    def query_plan(self, key, compiler):
+        """Returns a compiled query from the container's plan cache
+
+        key
+            A tuple that distinguishes this type of query from others
+            generated by this collection, it is combined with the
+            result of :meth:`query_plan_key` to look up the plan.
+
+        compiler
+            A function that takes a :py:class:`SQLParams` instance and
+            returns a tuple of (query string, extra) where extra is an
+            arbitrary object stored with the plan.  The function is
+            only called if no compatible plan is in the cache.
+
+        Returns a triple of (query string, params, extra) where params
+        is a :py:class:`SQLParams` instance bound to the values from
+        this collection.
+
+        A plan can only be cached if all parameters in the query are
+        added with :meth:`add_value_param` and are found in
+        :meth:`query_plan_values`, otherwise the query is compiled
+        every time."""
+        plan_cache = self.container.plan_cache
+        values = self.query_plan_values()
+        key = self.query_plan_key() + key
+        plan = plan_cache.get(key)
+        if plan is not None:
+            query, template, extra = plan
+            params = self.container.ParamsClass()
+            for i in template:
+                params.add_param(self.container.prepare_sql_value(values[i]))
+            return query, params, extra
+        params = PlanParams(self.container.ParamsClass())
+        self._plan_sources = []
+        try:
+            query, extra = compiler(params)
+            sources = self._plan_sources
+        finally:
+            self._plan_sources = None
+        if params.count == len(sources):
+            value_index = {}
+            for i, v in enumerate(values):
+                value_index[id(v)] = i
+            template = []
+            for v in sources:
+                i = value_index.get(id(v), None)
+                if i is None:
                     break
-                if entity is None:
-                    entity = self.new_entity()
-                    values = next(
-                        itertools.islice(
-                            zip(*list(self.select_fields(entity))), 1, None))
-                for value, new_value in zip(values, row):
-                    self.container.read_sql_value(value, new_value)
-                entity.exists = True
-                yield entity
-                entity, values = None, None
+                template.append(i)
+            else:
+                plan_cache.set(key, (query, template, extra))
+        return query, params.wrapped, extra
+
+    def add_value_param(self, value, params):
+        """Adds a simple value to a set of parameters
+
+        value
+            A :py:class:`~pyslet.odata2.csdl.SimpleValue` instance.
+
+        params
+            The :py:class:`SQLParams` object to add the value to.
+
+        Returns the string to include in the query in place of the
+        value.  Methods that generate SQL should use this method, in
+        preference to calling :py:meth:`SQLParams.add_param` directly,
+        to allow the query to be cached (see :meth:`query_plan`)."""
+        if self._plan_sources is not None:
+            self._plan_sources.append(value)
+        return params.add_param(self.container.prepare_sql_value(value))
+
+    def bind_plan(self, entity, prefix=True):
+        """Returns a plan for binding selected columns to entities
+
+        entity
+            Any instance of :py:class:`~pyslet.odata2.csdl.Entity`, used
+            as a template for all entities read with the plan.
+
+        Returns a tuple of (column names, plan).  The column names are
+        the mangled field names generated by :meth:`select_fields` and
+        the plan is a list of the same length, each item is a tuple of
+        (property name, sub path) that locates the corresponding
+        :py:class:`~pyslet.odata2.csdl.SimpleValue` in an entity; sub
+        path is a (possibly empty) tuple of names used to locate values
+        within complex properties.
+
+        The plan is calculated once per query and can then be used with
+        :meth:`read_row` to read any number of rows without the
+        overhead of calling :meth:`select_fields` for each one."""
+        paths = {}
+        for k, v in entity.data_items():
+            if isinstance(v, edm.SimpleValue):
+                paths[id(v)] = (k, ())
+            else:
+                for sub_path, fv in self._complex_field_generator(v):
+                    paths[id(fv)] = (k, tuple(sub_path))
+        column_names = []
+        plan = []
+        for cname, v in self.select_fields(entity, prefix):
+            column_names.append(cname)
+            plan.append(paths[id(v)])
+        return column_names, plan
+
+    def fetch_rows(self, cursor):
+        """A generator of rows from an executed cursor
+
+        Rows are fetched in batches using fetchmany with the batch size
+        set by the container's :attr:`SQLEntityContainer.arraysize`."""
+        arraysize = self.container.arraysize
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+    def skip_rows(self, cursor, skip):
+        """Discards rows from an executed cursor
+
+        cursor
+            A DB API cursor on which a query has been executed.
+
+        skip
+            The number of rows to discard.
+
+        This method is only used when the database does not support
+        skipping rows in the query itself (see
+        :py:meth:`SQLEntityContainer.limit_clause`).  The rows are
+        fetched in large batches and discarded without being read."""
+        batch = max(self.container.arraysize, 1024)
+        while skip > 0:
+            rows = cursor.fetchmany(min(skip, batch))
+            if not rows:
+                break
+            skip -= len(rows)
+
+    def read_row(self, plan, row):
+        """Returns a new entity read from a row of values
+
+        plan
+            A binding plan returned by :meth:`bind_plan`
+
+        row
+            A sequence of values returned by the database.  Only the
+            first len(plan) values are read, any additional values are
+            ignored.
+
+        The resulting entity is marked as existing."""
+        entity = self.new_entity()
+        read_sql_value = self.container.read_sql_value
+        for path, new_value in zip(plan, row):
+            pname, sub_path = path
+            value = entity[pname]
+            for name in sub_path:
+                value = value[name]
+            read_sql_value(value, new_value)
+        entity.exists = True
+        return entity
+
+    def _entity_query(self, params):
+        entity = self.new_entity()
+        query = ["SELECT "]
+        column_names, plan = self.bind_plan(entity)
+        self.orderby_cols(column_names, params)
+        query.append(", ".join(column_names))
+        query.append(' FROM ')
+        query.append(self.table_name)
+        # we force where and orderby to be calculated before the
+        # join clause is added as they may add to the joins
+        where = self.where_clause(
+            None, params, use_filter=True, use_skip=False)
+        orderby = self.orderby_clause()
+        query.append(self.join_clause())
+        query.append(where)
+        query.append(orderby)
+        return ''.join(query), plan
+
+    def entity_generator(self):
+        query, params, plan = self.query_plan(('entity', ),
+                                              self._entity_query)
+        transaction = SQLTransaction(self.container, self.connection)
+        try:
+            transaction.begin()
+            logging.info("%s; %s", query, to_text(params.params))
+            transaction.execute(query, params)
+            for row in self.fetch_rows(transaction.cursor):
+                yield self.read_row(plan, row)
             # we haven't changed the database, but we don't want to
             # leave the connection idle in transaction
             transaction.commit()
@@ -602,53 +991,50 @@ class SQLCollectionBase(core.EntityCollection):
                 limit = topmax
         else:
             limit = top
-        entity = self.new_entity()
-        query = ["SELECT "]
-        skip, limit_clause = self.container.select_limit_clause(skip, limit)
-        if limit_clause:
-            query.append(limit_clause)
-        params = self.container.ParamsClass()
-        column_names, values = zip(*list(self.select_fields(entity)))
-        column_names = list(column_names)
-        self.orderby_cols(column_names, params, True)
-        query.append(", ".join(column_names))
-        query.append(' FROM ')
-        query.append(self.table_name)
-        where = self.where_clause(None, params, use_filter=True, use_skip=True)
-        orderby = self.orderby_clause()
-        query.append(self.join_clause())
-        query.append(where)
-        query.append(orderby)
+        skip, select_limit = self.container.select_limit_clause(skip, limit)
         skip, limit_clause = self.container.limit_clause(skip, limit)
-        if limit_clause:
-            query.append(limit_clause)
-        query = ''.join(query)
+
+        def page_query(params):
+            entity = self.new_entity()
+            query = ["SELECT "]
+            if select_limit:
+                query.append(select_limit)
+            column_names, plan = self.bind_plan(entity)
+            self.orderby_cols(column_names, params, True)
+            query.append(", ".join(column_names))
+            query.append(' FROM ')
+            query.append(self.table_name)
+            where = self.where_clause(
+                None, params, use_filter=True, use_skip=True)
+            orderby = self.orderby_clause()
+            query.append(self.join_clause())
+            query.append(where)
+            query.append(orderby)
+            if limit_clause:
+                query.append(limit_clause)
+            return ''.join(query), plan
+
+        query, params, plan = self.query_plan(
+            ('page', select_limit, limit_clause), page_query)
         transaction = SQLTransaction(self.container, self.connection)
         try:
             transaction.begin()
             logging.info("%s; %s", query, to_text(params.params))
             transaction.execute(query, params)
+            if skip:
+                # the database can't skip for us
+                self.skip_rows(transaction.cursor, skip)
+            rows = self.fetch_rows(transaction.cursor)
             while True:
-                row = transaction.cursor.fetchone()
+                row = next(rows, None)
                 if row is None:
                     # no more pages
                     if set_next:
                         self.top = self.skip = 0
                         self.skipToken = None
                     break
-                if skip:
-                    skip = skip - 1
-                    continue
-                if entity is None:
-                    entity = self.new_entity()
-                    values = next(
-                        itertools.islice(
-                            zip(*list(self.select_fields(entity))), 1, None))
                 row_values = list(row)
-                for value, new_value in zip(values, row_values):
-                    self.container.read_sql_value(value, new_value)
-                entity.exists = True
-                yield entity
+                yield self.read_row(plan, row_values)
                 if topmax is not None:
                     topmax = topmax - 1
                     if topmax < 1:
@@ -684,7 +1070,6 @@ class SQLCollectionBase(core.EntityCollection):
                             else:
                                 self.skip = self.top
                         break
-                entity = None
             # we haven't changed the database, but we don't want to
             # leave the connection idle in transaction
             transaction.commit()
@@ -697,9 +1082,90 @@ class SQLCollectionBase(core.EntityCollection):
         return self.expand_entities(
             self.page_generator(set_next))
 
+    def expand_entities(self, entity_iterable):
+        """Expands entities in batches
+
+        Overridden to expand the entities returned by *entity_iterable*
+        in batches of :attr:`SQLEntityContainer.arraysize` using
+        :meth:`expand_batch`."""
+        if not self.expand:
+            for entity in super(SQLCollectionBase, self).expand_entities(
+                    entity_iterable):
+                yield entity
+            return
+        batch = []
+        for entity in entity_iterable:
+            batch.append(entity)
+            if len(batch) >= self.container.arraysize:
+                self.expand_batch(batch)
+                for e in batch:
+                    yield e
+                batch = []
+        if batch:
+            self.expand_batch(batch)
+            for e in batch:
+                yield e
+
+    def expand_batch(self, entities):
+        """Expands a list of entities
+
+        entities
+            A list of entities from this collection's entity set.
+
+        The effect is the same as calling
+        :py:meth:`~pyslet.odata2.csdl.Entity.expand` on each entity with
+        this collection's expand and select options but navigation
+        properties that are bound to :py:class:`SQLNavigationCollection`
+        instances are read with a single query per property (see
+        :meth:`SQLNavigationCollection.read_batch`) rather than one
+        query per property per entity."""
+        select = self.select
+        for entity in entities:
+            entity.expand(None, select)
+        if not self.expand or not entities:
+            return
+        if select is None:
+            select = {}
+        for k, dv in entities[0].navigation_items():
+            if k not in self.expand:
+                continue
+            if k in select:
+                sub_select = select[k]
+                if sub_select is None:
+                    sub_select = {'*': None}
+            else:
+                sub_select = None
+            cls, kws = self.entity_set.navigation_bindings[k]
+            if len(entities) > 1 and issubclass(cls, SQLNavigationCollection):
+                with self.entity_set.open_navigation(
+                        k, entities[0]) as collection:
+                    collection.set_expand(self.expand[k], sub_select)
+                    targets = collection.read_batch(entities)
+                for entity in entities:
+                    entity[k].set_expansion_values(
+                        targets.get(entity.key(), []))
+            else:
+                for entity in entities:
+                    entity[k].expand_collection(self.expand[k], sub_select)
+
     def __getitem__(self, key):
         entity = self.new_entity()
         entity.set_key(key)
+        return self._read_entity(entity, key, True)
+
+    def read_concurrency_tokens(self, key):
+        """Returns the entity with *key* for concurrency checks
+
+        Overridden to select only the key and concurrency token columns
+        so that large values, such as blobs and long strings, are not
+        read from the database."""
+        entity = self.new_entity()
+        entity.set_key(key)
+        entity.expand(None, dict((v.p_def.name, None)
+                                 for v in entity.etag_values()))
+        return self._read_entity(entity, key, False)
+
+    def _read_entity(self, entity, key, expand):
         params = self.container.ParamsClass()
         query = ["SELECT "]
         column_names, values = zip(*list(self.select_fields(entity)))
@@ -727,7 +1193,8 @@ class SQLCollectionBase(core.EntityCollection):
             for value, new_value in zip(values, row):
                 self.container.read_sql_value(value, new_value)
             entity.exists = True
-            entity.expand(self.expand, self.select)
+            if expand:
+                entity.expand(self.expand, self.select)
             transaction.commit()
             return entity
         except KeyError:
@@ -1069,8 +1536,6 @@ class SQLCollectionBase(core.EntityCollection):
         self._joins = None
         self.filter = filter
         self.set_page(None)
-        self._sqlLen = None
-        self._sqlGen = None
 
     def where_clause(
             self,
@@ -1143,44 +1608,80 @@ class SQLCollectionBase(core.EntityCollection):
                 '%s.%s=%s' %
                 (self.table_name,
                  self.container.mangled_names[(self.entity_set.name, k)],
-                 params.add_param(self.container.prepare_sql_value(v))))
+                 self.add_value_param(v, params)))
 
     def where_skiptoken_clause(self, where, params):
         """Adds the entity constraint expression to a list of SQL expressions.
 
         where
-                The list to append the skiptoken expression to."""
-        skip_expression = []
-        i = ket = 0
-        while True:
+                The list to append the skiptoken expression to.
+
+        If all the ordering rules are in the same direction and the
+        database supports row value comparisons (see
+        :py:attr:`ROW_VALUES`) the constraint is expressed as a single
+        comparison, for example::
+
+                (o_1, K) > (?, ?)
+
+        Otherwise the constraint is expanded, the first ordering rule is
+        repeated as an additional range constraint to help the database
+        use an index on the first column.  For example::
+
+                (o_1 >= ? AND (o_1 > ? OR (o_1 = ? AND K > ?)))
+
+        In both cases the result is that a deep page can be retrieved
+        without requiring the database to return (or count past) the
+        entities on the earlier pages."""
+        terms = []
+        for i in range3(len(self.orderNames)):
             if self.orderby and i < len(self.orderby):
                 oname = None
                 expression, dir = self.orderby[i]
             else:
+                expression = None
                 oname, dir = self.orderNames[i]
-            v = self.skiptoken[i]
-            op = ">" if dir > 0 else "<"
+            terms.append((expression, oname, dir, self.skiptoken[i]))
+
+        def o_expression(term, context):
+            expression, oname, dir, v = term
             if oname is None:
-                o_expression = self.sql_expression(expression, params, op)
+                return self.sql_expression(expression, params, context)
             else:
-                o_expression = oname
+                return oname
+
+        if (self.ROW_VALUES and len(terms) > 1 and
+                len(set(t[2] for t in terms)) == 1):
+            op = ">" if terms[0][2] > 0 else "<"
+            # build the left hand side first to keep params in order
+            lhs = ", ".join(o_expression(t, ',') for t in terms)
+            rhs = ", ".join(self.add_value_param(t[3], params)
+                            for t in terms)
+            where.append("(%s) %s (%s)" % (lhs, op, rhs))
+            return
+        skip_expression = []
+        ket = 0
+        if len(terms) > 1:
+            op = ">=" if terms[0][2] > 0 else "<="
             skip_expression.append(
-                "(%s %s %s" %
-                (o_expression,
-                 op,
-                 params.add_param(
-                     self.container.prepare_sql_value(v))))
+                "(%s %s %s AND " % (o_expression(terms[0], op), op,
+                                    self.add_value_param(terms[0][3],
+                                                         params)))
+            ket += 1
+        i = 0
+        while True:
+            term = terms[i]
+            v = term[3]
+            op = ">" if term[2] > 0 else "<"
+            skip_expression.append(
+                "(%s %s %s" % (o_expression(term, op), op,
+                               self.add_value_param(v, params)))
             ket += 1
             i += 1
-            if i < len(self.orderNames):
+            if i < len(terms):
                 # more to come
-                if oname is None:
-                    # remake the expression
-                    o_expression = self.sql_expression(expression, params, '=')
                 skip_expression.append(
                     " OR (%s = %s AND " %
-                    (o_expression, params.add_param(
-                        self.container.prepare_sql_value(v))))
+                    (o_expression(term, '='), self.add_value_param(v, params)))
                 ket += 1
                 continue
             else:
@@ -1225,7 +1726,6 @@ class SQLCollectionBase(core.EntityCollection):
                 (self.entity_set.name, key)]
             mangled_name = "%s.%s" % (self.table_name, mangled_name)
             self.orderNames.append((mangled_name, 1))
-        self._sqlGen = None
 
     def orderby_clause(self):
         """A utility method to return the orderby clause.
@@ -1531,9 +2031,7 @@ class SQLCollectionBase(core.EntityCollection):
             return self.container.ParamsClass.escape_literal(
                 to_text(expression.value))
         elif isinstance(expression, core.LiteralExpression):
-            return params.add_param(
-                self.container.prepare_sql_value(
-                    expression.value))
+            return self.add_value_param(expression.value, params)
         elif isinstance(expression, core.PropertyExpression):
             try:
                 p = self.entity_set.entityType[expression.name]
@@ -2172,109 +2670,18 @@ class SQLEntityCollection(SQLCollectionBase):
             transaction = SQLTransaction(self.container, self.connection)
         if entity.exists:
             raise edm.EntityExists(str(entity.get_location()))
-        # We must also go through each bound navigation property of our
-        # own and add in the foreign keys for forward links.
-        if fk_values is None:
-            fk_values = []
-        fk_mapping = self.container.fk_table[self.entity_set.name]
         try:
             transaction.begin()
-            nav_done = set()
-            for link_end, nav_name in dict_items(self.entity_set.linkEnds):
-                if nav_name:
-                    dv = entity[nav_name]
-                if (link_end.otherEnd.associationEnd.multiplicity ==
-                        edm.Multiplicity.One):
-                    # a required association
-                    if link_end == from_end:
-                        continue
-                    if nav_name is None:
-                        # unbound principal; can only be created from this
-                        # association
-                        raise edm.NavigationError(
-                            "Entities in %s can only be created "
-                            "from their principal" % self.entity_set.name)
-                    if not dv.bindings:
-                        raise edm.NavigationError(
-                            "Required navigation property %s of %s "
-                            "is not bound" % (nav_name, self.entity_set.name))
-                aset_name = link_end.parent.name
-                # if link_end is in fk_mapping it means we are keeping a
-                # foreign key for this property, it may even be required but
-                # either way, let's deal with it now.  We're only interested
-                # in associations that are bound to navigation properties.
-                if link_end not in fk_mapping or nav_name is None:
-                    continue
-                nullable, unique = fk_mapping[link_end]
-                target_set = link_end.otherEnd.entity_set
-                if len(dv.bindings) == 0:
-                    # we've already checked the case where nullable is False
-                    # above
-                    continue
-                elif len(dv.bindings) > 1:
-                    raise edm.NavigationError(
-                        "Unexpected error: found multiple bindings "
-                        "for foreign key constraint %s" % nav_name)
-                binding = dv.bindings[0]
-                if not isinstance(binding, edm.Entity):
-                    # just a key, grab the entity
-                    with target_set.open() as targetCollection:
-                        targetCollection.select_keys()
-                        target_entity = targetCollection[binding]
-                    dv.bindings[0] = target_entity
-                else:
-                    target_entity = binding
-                    if not target_entity.exists:
-                        # add this entity to it's base collection
-                        with target_set.open() as targetCollection:
-                            targetCollection.insert_entity_sql(
-                                target_entity,
-                                link_end.otherEnd,
-                                transaction=transaction)
-                # Finally, we have a target entity, add the foreign key to
-                # fk_values
-                for key_name in target_set.keys:
-                    fk_values.append(
-                        (self.container.mangled_names[
-                            (self.entity_set.name,
-                             aset_name,
-                             key_name)],
-                            target_entity[key_name]))
-                nav_done.add(nav_name)
+            # Step 1
+            fk_values, nav_done = self._insert_fk_bindings(
+                entity, from_end, fk_values, transaction)
             # Step 2
-            try:
-                entity.key()
-            except KeyError:
-                # missing key on insert, auto-generate if we can
-                for i in range3(100):
-                    entity.auto_key()
-                    if not self.test_key(entity, transaction):
-                        break
-            entity.set_concurrency_tokens()
-            query = ['INSERT INTO ', self.table_name, ' (']
-            insert_values = list(self.insert_fields(entity))
-            # watch out for exposed FK fields!
-            for fkname, fkv in fk_values:
-                i = 0
-                while i < len(insert_values):
-                    iname, iv = insert_values[i]
-                    if fkname == iname:
-                        # fk overrides - update the entity's value
-                        iv.set_from_value(fkv.value)
-                        # now drop it from the list to prevent
-                        # double column names
-                        del insert_values[i]
-                    else:
-                        i += 1
-            column_names, values = zip(*(insert_values + fk_values))
-            query.append(", ".join(column_names))
-            query.append(') VALUES (')
+            column_names, values = self._insert_columns(
+                entity, fk_values, transaction)
+            query = self._insert_query(column_names)
             params = self.container.ParamsClass()
-            query.append(
-                ", ".join(params.add_param(
-                    self.container.prepare_sql_value(x)) for x in values))
-            query.append(')')
-            query = ''.join(query)
+            for x in values:
+                params.add_param(self.container.prepare_sql_value(x))
             logging.info("%s; %s", query, to_text(params.params))
             transaction.execute(query, params)
             # before we can say the entity exists we need to ensure
@@ -2285,50 +2692,7 @@ class SQLEntityCollection(SQLCollectionBase):
                 self.get_auto(entity, auto_fields, transaction)
             entity.exists = True
             # Step 3
-            for k, dv in entity.navigation_items():
-                link_end = self.entity_set.navigation[k]
-                if not dv.bindings:
-                    continue
-                elif k in nav_done:
-                    dv.bindings = []
-                    continue
-                aset_name = link_end.parent.name
-                target_set = dv.target()
-                target_fk_mapping = self.container.fk_table[target_set.name]
-                with dv.open() as navCollection:
-                    with target_set.open() as targetCollection:
-                        while dv.bindings:
-                            binding = dv.bindings[0]
-                            if not isinstance(binding, edm.Entity):
-                                targetCollection.select_keys()
-                                binding = targetCollection[binding]
-                            if binding.exists:
-                                navCollection.insert_link(binding, transaction)
-                            else:
-                                if link_end.otherEnd in target_fk_mapping:
-                                    # target table has a foreign key
-                                    target_fk_values = []
-                                    for key_name in self.entity_set.keys:
-                                        target_fk_values.append(
-                                            (self.container.mangled_names[
-                                                (target_set.name,
-                                                 aset_name,
-                                                 key_name)],
-                                                entity[key_name]))
-                                    targetCollection.insert_entity_sql(
-                                        binding,
-                                        link_end.otherEnd,
-                                        target_fk_values,
-                                        transaction=transaction)
-                                else:
-                                    # foreign keys are in an auxiliary table
-                                    targetCollection.insert_entity_sql(
-                                        binding,
-                                        link_end.otherEnd,
-                                        transaction=transaction)
-                                    navCollection.insert_link(
-                                        binding, transaction)
-                            dv.bindings = dv.bindings[1:]
+            self._insert_bindings(entity, nav_done, transaction)
             transaction.commit()
         except (self.container.dbapi.IntegrityError,
                 self.container.dbapi.InternalError) as e:
@@ -2347,6 +2711,285 @@ class SQLEntityCollection(SQLCollectionBase):
         finally:
             transaction.close()
 
+    def insert_entities(self, entities, batch_size=100):
+        """Inserts multiple entities into the collection.
+
+        entities
+            An iterable of entities to insert.
+
+        batch_size
+            The number of entities to group together in each batch.
+
+        All entities are inserted in a single transaction.  Each batch
+        is processed in three passes that correspond to the three phases
+        described in :py:meth:`insert_entity_sql`.  Entities in a batch
+        that share the same set of columns are inserted using a single
+        call to the DB API's executemany method.  Navigation bindings are
+        then processed for the whole batch once all its entities have
+        been inserted.
+
+        Entities with automatically generated fields have to be read
+        back from the database after they are inserted and so are
+        inserted one at a time (though still within the same
+        transaction).
+
+        An entity may be bound to another new entity in the same batch,
+        for example, when loading a hierarchy.  Such entities are
+        inserted by the deep insert and are then skipped when the rest
+        of the batch is inserted.  If the transaction fails the entities
+        are all marked as not existing again."""
+        transaction = SQLTransaction(self.container, self.connection)
+        entities = iter(entities)
+        entity = None
+        done = []
+        committed = False
+        try:
+            transaction.begin()
+            batch = True
+            while batch:
+                batch = []
+                for entity in entities:
+                    if entity.exists:
+                        raise edm.EntityExists(str(entity.get_location()))
+                    batch.append(entity)
+                    done.append(entity)
+                    if len(batch) >= batch_size:
+                        break
+                if not batch:
+                    break
+                # Step 1: foreign keys and insert columns for each entity
+                nav_list = []
+                groups = {}
+                group_list = []
+                for entity in batch:
+                    if entity.exists:
+                        # deep inserted by an earlier entity's binding
+                        nav_list.append(None)
+                        continue
+                    fk_values, nav_done = self._insert_fk_bindings(
+                        entity, None, None, transaction)
+                    nav_list.append(nav_done)
+                    column_names, values = self._insert_columns(
+                        entity, fk_values, transaction)
+                    if list(self.auto_fields(entity)):
+                        # has to be read back, can't be grouped
+                        group_list.append((column_names, [(entity, values)]))
+                        continue
+                    group = groups.get(column_names, None)
+                    if group is None:
+                        group = []
+                        groups[column_names] = group
+                        group_list.append((column_names, group))
+                    group.append((entity, values))
+                # entities may also have been deep inserted by a later
+                # entity's binding, they must not be inserted again
+                for i, entity in enumerate(batch):
+                    if entity.exists:
+                        nav_list[i] = None
+                # Step 2: executemany for each group of entities
+                for column_names, group in group_list:
+                    group = [item for item in group if not item[0].exists]
+                    if not group:
+                        continue
+                    query = self._insert_query(column_names)
+                    param_list = []
+                    for entity, values in group:
+                        params = self.container.ParamsClass()
+                        for x in values:
+                            params.add_param(
+                                self.container.prepare_sql_value(x))
+                        param_list.append(params)
+                    entity = group[0][0]
+                    logging.info("%s; %i rows", query, len(param_list))
+                    if len(param_list) > 1:
+                        transaction.executemany(query, param_list)
+                    else:
+                        transaction.execute(query, param_list[0])
+                        auto_fields = list(self.auto_fields(entity))
+                        if auto_fields:
+                            self.get_auto(entity, auto_fields, transaction)
+                    for entity, values in group:
+                        entity.exists = True
+                # Step 3: remaining bindings
+                for entity, nav_done in zip(batch, nav_list):
+                    if nav_done is not None:
+                        self._insert_bindings(entity, nav_done, transaction)
+            transaction.commit()
+            committed = True
+        except (self.container.dbapi.IntegrityError,
+                self.container.dbapi.InternalError) as e:
+            transaction.rollback(e, swallow=True)
+            raise edm.ConstraintError(
+                "insert_entities failed for %s : %s" %
+                (str(entity.get_location()), str(e)))
+        except Exception as e:
+            transaction.rollback(e)
+        finally:
+            if not committed:
+                for entity in done:
+                    entity.exists = False
+            transaction.close()
+
+    def _insert_fk_bindings(self, entity, from_end, fk_values, transaction):
+        # Process all bindings for which we hold the foreign key,
+        # returns the augmented fk_values list and the set of
+        # navigation property names that have been processed.
+        #
+        # We must go through each bound navigation property of our
+        # own and add in the foreign keys for forward links.
+        if fk_values is None:
+            fk_values = []
+        fk_mapping = self.container.fk_table[self.entity_set.name]
+        nav_done = set()
+        for link_end, nav_name in dict_items(self.entity_set.linkEnds):
+            if nav_name:
+                dv = entity[nav_name]
+            if (link_end.otherEnd.associationEnd.multiplicity ==
+                    edm.Multiplicity.One):
+                # a required association
+                if link_end == from_end:
+                    continue
+                if nav_name is None:
+                    # unbound principal; can only be created from this
+                    # association
+                    raise edm.NavigationError(
+                        "Entities in %s can only be created "
+                        "from their principal" % self.entity_set.name)
+                if not dv.bindings:
+                    raise edm.NavigationError(
+                        "Required navigation property %s of %s "
+                        "is not bound" % (nav_name, self.entity_set.name))
+            aset_name = link_end.parent.name
+            # if link_end is in fk_mapping it means we are keeping a
+            # foreign key for this property, it may even be required but
+            # either way, let's deal with it now.  We're only interested
+            # in associations that are bound to navigation properties.
+            if link_end not in fk_mapping or nav_name is None:
+                continue
+            nullable, unique = fk_mapping[link_end]
+            target_set = link_end.otherEnd.entity_set
+            if len(dv.bindings) == 0:
+                # we've already checked the case where nullable is False
+                # above
+                continue
+            elif len(dv.bindings) > 1:
+                raise edm.NavigationError(
+                    "Unexpected error: found multiple bindings "
+                    "for foreign key constraint %s" % nav_name)
+            binding = dv.bindings[0]
+            if not isinstance(binding, edm.Entity):
+                # just a key, grab the entity
+                with target_set.open() as targetCollection:
+                    targetCollection.select_keys()
+                    target_entity = targetCollection[binding]
+                dv.bindings[0] = target_entity
+            else:
+                target_entity = binding
+                if not target_entity.exists:
+                    # add this entity to it's base collection
+                    with target_set.open() as targetCollection:
+                        targetCollection.insert_entity_sql(
+                            target_entity,
+                            link_end.otherEnd,
+                            transaction=transaction)
+            # Finally, we have a target entity, add the foreign key to
+            # fk_values
+            for key_name in target_set.keys:
+                fk_values.append(
+                    (self.container.mangled_names[
+                        (self.entity_set.name,
+                         aset_name,
+                         key_name)],
+                        target_entity[key_name]))
+            nav_done.add(nav_name)
+        return fk_values, nav_done
+
+    def _insert_columns(self, entity, fk_values, transaction):
+        # Returns a tuple of column names and a tuple of values to
+        # insert, generating a key first if necessary
+        try:
+            entity.key()
+        except KeyError:
+            # missing key on insert, auto-generate if we can
+            for i in range3(100):
+                entity.auto_key()
+                if not self.test_key(entity, transaction):
+                    break
+        entity.set_concurrency_tokens()
+        insert_values = list(self.insert_fields(entity))
+        # watch out for exposed FK fields!
+        for fkname, fkv in fk_values:
+            i = 0
+            while i < len(insert_values):
+                iname, iv = insert_values[i]
+                if fkname == iname:
+                    # fk overrides - update the entity's value
+                    iv.set_from_value(fkv.value)
+                    # now drop it from the list to prevent
+                    # double column names
+                    del insert_values[i]
+                else:
+                    i += 1
+        column_names, values = zip(*(insert_values + fk_values))
+        return column_names, values
+
+    def _insert_query(self, column_names):
+        params = self.container.ParamsClass()
+        query = ['INSERT INTO ', self.table_name, ' (']
+        query.append(", ".join(column_names))
+        query.append(') VALUES (')
+        query.append(
+            ", ".join(params.add_param(None) for x in column_names))
+        query.append(')')
+        return ''.join(query)
+
+    def _insert_bindings(self, entity, nav_done, transaction):
+        # Process all remaining bindings after entity has been inserted
+        for k, dv in entity.navigation_items():
+            link_end = self.entity_set.navigation[k]
+            if not dv.bindings:
+                continue
+            elif k in nav_done:
+                dv.bindings = []
+                continue
+            aset_name = link_end.parent.name
+            target_set = dv.target()
+            target_fk_mapping = self.container.fk_table[target_set.name]
+            with dv.open() as navCollection:
+                with target_set.open() as targetCollection:
+                    while dv.bindings:
+                        binding = dv.bindings[0]
+                        if not isinstance(binding, edm.Entity):
+                            targetCollection.select_keys()
+                            binding = targetCollection[binding]
+                        if binding.exists:
+                            navCollection.insert_link(binding, transaction)
+                        else:
+                            if link_end.otherEnd in target_fk_mapping:
+                                # target table has a foreign key
+                                target_fk_values = []
+                                for key_name in self.entity_set.keys:
+                                    target_fk_values.append(
+                                        (self.container.mangled_names[
+                                            (target_set.name,
+                                             aset_name,
+                                             key_name)],
+                                            entity[key_name]))
+                                targetCollection.insert_entity_sql(
+                                    binding,
+                                    link_end.otherEnd,
+                                    target_fk_values,
+                                    transaction=transaction)
+                            else:
+                                # foreign keys are in an auxiliary table
+                                targetCollection.insert_entity_sql(
+                                    binding,
+                                    link_end.otherEnd,
+                                    transaction=transaction)
+                                navCollection.insert_link(
+                                    binding, transaction)
+                        dv.bindings = dv.bindings[1:]
+
     def get_auto(self, entity, auto_fields, transaction):
         params = self.container.ParamsClass()
         query = ["SELECT "]
@@ -2848,6 +3491,54 @@ class SQLEntityCollection(SQLCollectionBase):
         finally:
             transaction.close()
 
+    def delete_entities(self, keys, batch_size=100):
+        """Deletes multiple entities from the collection
+
+        Overridden to delete each batch of entities with a single
+        DELETE statement, all batches are deleted in one transaction.
+        This is only possible if the entity set has a simple key and
+        deleting an entity never requires links to be removed from
+        other tables, otherwise the entities are deleted one at a time
+        using :py:meth:`delete_entity`."""
+        fk_mapping = self.container.fk_table[self.entity_set.name]
+        if len(self.entity_set.keys) != 1 or [
+                link_end for link_end in self.entity_set.linkEnds
+                if link_end not in fk_mapping]:
+            return super(SQLEntityCollection, self).delete_entities(
+                keys, batch_size)
+        key_name = self.entity_set.keys[0]
+        column = self.container.mangled_names[(self.entity_set.name,
+                                               key_name)]
+        entity = self.new_entity()
+        keys = iter(keys)
+        transaction = SQLTransaction(self.container, self.connection)
+        try:
+            transaction.begin()
+            batch = True
+            while batch:
+                params = self.container.ParamsClass()
+                batch = []
+                for key in keys:
+                    entity.set_key(key)
+                    batch.append(params.add_param(
+                        self.container.prepare_sql_value(entity[key_name])))
+                    if len(batch) >= batch_size:
+                        break
+                if not batch:
+                    break
+                query = "DELETE FROM %s WHERE %s IN (%s)" % (
+                    self.table_name, column, ", ".join(batch))
+                logging.info("%s; %s", query, to_text(params.params))
+                transaction.execute(query, params)
+                if transaction.cursor.rowcount != len(batch):
+                    raise KeyError("delete_entities: missing key in %s" %
+                                   self.entity_set.name)
+            transaction.commit()
+        except Exception as e:
+            transaction.rollback(e)
+        finally:
+            transaction.close()
+
     def delete_link(self, entity, link_end, target_entity, transaction=None):
         """Deletes the link between *entity* and *target_entity*
 
@@ -3110,8 +3801,128 @@ class SQLNavigationCollection(SQLCollectionBase, core.NavigationCollection):
 
     def __init__(self, aset_name, **kwargs):
         self.aset_name = aset_name
+        # a list of source entities when reading a batch
+        self._batch = None
         super(SQLNavigationCollection, self).__init__(**kwargs)
 
+    def query_plan_key(self):
+        """Extends the key to include the navigation property"""
+        return super(SQLNavigationCollection, self).query_plan_key() + (
+            self.from_entity.entity_set.name, self.name)
+
+    def query_plan_arguments(self):
+        """Returns the key values of *from_entity*"""
+        return list(dict_values(self.from_entity.key_dict()))
+
+    def source_key_column(self, key_name):
+        """Returns the column that identifies the source entity
+
+        key_name
+            The name of a key property of *from_entity*
+
+        Returns the (qualified) name of a column in this collection's
+        query that contains the corresponding key value of the source
+        entity.  Derived classes must override this method."""
+        raise NotImplementedError
+
+    def where_source_clause(self, where, params):
+        """Adds the constraint for the source entity
+
+        where
+            The list to append the constraint expression to.
+
+        params
+            The :py:class:`SQLParams` object to add parameters to.
+
+        Normally the constraint restricts the query to entities linked
+        from *from_entity*.  When reading a batch (see
+        :meth:`read_batch`) the constraint matches entities linked from
+        any of the source entities in the batch instead."""
+        if self._batch is None:
+            for k, v in dict_items(self.from_entity.key_dict()):
+                where.append("%s=%s" % (self.source_key_column(k),
+                                        self.add_value_param(v, params)))
+        else:
+            keys = self.from_entity.entity_set.keys
+            if len(keys) == 1:
+                k = keys[0]
+                where.append("%s IN (%s)" % (
+                    self.source_key_column(k),
+                    ", ".join(self.add_value_param(source[k], params)
+                              for source in self._batch)))
+            else:
+                source_where = []
+                for source in self._batch:
+                    source_where.append("(%s)" % ' AND '.join(
+                        "%s=%s" % (self.source_key_column(k),
+                                   self.add_value_param(source[k], params))
+                        for k in keys))
+                where.append("(%s)" % ' OR '.join(source_where))
+
+    def read_batch(self, sources):
+        """Reads the entities linked from a batch of source entities
+
+        sources
+            A list of entities from the same entity set as
+            *from_entity*.
+
+        Returns a dictionary mapping the keys of the source entities
+        onto lists of the entities linked from them.  Sources with no
+        linked entities are omitted from the dictionary.  The entities
+        are read with a single query and expanded according to the
+        expand and select options of this collection."""
+        result = {}
+        targets = []
+        keys = self.from_entity.entity_set.keys
+        self._batch = sources
+        transaction = SQLTransaction(self.container, self.connection)
+        try:
+            entity = self.new_entity()
+            params = self.container.ParamsClass()
+            query = ["SELECT "]
+            column_names, plan = self.bind_plan(entity)
+            self.orderby_cols(column_names, params)
+            nsource = len(column_names)
+            source_values = []
+            for k in keys:
+                column_names.append(self.source_key_column(k))
+                source_values.append(
+                    edm.SimpleValue.from_type(self.from_entity[k].type_code))
+            query.append(", ".join(column_names))
+            query.append(' FROM ')
+            query.append(self.table_name)
+            # we force where and orderby to be calculated before the
+            # join clause is added as they may add to the joins
+            where = self.where_clause(
+                None, params, use_filter=True, use_skip=False)
+            orderby = self.orderby_clause()
+            query.append(self.join_clause())
+            query.append(where)
+            query.append(orderby)
+            query = ''.join(query)
+            transaction.begin()
+            logging.info("%s; %s", query, to_text(params.params))
+            transaction.execute(query, params)
+            for row in self.fetch_rows(transaction.cursor):
+                target = self.read_row(plan, row)
+                for value, new_value in zip(source_values, row[nsource:]):
+                    self.container.read_sql_value(value, new_value)
+                if len(source_values) == 1:
+                    key = source_values[0].value
+                else:
+                    key = tuple(v.value for v in source_values)
+                result.setdefault(key, []).append(target)
+                targets.append(target)
+            transaction.commit()
+        except Exception as e:
+            transaction.rollback(e)
+        finally:
+            transaction.close()
+            self._batch = None
+        if self.expand or self.select:
+            self.expand_batch(targets)
+        return result
+
     def __setitem__(self, key, entity):
         # sanity check entity to check it can be inserted here
         if (not isinstance(entity, edm.Entity) or
@@ -3250,6 +4061,13 @@ class SQLForeignKeyCollection(SQLNavigationCollection):
         self._joins[nav_name] = (alias, join)
         self._source_alias = alias
 
+    def source_key_column(self, key_name):
+        """The key of the source entity in the aliased source table"""
+        if self._joins is None:
+            self.reset_joins()
+        return "%s.%s" % (self._source_alias, self.container.mangled_names[
+            (self.from_entity.entity_set.name, key_name)])
+
     def where_clause(self, entity, params, use_filter=True, use_skip=False):
         """Adds the constraint for entities linked from *from_entity* only.
 
@@ -3258,12 +4076,7 @@ class SQLForeignKeyCollection(SQLNavigationCollection):
         if self._joins is None:
             self.reset_joins()
         where = []
-        for k, v in dict_items(self.from_entity.key_dict()):
-            where.append(
-                "%s.%s=%s" %
-                (self._source_alias, self.container.mangled_names[
-                    (self.from_entity.entity_set.name, k)], params.add_param(
-                    self.container.prepare_sql_value(v))))
+        self.where_source_clause(where, params)
         if entity is not None:
             self.where_entity_clause(where, entity, params)
         if self.filter is not None and use_filter:
@@ -3370,14 +4183,15 @@ class SQLReverseKeyCollection(SQLNavigationCollection):
         super(SQLReverseKeyCollection, self).__init__(**kwargs)
         self.keyCollection = self.entity_set.open()
 
+    def source_key_column(self, key_name):
+        """The foreign key in this collection's table"""
+        return "%s.%s" % (self.table_name, self.container.mangled_names[
+            (self.entity_set.name, self.aset_name, key_name)])
+
     def where_clause(self, entity, params, use_filter=True, use_skip=False):
         """Adds the constraint to entities linked from *from_entity* only."""
         where = []
-        for k, v in dict_items(self.from_entity.key_dict()):
-            where.append("%s=%s" % (
-                self.container.mangled_names[
-                    (self.entity_set.name, self.aset_name, k)],
-                params.add_param(self.container.prepare_sql_value(v))))
+        self.where_source_clause(where, params)
         if entity is not None:
             self.where_entity_clause(where, entity, params)
         if self.filter is not None and use_filter:
@@ -3654,20 +4468,16 @@ class SQLAssociationCollection(SQLNavigationCollection):
         self._aliases.add(alias)
         return alias
 
+    def source_key_column(self, key_name):
+        """The foreign key of the source entity in the auxiliary table"""
+        return "%s.%s" % (self.atable_name, self.container.mangled_names[
+            (self.aset_name, self.from_entity.entity_set.name,
+             self.from_nav_name, key_name)])
+
     def where_clause(self, entity, params, use_filter=True, use_skip=False):
         """Provides the *from_entity* constraint in the auxiliary table."""
         where = []
-        for k, v in dict_items(self.from_entity.key_dict()):
-            where.append(
-                "%s.%s=%s" %
-                (self.atable_name,
-                 self.container.mangled_names[
-                     (self.aset_name,
-                      self.from_entity.entity_set.name,
-                      self.from_nav_name,
-                      k)],
-                    params.add_param(
-                     self.container.prepare_sql_value(v))))
+        self.where_source_clause(where, params)
         if entity is not None:
             for k, v in dict_items(entity.key_dict()):
                 where.append(
@@ -4061,6 +4871,18 @@ class SQLConnection(object):
         self.locked = 0
         self.last_seen = 0
         self.dbc = None
+        #: the time the connection was last opened or validated
+        self.last_checked = 0
+        #: the number of times the connection has been acquired (not
+        #: counting nested calls by the owning thread)
+        self.acquire_count = 0
+        #: the number of queries executed using this connection
+        self.query_count = 0
+        # the query_count when the connection was last acquired
+        self.query_mark = 0
+        #: the depth of :meth:`SQLEntityContainer.transaction` calls
+        #: currently using this connection
+        self.transaction_level = 0
 
 
 class SQLEntityContainer(object):
@@ -4109,6 +4931,16 @@ class SQLEntityContainer(object):
         Note: all names are quoted using :py:meth:`quote_identifier`
         before appearing in SQL statements.
 
+    min_connections (optional)
+        The number of connections the pool should try and keep open,
+        defaults to 0.  Connections are opened in advance of being
+        needed by :meth:`prewarm` which is called automatically by the
+        pool cleaner thread (see *max_idle*) but can also be called
+        directly once the container has been constructed.  Idle
+        connections are not closed by the :meth:`pool_cleaner` if that
+        would leave the pool with fewer than min_connections.  The
+        value is limited by max_connections.
+
     max_idle (optional)
         The maximum number of seconds idle database connections should
         be kept open before they are cleaned by the
@@ -4121,6 +4953,45 @@ class SQLEntityContainer(object):
         of 3600 (1 hour) will result in a pool cleaner call every 12
         minutes.
 
+    validate (optional)
+        A boolean, defaults to False.  If True, the pool cleaner tests
+        each connection that is not in use with
+        :meth:`validate_connection` and discards any that fail.
+        Ignored for modules with thread-safety level 0.
+
+    metrics_callback (optional)
+        A callable used to report pool activity.  It is called with
+        three arguments: an event name, the :class:`SQLConnection`
+        and a value that depends on the event:
+
+        'acquire'
+            the connection has been acquired by a thread, the value is
+            the time (in seconds) spent waiting for it
+
+        'query'
+            a query has been executed using the connection, the value
+            is the SQL command
+
+        'release'
+            the connection has been released, the value is the number of
+            queries executed since it was acquired
+
+        The callback is not called while the pool is locked but it may
+        be called from any thread.
+
+    arraysize (optional)
+        The number of rows to fetch from the database at a time when
+        iterating through the results of a query.  Rows are fetched in
+        batches using the DB API's fetchmany method, the default is
+        100.
+
+    plan_cache_size (optional)
+        The maximum number of compiled queries to cache.  Queries that
+        differ only in the values of literals in their filter (and
+        other parameters) share the same compiled SQL text, see
+        :py:class:`QueryPlanCache` for details.  The default is 256,
+        use 0 to disable caching.
+
     This class is designed to work with diamond inheritance and super.
     All derived classes must call __init__ through super and pass all
     unused keyword arguments.  For example::
@@ -4131,7 +5002,9 @@ class SQLEntityContainer(object):
                         # do something with myDBConfig...."""
 
     def __init__(self, container, dbapi, streamstore=None, max_connections=10,
-                 field_name_joiner="_", max_idle=None, **kwargs):
+                 field_name_joiner="_", max_idle=None, arraysize=100,
+                 plan_cache_size=256, min_connections=0, validate=False,
+                 metrics_callback=None, **kwargs):
         if kwargs:
             logging.debug(
                 "Unabsorbed kwargs in SQLEntityContainer constructor")
@@ -4153,11 +5026,23 @@ class SQLEntityContainer(object):
             self.module_lock = DummyLock()
             self.clocker = threading.RLock
             self.cpool_max = max_connections
+        self.cpool_min = min(min_connections, self.cpool_max)
         self.cpool_lock = threading.Condition()
         self.cpool_locked = {}
         self.cpool_unlocked = {}
         self.cpool_idle = []
         self.cpool_size = 0
+        # threads waiting for a connection, in order of arrival
+        self.cpool_waiters = collections.deque()
+        self.cpool_validate = validate and self.dbapi.threadsafety > 0
+        # statistics reported by pool_stats
+        self.cpool_wait_counts = [0] * (len(POOL_WAIT_LIMITS) + 1)
+        self.cpool_affinity = 0
+        self.cpool_recycled = 0
+        self.cpool_opened = 0
+        self.cpool_invalid = 0
+        #: the optional callable used to report pool activity
+        self.metrics_callback = metrics_callback
         self.closing = threading.Event()
         # set up the parameter style
         if self.dbapi.paramstyle == "qmark":
@@ -4176,6 +5061,11 @@ class SQLEntityContainer(object):
                             "setting to qmark",
                             self.dbapi.paramstyle)
             self.ParamsClass = SQLParams
+        #: the number of rows to fetch at a time when reading results
+        self.arraysize = arraysize
+        #: the :py:class:`QueryPlanCache` used by this container's
+        #: collections
+        self.plan_cache = QueryPlanCache(plan_cache_size)
         self.fk_table = {}
         """A mapping from an entity set name to a FK mapping of the form::
 
@@ -4274,7 +5164,7 @@ class SQLEntityContainer(object):
         if max_idle is not None:
             t = threading.Thread(
                 target=self._run_pool_cleaner, kwargs={'max_idle': max_idle})
-            t.setDaemon(True)
+            t.daemon = True
             t.start()
             logging.info("Starting pool_cleaner with max_idle=%f" %
                          float(max_idle))
@@ -4619,12 +5509,31 @@ class SQLEntityContainer(object):
                     out.write(ul(";\n\n"))
 
     def acquire_connection(self, timeout=None):
+        """Acquires a database connection from the pool
+
+        timeout
+            The maximum number of seconds to wait for a connection, None
+            means wait indefinitely.
+
+        Returns a :class:`SQLConnection` instance or None if no
+        connection could be acquired.  Connections are always shared
+        within the same thread, if the calling thread already holds a
+        connection then the same connection is returned (and must be
+        released the same number of times).  Otherwise, we prefer the
+        connection last used by the calling thread.
+
+        Threads that are forced to wait are served in order of arrival
+        so that waiting threads are not starved of connections by
+        threads that arrive later."""
         # block on the module for threadsafety==0 case
         thread = threading.current_thread()
         thread_id = thread.ident
         now = start = time.time()
         cpool_item = None
         close_flag = False
+        waiting = False
+        new_item = False
+        warm_up = False
         with self.cpool_lock:
             if self.closing.is_set():
                 # don't open connections when we are trying to close them
@@ -4643,13 +5552,20 @@ class SQLEntityContainer(object):
                 # our thread_id is in the locked table
                 cpool_item.locked += 1
                 cpool_item.last_seen = now
+            else:
+                new_item = True
             while cpool_item is None:
                 if thread_id in self.cpool_unlocked:
                     # take the connection that last belonged to us
                     cpool_item = self.cpool_unlocked[thread_id]
                     del self.cpool_unlocked[thread_id]
+                    self.cpool_affinity += 1
                     logging.debug("Thread[%i] re-acquiring connection",
                                   thread_id)
+                elif (self.cpool_waiters and
+                        self.cpool_waiters[0] != thread_id):
+                    # other threads are ahead of us in the queue
+                    pass
                 elif (self.cpool_idle):
                     # take a connection from an expired thread
                     cpool_item = self.cpool_idle.pop()
@@ -4658,10 +5574,14 @@ class SQLEntityContainer(object):
                     cpool_item = SQLConnection()
                     # do the actual open outside of the cpool lock
                     self.cpool_size += 1
+                    if not self.cpool_opened:
+                        warm_up = True
+                    self.cpool_opened += 1
                 elif self.cpool_unlocked:
                     # take a connection that doesn't belong to us, popped at
                     # random
                     old_thread_id, cpool_item = self.cpool_unlocked.popitem()
+                    self.cpool_recycled += 1
                     if self.dbapi.threadsafety > 1:
                         logging.debug(
                             "Thread[%i] recycled database connection from "
@@ -4673,13 +5593,16 @@ class SQLEntityContainer(object):
                         # is it ok to close a connection from a different
                         # thread?  Yes: we require it!
                         close_flag = True
-                else:
+                if cpool_item is None:
                     now = time.time()
                     if timeout is not None and now > start + timeout:
                         logging.warning(
                             "Thread[%i] timed out waiting for a database "
                             "connection", thread_id)
                         break
+                    if not waiting:
+                        self.cpool_waiters.append(thread_id)
+                        waiting = True
                     logging.debug(
                         "Thread[%i] forced to wait for a database connection",
                         thread_id)
@@ -4692,13 +5615,32 @@ class SQLEntityContainer(object):
                 cpool_item.thread = thread
                 cpool_item.thread_id = thread_id
                 cpool_item.last_seen = time.time()
+                cpool_item.acquire_count += 1
+                cpool_item.query_mark = cpool_item.query_count
                 self.cpool_locked[thread_id] = cpool_item
+            if waiting:
+                self.cpool_waiters.remove(thread_id)
+                # the next thread in the queue may now be able to proceed
+                self.cpool_lock.notify_all()
+            wait_time = time.time() - start
+            if cpool_item is not None and new_item:
+                self.cpool_wait_counts[
+                    bisect.bisect_left(POOL_WAIT_LIMITS, wait_time)] += 1
         if cpool_item:
             if close_flag:
                 self.close_connection(cpool_item.dbc)
                 cpool_item.dbc = None
             if cpool_item.dbc is None:
                 cpool_item.dbc = self.open()
+                cpool_item.last_checked = time.time()
+            if warm_up:
+                # a failed warm up must not fail this request
+                try:
+                    self.prewarm()
+                except Exception as err:
+                    logging.error("prewarm failed: %s", str(err))
+            if new_item and self.metrics_callback is not None:
+                self.metrics_callback('acquire', cpool_item, wait_time)
             return cpool_item
         # we are defeated, no database connection for the caller
         # release lock on the module as there is no connection to release
@@ -4711,16 +5653,24 @@ class SQLEntityContainer(object):
         with self.cpool_lock:
             # we have exclusive use of the cpool members
             cpool_item = self.cpool_locked.get(thread_id, None)
-            if cpool_item:
-                if cpool_item is release_item:
-                    self.module_lock.release()
-                    cpool_item.locked -= 1
-                    cpool_item.last_seen = time.time()
-                    if not cpool_item.locked:
-                        del self.cpool_locked[thread_id]
-                        self.cpool_unlocked[thread_id] = cpool_item
-                        self.cpool_lock.notify()
+            released = cpool_item is not None and cpool_item is release_item
+            if released:
+                self.module_lock.release()
+                cpool_item.locked -= 1
+                cpool_item.last_seen = time.time()
+                if cpool_item.locked:
                     return
+                del self.cpool_locked[thread_id]
+                self.cpool_unlocked[thread_id] = cpool_item
+                # wake all waiters, the first in the queue takes it
+                self.cpool_lock.notify_all()
+        if released:
+            if self.metrics_callback is not None:
+                self.metrics_callback(
+                    'release', release_item,
+                    release_item.query_count - release_item.query_mark)
+            return
+        with self.cpool_lock:
             # it seems likely that some other thread is going to leave a
             # locked connection now, let's try and find it to correct
             # the situation
@@ -4737,7 +5687,7 @@ class SQLEntityContainer(object):
                 if not bad_item.locked:
                     del self.cpool_locked[bad_thread]
                     self.cpool_unlocked[bad_item.thread_id] = bad_item
-                    self.cpool_lock.notify()
+                    self.cpool_lock.notify_all()
                     logging.error(
                         "Thread[%i] released database connection originally "
                         "acquired by Thread[%i]", thread_id, bad_thread)
@@ -4766,6 +5716,57 @@ class SQLEntityContainer(object):
         if close_flag:
             self.close_connection(release_item.dbc)
 
+    @contextlib.contextmanager
+    def transaction(self, timeout=SQL_TIMEOUT):
+        """Context manager that executes a block in a single transaction
+
+        timeout
+            The maximum number of seconds to wait for a database
+            connection, defaults to SQL_TIMEOUT.
+
+        All operations on this container's collections carried out by
+        the calling thread within the block share the connection
+        returned by :meth:`acquire_connection` and are committed
+        together when the block exits normally.  If the block raises an
+        exception the whole transaction is rolled back and the
+        exception is re-raised::
+
+            with container.transaction():
+                with people.open() as collection:
+                    collection.insert_entity(person)
+                with addresses.open() as collection:
+                    collection.insert_entity(address)
+
+        Calls may be nested, only the outermost call commits or rolls
+        back the transaction.  Individual operations should not be
+        retried while the transaction is open so lost connections are
+        not recovered automatically."""
+        connection = self.acquire_connection(timeout)
+        if connection is None:
+            raise DatabaseBusy(
+                "Failed to acquire connection after %is" % timeout)
+        connection.transaction_level += 1
+        try:
+            yield connection
+            if connection.transaction_level == 1:
+                connection.dbc.commit()
+        except Exception as err:
+            if connection.transaction_level == 1:
+                try:
+                    connection.dbc.rollback()
+                    logging.info(
+                        "rollback invoked for transaction following error "
+                        "%s", str(err))
+                except self.dbapi.NotSupportedError:
+                    logging.error(
+                        "Data Integrity Error: rollback invoked on a "
+                        "connection that does not support transactions "
+                        "after error %s", str(err))
+            raise
+        finally:
+            connection.transaction_level -= 1
+            self.release_connection(connection)
+
     def connection_stats(self):
         """Return information about the connection pool
 
@@ -4788,13 +5789,147 @@ class SQLEntityContainer(object):
             return (len(self.cpool_locked), len(self.cpool_unlocked),
                     len(self.cpool_idle))
 
+    def pool_stats(self):
+        """Return detailed information about the connection pool
+
+        Returns a dictionary with the following keys:
+
+        size
+            the number of connections in the pool (including any being
+            opened)
+
+        min, max
+            the target minimum and maximum number of connections
+
+        locked, unlocked, idle
+            the number of connections in each state, as reported by
+            :meth:`connection_stats`
+
+        waiting
+            the number of threads currently waiting for a connection
+
+        wait_times
+            a list of (limit, count) tuples giving a histogram of the
+            time threads spent waiting to acquire a connection.  Each
+            count is the number of acquisitions that took no more than
+            limit seconds (and more than the previous limit). The
+            final limit is None, the count of the slowest acquisitions.
+            The limits are taken from :data:`POOL_WAIT_LIMITS`.
+
+        affinity
+            the number of times a thread re-acquired the connection it
+            last used
+
+        recycled
+            the number of times a thread took an unused connection from
+            a different thread
+
+        opened
+            the number of connections opened by the pool
+
+        invalid
+            the number of connections discarded after failing
+            validation"""
+        with self.cpool_lock:
+            return {
+                'size': self.cpool_size,
+                'min': self.cpool_min,
+                'max': self.cpool_max,
+                'locked': len(self.cpool_locked),
+                'unlocked': len(self.cpool_unlocked),
+                'idle': len(self.cpool_idle),
+                'waiting': len(self.cpool_waiters),
+                'wait_times': list(zip(POOL_WAIT_LIMITS + (None, ),
+                                       self.cpool_wait_counts)),
+                'affinity': self.cpool_affinity,
+                'recycled': self.cpool_recycled,
+                'opened': self.cpool_opened,
+                'invalid': self.cpool_invalid}
+
+    def query_plan_stats(self):
+        """Return information about the query plan cache
+
+        Returns a triple of:
+
+        hits
+            the number of queries that used a cached plan
+
+        misses
+            the number of queries that had to be compiled
+
+        size
+            the number of plans currently in the cache"""
+        with self.plan_cache.lock:
+            return (self.plan_cache.hits, self.plan_cache.misses,
+                    len(self.plan_cache))
+
     def _run_pool_cleaner(self, max_idle=SQL_TIMEOUT * 10.0):
         run_time = max_idle / 5.0
         if run_time < 60.0:
             run_time = 60.0
         while not self.closing.is_set():
             self.closing.wait(run_time)
-            self.pool_cleaner(max_idle)
+            if self.closing.is_set():
+                break
+            try:
+                self.pool_cleaner(max_idle)
+            except Exception as err:
+                logging.error("pool_cleaner failed: %s", str(err))
+
+    def prewarm(self):
+        """Opens connections in advance of being needed
+
+        New connections are opened (and placed in the idle pool) until
+        the pool contains at least the *min_connections* passed on
+        construction.  This method is called automatically when the
+        first connection is acquired and by the :meth:`pool_cleaner`
+        but you may call it directly, for example, to ensure a service
+        has open connections before it starts accepting requests.
+
+        Any error opening a connection is raised by this method, when
+        called automatically on acquire the error is logged instead."""
+        while True:
+            with self.cpool_lock:
+                if (self.closing.is_set() or
+                        self.cpool_size >= self.cpool_min):
+                    return
+                self.cpool_size += 1
+            cpool_item = SQLConnection()
+            try:
+                cpool_item.dbc = self.open()
+            except Exception:
+                with self.cpool_lock:
+                    self.cpool_size -= 1
+                raise
+            cpool_item.last_seen = cpool_item.last_checked = time.time()
+            with self.cpool_lock:
+                self.cpool_opened += 1
+                self.cpool_idle.append(cpool_item)
+                self.cpool_lock.notify_all()
+
+    def validate_connection(self, connection):
+        """Tests a database connection
+
+        connection
+            A database connection object as returned by :meth:`open`.
+
+        Returns True if the connection is usable, False otherwise. The
+        default implementation executes the statement "SELECT 1". This
+        method is used by the :meth:`pool_cleaner` when the container
+        was created with *validate* set to True.  It is called from the
+        pool cleaner's thread and only when *connection* is not in use
+        by any other thread."""
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            return True
+        except self.dbapi.Error as err:
+            logging.warning("Database connection failed validation: %s",
+                            str(err))
+            return False
 
     def pool_cleaner(self, max_idle=SQL_TIMEOUT * 10.0):
         """Cleans up the connection pool
@@ -4802,14 +5937,21 @@ class SQLEntityContainer(object):
         max_idle (float)
             Optional number of seconds beyond which an idle connection
             is closed.  Defaults to 10 times the
-            :data:`SQL_TIMEOUT`."""
+            :data:`SQL_TIMEOUT`.
+
+        Connections are only closed for being idle if the pool has more
+        than *min_connections* (see the constructor for details).  If
+        validation is enabled, the connections that remain and are not
+        in use are tested with :meth:`validate_connection`.  Finally,
+        :meth:`prewarm` is called to replace any connections that have
+        been closed."""
         now = time.time()
         old_time = now - max_idle
         to_close = []
         with self.cpool_lock:
             locked_list = list(dict_values(self.cpool_locked))
             for cpool_item in locked_list:
-                if not cpool_item.thread.isAlive():
+                if not cpool_item.thread.is_alive():
                     logging.error(
                         "Thread[%i] failed to release database connection "
                         "before terminating", cpool_item.thread_id)
@@ -4817,7 +5959,7 @@ class SQLEntityContainer(object):
                     to_close.append(cpool_item.dbc)
             unlocked_list = list(dict_values(self.cpool_unlocked))
             for cpool_item in unlocked_list:
-                if not cpool_item.thread.isAlive():
+                if not cpool_item.thread.is_alive():
                     logging.debug(
                         "pool_cleaner moving database connection to idle "
                         "after Thread[%i] terminated",
@@ -4827,7 +5969,8 @@ class SQLEntityContainer(object):
                     cpool_item.thread = None
                     self.cpool_idle.append(cpool_item)
                 elif (cpool_item.last_seen <= old_time and
-                        self.dbapi.threadsafety <= 1):
+                        self.dbapi.threadsafety <= 1 and
+                        self.cpool_size > self.cpool_min):
                     logging.debug(
                         "pool_cleaner removing database connection "
                         "after Thread[%i] timed out",
@@ -4839,14 +5982,57 @@ class SQLEntityContainer(object):
             while i:
                 i = i - 1
                 cpool_item = self.cpool_idle[i]
-                if cpool_item.last_seen <= old_time:
+                if (cpool_item.last_seen <= old_time and
+                        self.cpool_size > self.cpool_min):
                     logging.info("pool_cleaner removed idle connection")
                     to_close.append(cpool_item.dbc)
                     del self.cpool_idle[i]
                     self.cpool_size -= 1
+            if self.cpool_validate:
+                # take the connections out of the pool while we test them
+                to_check = [(None, cpool_item) for cpool_item in
+                            self.cpool_idle]
+                del self.cpool_idle[:]
+                to_check += list(dict_items(self.cpool_unlocked))
+                self.cpool_unlocked.clear()
+            else:
+                to_check = []
         for dbc in to_close:
             if dbc is not None:
                 self.close_connection(dbc)
+        if to_check:
+            self._validate_connections(to_check)
+        self.prewarm()
+
+    def _validate_connections(self, to_check):
+        now = time.time()
+        to_close = []
+        for thread_id, cpool_item in to_check:
+            if cpool_item.dbc is None:
+                continue
+            if self.validate_connection(cpool_item.dbc):
+                cpool_item.last_checked = now
+            else:
+                to_close.append(cpool_item)
+        with self.cpool_lock:
+            for thread_id, cpool_item in to_check:
+                if cpool_item in to_close:
+                    self.cpool_size -= 1
+                    self.cpool_invalid += 1
+                elif (thread_id is None or thread_id in self.cpool_locked or
+                        thread_id in self.cpool_unlocked):
+                    # the owning thread has moved on
+                    cpool_item.thread = cpool_item.thread_id = None
+                    self.cpool_idle.append(cpool_item)
+                else:
+                    self.cpool_unlocked[thread_id] = cpool_item
+            self.cpool_lock.notify_all()
+        for cpool_item in to_close:
+            try:
+                self.close_connection(cpool_item.dbc)
+            except self.dbapi.Error as err:
+                logging.warning("Error closing invalid connection: %s",
+                                str(err))
 
     def open(self):
         """Creates and returns a new connection object.
@@ -4907,10 +6093,8 @@ class SQLEntityContainer(object):
             nlocked = None
             while True:
                 while self.cpool_idle:
+                    # idle connections are not owned by any thread
                     cpool_item = self.cpool_idle.pop()
-                    logging.error(
-                        "Thread[%i] failed to release database connection "
-                        "before terminating", cpool_item.thread_id)
                     to_close.append(cpool_item.dbc)
                 while self.cpool_unlocked:
                     unlocked_id, cpool_item = self.cpool_unlocked.popitem()
@@ -4923,7 +6107,7 @@ class SQLEntityContainer(object):
                             "before closing container", cpool_item.thread_id)
                         del self.cpool_locked[cpool_item.thread_id]
                         to_close.append(cpool_item.dbc)
-                    elif not cpool_item.thread.isAlive():
+                    elif not cpool_item.thread.is_alive():
                         logging.error(
                             "Thread[%i] failed to release database connection "
                             "before terminating", cpool_item.thread_id)
@@ -5551,6 +6735,9 @@ class SQLiteEntityContainer(SQLEntityContainer):
         clause = []
         if top:
             clause.append('LIMIT %i ' % top)
+        elif skip:
+            # SQLite requires a LIMIT clause before OFFSET
+            clause.append('LIMIT -1 ')
         if skip:
             clause.append('OFFSET %i ' % skip)
             skip = 0
@@ -5568,6 +6755,9 @@ class SQLiteEntityCollectionBase(SQLCollectionBase):
     DEFAULT_VALUE = False
     """SQLite does not support setting a value =DEFAULT"""
 
+    ROW_VALUES = sqlite3.sqlite_version_info >= (3, 15, 0)
+    """SQLite supports row values from version 3.15.0"""
+
     def sql_expression_substring(self, expression, params, context):
         """Converts the substring method
 
@@ -5709,7 +6899,10 @@ class SQLiteStreamStore(blockstore.StreamStore):
     dpath
         The optional directory path to the file system to use for
         storing the blocks of data. If dpath is None then the blocks are
-        stored in the SQLite database itself."""
+        stored in the SQLite database itself.
+
+    read_ahead and write_behind are passed to
+    :py:class:`pyslet.blockstore.StreamStore`."""
 
     def load_container(self):
         """Loads and returns a default entity container
@@ -5728,7 +6921,8 @@ class SQLiteStreamStore(blockstore.StreamStore):
             doc.read(f)
         return doc.root.DataServices['StreamStoreSchema.Container']
 
-    def __init__(self, file_path, dpath=None):
+    def __init__(self, file_path, dpath=None, read_ahead=0,
+                 write_behind=0):
         self.container_def = self.load_container()
         if isinstance(file_path, OSFilePath):
             file_path = str(file_path)
@@ -5744,4 +6938,5 @@ class SQLiteStreamStore(blockstore.StreamStore):
                 entity_set=self.container_def['Blocks'])
         ls = blockstore.LockStore(entity_set=self.container_def['Locks'])
         blockstore.StreamStore.__init__(
-            self, bs, ls, self.container_def['Streams'])
+            self, bs, ls, self.container_def['Streams'],
+            read_ahead=read_ahead, write_behind=write_behind)
@@ -3,6 +3,7 @@
 
 import logging
 import os.path
+import re
 
 from sys import maxunicode
 from pickle import dump, load
@@ -137,6 +138,12 @@ class CharClass(UnicodeMixin):
 
     """
 
+    # class-level defaults, instances unpickled from the resource files
+    # were created without these attributes
+    _bmp = None
+    _span_re = None
+    _span_bre = None
+
     @classmethod
     def ucd_category(cls, category):
         """Returns the character class representing the Unicode category.
@@ -325,6 +332,7 @@ class CharClass(UnicodeMixin):
 
     def add_range(self, a, z):
         """Adds a range of characters from a to z to the class"""
+        self._check_frozen()
         # our implementation assumes that codepoint is used in
         # comparisons
         a = force_text(a)
@@ -375,6 +383,7 @@ class CharClass(UnicodeMixin):
 
     def subtract_range(self, a, z):
         """Subtracts a range of characters from the character class"""
+        self._check_frozen()
         a = force_text(a)
         z = force_text(z)
         if z < a:
@@ -460,6 +469,7 @@ class CharClass(UnicodeMixin):
 
     def add_char(self, c):
         """Adds a single character to the character class"""
+        self._check_frozen()
         c = force_text(c)
         if self.ranges:
             match, index = self._bisection_search(c, 0, len(self.ranges) - 1)
@@ -472,6 +482,7 @@ class CharClass(UnicodeMixin):
 
     def subtract_char(self, c):
         """Subtracts a single character from the character class"""
+        self._check_frozen()
         c = force_text(c)
         if self.ranges:
             match, index = self._bisection_search(c, 0, len(self.ranges) - 1)
@@ -495,17 +506,19 @@ class CharClass(UnicodeMixin):
         """Adds all the characters in c to the character class
 
         This is effectively a union operation."""
+        self._check_frozen()
         if self.ranges:
             for r in c.ranges:
                 self.add_range(r[0], r[1])
         else:
             # take a short cut here, if we have no ranges yet just copy them
             for r in c.ranges:
-                self.ranges.append(r)
+                self.ranges.append([r[0], r[1]])
         self._clear_cache()
 
     def subtract_class(self, c):
         """Subtracts all the characters in c from the character class"""
+        self._check_frozen()
         for r in c.ranges:
             self.subtract_range(r[0], r[1])
         self._clear_cache()
@@ -520,6 +533,7 @@ class CharClass(UnicodeMixin):
 
         Results in the class of all characters *except* line feed and
         carriage return."""
+        self._check_frozen()
         max = CharClass([character(0), character(maxunicode)])
         max.subtract_class(self)
         self.ranges = max.ranges
@@ -549,6 +563,111 @@ class CharClass(UnicodeMixin):
 
     def _clear_cache(self):
         self._block_cache = [None] * 256
+        self._span_re = None
+        self._span_bre = None
+
+    def _check_frozen(self):
+        if self._bmp is not None:
+            raise ValueError("Can't modify a frozen CharClass")
+
+    def freeze(self):
+        """Freezes this character class
+
+        A frozen class precomputes a bitmap of all the characters in the
+        Basic Multilingual Plane that it contains.  Subsequent calls to
+        :meth:`test` are reduced to a single lookup (the block cache is
+        bypassed) at the expense of 64K of memory.  Character classes
+        that are used heavily by parsers and are defined at module level
+        should be frozen.
+
+        Once frozen, any attempt to modify the class raises ValueError.
+        As a convenience, returns the object as the result enabling this
+        method to be used in construction, e.g.::
+
+            hex_digit = CharClass(('0', '9'), ('a', 'f')).freeze()"""
+        if self._bmp is None:
+            bmp = bytearray(0x10000)
+            for a, z in self.ranges:
+                a = ord(a)
+                if a > 0xFFFF:
+                    break
+                z = min(ord(z), 0xFFFF) + 1
+                bmp[a:z] = b'\x01' * (z - a)
+            self._bmp = bmp
+        return self
+
+    def span_re(self, binary=False):
+        """Returns a compiled regular expression for this class
+
+        binary (defaults to False)
+            If True, the expression is compiled for matching binary
+            strings and matches bytes with values in this class, i.e.,
+            characters with code points greater than 255 are ignored.
+
+        The expression matches a run of one or more characters in the
+        class.  Unlike the string representation of the class, which
+        is suitable for use in more complex expressions, the result is
+        cached and is built by escaping each character in the class
+        rather than relying on any special forms."""
+        if binary:
+            if self._span_bre is None:
+                bset = []
+                for a, z in self.ranges:
+                    a = ord(a)
+                    if a > 0xFF:
+                        break
+                    z = min(ord(z), 0xFF)
+                    bset.append(re.escape(bytes(bytearray([a]))))
+                    if z > a:
+                        bset.append(b'-')
+                        bset.append(re.escape(bytes(bytearray([z]))))
+                if bset:
+                    self._span_bre = re.compile(
+                        b'[' + b''.join(bset) + b']+')
+                else:
+                    self._span_bre = re.compile(b'(?!)')
+            return self._span_bre
+        else:
+            if self._span_re is None:
+                uset = []
+                for a, z in self.ranges:
+                    uset.append(re.escape(a))
+                    if z != a:
+                        uset.append(ul('-'))
+                        uset.append(re.escape(z))
+                if uset:
+                    self._span_re = re.compile(
+                        ul('[%s]+') % ul('').join(uset))
+                else:
+                    self._span_re = re.compile(ul('(?!)'))
+            return self._span_re
+
+    def match_span(self, src, pos=0):
+        """Matches a run of characters in this class
+
+        src
+            A character string or, for binary mode, a string of bytes.
+
+        pos (defaults to 0)
+            The position in *src* at which to start matching
+
+        Returns the index of the first character after the run of
+        characters in *src* (starting at *pos*) that are in this class.
+        If the character at *pos* is not in the class (or *pos* is at
+        or beyond the end of *src*) then *pos* is returned.  For
+        example::
+
+            >>> CharClass(('a', 'z')).match_span("hello world")
+            5
+
+        This method uses the compiled expressions described in
+        :meth:`span_re` and is much faster than calling :meth:`test`
+        repeatedly when parsing long runs of characters."""
+        match = self.span_re(not is_unicode(src)).match(src, pos)
+        if match is None:
+            return pos
+        else:
+            return match.end()
 
     def test(self, c):
         """Test a unicode character.
@@ -580,6 +699,13 @@ class CharClass(UnicodeMixin):
             return False
         elif self.ranges:
             cv = ord(c)
+            if self._bmp is not None:
+                try:
+                    return self._bmp[cv] != 0
+                except IndexError:
+                    match, index = self._bisection_search(
+                        c, 0, len(self.ranges) - 1)
+                    return match
             block_num = cv >> 8
             try:
                 block = self._block_cache[block_num]
@@ -1227,6 +1353,27 @@ class BasicParser(ParserMixin, PEP8Compatibility):
         else:
             return None
 
+    def parse_span(self, char_class):
+        """Parses a run of characters from *char_class*
+
+        char_class
+            A :class:`CharClass` instance.  In binary mode bytes are
+            matched using their values as code points.
+
+        Returns the longest string of characters (or bytes) in
+        *char_class* starting at the current position or None if the
+        current character is not in *char_class*.  The run is matched in
+        a single call to :meth:`CharClass.match_span`."""
+        if self.the_char is None:
+            return None
+        end = char_class.match_span(self.src, self.pos)
+        if end > self.pos:
+            result = self.src[self.pos:end]
+            self.setpos(end)
+            return result
+        else:
+            return None
+
     u_digits = ul("0123456789")
     b_digits = b"0123456789"
 
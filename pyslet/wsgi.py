@@ -8,6 +8,7 @@ import io
 import json
 import logging
 import mimetypes
+import mmap
 import optparse
 import os
 import quopri
@@ -16,6 +17,7 @@ import sys
 import threading
 import time
 import traceback
+import zlib
 
 from hashlib import sha256
 from wsgiref.simple_server import make_server
@@ -23,6 +25,7 @@ from wsgiref.simple_server import make_server
 from . import iso8601 as iso
 from .http import (
     cookie,
+    grammar,
     messages,
     params)
 from .odata2 import (
@@ -500,6 +503,429 @@ class DispatchNode(object):
         self._nodes = {}
 
 
+class _DispatchState(object):
+
+    # a state in a compiled dispatcher.  transitions maps path
+    # segments onto the next state, default is the next state for any
+    # other segment, handler is the result if the path ends in this
+    # state and final, if not None, is the result regardless of any
+    # remaining path segments.  A next state of None means 404.
+
+    __slots__ = ('transitions', 'default', 'handler', 'final')
+
+    def __init__(self):
+        self.transitions = {}
+        self.default = None
+        self.handler = None
+        self.final = None
+
+
+class _Dispatcher(object):
+
+    """A compiled form of a tree of :class:`DispatchNode` instances
+
+    Paths registered without wildcards are looked up directly in a
+    dictionary.  Other paths are matched by a deterministic automaton
+    built from the tree in which each state represents the ordered list
+    of nodes that the original backtracking search could be at after
+    consuming the same path segments, the first being the preferred
+    match and the remainder the wildcard fall-back positions.  Matching
+    is therefore a single pass over the path segments.
+
+    The search rules are unchanged: named segments are preferred to
+    wildcards, a search that runs out of named and wildcard segments
+    falls back to the most recent trailing wildcard passed on the way
+    down (if any) and otherwise backtracks to the most recent
+    alternative wildcard segment."""
+
+    def __init__(self, root):
+        #: a dictionary mapping literal paths onto handlers
+        self.exact = {}
+        self._collect(root, [])
+        self._states = {}
+        self.start = self._compile(((root, None), ))
+        self._states = None
+
+    def _collect(self, node, path):
+        if node._handler is not None and path:
+            self.exact['/'.join(path)] = node._handler
+        for p, child in dict_items(node._nodes):
+            if p != '*':
+                self._collect(child, path + [p])
+
+    @staticmethod
+    def _advance(node, wildcard):
+        if node._wildcard is not None:
+            wildcard = node._wildcard
+        return (node, wildcard)
+
+    def _step(self, items, p):
+        # items is an ordered tuple of (node, wildcard) pairs or a
+        # (None, handler) pair representing a match that no longer
+        # depends on the rest of the path and always comes last.
+        result = []
+        for node, wildcard in items:
+            if node is None:
+                result.append((node, wildcard))
+                break
+            named = node._nodes.get(p, None)
+            wild_node = node._nodes.get('*', None)
+            if named is not None:
+                result.append(self._advance(named, wildcard))
+                if wild_node is not None:
+                    # this is a fall-back node
+                    result.append(self._advance(wild_node, wildcard))
+            elif wild_node is not None:
+                result.append(self._advance(wild_node, wildcard))
+            elif wildcard is not None:
+                # use the active wildcard whatever follows
+                result.append((None, wildcard))
+                break
+            # otherwise this is a dead end, try the fall-backs
+        return tuple(result)
+
+    def _compile(self, items):
+        if not items:
+            return None
+        state = self._states.get(items, None)
+        if state is not None:
+            return state
+        state = _DispatchState()
+        self._states[items] = state
+        node, wildcard = items[0]
+        if node is None:
+            state.final = wildcard
+            return state
+        if node._handler is not None:
+            state.handler = node._handler
+        else:
+            state.handler = wildcard
+        segments = set()
+        for node, wildcard in items:
+            if node is not None:
+                segments.update(node._nodes.keys())
+        for p in segments:
+            state.transitions[p] = self._compile(self._step(items, p))
+        # None is never a key in the tree so matches wildcards only
+        state.default = self._compile(self._step(items, None))
+        return state
+
+    def match(self, path):
+        """Returns the handler for *path* or None if there is no match"""
+        handler = self.exact.get(path, None)
+        if handler is not None:
+            return handler
+        state = self.start
+        for p in path.split('/'):
+            if state.final is not None:
+                return state.final
+            state = state.transitions.get(p, state.default)
+            if state is None:
+                return None
+        if state.final is not None:
+            return state.final
+        return state.handler
+
+
+class CompressionMiddleware(object):
+
+    """WSGI middleware that compresses response bodies
+
+    app
+        The WSGI application to wrap, for example, a
+        :class:`WSGIApp` instance's :meth:`WSGIApp.call_wrapper` or an
+        OData :class:`pyslet.odata2.server.Server` instance.
+
+    min_size (1024)
+        Responses with a Content-Length smaller than this value are
+        passed through uncompressed.  Responses with no Content-Length,
+        such as streamed feeds, are always compressed.
+
+    types (None)
+        A list of :class:`pyslet.http.messages.MediaRange` instances
+        that the Content-Type of a response must match for it to be
+        compressed.  Defaults to :attr:`DEFAULT_TYPES`.
+
+    level (6)
+        The zlib compression level.
+
+    metrics_callback (None)
+        A callable that is called after each compressed response has
+        been sent.  It is called with three arguments: the content
+        coding used ("gzip" or "deflate"), the number of bytes produced
+        by the application and the number of bytes actually sent.
+
+    The content coding is negotiated using the request's
+    Accept-Encoding header, gzip is preferred to deflate when both are
+    equally acceptable.  Responses that already have a Content-Encoding
+    or Content-Range are never modified.
+
+    Each string returned by the application (or passed to the write
+    callable) is compressed and flushed to the server as it is received
+    so streamed responses continue to be delivered incrementally.
+
+    The Content-Length is removed from compressed responses and a
+    strong ETag has the content coding appended, e.g., "abc" becomes
+    "abc-gzip", as the compressed entity is not byte-for-byte identical
+    to the original.  So that conditional requests continue to work,
+    each strong entity tag in an If-None-Match header that ends with
+    a coding suffix is passed to the application twice: unchanged
+    and with the suffix removed.  Weak tags are never changed.  If
+    the application responds with 304 and the ETag of the response
+    matches a tag that had its suffix removed, the suffix is restored
+    in the ETag.  Any other 304 response is left unchanged."""
+
+    #: the default list of compressible media ranges
+    DEFAULT_TYPES = [messages.MediaRange.from_str(t) for t in (
+        'text/*', 'application/json', 'application/javascript',
+        'application/xml', 'application/atom+xml',
+        'application/atomsvc+xml', 'application/xhtml+xml',
+        'image/svg+xml')]
+
+    #: the zlib wbits parameter used for each supported coding
+    CODINGS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+    def __init__(self, app, min_size=1024, types=None, level=6,
+                 metrics_callback=None):
+        self.app = app
+        self.min_size = min_size
+        self.types = self.DEFAULT_TYPES if types is None else types
+        self.level = level
+        self.metrics_callback = metrics_callback
+        self.lock = threading.Lock()
+        #: the number of responses compressed
+        self.responses = 0
+        #: the total number of bytes produced by the application in
+        #: compressed responses
+        self.raw_bytes = 0
+        #: the total number of bytes sent in compressed responses
+        self.encoded_bytes = 0
+
+    def compression_ratio(self):
+        """Returns the overall compression ratio
+
+        The result is the total number of compressed bytes sent as a
+        fraction of the number of bytes produced by the application, or
+        None if nothing has been compressed yet."""
+        with self.lock:
+            if self.raw_bytes:
+                return float(self.encoded_bytes) / self.raw_bytes
+            else:
+                return None
+
+    def select_coding(self, environ):
+        """Returns the content coding to use for a request
+
+        Returns "gzip", "deflate" or None if the response should not be
+        compressed."""
+        if environ.get('REQUEST_METHOD', 'GET').upper() == 'HEAD':
+            return None
+        accept = environ.get('HTTP_ACCEPT_ENCODING', None)
+        if not accept:
+            return None
+        try:
+            alist = messages.AcceptEncodingList.from_str(accept)
+        except grammar.BadSyntax:
+            return None
+        coding = alist.select_token(["gzip", "deflate", "identity"])
+        if coding in self.CODINGS:
+            return coding
+        else:
+            return None
+
+    def compressible(self, status, response_headers):
+        """Returns True if a response should be compressed
+
+        status
+            The status line passed to start_response
+
+        response_headers
+            The list of header tuples passed to start_response"""
+        try:
+            code = int(status.split()[0])
+        except ValueError:
+            return False
+        if code < 200 or code in (204, 206, 304):
+            return False
+        mtype = None
+        for h, v in response_headers:
+            h = h.lower()
+            if h in ('content-encoding', 'content-range'):
+                return False
+            elif h == 'content-length':
+                try:
+                    if int(v) < self.min_size:
+                        return False
+                except ValueError:
+                    return False
+            elif h == 'content-type':
+                try:
+                    mtype = params.MediaType.from_str(v)
+                except grammar.BadSyntax:
+                    return False
+        if mtype is None:
+            return False
+        for r in self.types:
+            if r.match_media_type(mtype):
+                return True
+        return False
+
+    def __call__(self, environ, start_response):
+        coding = self.select_coding(environ)
+        if coding is None:
+            return self.app(environ, start_response)
+        response = _CompressedResponse(self, coding, start_response)
+        match = environ.get('HTTP_IF_NONE_MATCH', None)
+        if match:
+            try:
+                tags = list(messages.EntityTagList.from_str(match))
+            except grammar.BadSyntax:
+                tags = []
+            stripped = []
+            for tag in tags:
+                if tag.weak:
+                    continue
+                for c in self.CODINGS:
+                    suffix = ('-%s' % c).encode('ascii')
+                    if tag.tag.endswith(suffix):
+                        new_tag = params.EntityTag(tag.tag[:-len(suffix)],
+                                                   weak=False)
+                        response.stripped[new_tag.tag] = tag
+                        stripped.append(new_tag)
+            if stripped:
+                environ = environ.copy()
+                environ['HTTP_IF_NONE_MATCH'] = str(
+                    messages.EntityTagList(*(tags + stripped)))
+        return response.run(
+            self.app(environ, response.start_response))
+
+    def _add_metrics(self, coding, raw_size, encoded_size):
+        with self.lock:
+            self.responses += 1
+            self.raw_bytes += raw_size
+            self.encoded_bytes += encoded_size
+        if self.metrics_callback is not None:
+            self.metrics_callback(coding, raw_size, encoded_size)
+
+
+class _CompressedResponse(object):
+
+    # the state of a single response passing through the compression
+    # middleware.  compressor is None until start_response decides
+    # that the response is to be compressed.
+
+    def __init__(self, middleware, coding, start_response):
+        self.middleware = middleware
+        self.coding = coding
+        self._start_response = start_response
+        self._write = None
+        self.compressor = None
+        self.raw_size = 0
+        self.encoded_size = 0
+        self.result = None
+        # maps stripped If-None-Match tags onto the original tags
+        self.stripped = {}
+
+    def start_response(self, status, response_headers, exc_info=None):
+        if self.stripped and status.split()[0] == '304':
+            response_headers = self.not_modified_headers(response_headers)
+        if exc_info is None and self.middleware.compressible(
+                status, response_headers):
+            self.compressor = zlib.compressobj(
+                self.middleware.level, zlib.DEFLATED,
+                self.middleware.CODINGS[self.coding])
+            headers = []
+            vary = None
+            for h, v in response_headers:
+                hl = h.lower()
+                if hl == 'content-length':
+                    continue
+                elif hl == 'etag':
+                    v = v.strip()
+                    if v.startswith('"') and v.endswith('"'):
+                        v = '%s-%s"' % (v[:-1], self.coding)
+                elif hl == 'vary':
+                    vary = v
+                    if (v.strip() != '*' and
+                            'accept-encoding' not in v.lower()):
+                        v = v + ", Accept-Encoding"
+                headers.append((h, v))
+            headers.append(('Content-Encoding', self.coding))
+            if vary is None:
+                headers.append(('Vary', 'Accept-Encoding'))
+            response_headers = headers
+        else:
+            self.compressor = None
+        self._write = self._start_response(
+            status, response_headers, exc_info)
+        return self.write
+
+    def not_modified_headers(self, response_headers):
+        # restores the coding suffix to the ETag of a 304 response that
+        # matched a stripped tag
+        headers = []
+        vary = None
+        etag = None
+        for h, v in response_headers:
+            hl = h.lower()
+            if hl == 'content-encoding':
+                return response_headers
+            elif hl == 'etag':
+                try:
+                    etag = params.EntityTag.from_str(v)
+                except grammar.BadSyntax:
+                    return response_headers
+                if etag.weak or etag.tag not in self.stripped:
+                    return response_headers
+                v = str(self.stripped[etag.tag])
+            elif hl == 'vary':
+                vary = v
+                if (v.strip() != '*' and
+                        'accept-encoding' not in v.lower()):
+                    v = v + ", Accept-Encoding"
+            headers.append((h, v))
+        if etag is None:
+            return response_headers
+        if vary is None:
+            headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+    def compress(self, data):
+        if self.compressor is None or not data:
+            return data
+        self.raw_size += len(data)
+        data = self.compressor.compress(data) + \
+            self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.encoded_size += len(data)
+        return data
+
+    def write(self, data):
+        data = self.compress(data)
+        if data:
+            self._write(data)
+
+    def run(self, result):
+        self.result = result
+        return self
+
+    def __iter__(self):
+        for data in self.result:
+            data = self.compress(data)
+            if data:
+                yield data
+        if self.compressor is not None:
+            data = self.compressor.flush()
+            self.encoded_size += len(data)
+            self.compressor = None
+            yield data
+            self.middleware._add_metrics(
+                self.coding, self.raw_size, self.encoded_size)
+
+    def close(self):
+        if hasattr(self.result, 'close'):
+            self.result.close()
+
+
 class WSGIApp(DispatchNode):
 
     """An object to help support WSGI-based applications.
@@ -584,7 +1010,13 @@ class WSGIApp(DispatchNode):
 
     private (None)
         A URL to the private files.  Interpreted as per the 'static'
-        setting above."""
+        setting above.
+
+    compress (False)
+        If True, :meth:`run_server` wraps the application in a
+        :class:`CompressionMiddleware` instance so that responses are
+        compressed when the client accepts gzip or deflate content
+        codings."""
 
     #: the class settings loaded from :attr:`settings_file` by
     #: :meth:`setup`
@@ -762,6 +1194,7 @@ class WSGIApp(DispatchNode):
         if is_text(cls.static_files):
             # catch older class definitions
             cls.static_files = OSFilePath(cls.static_files)
+        settings.setdefault('compress', False)
         url = settings.setdefault('private', None)
         if cls.private_files is None and url:
             cls.private_files = cls.resolve_setup_path(url)
@@ -803,6 +1236,7 @@ class WSGIApp(DispatchNode):
     def __init__(self):
         # keyword arguments end here, no more super after WSGIApp
         DispatchNode.__init__(self)
+        self._dispatcher = None
         #: flag: set to True to request :meth:`run_server` to exit
         self.stop = False
         with self.clslock:
@@ -858,7 +1292,13 @@ class WSGIApp(DispatchNode):
         path will be routed to its preferred handler.  Similarly you can
         register "/*/background.png" and "/home/background.png" but
         remember the '*' only matches a single path component!  There is
-        no way to match background.png in any directory."""
+        no way to match background.png in any directory.
+
+        The registered paths are compiled into a dispatcher when the
+        first request is handled after a change, there is no need to
+        register all methods during :meth:`init_dispatcher` though it
+        is more efficient to do so."""
+        self._dispatcher = None
         path = path.split('/')
         if not path:
             path = ['']
@@ -933,39 +1373,12 @@ class WSGIApp(DispatchNode):
             environ, start_response,
             self.settings['WSGIApp']['canonical_root'])
         try:
-            path = context.environ['PATH_INFO'].split('/')
-            if not path:
-                # empty path
-                path = ['']
-            i = 0
-            node = self
-            wildcard = None
-            stack = []
-            while i < len(path):
-                p = path[i]
-                old_node = node
-                wild_node = old_node._nodes.get('*', None)
-                node = old_node._nodes.get(p, None)
-                if node:
-                    if wild_node:
-                        # this is a fall-back node, push it
-                        stack.append((i, wild_node, wildcard))
-                elif wild_node:
-                    node = wild_node
-                elif wildcard:
-                    # if there is an active wildcard, use it
-                    break
-                elif stack:
-                    i, node, wildcard = stack.pop()
-                else:
-                    break
-                if node._wildcard is not None:
-                    wildcard = node._wildcard
-                i += 1
-            if node and node._handler is not None:
-                return node._handler(context)
-            if wildcard:
-                return wildcard(context)
+            dispatcher = self._dispatcher
+            if dispatcher is None:
+                dispatcher = self._dispatcher = _Dispatcher(self)
+            handler = dispatcher.match(context.environ['PATH_INFO'])
+            if handler is not None:
+                return handler(context)
             # we didn't find a handler
             return self.error_page(context, 404)
         except MethodNotAllowed:
@@ -1054,29 +1467,196 @@ class WSGIApp(DispatchNode):
             :class:`pyslet.vfs.OSFilePath` instance.
 
         The Content-Length header is set from the file size, the
-        Last-Modified date is set from the file's st_mtime and the
-        file's data is returned in chunks of :attr:`MAX_CHUNK` in the
-        response.
+        Last-Modified date is set from the file's st_mtime and an ETag
+        is calculated from the file's size and st_mtime.
+
+        If the WSGI server provides wsgi.file_wrapper it is used to
+        return the file's data, otherwise the file is memory mapped and
+        the data is returned in chunks of :attr:`MAX_CHUNK`.
 
         The status is *not* set and must have been set before calling
-        this method."""
+        this method.  If the status is 200 and the request is a GET (or
+        HEAD) then conditional requests are honoured using the
+        If-None-Match and If-Modified-Since headers resulting in a 304
+        response.  Range requests are also supported resulting in a 206
+        response containing a single range or a multipart/byteranges
+        response when multiple ranges are requested.  Unsatisfiable
+        ranges result in a 416 response."""
         if is_text(file_path):
             file_path = OSFilePath(file_path)
         finfo = file_path.stat()
-        context.add_header("Content-Length", str(finfo.st_size))
-        context.add_header("Last-Modified",
-                           str(params.FullDate.from_unix_time(finfo.st_mtime)))
+        fsize = finfo.st_size
+        etag = params.EntityTag(
+            "%x-%x" % (int(finfo.st_mtime * 1000000), fsize), weak=False)
+        mtime = int(finfo.st_mtime)
+        last_modified = str(params.FullDate.from_unix_time(mtime))
+        ranges = None
+        if (context.status == 200 and
+                context.environ.get('REQUEST_METHOD') in ('GET', 'HEAD')):
+            if self._file_not_modified(context, etag, mtime):
+                context.set_status(304)
+                context.add_header("ETag", str(etag))
+                context.add_header("Last-Modified", last_modified)
+                context.start_response()
+                return []
+            context.add_header("Accept-Ranges", "bytes")
+            ranges = self._file_ranges(context, etag, mtime, fsize)
+        context.add_header("ETag", str(etag))
+        context.add_header("Last-Modified", last_modified)
+        if ranges is None:
+            context.add_header("Content-Length", str(fsize))
+            context.start_response()
+            wrapper = context.environ.get('wsgi.file_wrapper', None)
+            if wrapper is not None:
+                return wrapper(file_path.open('rb'), self.MAX_CHUNK)
+            return self._file_chunks(file_path, [(b'', 0, fsize)])
+        elif not ranges:
+            context.set_status(416)
+            context.add_header(
+                "Content-Range", str(messages.ContentRange(total_len=fsize)))
+            context.add_header("Content-Length", "0")
+            context.start_response()
+            return []
+        context.set_status(206)
+        if len(ranges) == 1:
+            r = ranges[0]
+            context.add_header("Content-Range", str(r))
+            context.add_header("Content-Length", str(len(r)))
+            context.start_response()
+            return self._file_chunks(
+                file_path, [(b'', r.first_byte, r.last_byte + 1)])
+        # multiple ranges, replace the Content-Type with
+        # multipart/byteranges and use the original type in each part
+        ctype = None
+        i = 0
+        while i < len(context.headers):
+            if context.headers[i][0].lower() == 'content-type':
+                ctype = context.headers[i][1]
+                del context.headers[i]
+            else:
+                i += 1
+        boundary = "%032x" % random.getrandbits(128)
+        parts = []
+        clen = 0
+        for r in ranges:
+            if ctype is None:
+                phead = "\r\n--%s\r\nContent-Range: %s\r\n\r\n" % (
+                    boundary, str(r))
+            else:
+                phead = ("\r\n--%s\r\nContent-Type: %s\r\n"
+                         "Content-Range: %s\r\n\r\n") % (
+                    boundary, ctype, str(r))
+            phead = phead.encode('ascii')
+            parts.append((phead, r.first_byte, r.last_byte + 1))
+            clen += len(phead) + len(r)
+        trailer = ("\r\n--%s--\r\n" % boundary).encode('ascii')
+        parts.append((trailer, 0, 0))
+        clen += len(trailer)
+        context.add_header(
+            "Content-Type", "multipart/byteranges; boundary=%s" % boundary)
+        context.add_header("Content-Length", str(clen))
         context.start_response()
-        bleft = finfo.st_size
+        return self._file_chunks(file_path, parts)
+
+    def _file_not_modified(self, context, etag, mtime):
+        # returns True if the conditional headers in the request match
+        # the current file
+        return messages.not_modified(
+            context.environ.get('HTTP_IF_NONE_MATCH', None),
+            context.environ.get('HTTP_IF_MODIFIED_SINCE', None),
+            [etag], mtime)
+
+    def _file_ranges(self, context, etag, mtime, fsize):
+        # returns a list of satisfiable ContentRange instances or None
+        # if the whole file should be returned
+        range_spec = context.environ.get('HTTP_RANGE', None)
+        if range_spec is None:
+            return None
+        if_range = context.environ.get('HTTP_IF_RANGE', None)
+        if if_range is not None:
+            try:
+                if_range = if_range.strip()
+                if if_range.startswith('"') or if_range.startswith('W/'):
+                    # strong comparison
+                    tag = params.EntityTag.from_str(if_range)
+                    if tag.weak or tag.tag != etag.tag:
+                        return None
+                else:
+                    since = params.FullDate.from_http_str(if_range)
+                    if since.get_unixtime() != mtime:
+                        return None
+            except grammar.BadSyntax:
+                return None
+        unit, sep, spec_list = range_spec.partition('=')
+        if not sep or unit.strip().lower() != 'bytes':
+            return None
+        ranges = []
+        nspecs = 0
+        for spec in spec_list.split(','):
+            spec = spec.strip()
+            if not spec:
+                continue
+            nspecs += 1
+            first, sep, last = spec.partition('-')
+            first = first.strip()
+            last = last.strip()
+            if (not sep or (first and not first.isdigit()) or
+                    (last and not last.isdigit())):
+                # syntax error, ignore the Range header
+                return None
+            if first:
+                first = int(first)
+                if last:
+                    last = int(last)
+                    if last < first:
+                        return None
+                    last = min(last, fsize - 1)
+                else:
+                    last = fsize - 1
+                if first >= fsize:
+                    # not satisfiable
+                    continue
+            elif last:
+                # suffix range
+                first = max(fsize - int(last), 0)
+                last = fsize - 1
+                if last < first:
+                    continue
+            else:
+                return None
+            ranges.append(messages.ContentRange(first, last, fsize))
+        if not nspecs:
+            return None
+        return ranges
+
+    def _file_chunks(self, file_path, parts):
+        # parts is a list of (prefix, start, end) tuples, yields each
+        # prefix followed by the file's data from start to end
         with file_path.open('rb') as f:
-            while bleft:
-                chunk_size = min(bleft, self.MAX_CHUNK)
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    # unexpected EOF while reading
-                    raise RuntimeError("Unexpected EOF")
-                bleft -= len(chunk)
-                yield chunk
+            try:
+                fmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, ValueError, EnvironmentError):
+                # empty files and virtual files can't be mapped
+                fmap = None
+            try:
+                for prefix, start, end in parts:
+                    if prefix:
+                        yield prefix
+                    while start < end:
+                        chunk_end = min(end, start + self.MAX_CHUNK)
+                        if fmap is None:
+                            f.seek(start)
+                            chunk = f.read(chunk_end - start)
+                        else:
+                            chunk = fmap[start:chunk_end]
+                        if len(chunk) < chunk_end - start:
+                            # unexpected EOF while reading
+                            raise RuntimeError("Unexpected EOF")
+                        start = chunk_end
+                        yield chunk
+            finally:
+                if fmap is not None:
+                    fmap.close()
 
     def html_response(self, context, data):
         """Returns an HTML page
@@ -1220,7 +1800,10 @@ class WSGIApp(DispatchNode):
     def _run_server_thread(self):
         """Starts the web server running"""
         port = self.settings['WSGIApp']['port']
-        server = make_server('', port, self.call_wrapper)
+        app = self.call_wrapper
+        if self.settings['WSGIApp'].get('compress', False):
+            app = CompressionMiddleware(app)
+        server = make_server('', port, app)
         logger.info("HTTP server on port %i running", port)
         # Respond to requests until process is killed
         while not self.stop:
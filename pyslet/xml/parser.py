@@ -1,6 +1,8 @@
 #! /usr/bin/env python
 
 import logging
+import re
+
 from sys import maxunicode
 
 from ..py2 import (
@@ -43,6 +45,7 @@ else:
                      (character(0xE000), character(0xFFFD)),
                      (character(0x00010000), character(0x0010FFFF)))
 
+char.freeze()
 is_char = char.test
 
 
@@ -74,6 +77,18 @@ else:
         (character(0x0010FFFE), character(0x0010FFFF)))
 
 
+# regular expressions used to scan runs of characters, none of these
+# match carriage return as it is subject to end-of-line handling
+_name_chars_re = xml.name_char.span_re()
+_s_re = CharClass("\x20\x09\x0A").span_re()
+_char_data_re = re.compile(ul("[^<&\\]\x0D%s%s]+") %
+                           (character(0x2028), character(0x2029)))
+_att_value_re = dict(
+    (q, re.compile(ul("[^%s<&\x20\x09\x0A\x0D%s%s]+") %
+                   (q, character(0x2028), character(0x2029))))
+    for q in "'\"")
+
+
 def is_discouraged(c):
     """Tests if a character is discouraged in the specification.
 
@@ -148,7 +163,7 @@ def is_valid_nmtoken(nm_token):
 
 
 pubid_char = CharClass(' ', character(0x0D), character(0x0A), ('0', '9'),
-                       ('A', 'Z'), ('a', 'z'), "-'()+,./:=?;!*#@$_%")
+                       ('A', 'Z'), ('a', 'z'), "-'()+,./:=?;!*#@$_%").freeze()
 is_pubid_char = pubid_char.test
 
 
@@ -733,7 +748,10 @@ class XMLParser(PEP8Compatibility):
             self.the_char = self.entity.the_char
         else:
             self.the_char = None
-        self.buff = []
+        # characters pushed back to the parser and the position of
+        # the_char within them
+        self.buff = ''
+        self.buff_pos = 0
         self.stagBuffer = None
         #: The declaration being parsed or None
         self.declaration = None
@@ -755,6 +773,29 @@ class XMLParser(PEP8Compatibility):
         self.dataCount = 0
         self.noPERefs = False
         self.gotPERef = False
+        self.event_handler = None
+        """An optional callable used to report parsing events
+
+        If set, *event_handler* is called with two arguments, an event
+        name and the subject of the event, as the document is parsed:
+
+        'start'
+            called with the newly created element once its attributes
+            have been set but before any content has been parsed
+
+        'end'
+            called with the element after its content has been parsed
+            (and after :meth:`Element.content_changed` has been called)
+
+        'data'
+            called with a character string each time data is added to
+            the current element
+
+        The handler may modify the document, for example, by removing
+        completed elements from their parents to keep the memory used
+        when parsing large documents bounded.  See
+        :meth:`pyslet.xml.structures.Document.iterparse` for a pull
+        interface built on this attribute."""
 
     def get_context(self):
         """Returns the parser's context
@@ -774,16 +815,46 @@ class XMLParser(PEP8Compatibility):
         current entity then entities are popped from an internal entity
         stack automatically."""
         if self.buff:
-            self.buff = self.buff[1:]
-        if self.buff:
-            self.the_char = self.buff[0]
-        else:
-            self.entity.next_char()
+            self.buff_pos += 1
+            if self.buff_pos < len(self.buff):
+                self.the_char = self.buff[self.buff_pos]
+                return
+            self.buff = ''
+            self.buff_pos = 0
+        self.entity.next_char()
+        self.the_char = self.entity.the_char
+        while self.the_char is None and self.entityStack:
+            self.entity.close()
+            self.entity = self.entityStack.pop()
+            self.the_char = self.entity.the_char
+
+    def scan(self, regex):
+        """Parses a run of characters matching a regular expression
+
+        regex
+            A compiled regular expression, see
+            :py:meth:`~pyslet.xml.structures.XMLEntity.scan` for
+            details.
+
+        Returns the characters matched as a string, which will be empty
+        if no characters were matched.  The run is read directly from
+        the current entity's buffer and stops at the first character
+        that does not match.  The run also stops at the end of the
+        current entity and no characters are scanned while there are
+        characters pushed back with :py:meth:`buff_text`, in these cases
+        the caller should fall back to testing :py:attr:`the_char`
+        and calling :py:meth:`next_char`."""
+        if self.buff or self.the_char is None or \
+                self.the_char != self.entity.the_char:
+            return ''
+        run = self.entity.scan(regex)
+        if run:
             self.the_char = self.entity.the_char
             while self.the_char is None and self.entityStack:
                 self.entity.close()
                 self.entity = self.entityStack.pop()
                 self.the_char = self.entity.the_char
+        return run
 
     def buff_text(self, unused_chars):
         """Buffers characters that have already been parsed.
@@ -797,18 +868,16 @@ class XMLParser(PEP8Compatibility):
         and will be parsed (again) once the buffer is exhausted."""
         if unused_chars:
             if self.buff:
-                self.buff = list(unused_chars) + self.buff
+                self.buff = unused_chars + self.buff[self.buff_pos:]
+            elif self.entity.the_char is not None:
+                self.buff = unused_chars + self.entity.the_char
             else:
-                self.buff = list(unused_chars)
-                if self.entity.the_char is not None:
-                    self.buff.append(self.entity.the_char)
+                self.buff = unused_chars
+            self.buff_pos = 0
             self.the_char = self.buff[0]
 
     def _get_buff(self):
-        if len(self.buff) > 1:
-            return ''.join(self.buff[1:])
-        else:
-            return ''
+        return self.buff[self.buff_pos + 1:]
 
     def push_entity(self, entity):
         """Starts parsing an entity
@@ -1279,6 +1348,9 @@ class XMLParser(PEP8Compatibility):
         s = []
         slen = 0
         while True:
+            run = self.scan(_s_re)
+            if run:
+                s.append(run)
             if self.is_s():
                 s.append(self.the_char)
                 self.next_char()
@@ -1330,9 +1402,15 @@ class XMLParser(PEP8Compatibility):
         if xml.is_name_start_char(self.the_char):
             name.append(self.the_char)
             self.next_char()
-            while xml.is_name_char(self.the_char):
-                name.append(self.the_char)
-                self.next_char()
+            while True:
+                run = self.scan(_name_chars_re)
+                if run:
+                    name.append(run)
+                if xml.is_name_char(self.the_char):
+                    name.append(self.the_char)
+                    self.next_char()
+                else:
+                    break
         if name:
             return ''.join(name)
         else:
@@ -1472,8 +1550,13 @@ class XMLParser(PEP8Compatibility):
         qentity = self.entity
         save_mode = self.refMode
         self.refMode = XMLParser.RefModeInAttributeValue
+        run_re = _att_value_re.get(q, None)
         while True:
             try:
+                if run_re is not None:
+                    run = self.scan(run_re)
+                    if run:
+                        value.append(run)
                 if self.the_char is None:
                     self.well_formedness_error(production + ":EOF in AttValue")
                 elif self.the_char == q:
@@ -1571,7 +1654,14 @@ class XMLParser(PEP8Compatibility):
         character (so any implied start tag is treated as being
         immediately prior to the first non-S)."""
         data = []
+        dlen = 0
         while self.the_char is not None:
+            run = self.scan(_char_data_re)
+            if run:
+                data.append(run)
+                dlen += len(run)
+                if self.the_char is None:
+                    break
             if self.the_char == '<' or self.the_char == '&':
                 break
             if self.the_char == ']':
@@ -1580,8 +1670,9 @@ class XMLParser(PEP8Compatibility):
                     break
             self.is_s()     # force Unicode compatible white space handling
             data.append(self.the_char)
+            dlen += 1
             self.next_char()
-            if len(data) >= xml.XMLEntity.chunk_size:
+            if dlen >= xml.XMLEntity.chunk_size:
                 data = ''.join(data)
                 try:
                     self.handle_data(data)
@@ -1590,6 +1681,7 @@ class XMLParser(PEP8Compatibility):
                         return strip_leading_s(data)
                     raise
                 data = []
+                dlen = 0
         data = ''.join(data)
         try:
             self.handle_data(data)
@@ -2180,6 +2272,8 @@ class XMLParser(PEP8Compatibility):
             except xml.XMLValidityError:
                 if self.raiseValidityErrors:
                     raise
+        if self.event_handler is not None:
+            self.event_handler('start', self.element)
         if not empty:
             save_data_count = self.dataCount
             if (self.sgml_content and
@@ -2246,6 +2340,8 @@ class XMLParser(PEP8Compatibility):
                     ": element implied by PCDATA had empty content %s" %
                     self.element)
         self.element.content_changed()
+        if self.event_handler is not None:
+            self.event_handler('end', self.element)
         self.element = save_element
         self.elementType = save_element_type
         self.cursor = save_cursor
@@ -2734,6 +2830,8 @@ class XMLParser(PEP8Compatibility):
                         "element %s" % self.elementType.name)
             self.element.add_data(data)
             self.dataCount += len(data)
+            if self.event_handler is not None:
+                self.event_handler('data', data)
 
     def unhandled_data(self, data):
         """[43] content
@@ -6,6 +6,7 @@ import logging
 import os
 import os.path
 import random
+import threading
 import warnings
 
 from copy import copy
@@ -191,7 +192,7 @@ name_start_char = CharClass(
     (character(0x2c00), character(0x2fef)),
     (character(0x3001), character(0xd7ff)),
     (character(0xf900), character(0xfdcf)),
-    (character(0xfdf0), character(0xfffd)))
+    (character(0xfdf0), character(0xfffd))).freeze()
 
 
 @old_function('IsNameStartChar')
@@ -203,7 +204,7 @@ is_name_start_char = name_start_char.test   # noqa (def used by decorator)
 
 name_char = CharClass(name_start_char, '-', '.', ('0', '9'), character(0xb7),
                       (character(0x0300), character(0x036f)),
-                      (character(0x203f), character(0x2040)))
+                      (character(0x203f), character(0x2040))).freeze()
 
 
 @old_function('IsNameChar')
@@ -219,10 +220,7 @@ def is_valid_name(name):
     if name:
         if not is_name_start_char(name[0]):
             return False
-        for c in name[1:]:
-            if not is_name_char(c):
-                return False
-        return True
+        return name_char.match_span(name, 1) == len(name)
     else:
         return False
 
@@ -829,21 +827,68 @@ class Document(Node):
         self.read_from_entity(e)
 
     @old_method('ReadFromEntity')
-    def read_from_entity(self, e):
+    def read_from_entity(self, e, event_handler=None):
         """Reads this document from an entity
 
         e
             An :class:`XMLEntity` instance.
 
+        event_handler (defaults to None)
+            An optional callable that is passed to the parser, see
+            :attr:`pyslet.xml.parser.XMLParser.event_handler` for
+            details.
+
         The document is read from the current position in the entity.
         """
         self.data = []
         parser = self.XMLParser(e)
+        parser.event_handler = event_handler
         parser.parse_document(self)
         if e.location is not None:
             # update our base_uri from the entity
             self.set_base(e.location)
 
+    def iterparse(self, src=None, events=('end', ), element_class=None):
+        """Reads this document, yielding parsing events
+
+        src (defaults to None)
+            The source to read from, as for :meth:`read`.
+
+        events (defaults to ('end', ))
+            A sequence of the event names to report, any of 'start',
+            'end' or 'data'.
+
+        element_class (defaults to None)
+            An optional class used to filter 'start' and 'end' events,
+            elements that are not instances of *element_class* are not
+            reported.
+
+        This method is a generator that yields (event, node) tuples as
+        the document is parsed.  For 'start' and 'end' events node is
+        the :class:`Element` instance, for 'data' events it is the
+        character string that has just been added to the current
+        element.
+
+        The document tree is still built as parsing progresses but you
+        may discard elements once you have processed them to keep the
+        memory used by very large documents bounded.  For example, to
+        process each record in a large list::
+
+            for event, record in doc.iterparse(src,
+                                               element_class=Record):
+                process(record)
+                record.parent.remove_child(record)
+
+        You must not modify the tree in other ways during parsing.
+
+        The parser runs in a separate thread but control is passed
+        back and forth so that the parser is suspended while the caller
+        handles each event.  Any exception raised by the parser is
+        re-raised in the caller and if the generator is closed before
+        the document has been read then parsing is abandoned."""
+        pump = _EventPump(self, src, events, element_class)
+        return pump.run()
+
     @old_method('Create')
     def create(self, dst=None, **kws):
         """Creates the Document.
@@ -1006,6 +1051,100 @@ class Document(Node):
         return '\n'.join(output)
 
 
+class _ParsingAbandoned(Exception):
+
+    """Raised in the parser thread when an iterparse is closed early"""
+    pass
+
+
+class _EventPump(object):
+
+    """Runs a parser in its own thread on behalf of iterparse
+
+    The parser and the consumer hand control back and forth so that
+    only one thread is ever active, the parser waits while each event
+    is handled by the consumer."""
+
+    def __init__(self, doc, src, events, element_class):
+        self.doc = doc
+        self.src = src
+        self.events = frozenset(events)
+        self.element_class = element_class
+        self.lock = threading.Condition()
+        # True while the parser thread has control
+        self.parsing = True
+        self.finished = False
+        self.abandon = False
+        self.event = None
+        self.error = None
+
+    def run(self):
+        t = threading.Thread(target=self.parse)
+        t.daemon = True
+        t.start()
+        try:
+            while True:
+                with self.lock:
+                    while self.parsing:
+                        self.lock.wait()
+                    if self.finished:
+                        break
+                    event = self.event
+                    self.event = None
+                yield event
+                with self.lock:
+                    self.parsing = True
+                    self.lock.notify()
+        finally:
+            with self.lock:
+                if not self.finished:
+                    self.abandon = True
+                    self.parsing = True
+                    self.lock.notify()
+            t.join()
+        if self.error is not None:
+            raise self.error
+
+    def parse(self):
+        doc = self.doc
+        try:
+            if isinstance(self.src, XMLEntity):
+                doc.read_from_entity(self.src, self.handler)
+            elif self.src:
+                doc.read_from_entity(
+                    XMLEntity(self.src, req_manager=doc.req_manager),
+                    self.handler)
+            elif doc.base_uri is None:
+                raise XMLMissingLocationError
+            else:
+                with XMLEntity(doc.base_uri,
+                               req_manager=doc.req_manager) as e:
+                    doc.read_from_entity(e, self.handler)
+        except _ParsingAbandoned:
+            pass
+        except Exception as err:
+            self.error = err
+        with self.lock:
+            self.finished = True
+            self.parsing = False
+            self.lock.notify()
+
+    def handler(self, event, node):
+        if event not in self.events:
+            return
+        if (event != 'data' and self.element_class is not None and
+                not isinstance(node, self.element_class)):
+            return
+        with self.lock:
+            self.event = (event, node)
+            self.parsing = False
+            self.lock.notify()
+            while not self.parsing:
+                self.lock.wait()
+            if self.abandon:
+                raise _ParsingAbandoned
+
+
 class XMLDTD(MigratedClass):
 
     """An object that models a document type declaration.
@@ -3545,6 +3684,52 @@ class XMLEntity(MigratedClass):
             else:
                 self.ignore_lf = False
 
+    def scan(self, regex):
+        """Advances past a run of characters matching a regular expression
+
+        regex
+            A compiled regular expression.  The expression must not
+            match the carriage return character (which is subject to
+            end-of-line handling) and should only match non-empty
+            strings.
+
+        Returns the string of characters matched, which may be
+        empty, leaving :py:attr:`the_char` positioned at the first
+        character not matched.  The expression is matched directly
+        against the internal buffer of decoded characters so runs of
+        data can be read without calling :py:meth:`next_char` for each
+        character.  If a run reaches the end of the buffer the buffer is
+        refilled and matching continues."""
+        result = []
+        while True:
+            pos = self.char_pos
+            chars = self.chars
+            if (self.the_char is None or pos >= len(chars) or
+                    chars[pos] != self.the_char):
+                break
+            match = regex.match(chars, pos)
+            if match is None:
+                break
+            end = match.end()
+            if end <= pos:
+                break
+            run = chars[pos:end]
+            result.append(run)
+            # the current character has already been counted
+            nlines = run.count('\x0A', 1)
+            if nlines:
+                self.line_num = self.line_num + nlines
+                self.line_pos = len(run) - 1 - run.rindex('\x0A')
+            else:
+                self.line_pos = self.line_pos + len(run) - 1
+            # position on the last character of the run and move on
+            self.char_pos = end - 1
+            self.ignore_lf = False
+            self.next_char()
+        if len(result) == 1:
+            return result[0]
+        return ''.join(result)
+
     magic_table = {
         # UCS-4, big-endian machine (1234 order)
         b'\x00\x00\xfe\xff': ('utf_32_be', 4, True),
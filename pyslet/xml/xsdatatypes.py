@@ -1417,12 +1417,8 @@ class RegularExpressionParser(BasicParser):
 
     def require_is_block(self):
         """Parses IsBlock."""
-        block = []
-        while self.is_block_class.test(self.the_char):
-            block.append(self.the_char)
-            self.next_char()
-        block = ''.join(block)
-        if block.startswith("Is"):
+        block = self.parse_span(self.is_block_class)
+        if block and block.startswith("Is"):
             try:
                 return CharClass.ucd_block(block[2:])
             except KeyError:
@@ -31,6 +31,7 @@ def suite():
         loader.loadTestsFromTestCase(ODataTests),
         loader.loadTestsFromTestCase(LockingTests),
         loader.loadTestsFromTestCase(StreamStoreTests),
+        loader.loadTestsFromTestCase(BackgroundStreamTests),
         loader.loadTestsFromTestCase(RandomStreamTests),
     ))
 
@@ -100,6 +101,7 @@ class BlockStoreCommon(unittest.TestCase):
             pass
         kfox2 = bs.store(fox)
         self.assertTrue(kfox2 == kfox)
+        self.assertTrue(sorted(bs.iterkeys()) == sorted([kfox, kcafe]))
 
     def maxsize(self, bs):
         self.assertTrue(bs.max_block_size == 256, "custom block size")
@@ -378,6 +380,89 @@ class StreamStoreTests(unittest.TestCase):
                 self.assertTrue(len(blocks) == 1)
                 self.assertTrue(ss.retrieve_block(blocks2[0]) == cafe)
 
+    def test_delete_batch(self):
+        ss = blockstore.StreamStore(bs=self.bs, ls=self.ls,
+                                    entity_set=self.cdef['Streams'])
+        ss.GC_BATCH_SIZE = 4
+        s1 = ss.new_stream("text/plain")
+        s2 = ss.new_stream("text/plain")
+        data = [("Block %i" % i).encode('ascii') for i in range3(10)]
+        for i, block in enumerate(data):
+            ss.store_block(s1, i, block)
+        # s2 shares the odd numbered blocks with s1
+        for i in range3(1, 10, 2):
+            ss.store_block(s2, i, data[i])
+        # and also repeats a block within s1
+        ss.store_block(s1, 10, data[0])
+        queries = []
+        unreferenced = ss._unreferenced
+
+        def count_queries(hash_keys):
+            queries.append(len(hash_keys))
+            return unreferenced(hash_keys)
+        ss._unreferenced = count_queries
+        ss.delete_blocks(s1)
+        # 10 distinct hash keys checked in batches of 4
+        self.assertTrue(queries == [4, 4, 2], repr(queries))
+        with self.cdef['BlockLists'].open() as blocks:
+            self.assertTrue(len(blocks) == 5)
+        with self.cdef['Blocks'].open() as blocks:
+            self.assertTrue(len(blocks) == 5)
+        for i, block in enumerate(data):
+            if i % 2:
+                self.assertTrue(self.bs.retrieve(self.bs.key(block)) ==
+                                block)
+            else:
+                try:
+                    self.bs.retrieve(self.bs.key(block))
+                    self.fail("Expected orphan to be deleted")
+                except blockstore.BlockMissing:
+                    pass
+        # no locks should be left behind
+        with self.cdef['BlockLocks'].open() as locks:
+            self.assertTrue(len(locks) == 0)
+
+    def test_deferred_gc(self):
+        ss = blockstore.StreamStore(bs=self.bs, ls=self.ls,
+                                    entity_set=self.cdef['Streams'],
+                                    deferred_gc=True)
+        s1 = ss.new_stream("text/plain")
+        s2 = ss.new_stream("text/plain")
+        fox = b"The quick brown fox jumped over the lazy dog"
+        cafe = ul("Caf\xe9").encode('utf-8')
+        ss.store_block(s1, 0, cafe)
+        ss.store_block(s1, 1, fox)
+        ss.store_block(s2, 0, cafe)
+        ss.delete_blocks(s1)
+        with self.cdef['BlockLists'].open() as blocks:
+            self.assertTrue(len(blocks) == 1)
+        # the data is still there until we sweep
+        self.assertTrue(self.bs.retrieve(self.bs.key(fox)) == fox)
+        block = list(ss.retrieve_blocklist(s2))[0]
+        ss.update_block(block, fox)
+        self.assertTrue(self.bs.retrieve(self.bs.key(cafe)) == cafe)
+        # cafe is now an orphan, fox is in use again
+        self.assertTrue(ss.sweep() == 1)
+        self.assertTrue(self.bs.retrieve(self.bs.key(fox)) == fox)
+        try:
+            self.bs.retrieve(self.bs.key(cafe))
+            self.fail("Expected orphan to be deleted by sweep")
+        except blockstore.BlockMissing:
+            pass
+        # nothing left to do
+        self.assertTrue(ss.sweep() == 0)
+        # orphans created by another store are not recorded...
+        ss2 = blockstore.StreamStore(bs=self.bs, ls=self.ls,
+                                     entity_set=self.cdef['Streams'],
+                                     deferred_gc=True)
+        ss2.delete_stream(s2)
+        del ss2
+        self.assertTrue(ss.sweep() == 0)
+        self.assertTrue(self.bs.retrieve(self.bs.key(fox)) == fox)
+        # ...but they are found by a full sweep
+        self.assertTrue(ss.sweep(full=True) == 1)
+        self.assertTrue(list(self.bs.iterkeys()) == [])
+
     def test_create(self):
         ss = blockstore.StreamStore(bs=self.bs, ls=self.ls,
                                     entity_set=self.cdef['Streams'])
@@ -459,6 +544,119 @@ class StreamStoreTests(unittest.TestCase):
             self.assertTrue(s.tell() == nbytes)
 
 
+class SlowBlockStore(blockstore.EDMBlockStore):
+
+    """Simulates a block store with high latency"""
+
+    def __init__(self, **kwargs):
+        super(SlowBlockStore, self).__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.fail = None
+
+    def _wait(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.active, self.max_active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+
+    def store(self, data):
+        self._wait()
+        if self.fail is not None and data == self.fail:
+            raise IOError("store failed")
+        return super(SlowBlockStore, self).store(data)
+
+    def retrieve(self, key):
+        self._wait()
+        return super(SlowBlockStore, self).retrieve(key)
+
+
+class BackgroundStreamTests(unittest.TestCase):
+
+    def setUp(self):  # noqa
+        path = os.path.join(DATA_DIR, 'blockstore.xml')
+        self.doc = edmx.Document()
+        with open(path, 'rb') as f:
+            self.doc.read(f)
+        self.cdef = self.doc.root.DataServices['BlockSchema.BlockContainer']
+        self.container = InMemoryEntityContainer(self.cdef)
+        self.bs = SlowBlockStore(entity_set=self.cdef['Blocks'],
+                                 max_block_size=64)
+        self.ls = blockstore.LockStore(entity_set=self.cdef['BlockLocks'])
+        self.ss = blockstore.StreamStore(
+            bs=self.bs, ls=self.ls, entity_set=self.cdef['Streams'],
+            read_ahead=4, write_behind=4)
+        self.data = b''.join(
+            (b"%03i" % i) * 21 + b'\n' for i in range3(20))
+
+    def test_write_behind(self):
+        s1 = self.ss.new_stream("text/plain")
+        with self.ss.open_stream(s1, 'w') as s:
+            nbytes = 0
+            while nbytes < len(self.data):
+                nbytes += s.write(self.data[nbytes:])
+        self.assertTrue(self.bs.max_active > 1)
+        self.assertTrue(self.bs.active == 0)
+        self.assertTrue(s1['size'].value == len(self.data))
+        self.assertTrue(s1['md5'].value == hashlib.md5(self.data).digest())
+        blocks = list(self.ss.retrieve_blocklist(s1))
+        self.assertTrue(len(blocks) == 20)
+        for i, block in enumerate(blocks):
+            self.assertTrue(block['num'].value == i)
+            self.assertTrue(self.ss.retrieve_block(block) ==
+                            self.data[i * 64:(i + 1) * 64])
+        # errors are raised when the stream is flushed
+        s2 = self.ss.new_stream("text/plain")
+        self.bs.fail = self.data[64:128]
+        try:
+            with self.ss.open_stream(s2, 'w') as s:
+                s.write(self.data[:64])
+                s.write(self.data[64:128])
+                s.write(self.data[128:192])
+            self.fail("Expected store failure")
+        except IOError:
+            pass
+        # the stream entity is not updated
+        s2 = self.ss.get_stream(s2.key())
+        self.assertTrue(s2['size'].value == 0)
+
+    def test_rewrite_behind(self):
+        s1 = self.ss.new_stream("text/plain")
+        with self.ss.open_stream(s1, 'w') as s:
+            s.write(self.data[:64])
+            # rewrite the first block while it is still being stored
+            s.seek(0)
+            s.write(self.data[64:128])
+        self.assertTrue(self.bs.active == 0)
+        with self.ss.open_stream(s1, 'r') as s:
+            self.assertTrue(s.read() == self.data[64:128])
+        # the original first block must not be left orphaned
+        self.assertTrue(
+            set(self.bs.iterkeys()) ==
+            set(b['hash'].value for b in self.ss.retrieve_blocklist(s1)))
+
+    def test_read_ahead(self):
+        s1 = self.ss.new_stream("text/plain")
+        with self.ss.open_stream(s1, 'w') as s:
+            nbytes = 0
+            while nbytes < len(self.data):
+                nbytes += s.write(self.data[nbytes:])
+        self.bs.max_active = 0
+        with self.ss.open_stream(s1, 'r') as s:
+            self.assertTrue(s.read() == self.data)
+        self.assertTrue(self.bs.max_active > 1)
+        with self.ss.open_stream(s1, 'r') as s:
+            # random access discards prefetched blocks
+            s.seek(64 * 15 + 3)
+            self.assertTrue(s.read(3) == b"015")
+            s.seek(64 * 2)
+            self.assertTrue(s.read(3) == b"002")
+            self.assertTrue(s.read() == self.data[64 * 2 + 3:])
+
+
 class BlockStoreContainer(SQLiteEntityContainer):
 
     def ro_name(self, source_path):
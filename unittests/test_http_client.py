@@ -14,6 +14,18 @@ import unittest
 
 from tempfile import mkdtemp
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
 import pyslet.http.client as http
 import pyslet.http.messages as messages
 import pyslet.http.params as params
@@ -39,6 +51,8 @@ def suite():
         unittest.makeSuite(ClientTests, 'test'),
         unittest.makeSuite(LegacyServerTests, 'test'),
         unittest.makeSuite(ClientRequestTests, 'test'),
+        unittest.makeSuite(ThreadConnectionTests, 'test'),
+        unittest.makeSuite(AsyncClientTests, 'test'),
         # unittest.makeSuite(SecureTests, 'test')
     ))
 
@@ -926,6 +940,248 @@ class LegacyServerTests(unittest.TestCase):
         self.assertTrue(request.response.status == 204)
 
 
+class SlowHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):       # noqa
+        time.sleep(self.server.delay)
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/data")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "7")
+        self.end_headers()
+        self.wfile.write(b"Got it!")
+
+    def do_POST(self):      # noqa
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.do_GET()
+
+
+class SlowServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+    delay = 0.02
+
+
+class ThreadConnectionTests(unittest.TestCase):
+
+    def setUp(self):        # noqa
+        self.server = SlowServer(('localhost', 0), SlowHandler)
+        self.port = self.server.server_address[1]
+        t = threading.Thread(target=self.server.serve_forever,
+                             kwargs={'poll_interval': 0.1})
+        t.daemon = True
+        t.start()
+
+    def tearDown(self):     # noqa
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_requests(self, client, methods):
+        requests = []
+        for method in methods:
+            if method == "POST":
+                request = http.ClientRequest(
+                    "http://localhost:%i/data" % self.port, "POST",
+                    entity_body=TEST_STRING)
+            else:
+                request = http.ClientRequest(
+                    "http://localhost:%i/data" % self.port, method)
+            client.queue_request(request)
+            requests.append(request)
+        client.thread_loop(timeout=5)
+        for request in requests:
+            self.assertTrue(request.response.status == 200)
+        return requests
+
+    def test_least_loaded(self):
+        client = http.Client(max_thread_connections=3)
+        try:
+            requests = []
+            for i in range3(7):
+                request = http.ClientRequest(
+                    "http://localhost:%i/data" % self.port)
+                client.queue_request(request)
+                requests.append(request)
+            self.assertTrue(client.thread_active_count() == 3)
+            active = list(client.cActiveThreadTargets.values())[0]
+            self.assertTrue(
+                sorted(c.queue_length() for c in active.values()) ==
+                [2, 2, 3])
+            client.thread_loop(timeout=5)
+            for request in requests:
+                self.assertTrue(request.response.status == 200)
+                self.assertTrue(request.res_body == b"Got it!")
+            self.assertTrue(client.thread_active_count() == 0)
+            # connections return to the idle pool and are reused
+            self.run_requests(client, ["GET", "POST", "GET", "POST"])
+            self.assertTrue(len(client.cIdleList) == 3)
+        finally:
+            client.close()
+        # the default is one connection per thread
+        client = http.Client()
+        try:
+            for i in range3(3):
+                request = http.ClientRequest(
+                    "http://localhost:%i/data" % self.port)
+                client.queue_request(request)
+            self.assertTrue(client.thread_active_count() == 1)
+            client.thread_loop(timeout=5)
+        finally:
+            client.close()
+        # max_connections takes precedence
+        client = http.Client(max_connections=2, max_thread_connections=4)
+        try:
+            for i in range3(3):
+                request = http.ClientRequest(
+                    "http://localhost:%i/data" % self.port)
+                client.queue_request(request, timeout=0)
+            self.assertTrue(client.thread_active_count() == 2)
+            client.thread_loop(timeout=5)
+        finally:
+            client.close()
+
+    def test_throughput(self):
+        mixes = (("GET", ["GET"] * 16),
+                 ("POST", ["POST"] * 16),
+                 ("GET+POST", ["GET", "POST"] * 8))
+        for name, methods in mixes:
+            for n in (1, 2, 4, 8):
+                client = http.Client(max_thread_connections=n)
+                try:
+                    t = time.time()
+                    self.run_requests(client, methods)
+                    t = time.time() - t
+                finally:
+                    client.close()
+                logging.info("%s: max_thread_connections=%i, %.1f "
+                             "requests/s", name, n, len(methods) / t)
+
+
+class AsyncClientTests(unittest.TestCase):
+
+    def setUp(self):        # noqa
+        self.server = SlowServer(('localhost', 0), SlowHandler)
+        self.port = self.server.server_address[1]
+        t = threading.Thread(target=self.server.serve_forever,
+                             kwargs={'poll_interval': 0.1})
+        t.daemon = True
+        t.start()
+        if asyncio is not None:
+            self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):     # noqa
+        if asyncio is not None:
+            self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_requests(self, client, requests):
+        futures = [client.request(r) for r in requests]
+        return self.loop.run_until_complete(
+            asyncio.wait_for(asyncio.gather(*futures), 10))
+
+    def test_requests(self):
+        if asyncio is None:
+            logging.warning("Skipping AsyncClient tests (requires asyncio)")
+            return
+        client = http.AsyncClient(loop=self.loop, max_connections=4)
+        try:
+            requests = []
+            for i in range3(40):
+                if i % 4 == 1:
+                    request = http.ClientRequest(
+                        "http://localhost:%i/data" % self.port, "POST",
+                        entity_body=TEST_STRING)
+                elif i % 4 == 2:
+                    request = http.ClientRequest(
+                        "http://localhost:%i/redirect" % self.port)
+                else:
+                    request = http.ClientRequest(
+                        "http://localhost:%i/data" % self.port)
+                requests.append(request)
+            t = time.time()
+            results = self.run_requests(client, requests)
+            t = time.time() - t
+            logging.info("AsyncClient: %.1f requests/s", len(requests) / t)
+            self.assertTrue(results == requests)
+            for request in requests:
+                self.assertTrue(request.status == 200)
+                self.assertTrue(request.res_body == b"Got it!")
+                self.assertTrue(request.url.abs_path == "/data")
+            # requests were spread over the pool, which is now idle
+            self.assertTrue(client.active_count() == 0)
+            self.assertTrue(len(client.cIdleList) == 4)
+            self.assertFalse(client.futures)
+            # connections are reused
+            results = self.run_requests(client, [
+                http.ClientRequest("http://localhost:%i/data" % self.port)
+                for i in range3(2)])
+            self.assertTrue(len(client.cIdleList) == 4)
+            self.assertTrue(client.nextId == 5)
+            # a failed request resolves its future too
+            s = socket.socket()
+            s.bind(('localhost', 0))
+            port = s.getsockname()[1]
+            s.close()
+            request = http.ClientRequest(
+                "http://localhost:%i/data" % port, max_retries=0)
+            self.run_requests(client, [request])
+            self.assertTrue(request.status == 0)
+            self.assertTrue(request.error is not None)
+        finally:
+            client.close()
+
+    def test_waiting(self):
+        if asyncio is None:
+            logging.warning("Skipping AsyncClient tests (requires asyncio)")
+            return
+        # with a pool of one connection requests to a second target
+        # must wait for the connection to be released
+        client = http.AsyncClient(loop=self.loop, max_connections=1)
+        try:
+            requests = []
+            for i in range3(6):
+                host = "localhost" if i % 2 else "127.0.0.1"
+                requests.append(http.ClientRequest(
+                    "http://%s:%i/data" % (host, self.port)))
+            self.run_requests(client, requests)
+            for request in requests:
+                self.assertTrue(request.status == 200)
+            self.assertFalse(client.waiting)
+            self.assertTrue(len(client.cIdleList) == 1)
+        finally:
+            client.close()
+        # can't make requests from another thread
+        client = http.AsyncClient(loop=self.loop)
+        try:
+            self.run_requests(client, [http.ClientRequest(
+                "http://localhost:%i/data" % self.port)])
+            errors = []
+
+            def other():
+                try:
+                    client.request(http.ClientRequest(
+                        "http://localhost:%i/data" % self.port))
+                except RuntimeError:
+                    errors.append(True)
+            t = threading.Thread(target=other)
+            t.start()
+            t.join()
+            self.assertTrue(errors)
+        finally:
+            client.close()
+
+
 class SecureTests(unittest.TestCase):
 
     def setUp(self):        # noqa
@@ -12,6 +12,7 @@ from pyslet.py2 import is_string
 from pyslet.py26 import RawIOBase
 
 from pyslet.http.messages import *       # noqa
+from pyslet.http.messages import EntityTagList, not_modified
 
 
 def suite():
@@ -256,6 +257,72 @@ class MessageTests(unittest.TestCase):
         self.assertTrue(response.get_header("X-test").strip() ==
                         b"hello, good-bye")
 
+    def test_header_block(self):
+        lines = [b"Host: www.w3.org\r\n",
+                 b"X-Test: hello\r\n",
+                 b"Accept: text/html;q=0.5,\r\n",
+                 b"\t text/plain\r\n",
+                 b"x-test:good-bye \r\n",
+                 b"Content-Type: text/plain; charset=utf-8\r\n",
+                 b"Empty:\r\n",
+                 b"\r\n"]
+        line_request = Request()
+        line_request.start_receiving()
+        line_request.recv(b"GET /pub/WWW/TheProject.html HTTP/1.1\r\n")
+        line_request.recv(lines)
+        for block in (b''.join(lines), bytearray(b''.join(lines))):
+            request = Request()
+            request.start_receiving()
+            request.recv(b"GET /pub/WWW/TheProject.html HTTP/1.1\r\n")
+            self.assertTrue(request.recv_mode() == request.RECV_HEADERS)
+            request.recv(block)
+            self.assertTrue(request.recv_mode() is None)
+            self.assertTrue(request.get_headerlist() ==
+                            line_request.get_headerlist())
+            for h in request.get_headerlist():
+                self.assertTrue(request.get_header(h, True) ==
+                                line_request.get_header(h, True), h)
+            self.assertTrue(isinstance(request.get_header("X-Test"), bytes))
+            self.assertTrue(request.get_header("X-Test") ==
+                            b"hello, good-bye")
+            self.assertTrue(request.get_header("Empty") == b"")
+            self.assertTrue(len(request.get_accept()) == 2)
+        # degenerate case, no headers at all
+        request = Request()
+        request.start_receiving()
+        request.recv(b"GET /pub/WWW/TheProject.html HTTP/1.1\r\n")
+        request.recv(b"\r\n")
+        self.assertTrue(request.recv_mode() is None)
+        self.assertTrue(request.get_headerlist() == [])
+        # badly formed header
+        request = Request()
+        request.start_receiving()
+        request.recv(b"GET /pub/WWW/TheProject.html HTTP/1.1\r\n")
+        try:
+            request.recv(b"Host www.w3.org\r\n\r\n")
+            self.fail("Badly formed header line")
+        except ProtocolError:
+            pass
+
+    def test_parsed_cache(self):
+        request = Request()
+        request.set_header("Content-Type", "text/plain")
+        mtype = request.get_content_type()
+        self.assertTrue(str(mtype) == "text/plain")
+        # cached until the header changes
+        self.assertTrue(request.get_content_type() is mtype)
+        request.set_header("Content-Type", "text/html")
+        mtype = request.get_content_type()
+        self.assertTrue(str(mtype) == "text/html")
+        request.set_header("Content-Type", None)
+        self.assertTrue(request.get_content_type() is None)
+        request.set_header("Accept", "text/html")
+        accept = request.get_accept()
+        self.assertTrue(request.get_accept() is accept)
+        request.set_header("Accept", "text/plain", True)
+        self.assertFalse(request.get_accept() is accept)
+        self.assertTrue(len(request.get_accept()) == 2)
+
     def test_message_body_req(self):
         """RFC2616:
 
@@ -1425,6 +1492,54 @@ class HeaderTests(unittest.TestCase):
         cr7 = ContentRange.from_str("bytes 734-1234/1234")
         self.assertFalse(cr7.is_valid())
 
+    def test_entity_tag_list(self):
+        etl = EntityTagList.from_str(' "a" , W/"b",W/"c-gzip"')
+        self.assertTrue(len(etl) == 3)
+        self.assertFalse(etl.is_any())
+        self.assertTrue(etl[0].tag == b"a" and not etl[0].weak)
+        self.assertTrue(etl[1].tag == b"b" and etl[1].weak)
+        self.assertTrue(str(etl) == '"a", W/"b", W/"c-gzip"')
+        a = params.EntityTag("a", weak=False)
+        b = params.EntityTag("b", weak=False)
+        c = params.EntityTag("c", weak=False)
+        self.assertTrue(etl.match([c, a]))
+        self.assertTrue(etl.match([b]))
+        self.assertTrue(etl.match([a], weak=False))
+        # strong comparison requires both tags to be strong
+        self.assertFalse(etl.match([b], weak=False))
+        self.assertFalse(etl.match([c]))
+        self.assertFalse(etl.match([]))
+        etl = EntityTagList.from_str("*")
+        self.assertTrue(etl.is_any())
+        self.assertTrue(len(etl) == 0)
+        self.assertTrue(str(etl) == "*")
+        self.assertTrue(etl.match([a], weak=False))
+        self.assertTrue(str(EntityTagList(a, b)) == '"a", "b"')
+        for src in ('', 'a', '"a",', '"a" "b"', '*, "a"'):
+            try:
+                EntityTagList.from_str(src)
+                self.fail("EntityTagList.from_str(%s)" % repr(src))
+            except grammar.BadSyntax:
+                pass
+
+    def test_not_modified(self):
+        a = params.EntityTag("a", weak=False)
+        mtime = 784111777
+        date = "Sun, 06 Nov 1994 08:49:37 GMT"
+        earlier = "Sun, 06 Nov 1994 08:49:36 GMT"
+        self.assertFalse(not_modified(None, None, [a], mtime))
+        self.assertTrue(not_modified('W/"a"', None, [a], mtime))
+        self.assertTrue(not_modified('*', None, [a], mtime))
+        self.assertFalse(not_modified('"b"', None, [a], mtime))
+        # bad syntax is ignored
+        self.assertFalse(not_modified('a', None, [a], mtime))
+        self.assertTrue(not_modified(None, date, [a], mtime))
+        self.assertFalse(not_modified(None, earlier, [a], mtime))
+        self.assertFalse(not_modified(None, date, [a]))
+        self.assertFalse(not_modified(None, "yesterday", [a], mtime))
+        # If-Modified-Since is ignored if If-None-Match is present
+        self.assertFalse(not_modified('"b"', date, [a], mtime))
+
     def test_content_type(self):
         req = Request()
         mtype = params.MediaType('application', 'octet-stream',
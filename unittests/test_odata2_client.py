@@ -1,6 +1,7 @@
 #! /usr/bin/env python
 
 import decimal
+import json
 import logging
 import random
 import threading
@@ -11,11 +12,13 @@ from wsgiref.simple_server import make_server, WSGIRequestHandler
 
 from pyslet import rfc2396 as uri
 from pyslet import rfc5023 as app
+from pyslet.http import client as http
 from pyslet.odata2 import core
 from pyslet.odata2 import csdl as edm
 from pyslet.odata2 import client
 from pyslet.odata2.memds import InMemoryEntityContainer
 from pyslet.odata2.server import Server
+from pyslet.py2 import range3, ul
 from pyslet.py26 import py26
 
 from test_odata2_core import DataServiceRegressionTests
@@ -30,6 +33,7 @@ def suite(prefix='test'):
     return unittest.TestSuite((
         loader.loadTestsFromTestCase(ODataTests),
         loader.loadTestsFromTestCase(ClientTests),
+        loader.loadTestsFromTestCase(JSONFeedParserTests),
         loader.loadTestsFromTestCase(RegressionTests)
     ))
 
@@ -177,6 +181,45 @@ class ClientTests(unittest.TestCase):
                     isinstance(orders, core.ExpandedEntityCollection))
 
 
+class JSONFeedParserTests(unittest.TestCase):
+
+    def test_v2(self):
+        feed = {"d": {"__count": 3, "results": [
+            {"a": "x\"}]{[,", "b": [1, {"c": 2}]},
+            {"a": ul(b"Caf\xe9\\")}, {}],
+            "__next": {"uri": "http://host/set?$skiptoken=1"}}}
+        data = json.dumps(feed, ensure_ascii=False).encode('utf-8')
+        for size in (1, 2, 3, 7, len(data)):
+            parser = client.JSONFeedParser()
+            entries = []
+            for i in range3(0, len(data), size):
+                entries += parser.feed(data[i:i + size])
+            self.assertTrue(entries == feed['d']['results'], size)
+            self.assertTrue(parser.close() == {"d": {
+                "__count": 3, "results": [],
+                "__next": {"uri": "http://host/set?$skiptoken=1"}}})
+
+    def test_v1(self):
+        parser = client.JSONFeedParser()
+        entries = parser.feed(b'{"d" : [ {"a": [1]} ,\r\n{"b": {}} ]}')
+        self.assertTrue(entries == [{"a": [1]}, {"b": {}}])
+        self.assertTrue(parser.close() == {"d": []})
+
+    def test_incremental(self):
+        parser = client.JSONFeedParser()
+        self.assertTrue(parser.feed(b'{"d": {"results": [{"a": 1') == [])
+        # entries are returned as soon as they are complete
+        self.assertTrue(parser.feed(b'}, {"a"') == [{"a": 1}])
+        self.assertTrue(parser.feed(b': 2}]') == [{"a": 2}])
+        try:
+            parser.close()
+            self.fail("close with incomplete feed")
+        except ValueError:
+            pass
+        self.assertTrue(parser.feed(b'}}') == [])
+        self.assertTrue(parser.close() == {"d": {"results": []}})
+
+
 class LoggingHandler(WSGIRequestHandler):
 
     def log_message(self, format, *args):
@@ -223,6 +266,81 @@ class RegressionTests(DataServiceRegressionTests):
 
     def test_all_tests(self):
         self.run_combined()
+        self.runtest_batch()
+        self.runtest_json_feed()
+
+    def runtest_batch(self):
+        container = self.ds['RegressionModel.RegressionContainer']
+        autokeys = container['AutoKeysInt32']
+        with autokeys.open() as coll:
+            n = len(coll)
+            entities = []
+            with self.client.batch():
+                for i in range(3):
+                    e = coll.new_entity()
+                    e['Data'].set_from_value('batch %i' % i)
+                    coll.insert_entity(e)
+                    entities.append(e)
+                # nothing is sent until the batch exits
+                self.assertFalse(entities[0].exists)
+                self.assertTrue(len(coll) == n)
+            for e in entities:
+                self.assertTrue(e.exists)
+            self.assertTrue(len(coll) == n + 3)
+            request = http.ClientRequest(str(entities[0].get_location()))
+            with self.client.batch() as batch:
+                entities[1]['Data'].set_from_value('updated')
+                coll.update_entity(entities[1])
+                del coll[entities[2].key()]
+                batch.add(request)
+            self.assertTrue(request.status == 200)
+            self.assertTrue(len(coll) == n + 2)
+            self.assertTrue(coll[entities[1].key()]['Data'].value ==
+                            'updated')
+            # errors are raised when the batch exits
+            try:
+                with self.client.batch():
+                    del coll[entities[0].key()]
+                    del coll[entities[2].key()]
+                self.fail("Delete of missing entity in batch")
+            except KeyError:
+                pass
+
+    def runtest_json_feed(self):
+        container = self.ds['RegressionModel.RegressionContainer']
+        with container['PagingSet'].open() as coll:
+            for i in range3(3):
+                for j in range3(4):
+                    e = coll.new_entity()
+                    e.set_key((100 + i, j))
+                    e['Sum'].set_from_value(100 + i + j)
+                    e['Product'].set_from_value((100 + i) * j)
+                    coll.insert_entity(e)
+            entity_from_json = coll.entity_from_json
+            njson = []
+
+            def count_json(obj, *args):
+                njson.append(obj)
+                return entity_from_json(obj, *args)
+            coll.entity_from_json = count_json
+            coll.set_filter(core.CommonExpression.from_str("K1 ge 100"))
+            # force the server to return several pages
+            regressionServerApp.topmax = 5
+            try:
+                json_values = sorted(
+                    (e.key(), e['Sum'].value, e['Product'].value)
+                    for e in coll.values())
+                self.assertTrue(len(json_values) == 12)
+                self.assertTrue(len(njson) == 12)
+                # the Atom format is still supported
+                coll.FEED_ACCEPT = "application/atom+xml"
+                atom_values = sorted(
+                    (e.key(), e['Sum'].value, e['Product'].value)
+                    for e in coll.values())
+            finally:
+                regressionServerApp.topmax = 100
+            self.assertTrue(len(njson) == 12)
+            self.assertTrue(json_values == atom_values)
 
 
 if __name__ == "__main__":
@@ -33,7 +33,8 @@ def suite(prefix='test'):
         loader.loadTestsFromTestCase(ParamsExpressionTests),
         loader.loadTestsFromTestCase(ODataURITests),
         loader.loadTestsFromTestCase(JSONTests),
-        loader.loadTestsFromTestCase(StreamInfoTests)
+        loader.loadTestsFromTestCase(StreamInfoTests),
+        loader.loadTestsFromTestCase(DocumentTests)
     ))
 
 
@@ -48,7 +49,23 @@ class CommonExpressionTests(unittest.TestCase):
     def evaluate_common(self, expr_string):
         p = odata.Parser(expr_string)
         e = p.parse_common_expression()
-        return e.evaluate(None)
+        # check that the compiled form gives the same result
+        try:
+            compiled = e.compile_value(None)
+        except odata.EvaluationError:
+            compiled = None
+        try:
+            value = e.evaluate(None)
+        except odata.EvaluationError:
+            if compiled is not None:
+                self.assertRaises(odata.EvaluationError, compiled.func, None)
+            raise
+        if compiled is not None:
+            self.assertTrue(compiled.type_code == value.type_code,
+                            "Compiled type of %s" % expr_string)
+            self.assertTrue(compiled.func(None) == value.value,
+                            "Compiled value of %s" % expr_string)
+        return value
 
     def test_confusing_identifiers(self):
         p = odata.Parser("X and binary and Binary")
@@ -2033,6 +2050,12 @@ class JSONTests(unittest.TestCase):
         odata.simple_value_from_json(v, "1970-01-01T06:00:00+06:00")
         self.assertTrue(v)
         self.assertTrue(v.value == d)
+        # multi-digit and negative tick counts
+        odata.simple_value_from_json(v, "/Date(1387987143142)/")
+        self.assertTrue(v.value.get_calendar_string(ndp=3, dp=".") ==
+                        "2013-12-25T15:59:03.142")
+        odata.simple_value_from_json(v, "/Date(-1000)/")
+        self.assertTrue(str(v.value) == "1969-12-31T23:59:59")
 
     def test_datetimeoffset_to_json(self):
         v = edm.EDMValue.from_type(edm.SimpleType.DateTimeOffset)
@@ -2098,6 +2121,50 @@ class StreamInfoTests(unittest.TestCase):
         self.assertTrue(sinfo2.type == params.PLAIN_TEXT)
 
 
+class DocumentTests(unittest.TestCase):
+
+    def test_iter_entries(self):
+        src = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"
+    xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata"
+    xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices">
+    <id>http://host/service.svc/Orders</id>
+    <title type="text">Orders</title>
+    <m:count>3</m:count>
+    <entry>
+        <id>http://host/service.svc/Orders(1)</id>
+        <link rel="http://schemas.microsoft.com/ado/2007/08/dataservices/\
+related/Items" href="Orders(1)/Items">
+            <m:inline>
+                <feed>
+                    <entry><id>http://host/service.svc/Items(1)</id></entry>
+                </feed>
+            </m:inline>
+        </link>
+    </entry>
+    <entry><id>http://host/service.svc/Orders(2)</id></entry>
+    <link rel="next" href="Orders?$skiptoken=2"/>
+</feed>"""
+        doc = odata.Document()
+        ids = []
+        for entry in doc.iter_entries(src):
+            self.assertTrue(isinstance(entry, odata.Entry))
+            self.assertTrue(entry.parent is doc.root)
+            self.assertTrue(len(doc.root.Entry) == 1)
+            ids.append(entry.AtomId.get_value())
+        self.assertTrue(ids == ["http://host/service.svc/Orders(1)",
+                                "http://host/service.svc/Orders(2)"], ids)
+        self.assertTrue(isinstance(doc.root, odata.Feed))
+        self.assertTrue(len(doc.root.Entry) == 0)
+        self.assertTrue(doc.root.Link[0].rel == "next")
+        # not a feed
+        doc = odata.Document()
+        src = b"""<entry xmlns="http://www.w3.org/2005/Atom">
+    <id>http://host/service.svc/Orders(1)</id></entry>"""
+        self.assertTrue(list(doc.iter_entries(src)) == [])
+        self.assertTrue(isinstance(doc.root, odata.Entry))
+
+
 class DataServiceRegressionTests(unittest.TestCase):
 
     """Abstract class used to test individual data services."""
@@ -2131,6 +2198,98 @@ class DataServiceRegressionTests(unittest.TestCase):
                     self.fail("insert_entity returned a NULL key (%s)" %
                               keytype)
 
+    def runtest_bulk_insert(self):
+        container = self.ds['RegressionModel.RegressionContainer']
+        autokeys = container['AutoKeysInt32']
+        with autokeys.open() as coll:
+            n = len(coll)
+            entities = []
+            for i in range3(10):
+                e = coll.new_entity()
+                e['Data'].set_from_value('bulk %i' % i)
+                entities.append(e)
+            coll.insert_entities(entities, batch_size=3)
+            keys = set()
+            for e in entities:
+                self.assertTrue(e.exists)
+                keys.add(e.key())
+            self.assertTrue(len(keys) == 10)
+            self.assertTrue(len(coll) == n + 10)
+        manys = container['Many2OFs']
+        ones = container['Many2OXFs']
+        with manys.open() as collection_many:
+            with ones.open() as collection_o:
+                e_o = collection_o.new_entity()
+                e_o['K'].set_from_value(1000)
+                e_o['Data'].set_from_value('BulkOne')
+                collection_o.insert_entity(e_o)
+
+                def generate_manys():
+                    for i in range3(1, 8):
+                        e_many = collection_many.new_entity()
+                        e_many['K'].set_from_value(1000 + i)
+                        e_many['Data'].set_from_value('BulkMany_%i' % i)
+                        if i % 2:
+                            e_many['O'].bind_entity(e_o)
+                        else:
+                            # deep insert
+                            e_new = collection_o.new_entity()
+                            e_new['K'].set_from_value(1000 + i)
+                            e_new['Data'].set_from_value('BulkOne_%i' % i)
+                            e_many['O'].bind_entity(e_new)
+                        yield e_many
+                collection_many.insert_entities(generate_manys(),
+                                                batch_size=4)
+                for i in range3(1, 8):
+                    e_many = collection_many[1000 + i]
+                    self.assertTrue(e_many['Data'].value ==
+                                    'BulkMany_%i' % i)
+                    nav_o = e_many['O'].get_entity()
+                    self.assertTrue(nav_o['K'].value ==
+                                    (1000 if i % 2 else 1000 + i))
+                # a duplicate key raises an error
+                e_many = collection_many.new_entity()
+                e_many['K'].set_from_value(1001)
+                e_many['Data'].set_from_value('BulkDuplicate')
+                e_many['O'].bind_entity(e_o)
+                try:
+                    collection_many.insert_entities([e_many])
+                    self.fail("Duplicate key in insert_entities")
+                except edm.ConstraintError:
+                    pass
+        # an entity bound to a new entity earlier in the same batch
+        with container['Many2ZORvFs'].open() as coll:
+            parent = coll.new_entity()
+            parent['K'].set_from_value(2000)
+            parent['Data'].set_from_value('Parent')
+            child = coll.new_entity()
+            child['K'].set_from_value(2001)
+            child['Data'].set_from_value('Child')
+            child['ZO'].bind_entity(parent)
+            coll.insert_entities([parent, child])
+            self.assertTrue(parent.exists and child.exists)
+            self.assertTrue(coll[2001]['ZO'].get_entity().key() == 2000)
+            self.assertTrue(coll[2000]['ZO'].get_entity() is None)
+
+    def runtest_expand_batch(self):
+        container = self.ds['RegressionModel.RegressionContainer']
+        for es in container.EntitySet:
+            nav_names = sorted(es.navigation)
+            if not nav_names:
+                continue
+            with es.open() as collection:
+                collection.set_expand(dict((n, None) for n in nav_names))
+                entities = collection.values()
+            for entity in entities:
+                for n in nav_names:
+                    self.assertTrue(entity[n].isExpanded)
+                    keys = sorted(e.key() for e in
+                                  entity[n].expanded.values())
+                    with es.open_navigation(n, entity) as nav:
+                        expected = sorted(e.key() for e in nav.values())
+                    self.assertTrue(keys == expected, "%s/%s: %s" %
+                                    (es.name, n, repr(keys)))
+
     def check_null(self, entity, exclude=[]):
         for pname in entity.data_keys():
             # check each property is NULL
@@ -5729,6 +5888,8 @@ class DataServiceRegressionTests(unittest.TestCase):
         self.runtest_nav_many2many_1()
         self.runtest_nav_many2many_r()
         self.runtest_nav_many2many_r1()
+        self.runtest_bulk_insert()
+        self.runtest_expand_batch()
 
 
 if __name__ == "__main__":
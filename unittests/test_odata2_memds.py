@@ -1,7 +1,10 @@
 #! /usr/bin/env python
 
+import logging
+import time
 import unittest
 
+import pyslet.odata2.core as core
 import pyslet.odata2.csdl as edm
 import pyslet.odata2.edmx as edmx
 
@@ -17,7 +20,8 @@ def suite():
     loader.testMethodPrefix = 'test'
     return unittest.TestSuite((
         loader.loadTestsFromTestCase(MemDSTests),
-        loader.loadTestsFromTestCase(RegressionTests)
+        loader.loadTestsFromTestCase(RegressionTests),
+        loader.loadTestsFromTestCase(FilterBenchmarks)
     ))
 
 
@@ -69,6 +73,189 @@ class MemDSTests(unittest.TestCase):
         self.employees.data["FGHIJ"] = (ul("FGHIJ"), ul("Jane Smith"), None,
                                         None)
 
+    def load_documents(self, collection):
+        for i in range(30):
+            doc = collection.new_entity()
+            doc['DocumentID'].set_from_value(i)
+            doc['Title'].set_from_value(ul("Doc%02i") % (i // 2))
+            doc['Author'].set_from_value(ul("ABC")[i % 3])
+            collection.insert_entity(doc)
+
+    def test_order_page(self):
+        es = self.schema['SampleEntities.Documents']
+        with es.open() as collection:
+            self.load_documents(collection)
+            doc = collection[7]
+            doc['Title'].set_from_value(None)
+            collection.update_entity(doc)
+        # expected order: Author desc, Title (nulls first) then key
+        expected = sorted(range(30), key=lambda i: (
+            -ord("ABC"[i % 3]), -1 if i == 7 else i // 2, i))
+        with es.open() as collection:
+            collection.set_orderby(
+                core.CommonExpression.orderby_from_str(
+                    ul("Author desc, Title")))
+            self.assertTrue(
+                [e.key() for e in collection.itervalues()] == expected)
+            collection.set_page(top=5, skip=3)
+            self.assertTrue(
+                [e.key() for e in collection.iterpage()] == expected[3:8])
+            collection.set_page(top=10, skip=25)
+            self.assertTrue(
+                [e.key() for e in collection.iterpage()] == expected[25:])
+            collection.set_page(top=4)
+            collection.set_topmax(3)
+            self.assertTrue(
+                [e.key() for e in collection.iterpage(True)] == expected[:3])
+            self.assertTrue(collection.next_skiptoken() == "3")
+            self.assertTrue(
+                [e.key() for e in collection.iterpage(True)] == expected[3:6])
+
+    def test_compiled_filter(self):
+        es = self.schema['SampleEntities.Documents']
+        with es.open() as collection:
+            self.load_documents(collection)
+            doc = collection[7]
+            doc['Title'].set_from_value(None)
+            collection.update_entity(doc)
+            entities = list(collection.itervalues())
+        for f in ("Title eq 'Doc05'", "Title ne null", "DocumentID gt 5L",
+                  "DocumentID add 1 ge 7.5D", "not (Author eq 'A')",
+                  "startswith(Title, 'Doc1') or DocumentID le 2",
+                  "Title eq null or Author eq 'C'",
+                  "substringof('c1', tolower(Title)) and length(Author) eq 1",
+                  "DocumentID mod 4 eq 0 and Author ne 'B'",
+                  "-DocumentID lt -25", "concat(Author, Title) eq 'BDoc00'"):
+            expr = core.CommonExpression.from_str(ul(f))
+            func = expr.compile_filter(es.entityType)
+            self.assertFalse(func is None, f)
+            self.assertTrue(expr.compile_filter(es.entityType) is func)
+            for e in entities:
+                value = expr.evaluate(e)
+                self.assertTrue(func(e) == value.value,
+                                "%s: %s" % (f, repr(e.key())))
+        # division by zero raises the same error
+        expr = core.CommonExpression.from_str(
+            ul("DocumentID div (DocumentID sub 3) eq 0"))
+        func = expr.compile_filter(es.entityType)
+        self.assertRaises(core.EvaluationError, expr.evaluate, entities[3])
+        self.assertRaises(core.EvaluationError, func, entities[3])
+        # complex properties can be compiled
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            e = collection.new_entity()
+            e['EmployeeID'].set_from_value(ul("ABCDE"))
+            e['EmployeeName'].set_from_value(ul("John Smith"))
+            e['Address']['City'].set_from_value(ul("Chunton"))
+            expr = core.CommonExpression.from_str(
+                ul("Address/City eq 'Chunton'"))
+            func = expr.compile_filter(es.entityType)
+            self.assertTrue(func(e) is True)
+        # non-boolean expressions and unsupported features are not
+        for f in ("Title", "isof(Title, 'Edm.String')", "round(2.5M) eq 3M"):
+            expr = core.CommonExpression.from_str(ul(f))
+            self.assertTrue(expr.compile_filter(es.entityType) is None, f)
+        # parameters are evaluated when the filter is used
+        params = {'id': edm.EDMValue.from_type(edm.SimpleType.Int64)}
+        expr = core.CommonExpression.from_str(ul("DocumentID lt :id"), params)
+        func = expr.compile_filter(
+            self.schema['SampleEntities.Documents'].entityType)
+        params['id'].set_from_value(5)
+        self.assertTrue(func(entities[4]) is True)
+        params['id'].set_from_value(4)
+        self.assertTrue(func(entities[4]) is False)
+
+    def test_index(self):
+        es = self.schema['SampleEntities.Documents']
+        store = self.container.entityStorage['Documents']
+        with es.open() as collection:
+            self.load_documents(collection)
+        for bad_name in ('DocumentID', 'Missing'):
+            try:
+                store.add_index(bad_name)
+                self.fail("Index on %s" % bad_name)
+            except ValueError:
+                pass
+        filters = (
+            "Title eq 'Doc05'", "'Doc05' eq Title", "Author eq 'B'",
+            "Title eq null", "Title lt 'Doc03'", "Title le 'Doc03'",
+            "'Doc12' lt Title", "Title ge 'Doc12' and Author ne 'A'",
+            "startswith(Title, 'Doc1')", "Author eq 'A' or Author eq 'C'",
+            "Author eq 'A' and Title gt 'Doc07'",
+            "DocumentID lt 5 or Title eq 'Doc07'")
+        orders = (None, "Title", "Title desc", "Author desc",
+                  "Title desc, DocumentID")
+
+        def run_queries():
+            results = {}
+            for f in filters:
+                for o in orders:
+                    with es.open() as collection:
+                        collection.set_filter(
+                            core.CommonExpression.from_str(ul(f)))
+                        if o is not None:
+                            collection.set_orderby(
+                                core.CommonExpression.orderby_from_str(ul(o)))
+                        keys = [e.key() for e in collection.itervalues()]
+                        self.assertTrue(len(collection) == len(keys))
+                        if o is None or o == "Author desc":
+                            # order undefined or partially defined
+                            keys = sorted(keys)
+                        results[(f, o)] = keys
+            return results
+        unindexed = run_queries()
+        title = store.add_index('Title', ordered=True)
+        self.assertTrue(title.ordered)
+        author = store.add_index('Author')
+        self.assertFalse(author.ordered)
+        self.assertTrue(store.add_index('Author') is author)
+        self.assertTrue(unindexed == run_queries())
+        # check that the index reduces the number of entities read
+        reads = []
+        read_entity = store.read_entity
+
+        def counting_read(key, select=None):
+            reads.append(key)
+            return read_entity(key, select)
+        store.read_entity = counting_read
+        with es.open() as collection:
+            collection.set_filter(
+                core.CommonExpression.from_str(ul("Title eq 'Doc05'")))
+            self.assertTrue(len(list(collection.itervalues())) == 2)
+        self.assertTrue(sorted(reads) == [10, 11], reads)
+        del reads[:]
+        with es.open() as collection:
+            collection.set_filter(
+                core.CommonExpression.from_str(ul("startswith(Title,'Doc0')")))
+            collection.set_orderby(
+                core.CommonExpression.orderby_from_str(ul("Title desc")))
+            collection.set_page(top=3)
+            self.assertTrue(
+                [e.key() for e in collection.iterpage()] == [18, 19, 16])
+        self.assertTrue(len(reads) <= 4, reads)
+        del store.read_entity
+        # updates and deletes maintain the index
+        with es.open() as collection:
+            doc = collection[10]
+            doc['Title'].set_from_value(ul("Doc99"))
+            collection.update_entity(doc)
+            del collection[11]
+            self.assertTrue(title.eq_keys(ul("Doc05")) == set())
+            self.assertTrue(title.eq_keys(ul("Doc99")) == set((10, )))
+            self.assertFalse(ul("Doc05") in title.values)
+            collection.set_filter(
+                core.CommonExpression.from_str(ul("Title gt 'Doc14'")))
+            self.assertTrue(
+                sorted(e.key() for e in collection.itervalues()) == [10])
+            # null values sort first
+            self.assertTrue(title.ordered_keys()[:3] == [0, 1, 2])
+            collection.set_filter(None)
+            doc = collection[3]
+            doc['Title'].set_from_value(None)
+            collection.update_entity(doc)
+            self.assertTrue(title.ordered_keys()[:3] == [3, 0, 1])
+            self.assertTrue(title.ordered_keys(reverse=True)[-1] == 3)
+
 
 class RegressionTests(DataServiceRegressionTests):
 
@@ -81,5 +268,43 @@ class RegressionTests(DataServiceRegressionTests):
         self.run_combined()
 
 
+class FilterBenchmarks(unittest.TestCase):
+
+    def setUp(self):        # noqa
+        doc = edmx.Document()
+        mdpath = TEST_DATA_DIR.join('sample_server', 'metadata.xml')
+        with mdpath.open('rb') as f:
+            doc.read(f)
+        self.schema = doc.root.DataServices['SampleModel']
+        self.container = memds.InMemoryEntityContainer(
+            doc.root.DataServices["SampleModel.SampleEntities"])
+        self.es = self.schema['SampleEntities.Documents']
+        with self.es.open() as collection:
+            for i in range(2000):
+                doc = collection.new_entity()
+                doc['DocumentID'].set_from_value(i)
+                doc['Title'].set_from_value(ul("Document %i") % i)
+                doc['Author'].set_from_value(ul("Author %i") % (i % 7))
+                collection.insert_entity(doc)
+            self.entities = list(collection.itervalues())
+
+    def test_throughput(self):
+        expr = core.CommonExpression.from_str(
+            ul("(DocumentID ge 100 and DocumentID lt 1500.0D) and "
+               "(startswith(Title, 'Document 1') or Author eq 'Author 3')"))
+        t = time.time()
+        interpreted = [e for e in self.entities if expr.evaluate(e).value]
+        t = time.time() - t
+        func = expr.compile_filter(self.es.entityType)
+        self.assertFalse(func is None)
+        tc = time.time()
+        compiled = [e for e in self.entities if func(e)]
+        tc = time.time() - tc
+        self.assertTrue(interpreted == compiled)
+        logging.info("$filter: interpreted %i entities in %.3fs, "
+                     "compiled in %.3fs (%.1fx)", len(self.entities), t, tc,
+                     t / tc if tc else 0.0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -13,6 +13,7 @@ import time
 import traceback
 import uuid
 import unittest
+import zlib
 
 from threading import Thread
 
@@ -21,6 +22,7 @@ from pyslet import rfc2396 as uri
 from pyslet import rfc4287 as atom
 from pyslet import rfc5023 as app
 from pyslet.http import messages
+from pyslet.http import multipart
 from pyslet.http import params
 from pyslet.odata2 import core
 from pyslet.odata2 import csdl as edm
@@ -1950,6 +1952,33 @@ class SampleServerTests(unittest.TestCase):
         self.assertTrue(new_document['Version'].value == h.digest(),
                         "Mismatched version")
 
+    def test_empty_inline_from_atom_entry(self):
+        # an empty inline element means there is no linked entity
+        src = b"""<?xml version="1.0" encoding="utf-8"?>
+<entry xmlns="http://www.w3.org/2005/Atom"
+    xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata"
+    xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices">
+    <id>http://host/service.svc/Orders(3)</id>
+    <link rel="http://schemas.microsoft.com/ado/2007/08/dataservices/\
+related/Customer" href="Orders(3)/Customer"><m:inline/></link>
+    <link rel="http://schemas.microsoft.com/ado/2007/08/dataservices/\
+related/OrderLine" href="Orders(3)/OrderLine"><m:inline/></link>
+    <content type="application/xml">
+        <m:properties><d:OrderID m:type="Edm.Int32">3</d:OrderID>
+        </m:properties>
+    </content>
+</entry>"""
+        doc = core.Document()
+        doc.read(src)
+        orders = self.ds['SampleModel.SampleEntities.Orders']
+        order = core.Entity(orders)
+        order.exists = True
+        doc.root.get_value(order)
+        self.assertTrue(order['OrderID'].value == 3)
+        for nav in ('Customer', 'OrderLine'):
+            self.assertTrue(order[nav].isExpanded, nav)
+            self.assertTrue(len(order[nav].expanded) == 0, nav)
+
     def test_evaluate_first_member_expression(self):
         """Back-track a bit to test some basic stuff using the sample
         data set.
@@ -2639,11 +2668,12 @@ class SampleServerTests(unittest.TestCase):
         any Batch Request sent to it."""
         request = MockRequest("/service.svc/$batch")
         request.send(self.svc)
-        self.assertTrue(request.responseCode == 404)
+        # batch requests must be POSTed
+        self.assertTrue(request.responseCode == 400)
         base_uri = "/service.svc/$batch?"
         request = MockRequest(base_uri)
         request.send(self.svc)
-        self.assertTrue(request.responseCode == 404)
+        self.assertTrue(request.responseCode == 400)
         for x in ["$expand=Orders",
                   "$filter=substringof(CompanyName,%20'bikes')",
                   "$format=xml",
@@ -3937,6 +3967,40 @@ class SampleServerTests(unittest.TestCase):
         self.assertTrue(isinstance(obj, list), "Expected list of entities")
         self.assertTrue(len(obj) == 91, "Sample server has 91 Customers")
 
+    def test_retrieve_entity_set_streaming(self):
+        self.svc.streaming = True
+        self.svc.stream_chunk = 256
+        request = MockRequest('/service.svc/Customers')
+        response_data = self.svc(request.environ, request.start_response)
+        self.assertTrue(request.responseCode == 200)
+        self.assertFalse("CONTENT-LENGTH" in request.responseHeaders)
+        self.assertTrue(params.MediaType.from_str(
+            request.responseHeaders['CONTENT-TYPE']) == "application/atom+xml")
+        chunks = list(response_data)
+        self.assertTrue(len(chunks) > 1, "Expected multiple chunks")
+        for chunk in chunks:
+            self.assertTrue(isinstance(chunk, bytes))
+        doc = app.Document()
+        doc.read(b''.join(chunks))
+        self.assertTrue(isinstance(doc.root, atom.Feed))
+        self.assertTrue(len(doc.root.Entry) == 91,
+                        "Sample server has 91 Customers")
+        request = MockRequest('/service.svc/Customers')
+        request.set_header('Accept', 'application/json')
+        response_data = self.svc(request.environ, request.start_response)
+        self.assertTrue(request.responseCode == 200)
+        self.assertFalse("CONTENT-LENGTH" in request.responseHeaders)
+        chunks = list(response_data)
+        self.assertTrue(len(chunks) > 1, "Expected multiple chunks")
+        obj = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertTrue(len(obj["d"]["results"]) == 91)
+        # errors in the query are still reported before the response
+        self.svc.stream_chunk = 16384
+        request = MockRequest(
+            "/service.svc/Customers?$filter=substringof(CompanyName,1)")
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 500)
+
     def test_retrieve_entity(self):
         request = MockRequest("/service.svc/Customers('ALFKI')")
         request.send(self.svc)
@@ -4209,6 +4273,119 @@ class SampleServerTests(unittest.TestCase):
         self.assertTrue(ds.data_services_version() == "2.0",
                         "Expected matching data service version")
 
+    def test_metadata_cache(self):
+        request = MockRequest("/service.svc/$metadata")
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        data = request.wfile.getvalue()
+        etag = request.responseHeaders['ETAG']
+        self.assertTrue(etag.startswith('"'), "strong ETag expected")
+        self.assertFalse('CONTENT-ENCODING' in request.responseHeaders)
+        # the same response is served until the model is changed
+        self.assertTrue(self.svc.metadata_cache.data == data)
+        request = MockRequest("/service.svc/$metadata")
+        request.set_header('If-None-Match', etag)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 304)
+        self.assertTrue(request.wfile.getvalue() == b'')
+        self.assertTrue(request.responseHeaders['ETAG'] == etag)
+        request = MockRequest("/service.svc/$metadata")
+        request.set_header('If-None-Match', '"xxx", %s' % etag)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 304)
+        request = MockRequest("/service.svc/$metadata")
+        request.set_header('If-None-Match', '"xxx"')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        # now ask for a compressed version
+        request = MockRequest("/service.svc/$metadata")
+        request.set_header('Accept-Encoding', 'gzip, deflate')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        self.assertTrue(request.responseHeaders['CONTENT-ENCODING'] == "gzip")
+        gzip_etag = request.responseHeaders['ETAG']
+        self.assertFalse(gzip_etag == etag)
+        zdata = request.wfile.getvalue()
+        self.assertTrue(int(request.responseHeaders['CONTENT-LENGTH']) ==
+                        len(zdata))
+        self.assertTrue(len(zdata) < len(data))
+        self.assertTrue(
+            zlib.decompress(zdata, 16 + zlib.MAX_WBITS) == data)
+        # either tag matches the resource
+        request = MockRequest("/service.svc/$metadata")
+        request.set_header('If-None-Match', gzip_etag)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 304)
+        # the service document is cached too, in both formats
+        for accept in ('application/atomsvc+xml', 'application/json'):
+            request = MockRequest("/service.svc/")
+            request.set_header('Accept', accept)
+            request.set_header('Accept-Encoding', 'gzip')
+            request.send(self.svc)
+            self.assertTrue(request.responseCode == 200)
+            self.assertTrue(
+                request.responseHeaders['CONTENT-ENCODING'] == "gzip")
+            self.assertTrue(params.MediaType.from_str(
+                request.responseHeaders['CONTENT-TYPE']) == accept)
+            etag = request.responseHeaders['ETAG']
+            request = MockRequest("/service.svc/")
+            request.set_header('Accept', accept)
+            request.set_header('If-None-Match', etag)
+            request.send(self.svc)
+            self.assertTrue(request.responseCode == 304)
+        # changing the model updates the cache
+        old_etag = self.svc.metadata_cache.etag
+        self.svc.set_model(self.ds.get_document())
+        self.assertTrue(self.svc.metadata_cache.etag == old_etag)
+        self.ds['SampleModel'].set_attribute('Alias', 'Sample')
+        self.svc.cache_documents()
+        self.assertFalse(self.svc.metadata_cache.etag == old_etag)
+
+    def test_conditional_entity(self):
+        request = MockRequest("/service.svc/Customers('ALFKI')")
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        etag = request.responseHeaders['ETAG']
+        # binary concurrency tokens do not provide a modification time
+        self.assertFalse('LAST-MODIFIED' in request.responseHeaders)
+        for method in ("GET", "HEAD"):
+            request = MockRequest("/service.svc/Customers('ALFKI')", method)
+            request.set_header('If-None-Match', etag)
+            request.send(self.svc)
+            self.assertTrue(request.responseCode == 304)
+            self.assertTrue(request.wfile.getvalue() == b'')
+            self.assertTrue(request.responseHeaders['ETAG'] == etag)
+        request = MockRequest("/service.svc/Customers('ALFKI')")
+        request.set_header('If-None-Match', '*')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 304)
+        request = MockRequest("/service.svc/Customers('ALFKI')")
+        request.set_header('If-None-Match', '"xxx"')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        # If-Modified-Since can't be used with this entity
+        request = MockRequest("/service.svc/Customers('ALFKI')")
+        request.set_header('If-Modified-Since',
+                           'Sun, 06 Nov 2094 08:49:37 GMT')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        # expanded representations are not short-circuited
+        request = MockRequest(
+            "/service.svc/Customers('ALFKI')?$expand=Orders")
+        request.set_header('If-None-Match', etag)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+        # missing entities are handled as usual
+        request = MockRequest("/service.svc/Customers('ZZZZZ')")
+        request.set_header('If-None-Match', etag)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 404)
+        # entities with no concurrency tokens have no ETag
+        request = MockRequest("/service.svc/Orders(1)")
+        request.set_header('If-None-Match', '*')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 200)
+
     def test_retrieve_service_document(self):
         request = MockRequest("/service.svc/")
         request.send(self.svc)
@@ -4822,6 +4999,138 @@ class SampleServerTests(unittest.TestCase):
             customer = collection['ALFKI']
             self.assertTrue(customer['CompanyName'].value == "Example Inc")
 
+    def read_batch_response(self, request):
+        # returns a list of responses, a nested list for each changeset
+        mtype = params.MediaType.from_str(
+            request.responseHeaders['CONTENT-TYPE'])
+        self.assertTrue(mtype.type == "multipart")
+        return self.read_batch_parts(
+            io.BytesIO(request.wfile.getvalue()), mtype)
+
+    def read_batch_parts(self, src, mtype):
+        result = []
+        for part in multipart.MultipartRecvWrapper(src, mtype).read_parts():
+            ptype = part.message.get_content_type()
+            if ptype.type == "multipart":
+                result.append(self.read_batch_parts(part, ptype))
+            else:
+                self.assertTrue(ptype == "application/http")
+                wrapper = messages.RecvWrapper(part, messages.Response)
+                response = wrapper.read_message_header()
+                result.append((response, wrapper.read()))
+        return result
+
+    def test_batch(self):
+        customers = self.ds['SampleModel.SampleEntities.Customers']
+        with customers.open() as collection:
+            customer = collection.new_entity()
+            customer['CustomerID'].set_from_value('STEVE')
+            customer['CompanyName'].set_from_value("Steve's Inc")
+            data = ' '.join(customer.generate_entity_type_in_json(False, 1))
+            customer['CompanyName'].set_from_value("Steve's Ltd")
+            update = ' '.join(customer.generate_entity_type_in_json(True, 1))
+        data = data.encode('utf-8')
+        update = update.encode('utf-8')
+        body = [
+            b"--batch_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"GET Customers('ALFKI') HTTP/1.1\r\n"
+            b"Accept: application/json\r\n\r\n",
+            b"--batch_1\r\n"
+            b"Content-Type: multipart/mixed; boundary=changeset_1\r\n\r\n"
+            b"--changeset_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n"
+            b"Content-ID: 1\r\n\r\n"
+            b"POST Customers HTTP/1.1\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: %i\r\n\r\n" % len(data) + data,
+            b"--changeset_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"PUT $1 HTTP/1.1\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: %i\r\n\r\n" % len(update) + update,
+            b"--changeset_1--\r\n",
+            b"--batch_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"GET http://host/service.svc/Customers('STEVE')"
+            b"/CompanyName/$value HTTP/1.1\r\n\r\n",
+            b"--batch_1--"]
+        request = MockRequest("/service.svc/$batch", "POST")
+        batch = b"\r\n".join(body)
+        request.set_header('Content-Type',
+                           'multipart/mixed; boundary=batch_1')
+        request.set_header('Content-Length', str(len(batch)))
+        request.rfile.write(batch)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 202)
+        responses = self.read_batch_response(request)
+        self.assertTrue(len(responses) == 3)
+        response, data = responses[0]
+        self.assertTrue(response.status == 200)
+        obj = json.loads(data.decode('utf-8'))
+        self.assertTrue(obj["d"]["CustomerID"] == "ALFKI")
+        changeset = responses[1]
+        self.assertTrue(len(changeset) == 2)
+        self.assertTrue(changeset[0][0].status == 201)
+        self.assertTrue(changeset[0][0].get_header('Location') ==
+                        b"http://host/service.svc/Customers('STEVE')")
+        self.assertTrue(changeset[1][0].status == 204)
+        response, data = responses[2]
+        self.assertTrue(response.status == 200)
+        self.assertTrue(data == b"Steve's Ltd")
+        with customers.open() as collection:
+            self.assertTrue(
+                collection['STEVE']['CompanyName'].value == "Steve's Ltd")
+        # a failed operation fails the changeset
+        body = [
+            b"--batch_1\r\n"
+            b"Content-Type: multipart/mixed; boundary=changeset_1\r\n\r\n"
+            b"--changeset_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"DELETE Customers('STEVE') HTTP/1.1\r\n\r\n",
+            b"--changeset_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"DELETE Customers('STEVE') HTTP/1.1\r\n\r\n",
+            b"--changeset_1--\r\n",
+            b"--batch_1--"]
+        request = MockRequest("/service.svc/$batch", "POST")
+        batch = b"\r\n".join(body)
+        request.set_header('Content-Type',
+                           'multipart/mixed; boundary=batch_1')
+        request.set_header('Content-Length', str(len(batch)))
+        request.rfile.write(batch)
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 202)
+        responses = self.read_batch_response(request)
+        # a single response replaces the changeset
+        self.assertTrue(len(responses) == 1)
+        response, data = responses[0]
+        self.assertTrue(response.status == 404)
+        # the read only server refuses modifications in batches
+        svc = server.ReadOnlyServer('http://host/service.svc')
+        svc.set_model(self.ds.get_document())
+        request = MockRequest("/service.svc/$batch", "POST")
+        request.set_header('Content-Type',
+                           'multipart/mixed; boundary=batch_1')
+        request.set_header('Content-Length', str(len(batch)))
+        request.rfile.write(batch)
+        request.send(svc)
+        self.assertTrue(request.responseCode == 202)
+        responses = self.read_batch_response(request)
+        self.assertTrue(len(responses) == 1)
+        self.assertTrue(responses[0][0].status == 403)
+        # and a malformed batch is a bad request
+        request = MockRequest("/service.svc/$batch", "POST")
+        request.set_header('Content-Type', 'application/http')
+        request.send(self.svc)
+        self.assertTrue(request.responseCode == 400)
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -5,6 +5,7 @@ import logging
 import random
 import sqlite3
 import threading
+import time
 import uuid
 import unittest
 
@@ -13,6 +14,7 @@ from pyslet.http import params
 from pyslet.odata2 import core
 from pyslet.odata2 import csdl as edm
 from pyslet.odata2 import metadata as edmx
+from pyslet.odata2 import server
 from pyslet.odata2 import sqlds
 from pyslet.py2 import (
     long2,
@@ -21,6 +23,7 @@ from pyslet.py2 import (
 from pyslet.vfs import OSFilePath as FilePath
 
 from test_odata2_core import DataServiceRegressionTests
+from test_rfc5023 import MockRequest
 
 
 TEST_DATA_DIR = FilePath(
@@ -96,7 +99,7 @@ class ParamTests(unittest.TestCase):
 
 class MockCursor(object):
 
-    def execute(self, query):
+    def execute(self, query, params=None):
         pass
 
     def close(self):
@@ -439,6 +442,146 @@ class ContainerTests(unittest.TestCase):
         # success criteria?  that we survived
         pass
 
+    def test_pool_stats(self):
+        events = []
+
+        def callback(event, connection, value):
+            events.append((event, connection, value))
+
+        container = MockContainer(container=self.container, dbapi=MockAPI(2),
+                                  max_connections=5, min_connections=3,
+                                  metrics_callback=callback)
+        stats = container.pool_stats()
+        self.assertTrue(stats['size'] == 0)
+        self.assertTrue(stats['min'] == 3)
+        self.assertTrue(stats['max'] == 5)
+        # acquiring the first connection warms up the pool
+        c1 = container.acquire_connection()
+        stats = container.pool_stats()
+        self.assertTrue(stats['size'] == 3, stats)
+        self.assertTrue(stats['locked'] == 1)
+        self.assertTrue(stats['idle'] == 2)
+        self.assertTrue(stats['opened'] == 3)
+        self.assertTrue(sum(n for limit, n in stats['wait_times']) == 1)
+        self.assertTrue(stats['wait_times'][-1][0] is None)
+        self.assertTrue(len(events) == 1)
+        self.assertTrue(events[0][0] == 'acquire')
+        self.assertTrue(events[0][1] is c1)
+        # nested acquisitions are not counted
+        c2 = container.acquire_connection()
+        self.assertTrue(c2 is c1)
+        t = sqlds.SQLTransaction(container, c2)
+        t.begin()
+        t.execute("SELECT 1")
+        t.close()
+        self.assertTrue(c1.query_count == 1)
+        container.release_connection(c2)
+        self.assertTrue(len(events) == 2)
+        self.assertTrue(events[1] == ('query', c1, "SELECT 1"))
+        container.release_connection(c1)
+        self.assertTrue(events[2] == ('release', c1, 1))
+        # re-acquire from the same thread
+        c2 = container.acquire_connection()
+        self.assertTrue(c2 is c1)
+        self.assertTrue(c1.acquire_count == 2)
+        container.release_connection(c2)
+        stats = container.pool_stats()
+        self.assertTrue(stats['affinity'] == 1)
+        self.assertTrue(sum(n for limit, n in stats['wait_times']) == 2)
+        # the pool cleaner won't close connections below the minimum
+        container.pool_cleaner(max_idle=0)
+        stats = container.pool_stats()
+        self.assertTrue(stats['size'] == 3, stats)
+        container.close()
+
+    def test_prewarm_failure(self):
+
+        class FailingContainer(MockContainer):
+
+            open_count = 0
+
+            def open(self):
+                # the second open, made while warming up, fails
+                self.open_count += 1
+                if self.open_count == 2:
+                    raise self.dbapi.OperationalError("open failed")
+                return super(FailingContainer, self).open()
+
+        container = FailingContainer(
+            container=self.container, dbapi=MockAPI(2), max_connections=5,
+            min_connections=3)
+        # a failed warm up does not fail the acquire
+        c1 = container.acquire_connection()
+        self.assertTrue(c1 is not None)
+        stats = container.pool_stats()
+        self.assertTrue(stats['size'] == 1, stats)
+        self.assertTrue(stats['locked'] == 1)
+        container.release_connection(c1)
+        # ...and the module lock and connection were released
+        t = threading.Thread(target=mock_runner, args=(container,))
+        t.start()
+        t.join()
+        self.assertTrue(container.acquired is not None)
+        container.close()
+
+    def test_validate(self):
+        container = MockContainer(container=self.container, dbapi=MockAPI(2),
+                                  max_connections=5, min_connections=2,
+                                  validate=True)
+        container.prewarm()
+        c1 = container.acquire_connection()
+        container.release_connection(c1)
+        stats = container.pool_stats()
+        self.assertTrue(stats['size'] == 2)
+        self.assertTrue(stats['unlocked'] == 1)
+        self.assertTrue(stats['idle'] == 1)
+        # break our connection
+        c1.dbc.bad = True
+        container.pool_cleaner()
+        stats = container.pool_stats()
+        self.assertTrue(stats['invalid'] == 1, stats)
+        # the pool is topped up again
+        self.assertTrue(stats['size'] == 2, stats)
+        self.assertTrue(stats['unlocked'] == 0)
+        self.assertTrue(stats['idle'] == 2)
+        self.assertTrue(stats['opened'] == 3)
+        c2 = container.acquire_connection()
+        self.assertFalse(c2 is c1)
+        self.assertFalse(c2.dbc.bad)
+        container.release_connection(c2)
+        container.close()
+
+    def test_fifo(self):
+        container = MockContainer(container=self.container, dbapi=MockAPI(2),
+                                  max_connections=1)
+        c1 = container.acquire_connection()
+        order = []
+        started = []
+
+        def waiter(i):
+            started.append(i)
+            c = container.acquire_connection(5)
+            order.append(i)
+            time.sleep(0.01)
+            container.release_connection(c)
+
+        threads = []
+        for i in range3(5):
+            t = threading.Thread(target=waiter, args=(i, ))
+            threads.append(t)
+            t.start()
+            # wait for the thread to join the queue
+            while container.pool_stats()['waiting'] < i + 1:
+                time.sleep(0.001)
+        container.release_connection(c1)
+        for t in threads:
+            t.join()
+        self.assertTrue(order == list(range3(5)), order)
+        stats = container.pool_stats()
+        self.assertTrue(stats['waiting'] == 0)
+        self.assertTrue(stats['recycled'] == 5)
+        container.close()
+
     def test_retry(self):
         dbapi = MockAPI(1)
         for i in range3(5):
@@ -458,6 +601,30 @@ class ContainerTests(unittest.TestCase):
             container.release_connection(c)
 
 
+NOTES_SCHEMA = b"""<?xml version="1.0" encoding="utf-8" standalone="yes" ?>
+<edmx:Edmx Version="1.0"
+    xmlns:edmx="http://schemas.microsoft.com/ado/2007/06/edmx"
+    xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata">
+    <edmx:DataServices m:DataServiceVersion="2.0">
+        <Schema Namespace="NotesModel"
+            xmlns="http://schemas.microsoft.com/ado/2006/04/edm">
+            <EntityContainer Name="Notes" m:IsDefaultEntityContainer="true">
+                <EntitySet Name="Notes" EntityType="NotesModel.Note"/>
+            </EntityContainer>
+            <EntityType Name="Note">
+                <Key>
+                    <PropertyRef Name="NoteID"/>
+                </Key>
+                <Property Name="NoteID" Type="Edm.Int32" Nullable="false"/>
+                <Property Name="Body" Type="Edm.String" Nullable="true"/>
+                <Property Name="Modified" Type="Edm.DateTime"
+                    Nullable="false" ConcurrencyMode="Fixed"/>
+            </EntityType>
+        </Schema>
+    </edmx:DataServices>
+</edmx:Edmx>"""
+
+
 class SQLDSTests(unittest.TestCase):
 
     def setUp(self):  # noqa
@@ -524,6 +691,73 @@ class SQLDSTests(unittest.TestCase):
             except edm.ConstraintError:
                 pass
 
+    def test_insert_entities_rollback(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            entities = []
+            for key in ('00001', '00002', '00001'):
+                new_hire = collection.new_entity()
+                new_hire.set_key(key)
+                new_hire["EmployeeName"].set_from_value('Joe Bloggs')
+                entities.append(new_hire)
+            try:
+                collection.insert_entities(entities, batch_size=2)
+                self.fail("Double insert in batch")
+            except edm.ConstraintError:
+                pass
+            # the batch is rolled back, nothing exists
+            for new_hire in entities:
+                self.assertFalse(new_hire.exists)
+            self.assertTrue(len(collection) == 0)
+            collection.insert_entities(entities[:2])
+            self.assertTrue(entities[0].exists and entities[1].exists)
+            self.assertTrue(len(collection) == 2)
+
+    def test_delete_entities(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            for i in range3(10):
+                new_hire = collection.new_entity()
+                new_hire.set_key('%05X' % i)
+                new_hire["EmployeeName"].set_from_value('Talent #%i' % i)
+                collection.insert_entity(new_hire)
+            collection.delete_entities(
+                ['%05X' % i for i in range3(0, 10, 2)], batch_size=2)
+            self.assertTrue(sorted(collection.keys()) ==
+                            ['%05X' % i for i in range3(1, 10, 2)])
+            # a missing key rolls back the whole call
+            try:
+                collection.delete_entities(['00001', '00002'])
+                self.fail("delete_entities: missing key")
+            except KeyError:
+                pass
+            self.assertTrue(len(collection) == 5)
+
+    def test_distinct_values(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            for i in range3(10):
+                new_hire = collection.new_entity()
+                new_hire.set_key('%05X' % i)
+                new_hire["EmployeeName"].set_from_value(
+                    'Talent #%i' % (i % 3))
+                collection.insert_entity(new_hire)
+            values = list(collection.distinct_values('EmployeeName'))
+            self.assertTrue(sorted(values) == ['Talent #0', 'Talent #1',
+                                               'Talent #2'])
+            collection.set_filter(core.CommonExpression.from_str(
+                "EmployeeID lt '00004'"))
+            values = list(collection.distinct_values('EmployeeName'))
+            self.assertTrue(sorted(values) == ['Talent #0', 'Talent #1',
+                                               'Talent #2'])
+            collection.set_filter(core.CommonExpression.from_str(
+                "EmployeeID lt '00002'"))
+            values = list(collection.distinct_values('EmployeeName'))
+            self.assertTrue(sorted(values) == ['Talent #0', 'Talent #1'])
+
     def test_update(self):
         es = self.schema['SampleEntities.Employees']
         with es.open() as collection:
@@ -599,6 +833,158 @@ class SQLDSTests(unittest.TestCase):
             except KeyError:
                 pass
 
+    def test_transaction(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+
+        def add_employee(key, name):
+            with es.open() as collection:
+                new_hire = collection.new_entity()
+                new_hire.set_key(key)
+                new_hire["EmployeeName"].set_from_value(name)
+                collection.insert_entity(new_hire)
+
+        with self.db.transaction() as connection:
+            self.assertTrue(connection.transaction_level == 1)
+            add_employee('00001', 'Joe Bloggs')
+            with self.db.transaction():
+                # nested transactions are not committed
+                self.assertTrue(connection.transaction_level == 2)
+                add_employee('00002', 'Jane Doe')
+        self.assertTrue(connection.transaction_level == 0)
+        with es.open() as collection:
+            self.assertTrue(len(collection) == 2)
+        try:
+            with self.db.transaction():
+                add_employee('00003', 'Jack Smith')
+                # a failure in the transaction undoes the first insert
+                add_employee('00001', 'Joe Bloggs Jr')
+            self.fail("Double insert in transaction")
+        except edm.ConstraintError:
+            pass
+        with es.open() as collection:
+            self.assertTrue(len(collection) == 2)
+            self.assertFalse('00003' in collection)
+        try:
+            with self.db.transaction():
+                add_employee('00003', 'Jack Smith')
+                raise ValueError
+        except ValueError:
+            pass
+        with es.open() as collection:
+            self.assertTrue(len(collection) == 2)
+        # the connection was released each time
+        self.assertTrue(len(self.db.cpool_locked) == 0)
+
+    def test_batch_changeset(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            new_hire = collection.new_entity()
+            new_hire.set_key('00001')
+            new_hire["EmployeeName"].set_from_value('Joe Bloggs')
+            data = ' '.join(new_hire.generate_entity_type_in_json(False, 1))
+            data = data.encode('utf-8')
+        svc = server.Server('http://host/service.svc')
+        svc.set_model(self.doc)
+        insert = (
+            b"--changeset_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n\r\n"
+            b"POST Employees HTTP/1.1\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: %i\r\n\r\n" % len(data) + data + b"\r\n")
+        for count, expected in ((1, 1), (2, 0)):
+            # the second changeset fails on the duplicate insert and
+            # rolls back the first
+            with es.open() as collection:
+                for key in list(collection.keys()):
+                    del collection[key]
+            batch = (
+                b"--batch_1\r\n"
+                b"Content-Type: multipart/mixed; boundary=changeset_1"
+                b"\r\n\r\n" + insert * count + b"--changeset_1--\r\n"
+                b"--batch_1--")
+            request = MockRequest("/service.svc/$batch", "POST")
+            request.set_header('Content-Type',
+                               'multipart/mixed; boundary=batch_1')
+            request.set_header('Content-Length', str(len(batch)))
+            request.rfile.write(batch)
+            request.send(svc)
+            self.assertTrue(request.responseCode == 202)
+            with es.open() as collection:
+                self.assertTrue(len(collection) == expected)
+
+    def test_read_concurrency_tokens(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            new_hire = collection.new_entity()
+            new_hire.set_key('00001')
+            new_hire["EmployeeName"].set_from_value('Joe Bloggs')
+            new_hire["Address"]["City"].set_from_value('Chunton')
+            collection.insert_entity(new_hire)
+            version = new_hire['Version'].value
+            self.assertTrue(version)
+            entity = collection.read_concurrency_tokens('00001')
+            self.assertTrue(entity['EmployeeID'].value == '00001')
+            self.assertTrue(entity['Version'].value == version)
+            # other properties are not read
+            self.assertFalse(entity.is_selected('EmployeeName'))
+            self.assertFalse(entity['EmployeeName'])
+            self.assertFalse(entity['Address']['City'])
+            try:
+                collection.read_concurrency_tokens('00002')
+                self.fail("read_concurrency_tokens: missing key")
+            except KeyError:
+                pass
+
+    def test_conditional_get(self):
+        doc = edmx.Document()
+        doc.read(src=NOTES_SCHEMA)
+        container = doc.root.DataServices['NotesModel.Notes']
+        db = sqlds.SQLiteEntityContainer(
+            file_path=self.d.join('notes.db'), container=container)
+        try:
+            db.create_all_tables()
+            with container['Notes'].open() as collection:
+                note = collection.new_entity()
+                note.set_key(1)
+                note['Body'].set_from_value('x' * 10000)
+                collection.insert_entity(note)
+            svc = server.Server('http://host/service.svc')
+            svc.set_model(doc)
+            request = MockRequest("/service.svc/Notes(1)")
+            request.send(svc)
+            self.assertTrue(request.responseCode == 200)
+            etag = request.responseHeaders['ETAG']
+            mtime = request.responseHeaders['LAST-MODIFIED']
+            mtime = params.FullDate.from_http_str(mtime)
+            request = MockRequest("/service.svc/Notes(1)")
+            request.set_header('If-None-Match', etag)
+            request.send(svc)
+            self.assertTrue(request.responseCode == 304)
+            self.assertTrue(request.wfile.getvalue() == b'')
+            self.assertTrue(request.responseHeaders['ETAG'] == etag)
+            request = MockRequest("/service.svc/Notes(1)")
+            request.set_header('If-Modified-Since', str(mtime))
+            request.send(svc)
+            self.assertTrue(request.responseCode == 304)
+            request = MockRequest("/service.svc/Notes(1)")
+            request.set_header('If-Modified-Since', str(
+                params.FullDate.from_unix_time(mtime.get_unixtime() - 1)))
+            request.send(svc)
+            self.assertTrue(request.responseCode == 200)
+            # If-None-Match takes precedence
+            request = MockRequest("/service.svc/Notes(1)")
+            request.set_header('If-None-Match', '"xxx"')
+            request.set_header('If-Modified-Since', str(mtime))
+            request.send(svc)
+            self.assertTrue(request.responseCode == 200)
+        finally:
+            db.close()
+
     def test_iter(self):
         es = self.schema['SampleEntities.Employees']
         with es.open() as collection:
@@ -620,6 +1006,132 @@ class SQLDSTests(unittest.TestCase):
                 keys.add(talent['EmployeeID'].value)
             self.assertTrue(len(keys) == 10)
 
+    def test_fetch_batches(self):
+        es = self.schema['SampleEntities.Employees']
+        # force multiple fetches with a small arraysize
+        self.db.arraysize = 3
+        with es.open() as collection:
+            collection.create_table()
+            column_names, plan = collection.bind_plan(
+                collection.new_entity())
+            self.assertTrue(len(column_names) == len(plan))
+            self.assertTrue(('EmployeeID', ()) in plan)
+            self.assertTrue(('Address', ('City', )) in plan)
+            for i in range3(10):
+                new_hire = collection.new_entity()
+                new_hire.set_key('%05X' % i)
+                new_hire["EmployeeName"].set_from_value('Talent #%i' % i)
+                new_hire["Address"]["City"].set_from_value('Chunton')
+                new_hire["Address"]["Street"].set_from_value('Mill Road')
+                collection.insert_entity(new_hire)
+            talents = collection.values()
+            self.assertTrue(len(talents) == 10)
+            for talent in talents:
+                self.assertTrue(talent.exists)
+                self.assertTrue(talent["Address"]["City"] == 'Chunton')
+            self.assertTrue(len(set(t.key() for t in talents)) == 10)
+            collection.set_orderby(
+                core.CommonExpression.orderby_from_str("EmployeeID desc"))
+            collection.set_page(4, 2)
+            page = list(collection.iterpage())
+            self.assertTrue([t.key() for t in page] ==
+                            ['00007', '00006', '00005', '00004'])
+
+    def test_query_plan_cache(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            for i in range3(20):
+                new_hire = collection.new_entity()
+                new_hire.set_key('%05X' % i)
+                new_hire["EmployeeName"].set_from_value('Talent #%i' % i)
+                new_hire["Address"]["City"].set_from_value('Chunton')
+                new_hire["Address"]["Street"].set_from_value(
+                    'Mill Road' if i % 2 else 'Main Street')
+                collection.insert_entity(new_hire)
+        hits, misses, size = self.db.query_plan_stats()
+        for i in range3(5):
+            with es.open() as collection:
+                collection.set_filter(
+                    core.CommonExpression.from_str(
+                        "EmployeeName eq 'Talent #%i' and "
+                        "startswith(Address/Street,'M')" % (i + 10)))
+                talents = collection.values()
+                self.assertTrue(len(talents) == 1)
+                self.assertTrue(talents[0].key() == '%05X' % (i + 10))
+                self.assertTrue(len(collection) == 1)
+        new_hits, new_misses, new_size = self.db.query_plan_stats()
+        # one miss for each of the entity and count queries
+        self.assertTrue(new_misses == misses + 2)
+        self.assertTrue(new_hits == hits + 8)
+        self.assertTrue(new_size == size + 2)
+        # a different shape is compiled separately
+        with es.open() as collection:
+            collection.set_filter(
+                core.CommonExpression.from_str(
+                    "EmployeeName eq null or EmployeeName eq 'Talent #3'"))
+            self.assertTrue(len(collection) == 1)
+            collection.set_orderby(
+                core.CommonExpression.orderby_from_str("EmployeeName desc"))
+            collection.set_page(2, 0, "'Talent #3','00003'")
+            self.assertTrue(len(list(collection.iterpage())) == 0)
+            collection.set_page(2, 0, "'Talent #4','00004'")
+            talents = list(collection.iterpage())
+            self.assertTrue(len(talents) == 1)
+            self.assertTrue(talents[0].key() == '00003')
+        hits, misses, size = self.db.query_plan_stats()
+        self.assertTrue(hits == new_hits + 1)
+        self.assertTrue(misses == new_misses + 2)
+        # check the size limit
+        self.db.plan_cache.max_size = 3
+        with es.open() as collection:
+            for i in range3(3):
+                collection.set_filter(
+                    core.CommonExpression.from_str(
+                        "length(EmployeeName) gt %i" % i + " or true" * i))
+                len(collection)
+        self.assertTrue(len(self.db.plan_cache) == 3)
+
+    def test_keyset_paging(self):
+        es = self.schema['SampleEntities.Employees']
+        with es.open() as collection:
+            collection.create_table()
+            for i in range3(30):
+                new_hire = collection.new_entity()
+                new_hire.set_key('%05X' % i)
+                new_hire["EmployeeName"].set_from_value(
+                    'Talent #%i' % (i % 7))
+                new_hire["Address"]["City"].set_from_value('Chunton')
+                collection.insert_entity(new_hire)
+            # skip without top must be pushed down to the database
+            collection.set_orderby(
+                core.CommonExpression.orderby_from_str("EmployeeID"))
+            collection.set_page(None, 25)
+            keys = [e.key() for e in collection.iterpage()]
+            self.assertTrue(keys == ['%05X' % i for i in range3(25, 30)])
+        for orderby in ("EmployeeName", "EmployeeName desc",
+                        "EmployeeName,Address/City desc"):
+            with es.open() as collection:
+                collection.set_orderby(
+                    core.CommonExpression.orderby_from_str(orderby))
+                expected = [e.key() for e in collection.itervalues()]
+                self.assertTrue(len(expected) == 30)
+                collection.set_topmax(4)
+                collection.set_page(None)
+                keys = []
+                npages = 0
+                while True:
+                    page = [e.key() for e in collection.iterpage(True)]
+                    self.assertTrue(len(page) <= 4)
+                    keys += page
+                    npages += 1
+                    token = collection.next_skiptoken()
+                    if token is None:
+                        break
+                    collection.set_page(None, 0, token)
+                self.assertTrue(keys == expected, "%s: %s" % (orderby, keys))
+                self.assertTrue(npages >= 8)
+
     def test_filter(self):
         es = self.schema['SampleEntities.Employees']
         with es.open() as collection:
@@ -804,6 +1316,57 @@ class SQLDSTests(unittest.TestCase):
             self.assertTrue(len(collection) == 1)
             self.assertTrue(order.key() in collection)
 
+    def test_expand_batch(self):
+        self.db.create_all_tables()
+        customers = self.schema['SampleEntities.Customers']
+        orders = self.schema['SampleEntities.Orders']
+        with customers.open() as collection:
+            for i in range3(5):
+                customer = collection.new_entity()
+                customer.set_key('C%04i' % i)
+                customer["CompanyName"].set_from_value('Company %i' % i)
+                customer["Address"]["City"].set_from_value('Chunton')
+                collection.insert_entity(customer)
+        with orders.open() as collection:
+            for i in range3(20):
+                order = collection.new_entity()
+                order.set_key(i + 1)
+                if i % 4:
+                    # every fourth order has no customer
+                    order['Customer'].bind_entity('C%04i' % (i % 3))
+                collection.insert_entity(order)
+        queries = []
+        execute = sqlds.SQLTransaction.execute
+
+        def count_execute(transaction, sqlcmd, params=None):
+            queries.append(sqlcmd)
+            return execute(transaction, sqlcmd, params)
+        sqlds.SQLTransaction.execute = count_execute
+        try:
+            with orders.open() as collection:
+                collection.set_expand({'Customer': {'Orders': None}})
+                result = collection.values()
+            # one query for the orders, one for all the customers and
+            # one for all the customers' orders
+            self.assertTrue(len(queries) == 3, queries)
+        finally:
+            sqlds.SQLTransaction.execute = execute
+        self.assertTrue(len(result) == 20)
+        for order in result:
+            i = order.key() - 1
+            self.assertTrue(order['Customer'].isExpanded)
+            customer = order['Customer'].get_entity()
+            if i % 4:
+                self.assertTrue(customer.key() == 'C%04i' % (i % 3))
+                self.assertTrue(customer['Orders'].isExpanded)
+                keys = set(o.key() for o in
+                           customer['Orders'].expanded.values())
+                self.assertTrue(
+                    keys == set(j + 1 for j in range3(20) if
+                                j % 4 and j % 3 == i % 3))
+            else:
+                self.assertTrue(customer is None)
+
     def test_all_tables(self):
         self.db.create_all_tables()
         # run through each entity set and check there is no data in it
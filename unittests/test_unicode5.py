@@ -193,6 +193,58 @@ class CharClassTests(unittest.TestCase):
                             "CharClass Re test: expected %s, found %s" %
                             (test[2], result))
 
+    def test_freeze(self):
+        c = unicode5.CharClass(('a', 'c'), 'x', character(0x2028),
+                               (character(0xfff0), character(0x10010)))
+        c2 = unicode5.CharClass(c)
+        self.assertTrue(c.freeze() is c)
+        for i in range3(0x10020):
+            ci = character(i)
+            self.assertTrue(c.test(ci) == c2.test(ci), repr(ci))
+        self.assertFalse(c.test(None))
+        self.assertTrue(unicode5.CharClass().freeze().test('a') is False)
+        for method, arg in ((c.add_char, 'd'), (c.subtract_char, 'a'),
+                            (c.add_class, c2), (c.subtract_class, c2)):
+            try:
+                method(arg)
+                self.fail("Modified frozen class")
+            except ValueError:
+                pass
+        try:
+            c.negate()
+            self.fail("Negated frozen class")
+        except ValueError:
+            pass
+        # copies of a frozen class can be modified
+        c2 = unicode5.CharClass(c)
+        c2.subtract_char('a')
+        self.assertTrue(c.test('a'))
+        self.assertFalse(c2.test('a'))
+
+    def test_span(self):
+        c = unicode5.CharClass(('a', 'c'), '-]\\^[', character(0x2028))
+        src = ul('ab^-]\\[c') + character(0x2028) + ul('x')
+        self.assertTrue(c.match_span(src) == len(src) - 1)
+        self.assertTrue(c.match_span(src, 3) == len(src) - 1)
+        self.assertTrue(c.match_span(src, len(src) - 1) == len(src) - 1)
+        self.assertTrue(c.match_span(src, len(src)) == len(src))
+        self.assertTrue(c.match_span(src, len(src) + 1) == len(src) + 1)
+        # binary strings match by byte value
+        self.assertTrue(c.match_span(b'ab^-x') == 4)
+        self.assertTrue(c.match_span(b'\xe2\x80\xa8') == 0)
+        # empty class
+        c = unicode5.CharClass()
+        self.assertTrue(c.match_span(ul('abc'), 1) == 1)
+        self.assertTrue(c.match_span(b'abc') == 0)
+        # the compiled expressions are reset when the class is modified
+        c.add_char('a')
+        self.assertTrue(c.match_span(ul('abc')) == 1)
+        self.assertTrue(c.span_re() is c.span_re())
+        self.assertTrue(c.span_re(True) is c.span_re(True))
+        c.add_char('b')
+        self.assertTrue(c.match_span(ul('abc')) == 2)
+        self.assertTrue(c.match_span(b'abc') == 2)
+
     def class_test(self, cclass):
         result = []
         for c in range(ord('a'), ord('z') + 1):
@@ -585,6 +637,21 @@ class ParserTests(unittest.TestCase):
         p.setpos(0)
         self.assertTrue(p.parse_one(b"e") is None)
 
+    def test_parse_span(self):
+        c = unicode5.CharClass(('a', 'z'))
+        p = unicode5.BasicParser(ul("hello world"))
+        self.assertTrue(p.parse_span(c) == ul("hello"))
+        self.assertTrue(p.pos == 5)
+        self.assertTrue(p.parse_span(c) is None)
+        self.assertTrue(p.pos == 5)
+        p.setpos(6)
+        self.assertTrue(p.parse_span(c) == ul("world"))
+        self.assertTrue(p.the_char is None)
+        self.assertTrue(p.parse_span(c) is None)
+        p = unicode5.BasicParser(b"hello world")
+        self.assertTrue(p.parse_span(c) == b"hello")
+        self.assertTrue(p.the_char == byte(b" "))
+
     def test_match_digit(self):
         p = unicode5.BasicParser(ul("2p"))
         self.assertTrue(p.match_digit())
@@ -12,6 +12,9 @@ import tempfile
 import threading
 import time
 import unittest
+import zlib
+
+from wsgiref.util import FileWrapper
 
 from pyslet import html401 as html
 from pyslet import iso8601 as iso
@@ -19,9 +22,11 @@ from pyslet import wsgi
 from pyslet.http import (
     client as http,
     cookie,
+    messages,
     params)
 from pyslet.odata2 import (
     metadata as edmx,
+    server as odata,
     sqlds as sql)
 from pyslet.py2 import (
     dict_items,
@@ -46,6 +51,8 @@ def suite(prefix='test'):
         loader.loadTestsFromTestCase(AppCipherTests),
         loader.loadTestsFromTestCase(CookieSessionTests),
         loader.loadTestsFromTestCase(FullAppTests),
+        loader.loadTestsFromTestCase(CompressionTests),
+        loader.loadTestsFromTestCase(DispatchBenchmarks),
     ))
 
 
@@ -128,6 +135,66 @@ class MockApp(wsgi.WSGIApp):
     private_files = PRIVATE_FILES
 
 
+def backtrack_dispatch(app, path):
+    # the original backtracking dispatch algorithm, used to check the
+    # compiled dispatcher gives identical results
+    path = path.split('/')
+    i = 0
+    node = app
+    wildcard = None
+    stack = []
+    while i < len(path):
+        p = path[i]
+        old_node = node
+        wild_node = old_node._nodes.get('*', None)
+        node = old_node._nodes.get(p, None)
+        if node:
+            if wild_node:
+                stack.append((i, wild_node, wildcard))
+        elif wild_node:
+            node = wild_node
+        elif wildcard:
+            break
+        elif stack:
+            i, node, wildcard = stack.pop()
+        else:
+            break
+        if node._wildcard is not None:
+            wildcard = node._wildcard
+        i += 1
+    if node and node._handler is not None:
+        return node._handler
+    return wildcard
+
+
+def route_table(nroutes, seed=1):
+    # generates a random route table with overlapping wildcards and a
+    # matching set of test paths
+    r = random.Random(seed)
+    words = ['a', 'b', 'c', 'd', 'e']
+    routes = set()
+    while len(routes) < nroutes:
+        path = ['']
+        for i in range3(r.randint(1, 4)):
+            if r.random() < 0.2:
+                path.append('*')
+            else:
+                path.append(r.choice(words))
+        if path[-1] != '*' and r.random() < 0.1:
+            path.append('*')
+        routes.add('/'.join(path))
+    paths = set(['', '/'])
+    for route in routes:
+        paths.add(route.replace('*', r.choice(words + ['x'])))
+        paths.add(route.replace('*', 'x') + '/a')
+        if route.endswith('/*'):
+            paths.add(route[:-2])
+    for i in range3(nroutes):
+        paths.add('/' + '/'.join(r.choice(words + ['x', ''])
+                                 for j in range3(r.randint(0, 6))))
+    return sorted(routes), sorted(paths)
+
+
 class FunctionTests(unittest.TestCase):
 
     def test_keygen(self):
@@ -886,6 +953,43 @@ class AppTests(unittest.TestCase):
         req.call_app(app)
         self.assertTrue(req.output.getvalue() == b"test3")
 
+    def test_compiled_dispatch(self):
+        class App(wsgi.WSGIApp):
+
+            def page(self, context):
+                context.set_status(200)
+                return [context.environ['PATH_INFO'].encode('ascii')]
+
+            def no_post(self, context):
+                raise wsgi.MethodNotAllowed
+
+        App.setup()
+        for seed in range3(1, 21):
+            app = App()
+            routes, paths = route_table(20 * seed, seed)
+            # use the routes themselves in place of handlers
+            for route in routes:
+                app.set_method(route, route)
+            dispatcher = wsgi._Dispatcher(app)
+            for path in paths:
+                expected = backtrack_dispatch(app, path)
+                result = dispatcher.match(path)
+                self.assertTrue(result == expected,
+                                "%s: %s, expected %s" %
+                                (path, result, expected))
+        # the dispatcher is rebuilt when a new method is registered
+        app = App()
+        app.set_method('/a/*', app.page)
+        req = MockRequest(path="/a/b")
+        req.call_app(app)
+        self.assertTrue(req.output.getvalue() == b"/a/b")
+        self.assertFalse(app._dispatcher is None)
+        app.set_method('/a/b', app.no_post)
+        self.assertTrue(app._dispatcher is None)
+        req = MockRequest(path="/a/b")
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('405 '))
+
     def test_wrapper(self):
         class App(wsgi.WSGIApp):
 
@@ -965,6 +1069,136 @@ class AppTests(unittest.TestCase):
         req.call_app(app.call_wrapper)
         self.assertTrue(req.status.startswith('404 '))
 
+    def test_file_conditional(self):
+        pub_path = os.path.join(STATIC_FILES, 'res', 'public.txt')
+        MockApp.setup()
+        app = MockApp()
+        app.set_method('/*', app.static_page)
+        req = MockRequest(path="/res/public.txt")
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('200 '))
+        self.assertTrue(req.headers['accept-ranges'] == ['bytes'])
+        etag = req.headers['etag'][0]
+        self.assertFalse(etag.startswith('W/'), "strong etag")
+        last_modified = req.headers['last-modified'][0]
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_IF_NONE_MATCH'] = etag
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('304 '), req.status)
+        self.assertTrue(req.headers['etag'] == [etag])
+        self.assertTrue(req.output.getvalue() == b'')
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_IF_NONE_MATCH'] = '"xxx", W/%s' % etag
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('304 '), req.status)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_IF_NONE_MATCH'] = '"xxx"'
+        # If-None-Match takes precedence over If-Modified-Since
+        req.environ['HTTP_IF_MODIFIED_SINCE'] = last_modified
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('200 '), req.status)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_IF_MODIFIED_SINCE'] = last_modified
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('304 '), req.status)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_IF_MODIFIED_SINCE'] = \
+            "Sun, 06 Nov 1994 08:49:37 GMT"
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('200 '), req.status)
+        # POST requests are not conditional
+        req = MockRequest(method="POST", path="/res/public.txt")
+        req.environ['HTTP_IF_NONE_MATCH'] = etag
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('200 '), req.status)
+        # a file wrapper is used if available
+        wrapped = []
+
+        def file_wrapper(f, block_size):
+            wrapped.append(block_size)
+            return FileWrapper(f, block_size)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['wsgi.file_wrapper'] = file_wrapper
+        req.call_app(app)
+        self.assertTrue(wrapped == [app.MAX_CHUNK])
+        with open(pub_path, 'rb') as f:
+            self.assertTrue(req.output.getvalue() == f.read())
+
+    def test_file_ranges(self):
+        pub_path = os.path.join(STATIC_FILES, 'res', 'public.txt')
+        with open(pub_path, 'rb') as f:
+            data = f.read()
+        pub_len = len(data)
+        MockApp.setup()
+        app = MockApp()
+        app.set_method('/*', app.static_page)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=0-4'
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('206 '), req.status)
+        self.assertTrue(req.headers['content-range'] ==
+                        ['bytes 0-4/%i' % pub_len])
+        self.assertTrue(req.headers['content-length'] == ['5'])
+        self.assertTrue(req.output.getvalue() == b'Hello')
+        etag = req.headers['etag'][0]
+        # suffix range
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=-3'
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('206 '), req.status)
+        self.assertTrue(req.output.getvalue() == data[-3:])
+        # open range, last byte past the end
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=6-, 2-1000'
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('206 '), req.status)
+        ctype = params.MediaType.from_str(req.headers['content-type'][0])
+        self.assertTrue(ctype.type == "multipart")
+        self.assertTrue(ctype.subtype == "byteranges")
+        boundary = ctype['boundary'].decode('ascii')
+        output = req.output.getvalue()
+        self.assertTrue(req.headers['content-length'] ==
+                        [str(len(output))])
+        self.assertTrue(output.endswith(
+            ("\r\n--%s--\r\n" % boundary).encode('ascii')))
+        parts = output.split(("\r\n--%s" % boundary).encode('ascii'))
+        self.assertTrue(len(parts) == 4, repr(parts))
+        self.assertTrue(parts[0] == b'')
+        head, body = parts[1].split(b'\r\n\r\n', 1)
+        self.assertTrue(b'Content-Type: text/plain' in head)
+        self.assertTrue(
+            ('Content-Range: bytes 6-%i/%i' %
+             (pub_len - 1, pub_len)).encode('ascii') in head)
+        self.assertTrue(body == data[6:])
+        head, body = parts[2].split(b'\r\n\r\n', 1)
+        self.assertTrue(body == data[2:])
+        # unsatisfiable
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=%i-' % pub_len
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('416 '), req.status)
+        self.assertTrue(req.headers['content-range'] ==
+                        ['bytes */%i' % pub_len])
+        # syntax errors and unknown units are ignored
+        for spec in ('bytes=5-4', 'bytes=x-4', 'lines=1-2', 'bytes='):
+            req = MockRequest(path="/res/public.txt")
+            req.environ['HTTP_RANGE'] = spec
+            req.call_app(app)
+            self.assertTrue(req.status.startswith('200 '), spec)
+            self.assertTrue(req.output.getvalue() == data)
+        # If-Range
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=0-4'
+        req.environ['HTTP_IF_RANGE'] = etag
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('206 '), req.status)
+        req = MockRequest(path="/res/public.txt")
+        req.environ['HTTP_RANGE'] = 'bytes=0-4'
+        req.environ['HTTP_IF_RANGE'] = '"xxx"'
+        req.call_app(app)
+        self.assertTrue(req.status.startswith('200 '), req.status)
+        self.assertTrue(req.output.getvalue() == data)
+
     def test_html_response(self):
         class App(wsgi.WSGIApp):
 
@@ -1857,6 +2091,299 @@ class FullAppTests(unittest.TestCase):
         self.assertFalse('location' in req.headers)
 
 
+class CompressionTests(unittest.TestCase):
+
+    def setUp(self):        # noqa
+        self.body = b"Hello World! " * 200
+        self.metrics = []
+
+    def app(self, environ, start_response):
+        path = environ['PATH_INFO']
+        headers = []
+        if path == '/png':
+            headers.append(('Content-Type', 'image/png'))
+        else:
+            headers.append(('Content-Type', 'text/plain; charset=utf-8'))
+        if path == '/small':
+            data = b"Hello"
+        else:
+            data = self.body
+        if path == '/stream':
+            start_response("200 OK", headers)
+            return self.stream()
+        headers.append(('Content-Length', str(len(data))))
+        match = environ.get('HTTP_IF_NONE_MATCH', None)
+        headers.append(('ETag', '"hello"'))
+        if messages.not_modified(
+                match, None, [params.EntityTag("hello", weak=False)]):
+            start_response("304 Not Modified", headers)
+            return []
+        start_response("200 OK", headers)
+        return [data]
+
+    def stream(self):
+        for i in range3(10):
+            yield b"Chunk %i\n" % i
+
+    def callback(self, coding, raw_size, encoded_size):
+        self.metrics.append((coding, raw_size, encoded_size))
+
+    def test_constructor(self):
+        mw = wsgi.CompressionMiddleware(self.app)
+        self.assertTrue(mw.app == self.app)
+        self.assertTrue(mw.min_size == 1024)
+        self.assertTrue(mw.types is mw.DEFAULT_TYPES)
+        self.assertTrue(mw.responses == 0)
+        self.assertTrue(mw.compression_ratio() is None)
+
+    def test_gzip(self):
+        mw = wsgi.CompressionMiddleware(self.app,
+                                        metrics_callback=self.callback)
+        req = MockRequest(path='/text')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip, deflate'
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('200 '))
+        self.assertTrue(req.headers['content-encoding'] == ['gzip'])
+        self.assertTrue(req.headers['vary'] == ['Accept-Encoding'])
+        self.assertTrue(req.headers['etag'] == ['"hello-gzip"'])
+        self.assertFalse('content-length' in req.headers)
+        data = req.output.getvalue()
+        self.assertTrue(len(data) < len(self.body))
+        self.assertTrue(
+            zlib.decompress(data, 16 + zlib.MAX_WBITS) == self.body)
+        self.assertTrue(self.metrics == [('gzip', len(self.body), len(data))])
+        self.assertTrue(mw.responses == 1)
+        self.assertTrue(mw.compression_ratio() < 0.1)
+        # conditional request with the modified ETag
+        req = MockRequest(path='/text')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.environ['HTTP_IF_NONE_MATCH'] = '"hello-gzip"'
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('304 '))
+        self.assertFalse('content-encoding' in req.headers)
+        # the 304 carries the ETag the client has cached
+        self.assertTrue(req.headers['etag'] == ['"hello-gzip"'])
+        self.assertTrue(req.headers['vary'] == ['Accept-Encoding'])
+        self.assertTrue(req.output.getvalue() == b'')
+
+    def test_if_none_match(self):
+        environs = []
+
+        def app(environ, start_response):
+            environs.append(environ)
+            return self.app(environ, start_response)
+        mw = wsgi.CompressionMiddleware(app)
+        for match, passed, status in (
+                ('"hello-gzip"', '"hello-gzip", "hello"', '304'),
+                ('"x", "hello-deflate"', '"x", "hello-deflate", "hello"',
+                 '304'),
+                # weak tags are not changed
+                ('W/"hello-gzip"', 'W/"hello-gzip"', '200'),
+                ('"hello-br"', '"hello-br"', '200'),
+                ('*', '*', '304'),
+                ('bad-syntax-gzip"', 'bad-syntax-gzip"', '200')):
+            environs = []
+            req = MockRequest(path='/text')
+            req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+            req.environ['HTTP_IF_NONE_MATCH'] = match
+            req.call_app(mw)
+            self.assertTrue(
+                environs[0]['HTTP_IF_NONE_MATCH'] == passed,
+                environs[0]['HTTP_IF_NONE_MATCH'])
+            self.assertTrue(req.status.startswith(status), match)
+            if status == '304':
+                self.assertTrue(req.headers['etag'] ==
+                                ['"hello-gzip"' if 'gzip' in match else
+                                 '"hello-deflate"' if 'deflate' in match
+                                 else '"hello"'], req.headers['etag'])
+        # without compression the header is passed through unchanged
+        environs = []
+        req = MockRequest(path='/text')
+        req.environ['HTTP_IF_NONE_MATCH'] = '"hello-gzip"'
+        req.call_app(mw)
+        self.assertTrue(environs[0]['HTTP_IF_NONE_MATCH'] == '"hello-gzip"')
+        self.assertTrue(req.status.startswith('200 '))
+
+    def test_cached_metadata(self):
+        doc = edmx.Document()
+        md_path = os.path.join(os.path.split(__file__)[0], 'data_odatav2',
+                               'sample_server', 'metadata.xml')
+        with open(md_path, 'rb') as f:
+            doc.read(f)
+        svc = odata.Server('http://localhost/service.svc/')
+        svc.set_model(doc)
+        mw = wsgi.CompressionMiddleware(svc)
+        # the server's own gzip variant is not compressed again
+        req = MockRequest(path='/service.svc/$metadata')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('200 '))
+        self.assertTrue(req.headers['content-encoding'] == ['gzip'])
+        gzip_etag = req.headers['etag'][0]
+        self.assertTrue(gzip_etag.endswith('-gzip"'))
+        self.assertFalse(gzip_etag.endswith('-gzip-gzip"'))
+        data = zlib.decompress(req.output.getvalue(), 16 + zlib.MAX_WBITS)
+        self.assertTrue(data.startswith(b'<?xml'))
+        req = MockRequest(path='/service.svc/$metadata')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.environ['HTTP_IF_NONE_MATCH'] = gzip_etag
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('304 '))
+        self.assertTrue(req.headers['etag'] == [gzip_etag])
+        # the identity variant is compressed by the middleware
+        req = MockRequest(path='/service.svc/$metadata')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'deflate'
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('200 '))
+        self.assertTrue(req.headers['content-encoding'] == ['deflate'])
+        deflate_etag = req.headers['etag'][0]
+        self.assertTrue(deflate_etag == gzip_etag[:-6] + '-deflate"')
+        self.assertTrue(zlib.decompress(req.output.getvalue()) == data)
+        self.assertTrue(req.headers['vary'] == ['Accept, Accept-Encoding'])
+        req = MockRequest(path='/service.svc/$metadata')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'deflate'
+        req.environ['HTTP_IF_NONE_MATCH'] = deflate_etag
+        req.call_app(mw)
+        self.assertTrue(req.status.startswith('304 '))
+        self.assertTrue(req.headers['etag'] == [deflate_etag])
+        self.assertTrue(req.output.getvalue() == b'')
+
+    def test_deflate(self):
+        mw = wsgi.CompressionMiddleware(self.app)
+        req = MockRequest(path='/text')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip;q=0.5, deflate'
+        req.call_app(mw)
+        self.assertTrue(req.headers['content-encoding'] == ['deflate'])
+        self.assertTrue(req.headers['etag'] == ['"hello-deflate"'])
+        self.assertTrue(zlib.decompress(req.output.getvalue()) == self.body)
+
+    def test_identity(self):
+        mw = wsgi.CompressionMiddleware(self.app)
+        for accept in (None, 'identity', 'gzip;q=0, deflate;q=0', 'br',
+                       'gzip;q=x'):
+            req = MockRequest(path='/text')
+            if accept is not None:
+                req.environ['HTTP_ACCEPT_ENCODING'] = accept
+            req.call_app(mw)
+            self.assertTrue(req.status.startswith('200 '))
+            self.assertFalse('content-encoding' in req.headers, accept)
+            self.assertTrue(req.headers['content-length'] ==
+                            [str(len(self.body))])
+            self.assertTrue(req.output.getvalue() == self.body)
+        req = MockRequest(method='HEAD', path='/text')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertFalse('content-encoding' in req.headers)
+        self.assertTrue(mw.responses == 0)
+
+    def test_threshold(self):
+        mw = wsgi.CompressionMiddleware(self.app)
+        req = MockRequest(path='/small')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertFalse('content-encoding' in req.headers)
+        self.assertTrue(req.output.getvalue() == b"Hello")
+        mw = wsgi.CompressionMiddleware(self.app, min_size=0)
+        req = MockRequest(path='/small')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertTrue(req.headers['content-encoding'] == ['gzip'])
+
+    def test_types(self):
+        mw = wsgi.CompressionMiddleware(self.app)
+        req = MockRequest(path='/png')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertFalse('content-encoding' in req.headers)
+        self.assertTrue(req.output.getvalue() == self.body)
+        mw = wsgi.CompressionMiddleware(
+            self.app, types=[messages.MediaRange.from_str('image/*')])
+        req = MockRequest(path='/png')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertTrue(req.headers['content-encoding'] == ['gzip'])
+        req = MockRequest(path='/text')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        req.call_app(mw)
+        self.assertFalse('content-encoding' in req.headers)
+
+    def test_stream(self):
+        mw = wsgi.CompressionMiddleware(self.app,
+                                        metrics_callback=self.callback)
+        req = MockRequest(path='/stream')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        result = mw(req.environ, req.start_response)
+        self.assertTrue(req.headers['content-encoding'] == ['gzip'])
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        i = 0
+        for data in result:
+            # each chunk is flushed and can be decoded on arrival
+            chunk = d.decompress(data)
+            if i < 10:
+                self.assertTrue(chunk == b"Chunk %i\n" % i)
+            else:
+                self.assertTrue(chunk == b"")
+            i += 1
+        result.close()
+        self.assertTrue(i == 11)
+        self.assertTrue(len(self.metrics) == 1)
+        self.assertTrue(self.metrics[0][1] == 80)
+
+    def test_write(self):
+        def app(environ, start_response):
+            write = start_response(
+                "200 OK", [('Content-Type', 'application/json')])
+            write(self.body)
+            return []
+        mw = wsgi.CompressionMiddleware(app)
+        req = MockRequest(path='/')
+        req.environ['HTTP_ACCEPT_ENCODING'] = 'deflate'
+        req.call_app(mw)
+        self.assertTrue(req.headers['content-encoding'] == ['deflate'])
+        self.assertTrue(zlib.decompress(req.output.getvalue()) == self.body)
+
+    def test_setting(self):
+        class CApp(wsgi.WSGIApp):
+            pass
+        CApp.setup()
+        self.assertTrue(CApp.settings['WSGIApp']['compress'] is False)
+
+
+class DispatchBenchmarks(unittest.TestCase):
+
+    def test_throughput(self):
+        class App(wsgi.WSGIApp):
+
+            def page(self, context):
+                return []
+
+        App.setup()
+        app = App()
+        routes, paths = route_table(500)
+        for route in routes:
+            app.set_method(route, app.page)
+        environs = [MockRequest(path=path).environ for path in paths]
+        app(environs[0], None)
+        t = time.time()
+        for i in range3(10):
+            for path in paths:
+                backtrack_dispatch(app, path)
+        t = time.time() - t
+        tc = time.time()
+        for i in range3(10):
+            for path in paths:
+                app._dispatcher.match(path)
+        tc = time.time() - tc
+        logging.info("dispatch: %i routes, %i paths; backtracking %.3fs, "
+                     "compiled %.3fs (%.1fx)", len(routes), 10 * len(paths),
+                     t, tc, t / tc if tc else 0.0)
+        t = time.time()
+        for environ in environs:
+            app(environ, None)
+        t = time.time() - t
+        logging.info("dispatch: %i requests in %.3fs", len(environs), t)
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     unittest.main()
@@ -2,6 +2,7 @@
 
 import logging
 import os.path
+import time
 import unittest
 
 from sys import maxunicode
@@ -26,7 +27,8 @@ def suite():
     return unittest.TestSuite((
         unittest.makeSuite(XMLCharacterTests, 'test'),
         unittest.makeSuite(XMLValidationTests, 'test'),
-        unittest.makeSuite(XMLParserTests, 'test')
+        unittest.makeSuite(XMLParserTests, 'test'),
+        unittest.makeSuite(XMLParserBenchmarks, 'test')
     ))
 
 TEST_DATA_DIR = os.path.join(
@@ -632,6 +634,20 @@ class XMLParserTests(unittest.TestCase):
                                 "Match failed: %s (expected %s)" %
                                 (p.element.get_value(), match))
 
+    def test_buff_text(self):
+        with structures.XMLEntity("Hello World") as e:
+            p = parser.XMLParser(e)
+            self.assertTrue(p.parse_name() == "Hello")
+            p.buff_text("Hi")
+            self.assertTrue(p.the_char == "H")
+            p.buff_text("Oh")
+            # names are parsed across the pushed back characters
+            self.assertTrue(p.parse_name() == "OhHi")
+            self.assertTrue(p.parse_s() == " ")
+            p.buff_text("Big")
+            self.assertTrue(p.parse_name() == "BigWorld")
+            self.assertTrue(p.the_char is None)
+
     def test_comment(self):
         """[15] Comment ::= '<!--' ((Char - '-') | ('-' (Char - '-')))* '-->'
         """
@@ -2538,6 +2554,34 @@ class XMLParserTests(unittest.TestCase):
                     pass
 
 
+class XMLParserBenchmarks(unittest.TestCase):
+
+    def setUp(self):        # noqa
+        data = ['<?xml version="1.0" encoding="utf-8"?>\n<feed>\n']
+        for i in range3(2000):
+            data.append(
+                '  <entry id="e%i" class="item">\n'
+                '    <title>Entry number %i</title>\n'
+                '    <summary>Lorem ipsum dolor sit amet, consectetur\n'
+                '      adipiscing elit &amp; sed do eiusmod tempor\n'
+                '      incididunt ut labore et dolore magna aliqua.'
+                '</summary>\n  </entry>\n' % (i, i))
+        data.append('</feed>\n')
+        self.src = ''.join(data).encode('utf-8')
+
+    def test_throughput(self):
+        t = time.time()
+        doc = structures.Document()
+        doc.read(self.src)
+        t = time.time() - t
+        entries = [child for child in doc.root.get_children() if
+                   isinstance(child, structures.Element)]
+        self.assertTrue(len(entries) == 2000)
+        self.assertTrue(entries[-1].get_attribute('id') == 'e1999')
+        logging.info("XMLParser: parsed %i bytes in %.3fs, %.2f MB/s",
+                     len(self.src), t, len(self.src) / (t * 1000000.0))
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     unittest.main()
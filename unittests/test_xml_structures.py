@@ -2,6 +2,7 @@
 
 import logging
 import os.path
+import re
 import shutil
 import unittest
 
@@ -280,6 +281,34 @@ class XMLEntityTests(unittest.TestCase):
         self.assertTrue(e.line_num == 3)
         self.assertTrue(e.line_pos == 2)
 
+    def test_scan(self):
+        run = re.compile("[a-z\n]+")
+        e = structures.XMLEntity(b"hello\nworld\r\nfoo\rbar!")
+        self.assertTrue(e.scan(run) == "hello\nworld")
+        # CR is subject to end-of-line handling so is never scanned
+        self.assertTrue(e.the_char == "\n")
+        self.assertTrue(e.line_num == 3)
+        self.assertTrue(e.line_pos == 0)
+        self.assertTrue(e.scan(run) == "")
+        e.next_char()
+        self.assertTrue(e.the_char == "f")
+        self.assertTrue(e.line_num == 3)
+        self.assertTrue(e.scan(run) == "foo")
+        e.next_char()
+        self.assertTrue(e.scan(run) == "bar")
+        self.assertTrue(e.the_char == "!")
+        self.assertTrue(e.line_num == 4)
+        self.assertTrue(e.line_pos == 4)
+        e.next_char()
+        self.assertTrue(e.the_char is None)
+        self.assertTrue(e.scan(run) == "")
+        # runs continue when the buffer is refilled
+        data = "abcdefghij" * (structures.XMLEntity.chunk_size // 4)
+        e = structures.XMLEntity(data + "!")
+        self.assertTrue(e.scan(run) == data)
+        self.assertTrue(e.the_char == "!")
+        self.assertTrue(e.line_pos == len(data) + 1)
+
     def test_codecs(self):
         m = ul('Caf\xe9')
         e = structures.XMLEntity(b'Caf\xc3\xa9')
@@ -617,6 +646,52 @@ class DocumentTests(unittest.TestCase):
         self.assertTrue(
             root.xmlname == 'tag' and root.get_value() == 'Hello World')
 
+    def test_iterparse(self):
+        src = b'<list><item a="1">one</item><item a="2">two<sub/>' \
+            b'</item></list>'
+        d = structures.Document()
+        events = []
+        for event, node in d.iterparse(src, events=('start', 'end', 'data')):
+            if event == 'data':
+                events.append((event, node))
+            else:
+                events.append((event, node.xmlname))
+        self.assertTrue(events == [
+            ('start', 'list'), ('start', 'item'), ('data', 'one'),
+            ('end', 'item'), ('start', 'item'), ('data', 'two'),
+            ('start', 'sub'), ('end', 'sub'), ('end', 'item'),
+            ('end', 'list')], repr(events))
+        # filter by class and discard as we go
+        d = structures.Document()
+        values = []
+        for event, node in d.iterparse(src):
+            if node.xmlname == 'item':
+                # siblings have already been removed
+                self.assertTrue(len(list(node.parent.get_children())) == 1)
+                values.append(node.get_attribute('a'))
+                node.parent.remove_child(node)
+        self.assertTrue(values == ['1', '2'])
+        self.assertTrue(isinstance(d.root, structures.Element))
+        self.assertTrue(len(list(d.root.get_children())) == 0)
+        d = structures.Document()
+        events = list(d.iterparse(src, element_class=structures.Document))
+        self.assertTrue(events == [])
+        # closing the generator abandons the parser
+        d = structures.Document()
+        g = d.iterparse(src)
+        event, node = next(g)
+        self.assertTrue(node.xmlname == 'item')
+        g.close()
+        self.assertTrue(len(list(d.root.get_children())) == 1)
+        # errors are raised in the caller
+        d = structures.Document()
+        try:
+            for event, node in d.iterparse(b'<a><b></a>'):
+                pass
+            self.fail("Well-formedness error")
+        except structures.XMLError:
+            pass
+
     def test_string(self):
         os.chdir(TEST_DATA_DIR)
         d = structures.Document(base_uri='readFile.xml')